@@ -13,6 +13,11 @@ from typing import Dict, List, Optional, Set, Any
 from dataclasses import dataclass, asdict
 import json
 
+try:
+    from .robodog_terminal.ignore import DEFAULT_EXCLUDE_DIRS, matcher_for
+except ImportError:
+    from robodog_terminal.ignore import DEFAULT_EXCLUDE_DIRS, matcher_for
+
 logger = logging.getLogger(__name__)
 
 
@@ -71,7 +76,7 @@ class CodeMapper:
     
     def __init__(self, roots: List[str], exclude_dirs: Optional[Set[str]] = None):
         self.roots = roots
-        self.exclude_dirs = exclude_dirs or {'node_modules', 'dist', 'diffoutput', '__pycache__', '.git', 'venv', 'env'}
+        self.exclude_dirs = set(exclude_dirs or DEFAULT_EXCLUDE_DIRS)
         self.file_maps: Dict[str, FileMap] = {}
         self.index: Dict[str, List[str]] = {
             'classes': {},      # class_name -> [file_paths]
@@ -115,15 +120,15 @@ class CodeMapper:
     def _walk_directory(self, root: Path, extensions: List[str]) -> List[Path]:
         """Walk directory and find files with given extensions"""
         files = []
-        
-        for item in root.rglob('*'):
-            # Skip excluded directories
-            if any(excluded in item.parts for excluded in self.exclude_dirs):
-                continue
-            
-            # Check extension
-            if item.is_file() and item.suffix in extensions:
-                files.append(item)
+        skip = matcher_for(root, self.exclude_dirs)
+        
+        # Excluded / .gitignore'd directories are pruned, never entered
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not skip(os.path.join(dirpath, d), True)]
+            for fn in filenames:
+                item = Path(dirpath) / fn
+                if item.suffix in extensions and not skip(str(item), False):
+                    files.append(item)
         
         return files
     
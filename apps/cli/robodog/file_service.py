@@ -12,6 +12,13 @@ import traceback  # Added for stack traces
 logger = logging.getLogger(__name__)
 import re
 
+try:
+    from .robodog_terminal import file_tree
+    from .robodog_terminal.ignore import matcher_for
+except ImportError:
+    from robodog_terminal import file_tree
+    from robodog_terminal.ignore import matcher_for
+
 
 class FileService:
     """Handles file operations and path resolution."""
@@ -21,6 +28,8 @@ class FileService:
         self._roots = roots
         self._base_dir = base_dir
         self._exclude_dirs = {"node_modules", "dist", "diffoutput"}
+        # True when the last search_files hit the file-tree cap (partial results)
+        self.truncated = False
         self._backupFolder = backupFolder
         self._app = app
         logger.info(f"FileService initialized with {len(roots)} roots and exclude_dirs: {self._exclude_dirs}", extra={'log_color': 'HIGHLIGHT'})
@@ -178,6 +187,7 @@ class FileService:
             patterns = list(patterns)
         exclude_dirs = set(exclude_dirs or self._exclude_dirs)
         matches = []
+        self.truncated = False
         roots_to_search = roots or self._roots
         logger.debug(f"Searching in {len(roots_to_search)} roots with {len(patterns)} patterns, excluding {exclude_dirs}", extra={'log_color': 'HIGHLIGHT'})
         for root in roots_to_search:
@@ -185,17 +195,26 @@ class FileService:
                 logger.warning(f"Root directory not found: {root}", extra={'log_color': 'DELTA'})
                 continue
             if recursive:
-                for dirpath, dirnames, filenames in os.walk(root):
-                    # Filter out excluded directories
-                    dirnames[:] = [d for d in dirnames if d not in exclude_dirs]
-                    logger.debug(f"Scanning directory: {dirpath}, filtered dirnames: {dirnames}", extra={'log_color': 'HIGHLIGHT'})
-                    for fn in filenames:
-                        full = os.path.join(dirpath, fn)
-                        for pat in patterns:
-                            if fnmatch.fnmatch(full, pat) or fnmatch.fnmatch(fn, pat):
-                                matches.append(full)
-                                logger.debug(f"Matched file: {full} with pattern: {pat}", extra={'log_color': 'PERCENT'})
-                                break
+                # The shared file_tree snapshot (.gitignore-aware, refreshed from
+                # dir mtimes) instead of a fresh os.walk per call.
+                tree, prefix = file_tree.tree_for(root, matcher_for(root))
+                if tree.truncated:
+                    self.truncated = True
+                    logger.warning(f"The file index stopped at {tree.max_files} files, so the "
+                                   f"search of {root} may be incomplete — raise "
+                                   f"ROBODOG_FILE_TREE_MAX.", extra={'log_color': 'DELTA'})
+                for rel in tree.files(prefix):
+                    if prefix:
+                        rel = os.path.relpath(rel, prefix)
+                    if any(part in exclude_dirs for part in rel.split(os.sep)[:-1]):
+                        continue
+                    full = os.path.join(root, rel)
+                    fn = os.path.basename(rel)
+                    for pat in patterns:
+                        if fnmatch.fnmatch(full, pat) or fnmatch.fnmatch(fn, pat):
+                            matches.append(full)
+                            logger.debug(f"Matched file: {full} with pattern: {pat}", extra={'log_color': 'PERCENT'})
+                            break
             else:
                 for fn in os.listdir(root):
                     full = os.path.join(root, fn)
@@ -206,7 +225,9 @@ class FileService:
                             matches.append(full)
                             logger.debug(f"Matched file (non-recursive): {full} with pattern: {pat}", extra={'log_color': 'PERCENT'})
                             break
-        logger.info(f"Search completed: {len(matches)} files matched", extra={'log_color': 'PERCENT'})
+        logger.info(f"Search completed: {len(matches)} files matched"
+                    + (" (incomplete: file index cap reached)" if self.truncated else ""),
+                    extra={'log_color': 'PERCENT'})
         return matches
 
 
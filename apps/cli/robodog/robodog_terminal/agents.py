@@ -19,12 +19,13 @@ from __future__ import annotations
 
 from typing import Callable, Dict, Optional
 
+from .llm_client import current_cancel_event
 from .loop import AgentLoop
 from .tools import Tool, ToolParam, ToolRegistry, default_registry
 
 AGENT_TYPES: Dict[str, dict] = {
     "explore": {
-        "tools": ["read_file", "glob", "grep", "list_dir"],  # read-only
+        "tools": ["read_file", "read_many", "glob", "grep", "list_dir"],  # read-only
         "max_iterations": 10,
         "note": (
             "You are a READ-ONLY exploration subagent. Investigate the codebase to "
@@ -54,6 +55,10 @@ def _child_registry(parent: ToolRegistry, agent_type: str) -> ToolRegistry:
         for name, tool in child._tools.items()
         if name != "agent" and (allowed is None or name in allowed)
     }
+    # Every child of this type has the same tools, so the fan-out shares one
+    # rendered catalog (keyed by tool names + mode) instead of each child
+    # rendering its own.
+    child.catalog_share = (parent._shared_catalogs, agent_type)
     return child
 
 
@@ -125,7 +130,10 @@ def register_agent_tool(
                         f"⚙ {d.get('name', '')} " if k == "tool_start" else "")
                     if k == "tool_start" else None,
                     child_id=child_id)
-                res = child.run(prompt)
+                try:
+                    res = child.run(prompt)
+                finally:
+                    child.registry.close()
                 return res.final_text
 
             bg = manager.spawn("agent", f"{agent_type}: {prompt[:50]}", target)
@@ -137,10 +145,16 @@ def register_agent_tool(
         # subagents are actually in-flight (which reveals the concurrency cap).
         emit = on_child_event or (lambda k, d: None)
         emit("agent_spawn", {"child_id": child_id, "agent_type": agent_type})
+        child = None
         try:
-            child = _make_child(agent_type, child_id=child_id)
+            # Started early by the loop's stream dispatcher, the call runs in
+            # a cancellable() block: the child stops with the parent's turn.
+            child = _make_child(agent_type, cancel_event=current_cancel_event(),
+                                child_id=child_id)
             result = child.run(prompt)
         finally:
+            if child is not None:
+                child.registry.close()      # its bash session, if it ran one
             emit("agent_done", {"child_id": child_id, "agent_type": agent_type})
         return (
             f"[subagent#{child_id}:{agent_type} finished — {result.iterations} steps, "
@@ -22,14 +22,21 @@ import sys
 from pathlib import Path
 
 try:
-    from .llm_client import EchoClient, GatewayClient, LLMClient, OpenAICompatClient, clean_text
+    from .llm_client import (EchoClient, GatewayClient, LLMClient, OpenAICompatClient,
+                             clean_text, concurrency_snapshot)
     from .ui import UI
     from .core import build_core
+    from .response_cache import cache_mode, model_id, wrap_client
+    from .hedging import hedge_from_env
 except ImportError:
     sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-    from robodog_terminal.llm_client import EchoClient, GatewayClient, LLMClient, OpenAICompatClient, clean_text
+    from robodog_terminal.llm_client import (EchoClient, GatewayClient, LLMClient,
+                                             OpenAICompatClient, clean_text,
+                                             concurrency_snapshot)
     from robodog_terminal.ui import UI
     from robodog_terminal.core import build_core
+    from robodog_terminal.response_cache import cache_mode, model_id, wrap_client
+    from robodog_terminal.hedging import hedge_from_env
 
 DEMO_SCRIPT = [
     'I will create a small script for you.\n'
@@ -147,6 +154,34 @@ def _load_keepass_entry(title: str):
 
 
 def build_backend(args, on_retry=None) -> tuple:
+    """The backend client + display label (see _select_backend), optionally
+    hedged across backends (--hedge / ROBODOG_HEDGE, see hedging.py) and
+    behind the opt-in LLM response cache (--llm-cache / ROBODOG_LLM_CACHE,
+    see response_cache.py). Replay needs no live backend: it serves
+    recordings made under the requested model's id."""
+    client, label = _select_backend(args, on_retry=on_retry)
+    mode = cache_mode(getattr(args, "llm_cache", None))
+    hedge = getattr(args, "hedge", None)
+    if hedge is None:
+        hedge = os.environ.get("ROBODOG_HEDGE", "").lower() in ("1", "true", "yes")
+    if hedge and mode != "replay" and not isinstance(client, EchoClient):
+        client = hedge_from_env(client, on_retry=on_retry)
+    if mode == "off":
+        return client, label
+    if mode == "replay":
+        if label.startswith("echo/demo (no"):      # no keys here: that's fine
+            backend = getattr(args, "backend", "auto") or "auto"
+            model = (os.environ.get("GATEWAY_ENGINE") if backend == "gateway"
+                     else _normalize_model_id(getattr(args, "model", None)
+                                              or os.environ.get("ROBODOG_MODEL",
+                                                                DEFAULT_MODEL)))
+        else:
+            model = model_id(client)
+        return wrap_client(client, mode, model=model), f"{model} (replay)"
+    return wrap_client(client, mode), label
+
+
+def _select_backend(args, on_retry=None) -> tuple:
     """
     Selection order:
       --echo               -> offline scripted demo
@@ -323,9 +358,9 @@ def _expand_mentions(line: str, registry) -> str:
     import os
     import re
     try:
-        from .tools import EXCLUDE_DIRS
+        from .ignore import matcher_for
     except ImportError:
-        from robodog_terminal.tools import EXCLUDE_DIRS
+        from robodog_terminal.ignore import matcher_for
     out = line
     for m in re.finditer(r"@([\w./\\~-]+)", line):
         rel = m.group(1)
@@ -341,11 +376,14 @@ def _expand_mentions(line: str, registry) -> str:
             out += f"\n\n[content of {rel}]:\n{content}"
         elif p.is_dir():
             files, capped = [], False
+            skip = matcher_for(p)
             for dirpath, dirnames, filenames in os.walk(str(p)):
                 dirnames[:] = [d for d in dirnames
-                               if d not in EXCLUDE_DIRS and not d.endswith(".egg-info")]
+                               if not skip(os.path.join(dirpath, d), True)]
                 for fn in sorted(filenames):
                     full = Path(dirpath) / fn
+                    if skip(str(full), False):
+                        continue
                     try:
                         files.append(str(full.relative_to(p)).replace("\\", "/"))
                     except ValueError:
@@ -418,12 +456,18 @@ def _blocking_threads() -> list:
             if t is not main and t.is_alive() and not t.daemon]
 
 
-def _hard_quit(ui=None, code: int = 0) -> int:
+def _hard_quit(ui=None, code: int = 0, core=None) -> int:
     """Print 'bye', then exit. If worker threads would block a clean shutdown
     (a stuck subagent fan-out), terminate immediately via os._exit so the user
     actually gets out — "bye" printed but hung otherwise. Sessions persist
     per-turn, so nothing committed is lost. If nothing is blocking, returns the
-    code so the caller can `return` cleanly (keeps in-process/test use sane)."""
+    code so the caller can `return` cleanly (keeps in-process/test use sane).
+    `core`, when given, is closed first (its persistent shell)."""
+    if core is not None:
+        try:
+            core.close()
+        except Exception:
+            pass
     try:
         if ui is not None:
             try:
@@ -444,7 +488,7 @@ def _hard_quit(ui=None, code: int = 0) -> int:
 
 
 def _fanout_label(inflight: int, n: int, calls: int, cap: int,
-                  permission_label: str = "") -> str:
+                  permission_label: str = "", queued: int = 0) -> str:
     """Build the subagent fan-out spinner text. A pure function (no ui/child_lock
     closure) specifically so it's unit-testable without a real TTY — the
     spinner itself only runs when sys.stdout.isatty(), which a test harness
@@ -453,7 +497,8 @@ def _fanout_label(inflight: int, n: int, calls: int, cap: int,
 
     `inflight`/`n` = subagents still running of the total spawned. `cap` is the
     MODEL-call concurrency limit (shown separately so it doesn't read as a cap
-    on subagent count). `permission_label`, when set, is folded in because this
+    on subagent count) — adaptive, so it's the limit right now — and `queued`
+    the model calls waiting for a slot under it. `permission_label`, when set, is folded in because this
     spinner text is the ONLY thing on screen during fan-out — the bottom
     toolbar (and its permission-mode row) doesn't render at all mid-turn — so
     without this the indicator would silently vanish while subagents run."""
@@ -461,11 +506,16 @@ def _fanout_label(inflight: int, n: int, calls: int, cap: int,
              f" · {calls} tool call{'' if calls == 1 else 's'}")
     if cap > 0:
         label += f" · model cap {cap}"
+        if queued:
+            label += f" ({queued} queued)"
     if permission_label:
         label += f"  ·  {permission_label}"
     return label
 
 
+_TRACE_METRIC_KINDS = {"first_tool_start", "bg_compact"}
+
+
 def _format_trace_summary(loop) -> str:
     """Build the /trace summary text from `loop.trace` (a pure function over
     the trace list, not `loop` itself, so it's unit-testable without a real
@@ -480,6 +530,12 @@ def _format_trace_summary(loop) -> str:
     if not trace:
         return "tracing is on, but no timed events yet this session."
 
+    # Latency METRICS (a point in time, not a span of work) are reported on
+    # their own lines — summing them into the breakdown would double-count
+    # time the llm_call/tool_call spans already cover.
+    metrics = [e for e in trace if e["kind"] in _TRACE_METRIC_KINDS]
+    trace = [e for e in trace if e["kind"] not in _TRACE_METRIC_KINDS]
+
     by_kind: dict = {}
     for e in trace:
         k = e["kind"]
@@ -508,6 +564,56 @@ def _format_trace_summary(loop) -> str:
             lines.append(f"    {name:<16} {len(durs):>3} calls · "
                          f"{sum(durs):>7.2f}s total · {sum(durs) / len(durs):.2f}s avg")
 
+    first_starts = [e for e in metrics if e["kind"] == "first_tool_start"]
+    if first_starts:
+        durs = [e["duration_s"] for e in first_starts]
+        streamed = sum(1 for e in first_starts if e.get("streamed"))
+        lines.append(f"  time to first tool start: {sum(durs) / len(durs):.2f}s avg · "
+                     f"{min(durs):.2f}s best · {len(durs)} steps"
+                     + (f" ({streamed} started mid-stream)" if streamed else ""))
+
+    net = [e for e in trace if e["kind"] == "llm_call" and "ttfb_s" in e]
+    if net:
+        reqs = sum(e["requests"] for e in net)
+        fresh = sum(e["new_conns"] for e in net)
+        lines.append(f"  network: time to first byte {sum(e['ttfb_s'] for e in net) / len(net):.2f}s "
+                     f"avg · {fresh} new connection(s) over {reqs} request(s) "
+                     f"({sum(e['connect_s'] for e in net):.2f}s connect, "
+                     f"{sum(e['tls_s'] for e in net):.2f}s TLS) · HTTP/{net[-1]['http']}")
+
+    conc = concurrency_snapshot()
+    if conc:
+        lines.append(f"  model concurrency: adaptive limit {conc['limit']} now "
+                     f"({conc['low']}-{conc['high']} this session, ceiling "
+                     f"{conc['ceiling']}) · {conc['inflight']} in flight · "
+                     f"{conc['queued']} queued (peak {conc['peak_queued']}) · "
+                     f"{conc['cuts']} overload cut(s)")
+
+    hedge_stats = getattr(getattr(loop, "client", None), "hedge_stats", None)
+    hs = hedge_stats() if callable(hedge_stats) else None
+    if hs and hs["calls"]:
+        health = ", ".join(f"{b['name']} {b['score']:.2f}"
+                           + (f" (p95 {b['p95_s']:.1f}s)" if b["p95_s"] else "")
+                           for b in hs["backends"])
+        lines.append(f"  hedging: {hs['hedges']} hedge(s) over {hs['calls']} call(s), "
+                     f"{hs['hedge_wins']} won by the hedge · {hs['failovers']} "
+                     f"failover(s) · health {health}")
+
+    swaps = [e for e in metrics if e["kind"] == "bg_compact"]
+    if swaps:
+        lines.append(f"  background compaction: {len(swaps)} swap(s) · "
+                     f"{sum(e['calls'] for e in swaps)} summary calls "
+                     f"({sum(e['reused'] for e in swaps)} chunks reused) · "
+                     f"{sum(e['duration_s'] for e in swaps):.2f}s off the critical path")
+
+    llm_ok = [e for e in trace if e["kind"] == "llm_call" and e.get("ok")]
+    cached = sum(e.get("cached_tokens", 0) or 0 for e in llm_ok)
+    if cached:
+        ptok = sum(e.get("prompt_tokens", 0) or 0 for e in llm_ok)
+        hits = sum(1 for e in llm_ok if e.get("cached_tokens"))
+        lines.append(f"  prompt cache: {cached:,} of {ptok:,} prompt tokens cached "
+                     f"({cached * 100 // max(1, ptok)}%) · {hits}/{len(llm_ok)} calls hit")
+
     slowest = sorted(trace, key=lambda e: -e["duration_s"])[:5]
     if slowest:
         lines.append("  slowest individual calls:")
@@ -632,7 +738,15 @@ def main(argv=None) -> int:
                         help="max completion tokens per LLM call (default 8192)")
     parser.add_argument("--temperature", type=float, default=0.3)
     parser.add_argument("--max-transcript-chars", type=int, default=450_000,
-                        help="auto-trim threshold for the running transcript")
+                        help="auto-trim threshold for the running transcript, in "
+                             "chars (used when no token budget applies)")
+    _mtt = os.environ.get("ROBODOG_MAX_TRANSCRIPT_TOKENS", "").strip()
+    parser.add_argument("--max-transcript-tokens", type=int,
+                        default=int(_mtt) if _mtt.isdigit() else None,
+                        help="auto-trim threshold in tokens (default: derived from "
+                             "the model's context window; 0 = use the char "
+                             "threshold). Also settable via "
+                             "ROBODOG_MAX_TRANSCRIPT_TOKENS.")
     # -------- context / prompt ----------------------------------------
     parser.add_argument("--append-system-prompt", default=None, metavar="TEXT",
                         help="extra instructions appended to the system context")
@@ -686,6 +800,42 @@ def main(argv=None) -> int:
                              "prompt-render / parse step (in-memory, no file I/O); "
                              "view with /trace. Off by default. Also settable via "
                              "ROBODOG_TRACE=1.")
+    parser.add_argument("--stream", action="store_true",
+                        default=os.environ.get("ROBODOG_STREAM", "").lower()
+                                in ("1", "true", "yes"),
+                        help="stream model replies and start read-only tool calls "
+                             "as soon as each one is complete, instead of after the "
+                             "whole reply. Off by default. Also settable via "
+                             "ROBODOG_STREAM=1.")
+    parser.add_argument("--prompt-cache", action="store_true",
+                        default=os.environ.get("ROBODOG_PROMPT_CACHE", "").lower()
+                                in ("1", "true", "yes"),
+                        help="send the conversation as a prefix-stable message array "
+                             "with prompt-cache breakpoints (OpenAI-compatible "
+                             "backends) and trim old tool output in batches, so the "
+                             "provider can reuse its cached prefix. Off by default. "
+                             "Also settable via ROBODOG_PROMPT_CACHE=1.")
+    parser.add_argument("--bg-compact", action="store_true",
+                        default=os.environ.get("ROBODOG_BG_COMPACT", "").lower()
+                                in ("1", "true", "yes"),
+                        help="summarize older turns on a background thread once the "
+                             "context passes ~70%% full, and swap the summary in "
+                             "between steps, instead of blocking on compaction near "
+                             "the limit. Off by default. Also settable via "
+                             "ROBODOG_BG_COMPACT=1.")
+    parser.add_argument("--hedge", action="store_true",
+                        default=os.environ.get("ROBODOG_HEDGE", "").lower()
+                                in ("1", "true", "yes"),
+                        help="if a model call hasn't answered by its backend's p95 "
+                             "latency, fire a duplicate (to ROBODOG_HEDGE_URL/"
+                             "ROBODOG_HEDGE_KEY if set, else the same backend) and "
+                             "take the first good reply; degraded backends are routed "
+                             "around. Off by default. Also settable via ROBODOG_HEDGE=1.")
+    parser.add_argument("--llm-cache", default=None, choices=["off", "cache", "record", "replay"],
+                        help="on-disk LLM response cache: 'cache' serves repeated calls "
+                             "from disk, 'record' captures a live session, 'replay' "
+                             "serves a recording offline with no backend. Default: "
+                             "$ROBODOG_LLM_CACHE or off.")
     parser.add_argument("--version", action="store_true", help="print version and exit")
     args = parser.parse_args(argv)
 
@@ -712,6 +862,8 @@ def main(argv=None) -> int:
         ui.dim(f"  ⚠ API error ({r}) · Retrying in {d:.0f}s · attempt {a}/{m}")
     client, model_label = build_backend(args, on_retry=on_retry)
     ui.model_name = model_label
+    if cache_mode(args.llm_cache) != "off":
+        ui.dim(f"(llm response cache: {cache_mode(args.llm_cache)} · {client.cache.root})")
     # Tool gating flags, parsed into lists (build_core applies them to the registry).
     allowed_tools = ([t.strip() for t in args.allowed_tools.split(",") if t.strip()]
                     if args.allowed_tools else None)
@@ -734,12 +886,12 @@ def main(argv=None) -> int:
     child_lock = _cthreading.Lock()
 
     def _fanout_spinner():
-        from robodog_terminal.llm_client import _effective_max_concurrency
         with child_lock:
             n = len(child_stats["children"])
             inflight, calls = child_stats["inflight"], child_stats["calls"]
-        cap = _effective_max_concurrency()
-        ui.spinner_update(_fanout_label(inflight, n, calls, cap, ui.permission_label))
+        conc = concurrency_snapshot() or {}
+        ui.spinner_update(_fanout_label(inflight, n, calls, conc.get("limit", 0),
+                                        ui.permission_label, conc.get("queued", 0)))
 
     def on_child_event(kind, data):
         if kind == "agent_spawn":
@@ -812,6 +964,8 @@ def main(argv=None) -> int:
                 ui.dim(data["result"])
             else:
                 ui.tool_result(data["name"], data["result"])
+        elif kind == "compacted":
+            on_background_compaction(data)
 
     def ask_fn(question, options):
         if headless:
@@ -852,8 +1006,11 @@ def main(argv=None) -> int:
         test_command=args.test_command, system_suffix=system_suffix,
         max_iterations=args.max_iterations, max_tokens=args.max_tokens,
         temperature=args.temperature, max_transcript_chars=args.max_transcript_chars,
-        trace_enabled=args.trace,
-        on_diff=on_diff, on_bash_line=ui.bash_line, on_child_event=on_child_event,
+        model=model_label, max_transcript_tokens=args.max_transcript_tokens,
+        trace_enabled=args.trace, stream_tools=args.stream,
+        prompt_cache=args.prompt_cache, background_compaction=args.bg_compact,
+        on_diff=on_diff, diff_max_lines=UI.DIFF_LINES,
+        on_bash_line=ui.bash_line, on_child_event=on_child_event,
         on_event=on_event, ask_fn=ask_fn, on_task_change=on_task_change, log=ui.dim,
     )
     registry, loop, skills, manager, checklist, store = (
@@ -900,6 +1057,8 @@ def main(argv=None) -> int:
             else:
                 print(f"error: {type(exc).__name__}: {exc}", file=sys.stderr)
             return 1
+        finally:
+            core.close()
         if registry.hooks is not None:
             registry.hooks.run_stop()
         if args.output_format == "json":
@@ -939,7 +1098,7 @@ def main(argv=None) -> int:
     history_marks: dict = {}
     import time as _time
     _session_start = _time.time()
-    cost_tokens = {"in": 0, "out": 0}   # session input/output tokens for /stats cost
+    cost_tokens = {"in": 0, "out": 0, "cached": 0}   # session tokens for /stats cost
     last_answer = [""]                  # most recent final answer (for /copy, /save)
 
     # --continue / --resume at startup
@@ -1020,8 +1179,9 @@ def main(argv=None) -> int:
                 ui.print_status()
             elif cmd == "context":
                 chars = loop.transcript_chars()
-                ui.info(f"transcript: {len(loop.history)} turns · ~{chars // 4} tokens "
-                        f"({chars} chars)")
+                ui.info(f"transcript: {len(loop.history)} turns · "
+                        f"~{loop.transcript_tokens():,} tokens ({chars:,} chars, "
+                        f"{loop.tokenizer.name} count)")
             elif cmd == "doctor":
                 try:
                     from .doctor import run_doctor, format_report
@@ -1077,8 +1237,8 @@ def main(argv=None) -> int:
         ui.total_tokens += result.total_tokens
         cost_tokens["in"] += getattr(result, "prompt_tokens", 0) or 0
         cost_tokens["out"] += getattr(result, "completion_tokens", 0) or 0
-        ui.context_pct = min(99, loop.transcript_chars() * 100
-                             // loop.max_transcript_chars)
+        cost_tokens["cached"] += getattr(result, "cached_tokens", 0) or 0
+        ui.context_pct = min(99, int(loop.context_fill() * 100))
         ui.assistant(result.final_text)
         last_answer[0] = result.final_text or ""
         dur = getattr(result, "duration", 0.0)
@@ -1086,6 +1246,29 @@ def main(argv=None) -> int:
         if registry.hooks is not None:
             registry.hooks.run_stop()   # Stop hooks: the agent turn finished
 
+    def on_background_compaction(data):
+        """The loop swapped history[start:end] for one summary turn mid-turn:
+        save the replaced turns that weren't persisted yet and the summary
+        itself, and shift the indices that point past them (persisted count,
+        /rewind marks)."""
+        start, end = data["start"], data["end"]
+        if session_id[0] is None:
+            session_id[0] = store.new_session()
+        if persisted[0] < end:
+            pending = (loop.history[persisted[0]:start]
+                       + data["removed"][max(0, persisted[0] - start):])
+            for t in pending:
+                store.append_turn(session_id[0], t.role, t.content, t.tool_name)
+        summary = loop.history[start] if start < len(loop.history) else None
+        if summary is not None:
+            store.append_turn(session_id[0], summary.role, summary.content, summary.tool_name)
+        shift = lambda i: i - (end - start) + 1 if i >= end else min(i, start + 1)  # noqa: E731
+        persisted[0] = shift(max(persisted[0], end))
+        for k, v in list(history_marks.items()):
+            history_marks[k] = shift(v)
+        ui.dim(f"  (older turns summarized in the background: "
+               f"{end - start} turns → 1 summary)")
+
     while True:
         # Drain any queued follow-up prompts before reading new input.
         if pending_prompts:
@@ -1099,7 +1282,7 @@ def main(argv=None) -> int:
             except (EOFError, KeyboardInterrupt):
                 # Idle quit — hard-exit if a backgrounded turn's subagents are
                 # stuck and would block a clean shutdown.
-                return _hard_quit(ui)
+                return _hard_quit(ui, core=core)
         # Strip lone UTF-16 surrogates from clipboard pastes at the boundary, so
         # they can't crash any downstream utf-8 encode (HTTP body, session JSONL).
         line = clean_text(line)
@@ -1125,18 +1308,21 @@ def main(argv=None) -> int:
             cmd = cmd.lower().strip()
             rest = rest.strip()
             if cmd in ("exit", "quit", "q"):
-                return _hard_quit(ui)
+                return _hard_quit(ui, core=core)
             elif cmd == "help":
                 ui.info(HELP)
             elif cmd == "status":
                 ui.print_status()
             elif cmd == "context":
                 chars = loop.transcript_chars()
-                ui.info(f"transcript: {len(loop.history)} turns · ~{chars // 4} tokens "
-                        f"({chars} chars) · trim threshold {loop.max_transcript_chars} chars")
+                threshold = (f"{loop.max_transcript_tokens:,} tokens"
+                             if loop.max_transcript_tokens
+                             else f"{loop.max_transcript_chars:,} chars")
+                ui.info(f"transcript: {len(loop.history)} turns · "
+                        f"~{loop.transcript_tokens():,} tokens ({chars:,} chars, "
+                        f"{loop.tokenizer.name} count) · trim threshold {threshold}")
             elif cmd == "stats":
-                chars = loop.transcript_chars()
-                pct = min(99, chars * 100 // max(1, loop.max_transcript_chars))
+                pct = min(99, int(loop.context_fill() * 100))
                 elapsed = int(_time.time() - _session_start)
                 mm, ss = divmod(elapsed, 60)
                 files = len(getattr(registry, "read_paths", {}) or {})
@@ -1146,12 +1332,19 @@ def main(argv=None) -> int:
                              if _c is not None else
                              f"— (no price for this model; in {cost_tokens['in']:,} / "
                              f"out {cost_tokens['out']:,})")
+                cache_line = ""
+                if cost_tokens["cached"] or getattr(loop, "prompt_cache", False):
+                    hit = cost_tokens["cached"] * 100 // max(1, cost_tokens["in"])
+                    cache_line = (f"  prompt cache: {cost_tokens['cached']:,} of "
+                                  f"{cost_tokens['in']:,} input tokens cached ({hit}%)\n")
                 ui.info(
                     f"session stats\n"
                     f"  model:       {model_label}\n"
                     f"  tokens:      {ui.total_tokens:,} this session\n"
                     f"  est. cost:   {cost_line}\n"
-                    f"  context:     ~{chars // 4:,} tokens ({pct}% of the trim window)\n"
+                    f"{cache_line}"
+                    f"  context:     ~{loop.transcript_tokens():,} tokens "
+                    f"({pct}% of the trim window)\n"
                     f"  turns:       {prompt_count} prompts · {len(loop.history)} history entries\n"
                     f"  files read:  {files}\n"
                     f"  uptime:      {mm}m {ss}s")
@@ -1218,7 +1411,7 @@ def main(argv=None) -> int:
                 if not loop.history:
                     ui.info("nothing to compact.")
                     continue
-                before = loop.transcript_chars()
+                before = loop.transcript_tokens()
                 ui.spinner_start("✳ Compacting conversation…")
                 try:
                     did = loop.compact()
@@ -1226,8 +1419,8 @@ def main(argv=None) -> int:
                     ui.spinner_stop()
                 if did:
                     persisted[0] = len(loop.history)
-                    after = loop.transcript_chars()
-                    ui.info(f"conversation compacted (~{before // 4} → {after // 4} "
+                    after = loop.transcript_tokens()
+                    ui.info(f"conversation compacted (~{before:,} → {after:,} "
                             f"tokens; goal + recent turns kept verbatim).")
                 else:
                     ui.info("nothing to compact yet (too short, or it wouldn't shrink).")
@@ -1277,6 +1470,14 @@ def main(argv=None) -> int:
                         loop.client = new_client
                         client = new_client
                         ui.model_name = new_label
+                        # New model, new vocabulary and window (an explicit
+                        # --max-transcript-tokens stays put).
+                        from robodog_terminal.tokens import (
+                            get_tokenizer, transcript_token_budget)
+                        loop.tokenizer = get_tokenizer(new_label)
+                        if args.max_transcript_tokens is None:
+                            loop.max_transcript_tokens = transcript_token_budget(
+                                new_label, args.max_tokens)
                         ui.info(f"switched to {new_label}")
                     except Exception as exc:
                         ui.error(f"model switch failed: {exc}")
@@ -1388,7 +1589,7 @@ def main(argv=None) -> int:
                           * ((pad_tokens * 4 // 44) + 1))[:pad_tokens * 4] if pad_tokens else ""
                 prompt = ((f"[reference text, ignore it]\n{filler}\n\n" if filler else "")
                           + "Reply with the single word: ready. Use no tools.")
-                approx_tok = len(prompt) // 4
+                approx_tok = loop.tokenizer.count(prompt)
                 ui.info(f"probing the subagent path — {n} parallel agents, "
                         f"{size} prompt (~{approx_tok} tokens each)…")
 
@@ -1402,15 +1603,13 @@ def main(argv=None) -> int:
                     except Exception as exc:
                         return (i, False, _t.time() - t0, f"{type(exc).__name__}: {exc}")
 
-                try:
-                    from .llm_client import _effective_max_concurrency as _emc
-                except ImportError:
-                    from robodog_terminal.llm_client import _effective_max_concurrency as _emc
-                _cap = _emc() or "unlimited"
                 t0 = _t.time()
                 with _cf.ThreadPoolExecutor(max_workers=n) as _ex:
                     results = sorted(_ex.map(_one, range(n)))
                 total = _t.time() - t0
+                _snap = concurrency_snapshot()
+                _cap = (f"{_snap['limit']} adaptive, {_snap['low']}-{_snap['high']} "
+                        f"this session" if _snap else "unlimited")
                 good = sum(1 for _, ok2, _, _ in results if ok2)
                 times = [dt for _, _, dt, _ in results]
                 stats = (f"per-agent {min(times):.1f}s min / "
@@ -1544,6 +1743,7 @@ def main(argv=None) -> int:
                     ui.total_tokens += result.total_tokens
                     cost_tokens["in"] += getattr(result, "prompt_tokens", 0) or 0
                     cost_tokens["out"] += getattr(result, "completion_tokens", 0) or 0
+                    cost_tokens["cached"] += getattr(result, "cached_tokens", 0) or 0
                 except KeyboardInterrupt:
                     ui.spinner_stop()
                     ui.dim("[interrupted]")
@@ -1625,7 +1825,7 @@ def main(argv=None) -> int:
         except KeyboardInterrupt:
             # A SECOND Ctrl+C escaped the cancel wait — force-quit NOW, even if
             # subagent worker threads are wedged in a network retry.
-            return _hard_quit(ui)
+            return _hard_quit(ui, core=core)
         except Exception as exc:
             ui.reset_typing()
             ui.spinner_stop()
@@ -1669,7 +1869,7 @@ def main(argv=None) -> int:
 
         # Auto-compact near the context ceiling (keeps the goal + recent turns
         # verbatim, summarizes the middle — see AgentLoop.compact).
-        if loop.transcript_chars() > int(loop.max_transcript_chars * 0.9):
+        if loop.context_fill() > 0.9:
             ui.dim("(auto-compacting conversation…)")
             try:
                 if loop.compact():
@@ -2,8 +2,11 @@
 """
 BackgroundManager: thread-based background tasks for terminal mode.
 
-Runs long work (shell commands, agent loops) in daemon threads so the main
+Runs long work (shell commands, agent loops) off the main thread so the main
 REPL stays responsive — a modern agentic terminal's Ctrl-B / `run_in_background` pattern.
+Agent loops get a daemon thread each; shell commands on POSIX get no thread
+at all — the process-wide reactor (reactor.py) streams their output,
+enforces their timeout and finishes them.
 Each task gets a small id ("bg1", "bg2", ...), a capped output buffer the
 worker appends to via task.emit(), and a cancel_event / proc handle so
 kill() can stop it (killing the whole process tree for shell commands).
@@ -23,6 +26,8 @@ import time
 from dataclasses import dataclass, field
 from typing import Callable, Dict, List, Optional
 
+from . import reactor
+
 logger = logging.getLogger(__name__)
 
 BUFFER_MAX_LINES = 2000   # per-task output cap (oldest lines dropped)
@@ -44,6 +49,17 @@ class BgTask:
     lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
     cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
     proc: Optional[subprocess.Popen] = field(default=None, repr=False)
+    watch: Optional[reactor.Watch] = field(default=None, repr=False)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the task's worker (its thread, or its reactor watch) to
+        end. True once it has."""
+        if self.thread is not None:
+            self.thread.join(timeout)
+            return not self.thread.is_alive()
+        if self.watch is not None:
+            return self.watch.wait(timeout)
+        return True
 
     def emit(self, line: str) -> None:
         """Append an output line (worker-thread safe). Oldest lines drop past cap."""
@@ -102,10 +118,7 @@ class BackgroundManager:
         text. `target` should check task.cancel_event periodically and may call
         task.emit(line) to stream output into the buffer.
         """
-        with self._lock:
-            self._counter += 1
-            task = BgTask(id=f"bg{self._counter}", kind=kind, title=title)
-            self._tasks[task.id] = task
+        task = self._new_task(kind, title)
 
         def _runner():
             try:
@@ -126,6 +139,10 @@ class BackgroundManager:
         elsewhere), streaming each output line into the task buffer. timeout=0
         means no timeout. Result = "(exit <code>)\\n" + last 50 output lines.
         """
+        title = command if len(command) <= 60 else command[:57] + "..."
+        if reactor.available():
+            return self._spawn_watched(command, cwd, timeout, title)
+
         def _target(task: BgTask) -> str:
             if os.name == "nt":
                 shell_cmd = ["powershell", "-NoProfile", "-NonInteractive",
@@ -161,9 +178,32 @@ class BackgroundManager:
             tail = task.tail(RESULT_TAIL_LINES)
             return f"(exit {code})\n{tail}"
 
-        title = command if len(command) <= 60 else command[:57] + "..."
         return self.spawn("bash", title, _target)
 
+    def _spawn_watched(self, command: str, cwd: str, timeout: int, title: str) -> BgTask:
+        task = self._new_task("bash", title)
+        try:
+            proc = subprocess.Popen(
+                ["/bin/sh", "-c", command], cwd=cwd,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL, start_new_session=True,
+            )
+        except Exception as exc:
+            logger.exception("background task %s (%s) failed", task.id, title)
+            self._finish(task, "failed", f"{type(exc).__name__}: {exc}")
+            return task
+        task.proc = proc  # so kill() can terminate the tree
+
+        def _on_done(w: reactor.Watch) -> None:
+            tail = task.tail(RESULT_TAIL_LINES)
+            self._finish(task, "done", f"(exit {w.returncode})\n{tail}")
+
+        task.watch = reactor.get().watch(
+            proc, [(proc.stdout, task.emit)], timeout=timeout or None,
+            on_timeout=lambda: task.emit(f"[timeout after {timeout}s — killing process]"),
+            on_done=_on_done)
+        return task
+
     # ---- queries --------------------------------------------------------
     def list(self) -> List[BgTask]:
         with self._lock:
@@ -210,6 +250,13 @@ class BackgroundManager:
             return pending
 
     # ---- internal -------------------------------------------------------
+    def _new_task(self, kind: str, title: str) -> BgTask:
+        with self._lock:
+            self._counter += 1
+            task = BgTask(id=f"bg{self._counter}", kind=kind, title=title)
+            self._tasks[task.id] = task
+        return task
+
     def _finish(self, task: BgTask, status: str, result: str) -> None:
         """Transition running -> terminal exactly once and queue a notification."""
         with self._lock:
@@ -5,28 +5,165 @@ File checkpointing for /rewind — the undo layer under YOLO permissions.
 Before every mutating file operation the registry snapshots the target file
 here. Checkpoints are grouped by a "marker" (the prompt index: which user
 message triggered the change), so /rewind can restore the working tree to the
-state before any given prompt. Mirrors a modern agentic terminal's checkpointing (100 most
-recent, per-prompt restore).
+state before any given prompt.
+
+Snapshots are content-addressed: each distinct file content is stored once,
+zlib-compressed, as objects/<id[:2]>/<id> (id = blake2b of the bytes), and
+the manifest entries point at ids. A snapshot of a path that was snapshotted
+before is stored as a line-level delta against that previous content (copy
+runs of the old bytes + inserted lines) when that comes out smaller — so 30
+small edits to a 2 MB file cost about one compressed copy plus 30 small
+deltas. Every KEYFRAME_EVERY-th link of a chain is stored whole, which caps
+the work to rebuild any snapshot.
+
+Instead of a count cap, the store has a size budget (stored bytes,
+ROBODOG_CHECKPOINT_MAX_MB): past it, the oldest snapshots are dropped (their
+manifest entries stay, so /rewind lists them, but can't restore them) and
+objects no remaining snapshot needs are deleted; on load, an entry whose
+object is gone counts as dropped. Snapshots taken at the current marker are
+never dropped.
 """
 from __future__ import annotations
 
+import bisect
+import hashlib
 import json
-import shutil
+import os
+import threading
 import time
+import uuid
+import zlib
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
+
+MAX_MB = 200               # default budget for stored snapshot bytes
+KEYFRAME_EVERY = 16        # longest delta chain is KEYFRAME_EVERY - 1
+_DELTA_MIN = 4096          # smaller contents are always stored whole
+_ZLIB_LEVEL = 1            # snapshots sit on the edit path: speed over ratio
+_RECENT_MAX = 32 * 1024 * 1024   # raw bytes of recent snapshots kept as delta bases
+
+# Object files: one tag byte, then (delta only) the base id, then zlib data.
+_FULL = b"F"
+_DELTA = b"D"
+_ID_LEN = 32               # hex chars of a blake2b digest_size=16 id
+# Delta ops: copy <offset> <length> from the base, or insert <length> bytes.
+_COPY = 0x43
+_INSERT = 0x49
+
+
+def _max_bytes() -> int:
+    try:
+        return int(float(os.environ.get("ROBODOG_CHECKPOINT_MAX_MB") or MAX_MB) * 1024 * 1024)
+    except ValueError:
+        return MAX_MB * 1024 * 1024
+
+
+def _varint(n: int, out: bytearray) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf: bytes, i: int):
+    n = shift = 0
+    while True:
+        b = buf[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+
+def make_delta(base: bytes, data: bytes) -> bytes:
+    """Ops that rebuild `data` from `base`, matched line by line: a line that
+    continues the current copy run extends it, else it starts a run at its
+    next occurrence in `base` (or its first), else it is inserted."""
+    old = base.splitlines(keepends=True)
+    starts = [0]                      # byte offset of each base line, and the end
+    for ln in old:
+        starts.append(starts[-1] + len(ln))
+    index: Dict[bytes, List[int]] = {}
+    for i, ln in enumerate(old):
+        index.setdefault(ln, []).append(i)
+
+    out = bytearray()
+    run_start = run_end = -1          # current copy run, in base lines [start, end)
+    pending = bytearray()             # bytes to insert
+
+    def _flush_copy():
+        if run_start >= 0:
+            out.append(_COPY)
+            _varint(starts[run_start], out)
+            _varint(starts[run_end] - starts[run_start], out)
+
+    def _flush_insert():
+        if pending:
+            out.append(_INSERT)
+            _varint(len(pending), out)
+            out.extend(pending)
+            pending.clear()
+
+    for ln in data.splitlines(keepends=True):
+        if run_start >= 0 and run_end < len(old) and old[run_end] == ln:
+            run_end += 1
+            continue
+        hits = index.get(ln)
+        if not hits:
+            _flush_copy()
+            run_start = run_end = -1
+            pending.extend(ln)
+            continue
+        _flush_copy()
+        _flush_insert()
+        k = bisect.bisect_left(hits, max(run_end, 0))
+        run_start = hits[k] if k < len(hits) else hits[0]
+        run_end = run_start + 1
+    _flush_copy()
+    _flush_insert()
+    return bytes(out)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    out = bytearray()
+    i = 0
+    while i < len(delta):
+        op = delta[i]
+        i += 1
+        if op == _COPY:
+            off, i = _read_varint(delta, i)
+            n, i = _read_varint(delta, i)
+            out += base[off:off + n]
+        elif op == _INSERT:
+            n, i = _read_varint(delta, i)
+            out += delta[i:i + n]
+            i += n
+        else:
+            raise ValueError(f"bad delta op {op!r}")
+    return bytes(out)
+
 
-MAX_SNAPSHOTS = 100
+def _content_id(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
 
 
 class Checkpointer:
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, max_bytes: Optional[int] = None):
         self.root = Path(root)
         self.root.mkdir(parents=True, exist_ok=True)
         self.manifest_path = self.root / "manifest.jsonl"
+        self.objects_dir = self.root / "objects"
+        self.max_bytes = max_bytes if max_bytes is not None else _max_bytes()
         self.marker = 0          # current prompt index (app bumps per user msg)
         self._seq = 0
         self._entries: List[dict] = []
+        self._objects: Dict[str, tuple] = {}    # id -> (base id or None, stored bytes)
+        self._depth: Dict[str, int] = {}        # id -> delta chain length (0 = whole)
+        self._last: Dict[str, str] = {}         # path -> id of its latest snapshot
+        self._recent: Dict[str, bytes] = {}     # id -> bytes, for the next delta
+        self._stored = 0
+        self._lock = threading.RLock()
         self._load()
 
     def _load(self):
@@ -38,6 +175,28 @@ class Checkpointer:
                     continue
             if self._entries:
                 self._seq = max(e["seq"] for e in self._entries) + 1
+        if self.objects_dir.is_dir():
+            for sub in os.scandir(self.objects_dir):
+                if not sub.is_dir():
+                    continue
+                for f in os.scandir(sub.path):
+                    if len(f.name) != _ID_LEN:
+                        continue            # a leftover temp file
+                    try:
+                        with open(f.path, "rb") as fh:
+                            head = fh.read(1 + _ID_LEN)
+                        size = f.stat().st_size
+                    except OSError:
+                        continue
+                    base = head[1:].decode("ascii") if head[:1] == _DELTA else None
+                    self._objects[f.name] = (base, size)
+                    self._stored += size
+        for e in self._entries:
+            snap = e.get("snap")
+            if snap and "." not in snap and snap not in self._objects:
+                e["snap"] = None        # pruned: the manifest only records the snapshot
+            elif snap in self._objects:
+                self._last[e["path"]] = snap
 
     def _append(self, entry: dict):
         self._entries.append(entry)
@@ -47,41 +206,158 @@ class Checkpointer:
     def set_marker(self, marker: int):
         self.marker = marker
 
+    # ---- object store ---------------------------------------------------
+    def _object_path(self, oid: str) -> Path:
+        return self.objects_dir / oid[:2] / oid
+
+    def _chain_depth(self, oid: str) -> int:
+        depth = self._depth.get(oid)
+        if depth is None:
+            base = self._objects[oid][0]
+            depth = 0 if base is None or base not in self._objects else self._chain_depth(base) + 1
+            self._depth[oid] = depth
+        return depth
+
+    def _read(self, oid: str) -> Optional[bytes]:
+        """The bytes stored under `oid`, rebuilding a delta chain; None if
+        the object (or a base it needs) is gone or damaged."""
+        try:
+            raw = self._object_path(oid).read_bytes()
+            if raw[:1] == _FULL:
+                return zlib.decompress(raw[1:])
+            base = self._read(raw[1:1 + _ID_LEN].decode("ascii"))
+            if base is None:
+                return None
+            return apply_delta(base, zlib.decompress(raw[1 + _ID_LEN:]))
+        except (OSError, zlib.error, ValueError, IndexError):
+            return None
+
+    def _store(self, oid: str, data: bytes, base_id: Optional[str]) -> None:
+        blob = None
+        base = None
+        if (base_id in self._objects and len(data) >= _DELTA_MIN
+                and self._chain_depth(base_id) < KEYFRAME_EVERY - 1):
+            base_data = self._recent.get(base_id)
+            if base_data is None:
+                base_data = self._read(base_id)
+            if base_data is not None:
+                delta = make_delta(base_data, data)
+                # the undo layer can't afford a bad delta: check it round-trips
+                if apply_delta(base_data, delta) == data:
+                    blob = _DELTA + base_id.encode("ascii") + zlib.compress(delta, _ZLIB_LEVEL)
+                    base = base_id
+        # Compressing the whole content is the slow part; skip it when the
+        # delta is clearly the winner.
+        if blob is None or len(blob) * 16 > len(data):
+            whole = _FULL + zlib.compress(data, _ZLIB_LEVEL)
+            if blob is None or len(whole) <= len(blob):
+                blob, base = whole, None
+        if sum(len(v) for v in self._recent.values()) + len(data) > _RECENT_MAX:
+            self._recent.clear()
+        self._recent[oid] = data
+        path = self._object_path(oid)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{oid}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+        self._objects[oid] = (base, len(blob))
+        self._depth.pop(oid, None)
+        self._stored += len(blob)
+
     # ---- capture --------------------------------------------------------
     def snapshot(self, path: Path):
         """Snapshot an existing file before it is mutated."""
         path = Path(path)
-        if not path.exists():
+        try:
+            data = path.read_bytes()
+            mode = path.stat().st_mode & 0o7777
+        except OSError:
             return
-        snap_name = f"{self._seq:05d}{path.suffix or '.snap'}"
-        shutil.copy2(path, self.root / snap_name)
-        self._append({
-            "seq": self._seq, "marker": self.marker, "kind": "modified",
-            "path": str(path), "snap": snap_name, "ts": time.time(),
-        })
-        self._seq += 1
-        self._prune()
+        oid = _content_id(data)
+        with self._lock:
+            if oid not in self._objects:
+                self._store(oid, data, self._last.get(str(path)))
+            self._last[str(path)] = oid
+            self._append({
+                "seq": self._seq, "marker": self.marker, "kind": "modified",
+                "path": str(path), "snap": oid, "size": len(data), "mode": mode,
+                "ts": time.time(),
+            })
+            self._seq += 1
+            self._prune()
 
     def record_new(self, path: Path):
         """Record a file the agent created (restore = delete it)."""
-        self._append({
-            "seq": self._seq, "marker": self.marker, "kind": "created",
-            "path": str(Path(path)), "snap": None, "ts": time.time(),
-        })
-        self._seq += 1
+        with self._lock:
+            self._append({
+                "seq": self._seq, "marker": self.marker, "kind": "created",
+                "path": str(Path(path)), "snap": None, "ts": time.time(),
+            })
+            self._seq += 1
 
     def _prune(self):
-        snaps = [e for e in self._entries if e["snap"]]
-        if len(snaps) <= MAX_SNAPSHOTS:
+        """Drop the oldest snapshots until the store fits the budget (caller
+        holds the lock)."""
+        if self._stored <= self.max_bytes:
             return
-        for e in snaps[: len(snaps) - MAX_SNAPSHOTS]:
+        # Count what needs each object (snapshots, and deltas built on it) so
+        # each drop knows what it frees; the objects are deleted once, after.
+        refs: Dict[str, int] = {}
+        for e in self._entries:
+            if e["snap"] in self._objects:
+                refs[e["snap"]] = refs.get(e["snap"], 0) + 1
+        for base, _ in self._objects.values():
+            if base in self._objects:
+                refs[base] = refs.get(base, 0) + 1
+        stored = self._stored
+        dropped = False
+        for e in self._entries:
+            if stored <= self.max_bytes or e["marker"] >= self.marker:
+                break
+            oid = e["snap"]
+            if not oid:
+                continue
+            e["snap"] = None  # keep manifest entry, snapshot gone
+            dropped = True
+            while oid in self._objects:
+                refs[oid] -= 1
+                if refs[oid]:
+                    break
+                stored -= self._objects[oid][1]
+                oid = self._objects[oid][0]
+        if dropped:
+            self._collect()
+
+    def _collect(self):
+        """Delete objects no remaining snapshot needs, directly or as a base."""
+        keep: Set[str] = set()
+        for e in self._entries:
+            oid = e["snap"]
+            while oid and oid in self._objects and oid not in keep:
+                keep.add(oid)
+                oid = self._objects[oid][0]
+        for oid in [o for o in self._objects if o not in keep]:
             try:
-                (self.root / e["snap"]).unlink(missing_ok=True)
-                e["snap"] = None  # keep manifest entry, snapshot gone
+                self._object_path(oid).unlink(missing_ok=True)
             except OSError:
-                pass
+                continue
+            self._stored -= self._objects.pop(oid)[1]
+            self._depth.pop(oid, None)
+            self._recent.pop(oid, None)
+            for path, last in list(self._last.items()):
+                if last == oid:
+                    del self._last[path]
 
     # ---- inspect / restore ---------------------------------------------
+    def stats(self) -> Dict[str, int]:
+        """Snapshots still restorable, their total size as plain copies, and
+        the bytes the store actually holds."""
+        with self._lock:
+            live = [e for e in self._entries if e["snap"]]
+            return {"snapshots": len(live), "objects": len(self._objects),
+                    "logical_bytes": sum(e.get("size", 0) for e in live),
+                    "stored_bytes": self._stored}
+
     def markers(self) -> Dict[int, int]:
         """{marker: file-change count} for the /rewind listing."""
         out: Dict[int, int] = {}
@@ -89,6 +365,26 @@ class Checkpointer:
             out[e["marker"]] = out.get(e["marker"], 0) + 1
         return out
 
+    def changed_paths(self, marker: Optional[int] = None) -> List[str]:
+        """Paths modified or created at `marker` (default: the current one),
+        oldest first, each once."""
+        marker = self.marker if marker is None else marker
+        seen: Dict[str, None] = {}
+        for e in self._entries:
+            if e["marker"] == marker:
+                seen.setdefault(e["path"], None)
+        return list(seen)
+
+    def _snapshot_bytes(self, entry: dict) -> Optional[bytes]:
+        snap = entry["snap"]
+        if "." in snap:
+            # a manifest from before the object store: a plain copy in root
+            try:
+                return (self.root / snap).read_bytes()
+            except OSError:
+                return None
+        return self._read(snap)
+
     def restore(self, from_marker: int) -> List[str]:
         """
         Undo all changes made at prompt >= from_marker, newest first.
@@ -114,8 +410,16 @@ class Checkpointer:
                 oldest = next((x for x in self._entries
                                if x["path"] == e["path"] and x["snap"]
                                and x["marker"] >= from_marker), None)
-                if oldest:
-                    shutil.copy2(self.root / oldest["snap"], p)
+                data = self._snapshot_bytes(oldest) if oldest else None
+                if data is not None:
+                    p.write_bytes(data)
+                    if oldest.get("mode") is not None:
+                        try:
+                            os.chmod(p, oldest["mode"])
+                        except OSError:
+                            pass
                     actions.append(f"restored {p}")
+                elif oldest:
+                    actions.append(f"could not restore {p} (snapshot unreadable)")
                 restored.add(key)
         return actions
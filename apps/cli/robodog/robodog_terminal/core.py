@@ -38,6 +38,7 @@ try:
     from .tasklist import TaskChecklist, register_task_tools, register_ask_tool
     from .sessions import SessionStore
     from .checkpoint import Checkpointer
+    from .tokens import get_tokenizer, transcript_token_budget
 except ImportError:  # pragma: no cover - alt import path (see app.py)
     from robodog_terminal.llm_client import LLMClient
     from robodog_terminal.tools import ToolRegistry, default_registry
@@ -50,6 +51,7 @@ except ImportError:  # pragma: no cover - alt import path (see app.py)
     from robodog_terminal.tasklist import TaskChecklist, register_task_tools, register_ask_tool
     from robodog_terminal.sessions import SessionStore
     from robodog_terminal.checkpoint import Checkpointer
+    from robodog_terminal.tokens import get_tokenizer, transcript_token_budget
 
 
 def _make_checkpointer() -> Checkpointer:
@@ -68,6 +70,11 @@ class Core:
     checklist: TaskChecklist
     store: SessionStore
 
+    def close(self) -> None:
+        """End the session: release the registry's long-lived resources
+        (its persistent shell)."""
+        self.registry.close()
+
 
 def build_core(
     cwd: str,
@@ -85,8 +92,14 @@ def build_core(
     max_tokens: int = 8192,
     temperature: float = 0.3,
     max_transcript_chars: int = 450_000,
+    model: str = "",
+    max_transcript_tokens: Optional[int] = None,
     trace_enabled: bool = False,
+    stream_tools: bool = False,
+    prompt_cache: bool = False,
+    background_compaction: bool = False,
     on_diff: Optional[Callable[[str, str], None]] = None,
+    diff_max_lines: Optional[int] = None,
     on_bash_line: Optional[Callable[[str], None]] = None,
     on_confirm: Optional[Callable[[str, str], bool]] = None,
     on_child_event: Optional[Callable[[str, dict], None]] = None,
@@ -104,8 +117,14 @@ def build_core(
     ask_user tool) defaults to auto-picking the first option, same as
     app.py's existing headless (`-p`) fallback; `log` (informational
     startup lines like "(settings: N rules)") defaults to a no-op.
+    `diff_max_lines` caps the diff handed to `on_diff` at the lines it will
+    show (None = the whole diff); without `on_diff` no diff is computed.
     `checkpointer` defaults to a fresh timestamped one under
     `~/.robodog/checkpoints/` if not supplied.
+
+    `model` picks the tokenizer (tokens.get_tokenizer) and, unless
+    `max_transcript_tokens` is given, a token trim budget derived from the
+    model's context window; 0 (or an unknown model) keeps the char budget.
     """
     log = log or (lambda _msg: None)
     cwd = str(Path(cwd).resolve())
@@ -120,6 +139,7 @@ def build_core(
 
     registry.checkpointer = checkpointer or _make_checkpointer()
     registry.on_diff = on_diff
+    registry.diff_max_lines = diff_max_lines
     registry.on_bash_line = on_bash_line
 
     # Hooks + permission rules from .robodog/.claude settings.json — loaded
@@ -168,8 +188,14 @@ def build_core(
     loop = AgentLoop(client, registry, max_iterations=max_iterations,
                      max_tokens=max_tokens, temperature=temperature,
                      on_event=on_event, system_suffix=system_suffix,
-                     trace_enabled=trace_enabled)
+                     trace_enabled=trace_enabled, stream_tools=stream_tools,
+                     prompt_cache=prompt_cache,
+                     background_compaction=background_compaction)
     loop.max_transcript_chars = max_transcript_chars
+    loop.tokenizer = get_tokenizer(model)
+    loop.max_transcript_tokens = (transcript_token_budget(model, max_tokens)
+                                  if max_transcript_tokens is None
+                                  else (max_transcript_tokens or None))
 
     return Core(registry=registry, loop=loop, skills=skills, manager=manager,
                 checklist=checklist, store=store)
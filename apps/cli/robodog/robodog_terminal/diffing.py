@@ -0,0 +1,251 @@
+# file: robodog_terminal/diffing.py
+"""
+The unified diff behind the per-edit preview (ToolRegistry.on_diff).
+
+_diff_and_checkpoint used to run difflib.unified_diff over the whole old
+and new file on every mutation. difflib's SequenceMatcher is quadratic in
+the worst case, and the UI shows only the first 40 lines anyway. unified()
+keeps the output format but does less work:
+
+  - lines common to both ends are trimmed first (an edit usually touches a
+    few lines of a big file, so what's left to diff is tiny);
+  - a small remainder goes to difflib as before; a large one gets a
+    patience diff — lines unique to both sides anchor the alignment
+    (longest increasing run via bisect), the gaps between anchors are
+    diffed recursively, and a gap with no anchors that is still too big
+    for difflib becomes a plain replace;
+  - past _MAX_LINES changed lines on either side no line diff is attempted
+    at all: one summary hunk header says how much changed;
+  - with max_lines, lines are formatted only until that many exist,
+    followed by one "@@ … rest of the diff not shown @@" line counting the
+    removed/added lines left out.
+
+Callers only compute it when a preview is wanted (on_diff is wired).
+"""
+from __future__ import annotations
+
+import difflib
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_DIFFLIB_MAX_CELLS = 4_000_000   # len(a) * len(b) still cheap for SequenceMatcher
+_MAX_LINES = 200_000             # beyond this many changed lines: summary only
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _nl_terminated(text: str) -> List[str]:
+    # A file whose last line has no trailing newline yields a diff line with
+    # no '\n'; "".join then GLUES it to the next +/- line (`examples.+**See**`).
+    # difflib emits no `\ No newline` marker, so terminate the last line
+    # ourselves — this is display-only.
+    lines = text.splitlines(keepends=True)
+    if lines and not lines[-1].endswith(("\n", "\r")):
+        lines[-1] += "\n"
+    return lines
+
+
+def _difflib_blocks(a, b, alo, ahi, blo, bhi, out) -> None:
+    sm = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi])
+    for i, j, size in sm.get_matching_blocks():
+        if size:
+            out.append((alo + i, blo + j, size))
+
+
+def _patience_blocks(a: Sequence[str], b: Sequence[str], alo: int, ahi: int,
+                     blo: int, bhi: int) -> List[Tuple[int, int, int]]:
+    """Matching blocks (i, j, size) of a[alo:ahi] vs b[blo:bhi], sorted."""
+    out: List[Tuple[int, int, int]] = []
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            out.append((alo, blo, 1))
+            alo, blo = alo + 1, blo + 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi, bhi = ahi - 1, bhi - 1
+            out.append((ahi, bhi, 1))
+        if alo == ahi or blo == bhi:
+            continue
+        count_a: Dict[str, int] = {}
+        for i in range(alo, ahi):
+            count_a[a[i]] = count_a.get(a[i], 0) + 1
+        where_b: Dict[str, int] = {}
+        count_b: Dict[str, int] = {}
+        for j in range(blo, bhi):
+            count_b[b[j]] = count_b.get(b[j], 0) + 1
+            where_b[b[j]] = j
+        pairs = [(i, where_b[a[i]]) for i in range(alo, ahi)
+                 if count_a[a[i]] == 1 and count_b.get(a[i]) == 1]
+        anchors = _longest_increasing(pairs)
+        if not anchors:
+            if (ahi - alo) * (bhi - blo) <= _DIFFLIB_MAX_CELLS:
+                _difflib_blocks(a, b, alo, ahi, blo, bhi, out)
+            continue         # no anchor and too big: the whole gap is a replace
+        pi, pj = alo, blo
+        for i, j in anchors:
+            stack.append((pi, i, pj, j))
+            out.append((i, j, 1))
+            pi, pj = i + 1, j + 1
+        stack.append((pi, ahi, pj, bhi))
+    out.sort()
+    return out
+
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """The longest run of `pairs` (already increasing in i) increasing in j."""
+    tails: List[int] = []          # smallest j ending a run of each length
+    tail_idx: List[int] = []
+    prev = [-1] * len(pairs)
+    for k, (_i, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos else -1
+    run = []
+    k = tail_idx[-1] if tail_idx else -1
+    while k >= 0:
+        run.append(pairs[k])
+        k = prev[k]
+    return run[::-1]
+
+
+def _opcodes(blocks: List[Tuple[int, int, int]], la: int, lb: int) -> List[Opcode]:
+    ops: List[Opcode] = []
+    i = j = 0
+    for bi, bj, size in blocks + [(la, lb, 0)]:
+        tag = ("replace" if i < bi and j < bj else "delete" if i < bi
+               else "insert" if j < bj else "")
+        if tag:
+            ops.append((tag, i, bi, j, bj))
+        if size:
+            if ops and ops[-1][0] == "equal" and ops[-1][2] == bi and ops[-1][4] == bj:
+                ops[-1] = ("equal", ops[-1][1], bi + size, ops[-1][3], bj + size)
+            else:
+                ops.append(("equal", bi, bi + size, bj, bj + size))
+        i, j = bi + size, bj + size
+    return ops
+
+
+def _grouped(ops: List[Opcode], n: int) -> List[List[Opcode]]:
+    """SequenceMatcher.get_grouped_opcodes, over precomputed opcodes."""
+    if not ops:
+        ops = [("equal", 0, 1, 0, 1)]
+    if ops[0][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[0]
+        ops[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if ops[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[-1]
+        ops[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    nn = n + n
+    groups, group = [], []
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == "equal" and i2 - i1 > nn:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+    return groups
+
+
+def _range(start: int, stop: int) -> str:
+    beginning, length = start + 1, stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified(old_text: str, new_text: str, fromfile: str = "", tofile: str = "",
+            n: int = 2, max_lines: Optional[int] = None) -> str:
+    """difflib.unified_diff-format text of old_text -> new_text ("" if equal)."""
+    a, b = _nl_terminated(old_text), _nl_terminated(new_text)
+    la, lb = len(a), len(b)
+    head = 0
+    while head < la and head < lb and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < la - head and tail < lb - head and a[la - 1 - tail] == b[lb - 1 - tail]:
+        tail += 1
+    if head == la == lb:
+        return ""
+    out = [f"--- {fromfile}\n", f"+++ {tofile}\n"]
+    alo, ahi, blo, bhi = head, la - tail, head, lb - tail
+    if max(ahi - alo, bhi - blo) > _MAX_LINES:
+        out.append(f"@@ -{_range(alo, ahi)} +{_range(blo, bhi)} @@ "
+                   f"{ahi - alo} line(s) replaced by {bhi - blo}; too large to show "
+                   f"line by line\n")
+        return "".join(out)
+    if (ahi - alo) * (bhi - blo) <= _DIFFLIB_MAX_CELLS:
+        blocks: List[Tuple[int, int, int]] = []
+        _difflib_blocks(a, b, alo, ahi, blo, bhi, blocks)
+    else:
+        blocks = _patience_blocks(a, b, alo, ahi, blo, bhi)
+    if head:
+        blocks.insert(0, (0, 0, head))
+    if tail:
+        blocks.append((ahi, bhi, tail))
+    groups = _grouped(_opcodes(blocks, la, lb), n)
+    if max_lines is None:
+        body, dels, adds = _hunks(groups, a, b, None)
+    else:
+        # max_lines counts every line, the ---/+++ headers and the summary
+        # included, so a caller showing max_lines shows all of it.
+        body, dels, adds = _hunks(groups, a, b, max_lines - 2)
+        if dels or adds:
+            body, dels, adds = _hunks(groups, a, b, max_lines - 3)
+    out.extend(body)
+    if dels or adds:
+        out.append(f"@@ … rest of the diff not shown: -{dels} +{adds} lines @@\n")
+    return "".join(out)
+
+
+def _hunks(groups: List[List[Opcode]], a: List[str], b: List[str],
+           room: Optional[int]) -> Tuple[List[str], int, int]:
+    """The hunk lines of `groups`, at most `room` of them (None = all), and
+    the deleted / added lines left out."""
+    out: List[str] = []
+    changed = [op for g in groups for op in g if op[0] != "equal"]
+    dels = sum(i2 - i1 for _t, i1, i2, _j1, _j2 in changed)
+    adds = sum(j2 - j1 for _t, _i1, _i2, j1, j2 in changed)
+
+    def emit(prefix: str, lines: List[str]) -> bool:
+        """Append prefixed lines within the budget; False once it's spent."""
+        nonlocal room, dels, adds
+        take = lines if room is None else lines[:max(room, 0)]
+        out.extend(prefix + ln for ln in take)
+        if prefix == "-":
+            dels -= len(take)
+        elif prefix == "+":
+            adds -= len(take)
+        if room is not None:
+            room -= len(take)
+            return len(take) == len(lines) and room > 0
+        return True
+
+    for group in groups:
+        first, last = group[0], group[-1]
+        header = f"@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@\n"
+        if not emit("", [header]):
+            break
+        full = True
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                full = emit(" ", a[i1:i2])
+            if full and tag in ("replace", "delete"):
+                full = emit("-", a[i1:i2])
+            if full and tag in ("replace", "insert"):
+                full = emit("+", b[j1:j2])
+            if not full:
+                break
+        if not full:
+            break
+    return out, dels, adds
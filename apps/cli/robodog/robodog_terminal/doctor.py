@@ -328,7 +328,8 @@ def _check_llm_config() -> CheckResult:
     to_src = "set" if explicit_to else "auto"
     if cap_n > 0:
         cap_src = "set" if explicit_cap else "auto: custom gateway"
-        detail = (f"max concurrency: {cap_n} ({cap_src}); "
+        detail = (f"max concurrency: {cap_n} ({cap_src}), adaptive — halved on "
+                  f"429/5xx/timeouts, grown back on fast successes; "
                   f"request timeout: {timeout:.0f}s ({to_src})")
         return CheckResult("llm-config", True, detail)
     detail = (f"max concurrency: unlimited; request timeout: {timeout:.0f}s ({to_src}) "
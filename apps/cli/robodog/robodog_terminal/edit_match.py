@@ -0,0 +1,158 @@
+# file: robodog_terminal/edit_match.py
+"""
+Line-level matching for edit_file / multi_edit and their "not found" hints.
+
+The whitespace-tolerant fallback used to compare a list slice at every
+source line (O(lines × old lines) for each failed exact match), and
+edit_not_found_hint ran difflib against every line of the file, so a failed
+edit on a multi-thousand-line file was visibly slow. Instead:
+
+  - LineTable splits a text once: raw lines, their char offsets, the
+    trailing-whitespace-normalized lines and a hash per normalized line;
+  - find_spans is Rabin-Karp over those line hashes: one rolling hash
+    across the file finds every line-aligned occurrence of a block in
+    linear time (a hash hit is confirmed by comparing the lines);
+  - block_miss / closest_lines rank where an old_string that isn't in the
+    file was probably aimed: each of its lines votes, through a stripped
+    line → line numbers table, for the file offset it lines up with; a
+    single line falls back to shortlisting lines by shared trigrams and
+    running difflib on that shortlist only;
+  - apply_spans splices several non-overlapping replacements in one join.
+"""
+from __future__ import annotations
+
+import difflib
+from collections import Counter
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_MOD = (1 << 61) - 1
+_BASE = 1_000_003
+_COMMON = 64        # a line found more often than this ("}", "else:") doesn't vote
+_SHORTLIST = 24     # lines that get a difflib ratio in closest_lines
+
+
+def _h(line: str) -> int:
+    return hash(line) & _MOD
+
+
+def _target(old: str) -> List[str]:
+    return [ln.rstrip() for ln in old.strip("\n").split("\n")]
+
+
+class LineTable:
+    """One text split into lines, with what the matchers need precomputed."""
+
+    def __init__(self, text: str):
+        self.raw = text.split("\n")
+        self.norm = [ln.rstrip() for ln in self.raw]
+        self.offsets = list(accumulate((len(ln) + 1 for ln in self.raw[:-1]), initial=0))
+        self.hashes = [_h(ln) for ln in self.norm]
+        self._where: Optional[Dict[str, List[int]]] = None
+
+    def span(self, i: int, n: int) -> Tuple[int, int]:
+        """Char span of lines [i, i + n), without the last line's newline."""
+        return self.offsets[i], self.offsets[i + n - 1] + len(self.raw[i + n - 1])
+
+    def where(self) -> Dict[str, List[int]]:
+        """Stripped non-blank line → the 0-based lines it occurs on."""
+        if self._where is None:
+            where: Dict[str, List[int]] = {}
+            for i, ln in enumerate(self.norm):
+                key = ln.strip()
+                if key:
+                    where.setdefault(key, []).append(i)
+            self._where = where
+        return self._where
+
+
+def find_spans(table: LineTable, old: str) -> List[Tuple[int, int]]:
+    """Every line-aligned occurrence of `old` in the table's text, ignoring
+    trailing whitespace per line and blank lines around `old` (indentation
+    must match). Occurrences may overlap; callers decide about ambiguity."""
+    target = _target(old)
+    n, total = len(target), len(table.norm)
+    if not any(target) or n > total:
+        return []
+    want = 0
+    for t in target:
+        want = (want * _BASE + _h(t)) % _MOD
+    hs = table.hashes
+    cur = 0
+    for h in hs[:n]:
+        cur = (cur * _BASE + h) % _MOD
+    top = pow(_BASE, n - 1, _MOD)
+    out = []
+    for i in range(total - n + 1):
+        if cur == want and table.norm[i:i + n] == target:
+            out.append(table.span(i, n))
+        if i + n < total:
+            cur = ((cur - hs[i] * top) * _BASE + hs[i + n]) % _MOD
+    return out
+
+
+def block_miss(table: LineTable, old: str) -> Optional[Tuple[int, int, int, int]]:
+    """Where a multi-line `old` most likely sits in the file, by line votes.
+    Returns (first file line, line count, agreeing lines, first differing
+    offset within the block, or -1 if every line agrees once stripped), all
+    0-based; None for a single line or when no line of `old` is in the file."""
+    target = _target(old)
+    if len(target) < 2:
+        return None
+    where = table.where()
+    votes: Counter = Counter()
+    for j, ln in enumerate(target):
+        hits = where.get(ln.strip()) if ln.strip() else None
+        if hits and len(hits) <= _COMMON:
+            for i in hits:
+                votes[i - j] += 1
+    if not votes:
+        return None
+    start, agree = min(votes.items(), key=lambda kv: (-kv[1], kv[0]))
+    n = len(target)
+    diff = -1
+    for j, ln in enumerate(target):
+        i = start + j
+        if not 0 <= i < len(table.norm) or table.norm[i].strip() != ln.strip():
+            diff = j
+            break
+    return start, n, agree, diff
+
+
+def closest_lines(table: LineTable, line: str, limit: int = 3,
+                  cutoff: float = 0.5) -> List[Tuple[int, float]]:
+    """Up to `limit` (0-based line, ratio) pairs most similar to `line`
+    (stripped), best first, earlier lines winning ties."""
+    a = line.strip()
+    if not a:
+        return []
+    grams = {a[k:k + 3] for k in range(len(a) - 2)}
+    stripped = [ln.strip() for ln in table.norm]
+    if grams:
+        scored = [(sum(g in s for g in grams), i) for i, s in enumerate(stripped) if s]
+        scored = [(sc, i) for sc, i in scored if sc]
+        scored.sort(key=lambda t: (-t[0], t[1]))
+        shortlist = [i for _sc, i in scored[:_SHORTLIST]]
+    else:
+        shortlist = [i for i, s in enumerate(stripped) if s]
+    ranked = []
+    for i in shortlist:
+        r = difflib.SequenceMatcher(None, a, stripped[i]).ratio()
+        if r >= cutoff:
+            ranked.append((i, r))
+    ranked.sort(key=lambda t: (-t[1], t[0]))
+    return ranked[:limit]
+
+
+def apply_spans(text: str, edits: Sequence[Tuple[int, int, str]]) -> str:
+    """`text` with each (start, end, new) span replaced, in one pass.
+    Raises ValueError if two spans overlap."""
+    out, pos = [], 0
+    for start, end, new in sorted(edits, key=lambda e: (e[0], e[1])):
+        if start < pos:
+            raise ValueError("overlapping edits")
+        out.append(text[pos:start])
+        out.append(new)
+        pos = end
+    out.append(text[pos:])
+    return "".join(out)
@@ -0,0 +1,339 @@
+# file: robodog_terminal/file_tree.py
+"""
+One shared, incrementally refreshed directory snapshot per project.
+
+`glob`, `find_by_basename` (read_file / cd "did you mean"), the not-found
+hints and FileService.search_files each used to run their own os.walk over
+the project, capped at 40k-60k entries — a single mistyped read_file could
+walk the whole tree. Now every tool and subagent in the process shares one
+FileTree per root:
+
+  - the first query walks the tree once (os.scandir, pruned excludes,
+    symlinked dirs not followed) and records each directory's mtime and its
+    child names;
+  - every later query first stats each known directory and rescans only the
+    ones whose mtime moved — adding, removing or renaming an entry always
+    bumps its parent's mtime, so that's all a path listing needs. A dir
+    whose mtime is within _RACY_NS of the scan is rescanned next time too
+    (coarse-mtime filesystems could hide a change made in the same tick);
+  - an edited, added or removed .gitignore / .robodogignore (or the root's
+    .git/info/exclude) changes what is pruned below it without touching any
+    directory mtime, so the tree also stamps those files and rebuilds from
+    scratch when one moves;
+  - from that it derives, lazily after each change: the sorted list of file
+    paths, a casefolded basename index (files and dirs) and a suffix index,
+    so glob and basename lookups are in-memory queries.
+
+Paths are relative to the tree's root, os.sep-separated. A tree stops
+descending after ROBODOG_FILE_TREE_MAX files (default 200000), logs a
+warning and says so via `truncated` (glob reports it).
+"""
+from __future__ import annotations
+
+import bisect
+import fnmatch
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .ignore import IGNORE_FILES
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_MAX_FILES = 200_000
+_RACY_NS = 2_000_000_000
+
+_TREES: Dict[str, "FileTree"] = {}
+_TREES_LOCK = threading.Lock()
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _max_files() -> int:
+    try:
+        return int(os.environ.get("ROBODOG_FILE_TREE_MAX") or _DEFAULT_MAX_FILES)
+    except ValueError:
+        return _DEFAULT_MAX_FILES
+
+
+class _Dir:
+    __slots__ = ("mtime", "dirs", "files")
+
+    def __init__(self, mtime: Optional[int], dirs: Tuple[str, ...], files: Tuple[str, ...]):
+        self.mtime = mtime          # None = rescan on the next refresh
+        self.dirs = dirs
+        self.files = files
+
+
+class FileTree:
+    """The directory snapshot of one root. Every query refreshes first."""
+
+    def __init__(self, root: Path, prune: Callable[[str, bool], bool],
+                 max_files: Optional[int] = None):
+        self.root = Path(root)
+        self.prune = prune
+        self.max_files = max_files or _max_files()
+        self.truncated = False
+        self._dirs: Dict[str, _Dir] = {}
+        self._nfiles = 0
+        self._lock = threading.RLock()
+        self._paths: Optional[List[str]] = None
+        self._names: Optional[Dict[str, List[Tuple[str, bool]]]] = None
+        self._suffixes: Optional[Dict[str, List[str]]] = None
+        self._ignores: Dict[str, Optional[Tuple[int, int]]] = {}   # ignore file -> stamp
+        self._rules_moved = False
+        self.stats = {"queries": 0, "rescanned": 0, "rebuilds": 0}
+
+    # -- maintenance --
+    def _abs(self, rel: str) -> str:
+        return os.path.join(str(self.root), rel) if rel else str(self.root)
+
+    def _scan(self, rel: str) -> None:
+        """(Re)list `rel` and, depth-first, any subdirectory not yet known."""
+        stack = [rel]
+        while stack:
+            d = stack.pop()
+            try:
+                mtime = os.stat(self._abs(d)).st_mtime_ns
+                with os.scandir(self._abs(d)) as it:
+                    entries = list(it)
+            except OSError:
+                self._drop(d)
+                continue
+            self._stamp_ignores(d, {e.name for e in entries})
+            dirs, files = [], []
+            for e in entries:
+                try:
+                    is_dir = e.is_dir(follow_symlinks=False)
+                    if self.prune(e.path, is_dir):
+                        continue
+                    if is_dir:
+                        dirs.append(e.name)
+                    elif e.is_file():
+                        files.append(e.name)
+                except OSError:
+                    continue
+            if time.time_ns() - mtime < _RACY_NS:
+                mtime = None
+            old = self._dirs.get(d)
+            if old is not None:
+                self._nfiles -= len(old.files)
+                for gone in set(old.dirs) - set(dirs):
+                    self._drop(os.path.join(d, gone) if d else gone)
+            if self._nfiles + len(files) > self.max_files:
+                self._truncate()
+                files = files[:max(0, self.max_files - self._nfiles)]
+            self._nfiles += len(files)
+            self._dirs[d] = _Dir(mtime, tuple(sorted(dirs)), tuple(sorted(files)))
+            self.stats["rescanned"] += 1
+            if self._nfiles >= self.max_files:
+                self._truncate()
+                continue
+            for sub in dirs:
+                child = os.path.join(d, sub) if d else sub
+                if child not in self._dirs:
+                    stack.append(child)
+        self._paths = self._names = self._suffixes = None
+
+    def _truncate(self) -> None:
+        if not self.truncated:
+            self.truncated = True
+            logger.warning("file tree of %s stopped at %d files (ROBODOG_FILE_TREE_MAX); "
+                           "glob and path hints won't see the rest", self.root, self.max_files)
+
+    def _stamp_ignores(self, rel: str, names) -> None:
+        """Stamp the ignore files of `rel` (just listed, entry `names`). One
+        appearing in or vanishing from an already-known dir means the rules
+        moved."""
+        d = self._abs(rel)
+        known = rel in self._dirs
+        for f in IGNORE_FILES:
+            path = os.path.join(d, f)
+            if known and (path in self._ignores) != (f in names):
+                self._rules_moved = True
+            if f in names:
+                self._ignores[path] = _stamp(path)
+            else:
+                self._ignores.pop(path, None)
+        if not rel:
+            exclude = os.path.join(d, ".git", "info", "exclude")
+            self._ignores[exclude] = _stamp(exclude)
+
+    def _rebuild(self) -> None:
+        """Start over: the prune rules changed under the whole snapshot."""
+        recheck = getattr(self.prune, "recheck", None)
+        if recheck is not None:
+            recheck()                  # don't let the matcher serve the old rules
+        self._drop("")
+        self._rules_moved = False
+        self.truncated = False
+        self.stats["rebuilds"] += 1
+        self._scan("")
+
+    def _drop(self, rel: str) -> None:
+        """Forget `rel` and everything below it."""
+        if not rel:
+            self._dirs.clear()
+            self._ignores.clear()
+            self._nfiles = 0
+            self._paths = self._names = self._suffixes = None
+            return
+        below = rel + os.sep
+        for k in [k for k in self._dirs if k == rel or k.startswith(below)]:
+            self._nfiles -= len(self._dirs.pop(k).files)
+        gone = os.path.join(self._abs(rel), "")
+        for k in [k for k in self._ignores if k.startswith(gone)]:
+            del self._ignores[k]
+        self._paths = self._names = self._suffixes = None
+
+    def refresh(self) -> None:
+        with self._lock:
+            if not self._dirs:
+                self._scan("")
+                return
+            if any(_stamp(f) != st for f, st in self._ignores.items()):
+                self._rebuild()
+                return
+            for rel in list(self._dirs):
+                cur = self._dirs.get(rel)
+                if cur is None:
+                    continue                       # dropped with a parent this pass
+                try:
+                    mtime = os.stat(self._abs(rel)).st_mtime_ns
+                except OSError:
+                    self._drop(rel)
+                    continue
+                if cur.mtime != mtime:
+                    self._scan(rel)
+            if self._rules_moved:
+                self._rebuild()
+
+    def _derive(self) -> None:
+        if self._paths is not None:
+            return
+        paths: List[str] = []
+        names: Dict[str, List[Tuple[str, bool]]] = {}
+        suffixes: Dict[str, List[str]] = {}
+        for d, node in self._dirs.items():
+            for sub in node.dirs:
+                names.setdefault(sub.lower(), []).append((os.path.join(d, sub) if d else sub, True))
+            for fn in node.files:
+                p = os.path.join(d, fn) if d else fn
+                paths.append(p)
+                names.setdefault(fn.lower(), []).append((p, False))
+                suffixes.setdefault(_suffix(fn), []).append(p)
+        paths.sort()
+        for v in names.values():
+            v.sort()
+        for v in suffixes.values():
+            v.sort()
+        self._paths, self._names, self._suffixes = paths, names, suffixes
+
+    def _query(self) -> None:
+        self.refresh()
+        self._derive()
+        self.stats["queries"] += 1
+
+    # -- queries --
+    def files(self, prefix: str = "") -> List[str]:
+        """Every file under `prefix` (a relative dir, "" = the root), sorted."""
+        with self._lock:
+            self._query()
+            return _under(self._paths, prefix)
+
+    def glob(self, pattern: str, prefix: str = "") -> List[str]:
+        """Files under `prefix` whose BASENAME matches `pattern`, sorted. A
+        `*<ext>`-style pattern is answered from the suffix index."""
+        with self._lock:
+            self._query()
+            head = pattern[1:] if pattern.startswith("*") else None
+            if head and not any(c in head for c in "*?[") and "." in head:
+                pool = self._suffixes.get(_suffix(head), [])
+            else:
+                pool = self._paths
+            pool = _under(pool, prefix)
+        return [p for p in pool if fnmatch.fnmatch(os.path.basename(p), pattern)]
+
+    def named(self, name: str, kind: str = "file", prefix: str = "") -> List[str]:
+        """Files (kind="file"), dirs ("dir") or both ("any") named exactly
+        `name`, case-insensitively, under `prefix`."""
+        want = {"file": (False,), "dir": (True,)}.get(kind, (False, True))
+        below = prefix + os.sep if prefix else ""
+        with self._lock:
+            self._query()
+            hits = self._names.get(name.lower(), [])
+        return [p for p, is_dir in hits if is_dir in want and p.startswith(below)]
+
+    def listing(self, rel: str) -> Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+        """(subdirs, files) of directory `rel`, or None if it isn't in the tree."""
+        with self._lock:
+            self.refresh()
+            node = self._dirs.get(rel)
+            return None if node is None else (node.dirs, node.files)
+
+
+def _suffix(name: str) -> str:
+    """From the last dot on, casefolded ("" without one) — `.bashrc` is its
+    own suffix, so `*.bashrc` still finds it."""
+    dot = name.rfind(".")
+    return name[dot:].lower() if dot >= 0 else ""
+
+
+def _under(paths: List[str], prefix: str) -> List[str]:
+    if not prefix:
+        return list(paths)
+    below = prefix + os.sep
+    i = bisect.bisect_left(paths, below)
+    j = bisect.bisect_left(paths, below + "\U0010ffff")
+    return paths[i:j]
+
+
+def _key(root) -> str:
+    return str(Path(root).resolve())
+
+
+def lookup(path) -> Optional[Tuple[FileTree, str]]:
+    """The existing tree covering `path` and `path`'s prefix within it, or
+    None — never builds one."""
+    p = _key(path)
+    with _TREES_LOCK:
+        trees = list(_TREES.items())
+    best = None
+    for key, tree in trees:
+        if p == key or p.startswith(key.rstrip(os.sep) + os.sep):
+            if best is None or len(key) < len(best[0]):
+                best = (key, tree)
+    if best is None:
+        return None
+    key, tree = best
+    return tree, "" if p == key else os.path.relpath(p, key)
+
+
+def tree_for(root, prune: Callable[[str, bool], bool]) -> Tuple[FileTree, str]:
+    """The process-wide tree covering `root` (an existing tree of an ancestor
+    is reused) and `root`'s prefix within it. Built on first use. A root
+    inside a pruned dir (node_modules/x) gets a tree of its own."""
+    found = lookup(root)
+    if found is not None:
+        tree, prefix = found
+        parts = prefix.split(os.sep) if prefix else []
+        if not any(tree.prune(os.path.join(str(tree.root), *parts[:k]), True)
+                   for k in range(1, len(parts) + 1)):
+            return found
+    key = _key(root)
+    if not os.path.isdir(key):
+        return FileTree(Path(key), prune), ""        # empty, and not kept
+    with _TREES_LOCK:
+        tree = _TREES.get(key)
+        if tree is None:
+            tree = _TREES[key] = FileTree(Path(key), prune)
+    return tree, ""
@@ -0,0 +1,238 @@
+# file: robodog_terminal/grep_engine.py
+"""
+The scanning engine behind the `grep` tool.
+
+The old loop built the whole target list from rglob before reading a byte,
+then decoded and splitlines()'d every file on one thread. Here:
+
+  - iter_files() walks with os.scandir, pruning excluded dirs on the way
+    down, and yields files in sorted-path order as it goes;
+  - search() keeps a bounded window of files in flight on a thread pool
+    (file reads release the GIL; `re` doesn't, so the win is overlapping
+    I/O with matching) and consumes results in walk order, so the output is
+    deterministic. Once the match cap is reached a stop flag halts every
+    worker and nothing further is submitted;
+  - each file is sniffed (a NUL byte in the first 8 KB = binary, skipped).
+    A whole-text pre-check rejects files with no match at all without
+    splitting them into lines; files of MMAP_MIN_BYTES or more are mapped
+    and first checked for the regex's required literals, then read line by
+    line rather than decoded whole;
+  - a match can carry -B/-A context lines, and count mode returns per-file
+    match counts with no cap — both save the follow-up read_file calls.
+"""
+from __future__ import annotations
+
+import fnmatch
+import mmap
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from . import grep_index
+
+MMAP_MIN_BYTES = 1 << 20
+_SNIFF_BYTES = 8192
+_DEFAULT_WORKERS = min(8, (os.cpu_count() or 2) + 2)
+_OTHER_BREAKS = re.compile("[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+
+def iter_files(root: Path, prune: Callable[[str, bool], bool],
+               file_glob: str = "*") -> Iterator[Path]:
+    """Files under `root` in sorted-path order (the order sorted(rglob) would
+    give), skipping entries `prune(path, is_dir)` rejects (an ignore.py
+    matcher). Symlinked dirs aren't followed."""
+    try:
+        entries = sorted(os.scandir(root), key=lambda e: e.name)
+    except OSError:
+        return
+    for e in entries:
+        try:
+            is_dir = e.is_dir(follow_symlinks=False)
+            if prune(e.path, is_dir):
+                continue
+            if is_dir:
+                yield from iter_files(Path(e.path), prune, file_glob)
+            elif e.is_file() and fnmatch.fnmatch(e.name, file_glob):
+                yield Path(e.path)
+        except OSError:
+            continue
+
+
+@dataclass
+class FileHits:
+    path: Path
+    lines: List[Tuple[int, str, bool]] = field(default_factory=list)  # (lineno, text, is_match)
+    count: int = 0
+
+
+class _Matcher:
+    """One compiled query: the per-line regex, a whole-text pre-check when
+    it's safe, and the literal clauses for the mmap byte pre-check."""
+
+    def __init__(self, rx: "re.Pattern"):
+        self.rx = rx
+        # A MULTILINE search over the whole text finds a hit whenever some
+        # line does — except for patterns that anchor on the text's ends or
+        # look around (a line's edge sees the neighbouring newline), and for
+        # ^/$ in text with separators other than \n (splitlines() also
+        # breaks on \r, \x0b, \u2028 …, MULTILINE anchors don't).
+        src = rx.pattern
+        self.whole = (None if any(t in src for t in ("\\A", "\\Z", "(?<", "(?!"))
+                      else re.compile(src, rx.flags | re.MULTILINE))
+        self.anchored = "^" in src or "$" in src
+        clauses = grep_index.required_literals(src)
+        self.byte_clauses = None
+        # Literals are exact-case bytes: any case-insensitive part — the
+        # IGNORECASE flag, a leading (?i), a scoped (?i:...) — rules them out.
+        if (clauses and not rx.flags & re.IGNORECASE
+                and not grep_index.ignores_case(src)):
+            self.byte_clauses = [[lit.encode("utf-8") for lit in c] for c in clauses]
+
+    def may_match_bytes(self, buf) -> bool:
+        if self.byte_clauses is None:
+            return True
+        return all(any(buf.find(lit) >= 0 for lit in c) for c in self.byte_clauses)
+
+
+def _scan_lines(lines: Iterable[str], m: _Matcher, hits: FileHits, before: int,
+                after: int, count_only: bool, budget: float,
+                stop: threading.Event) -> None:
+    """Collect matching lines (with context) into `hits` until `budget`
+    matches — then only the last match's trailing context is still taken."""
+    ring: deque = deque(maxlen=before)
+    pending = 0
+    for i, line in enumerate(lines, 1):
+        if i & 1023 == 0 and stop.is_set():
+            return
+        full = hits.count >= budget
+        if full and not pending:
+            return
+        if not full and m.rx.search(line):
+            hits.count += 1
+            if count_only:
+                continue
+            hits.lines.extend((j, prev, False) for j, prev in ring)
+            ring.clear()
+            hits.lines.append((i, line, True))
+            pending = after
+        elif count_only:
+            continue
+        elif pending:
+            hits.lines.append((i, line, False))
+            pending -= 1
+        elif before:
+            ring.append((i, line))
+
+
+def _iter_mapped_lines(mm) -> Iterator[str]:
+    for raw in iter(mm.readline, b""):
+        # splitlines() again so line numbers agree with the small-file path
+        # (which splits on \r, \x0b, \u2028 ... as well as \n).
+        yield from raw.decode("utf-8", errors="ignore").splitlines() or [""]
+
+
+def _search_file(path: Path, m: _Matcher, before: int, after: int,
+                 count_only: bool, budget: float, stop: threading.Event) -> FileHits:
+    hits = FileHits(path)
+    if stop.is_set():
+        return hits
+    try:
+        with open(path, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size >= MMAP_MIN_BYTES:
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if b"\0" in mm[:_SNIFF_BYTES] or not m.may_match_bytes(mm):
+                        return hits
+                    _scan_lines(_iter_mapped_lines(mm), m, hits, before, after,
+                                count_only, budget, stop)
+                return hits
+            data = fh.read()
+    except (OSError, ValueError):
+        return hits
+    if b"\0" in data[:_SNIFF_BYTES]:
+        return hits
+    text = data.decode("utf-8", errors="ignore")
+    if (m.whole is not None and not (m.anchored and _OTHER_BREAKS.search(text))
+            and not m.whole.search(text)):
+        return hits
+    _scan_lines(text.splitlines(), m, hits, before, after, count_only, budget, stop)
+    return hits
+
+
+@dataclass
+class GrepResult:
+    files: List[FileHits]
+    matches: int
+    capped: bool
+    files_scanned: int
+
+
+def search(files: Iterable[Path], rx: "re.Pattern", max_matches: int = 300,
+           before: int = 0, after: int = 0, count_only: bool = False,
+           workers: Optional[int] = None) -> GrepResult:
+    """Search `files` (in the order given) for `rx`, line by line. Stops at
+    `max_matches` matching lines unless count_only."""
+    m = _Matcher(rx)
+    stop = threading.Event()
+    workers = workers or _DEFAULT_WORKERS
+    cap = float("inf") if count_only else max_matches
+    out: List[FileHits] = []
+    total = scanned = 0
+    capped = False
+    window: deque = deque()
+    it = iter(files)
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix="robodog-grep") as pool:
+        def fill():
+            while len(window) < workers * 4:
+                try:
+                    fp = next(it)
+                except StopIteration:
+                    return
+                # One match past the cap tells "exactly cap" from "more".
+                window.append(pool.submit(_search_file, fp, m, before, after,
+                                          count_only, cap + 1, stop))
+        fill()
+        while window:
+            hits = window.popleft().result()
+            scanned += 1
+            if hits.count:
+                if total + hits.count > cap:
+                    keep = int(cap - total)
+                    if keep:
+                        hits.count = keep
+                        hits.lines = _truncate(hits.lines, keep, after)
+                        out.append(hits)
+                        total += keep
+                    capped = True
+                    stop.set()
+                    for f in window:
+                        f.cancel()
+                    break
+                out.append(hits)
+                total += hits.count
+            fill()
+    return GrepResult(out, total, capped, scanned)
+
+
+def _truncate(lines: List[Tuple[int, str, bool]], keep: int,
+              after: int) -> List[Tuple[int, str, bool]]:
+    """A file's lines up to its `keep`-th match plus that match's trailing
+    context (at most `after` consecutive lines — a match past the cap among
+    them shows as context)."""
+    seen = 0
+    for k, (lineno, _t, is_match) in enumerate(lines):
+        if is_match:
+            seen += 1
+            if seen == keep:
+                end = k + 1
+                while (end < len(lines) and end - k <= after
+                       and lines[end][0] == lineno + (end - k)):
+                    end += 1
+                return lines[:k + 1] + [(n, t, False) for n, t, _m in lines[k + 1:end]]
+    return lines
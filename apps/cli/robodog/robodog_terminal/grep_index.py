@@ -0,0 +1,402 @@
+# file: robodog_terminal/grep_index.py
+"""
+Opt-in persistent trigram index behind the `grep` tool.
+
+`grep` walks the whole tree and regex-scans every line of every file on
+every call; on a large monorepo an agent issuing dozens of greps per turn
+re-reads hundreds of MB each time. With ROBODOG_GREP_INDEX=1 each project
+gets a trigram index instead:
+
+  - built on a background thread the first time the project is seen (grep
+    keeps doing the full scan until it's ready), then persisted under
+    ROBODOG_GREP_INDEX_DIR (default ~/.robodog/grep_index/<project-slug>.json.gz)
+    so the next session starts warm;
+  - kept fresh by an mtime/size stat walk before each query — only files that
+    changed are re-read, deleted ones drop out;
+  - queried by decomposing the regex (re._parser) into the literal runs any
+    match must contain: an AND of clauses, each an OR of strings (from
+    alternations). Files whose trigram sets can't contain those strings are
+    skipped; the regex still runs on every remaining candidate, so results
+    are exactly the full scan's. Trigrams are casefolded, so (?i) patterns
+    narrow too. A regex with no literal run of 3+ chars (`\\w+\\s*=`) can't
+    be narrowed and gets the full scan.
+
+Files over ROBODOG_GREP_INDEX_MAX_KB (default 4096) aren't indexed and are
+always candidates.
+"""
+from __future__ import annotations
+
+import atexit
+import fnmatch
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_VERSION = 1
+_DEFAULT_MAX_KB = 4096
+_SAVE_INTERVAL_S = 30.0
+
+_INDEXES: Dict[str, "TrigramIndex"] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.environ.get("ROBODOG_GREP_INDEX", "").lower() in ("1", "true", "yes")
+
+
+def _index_dir() -> Path:
+    env = os.environ.get("ROBODOG_GREP_INDEX_DIR")
+    return Path(env) if env else Path.home() / ".robodog" / "grep_index"
+
+
+def trigrams(text: str) -> Set[str]:
+    """Casefolded trigrams within each line (grep matches line by line, the
+    same splitlines() split); repeated lines are only sliced once."""
+    out: Set[str] = set()
+    for line in set(text.casefold().splitlines()):
+        out.update(line[i:i + 3] for i in range(len(line) - 2))
+    return out
+
+
+# ---- regex -> required literals ---------------------------------------------
+
+def required_literals(pattern: str) -> Optional[List[List[str]]]:
+    """The strings any match of `pattern` must contain, as an AND of OR-clauses
+    (each clause a list of alternatives, every one 3+ chars). None when the
+    pattern yields no usable clause (or doesn't parse) — the caller scans."""
+    try:
+        from re import _parser as sre_parse           # 3.11+
+    except ImportError:                               # pragma: no cover
+        import sre_parse                              # type: ignore
+    try:
+        parsed = sre_parse.parse(pattern, 0)
+    except (re.error, RecursionError, OverflowError):
+        return None
+    clauses = _clauses(list(parsed), sre_parse)
+    return clauses or None
+
+
+def ignores_case(pattern: str) -> bool:
+    """Whether any part of `pattern` matches case-insensitively: a global
+    (?i) or a scoped (?i:...) group. True for a pattern that doesn't parse,
+    so a caller relying on exact-case literals stays safe."""
+    try:
+        from re import _parser as sre_parse           # 3.11+
+    except ImportError:                               # pragma: no cover
+        import sre_parse                              # type: ignore
+    try:
+        parsed = sre_parse.parse(pattern, 0)
+    except (re.error, RecursionError, OverflowError):
+        return True
+    if parsed.state.flags & re.IGNORECASE:
+        return True
+
+    def walk(node) -> bool:
+        if isinstance(node, sre_parse.SubPattern):
+            for op, av in node:
+                if op == sre_parse.SUBPATTERN and av[1] & re.IGNORECASE:
+                    return True
+                if walk(av):
+                    return True
+        elif isinstance(node, (list, tuple)):
+            return any(walk(x) for x in node)
+        return False
+    return walk(parsed)
+
+
+def _clauses(seq, sp) -> List[List[str]]:
+    c = sp                                  # the opcode constants live on the parser
+    LITERAL, IN, AT = c.LITERAL, c.IN, c.AT
+    SUBPATTERN, BRANCH = c.SUBPATTERN, c.BRANCH
+    REPEATS = {c.MAX_REPEAT, c.MIN_REPEAT}
+    if hasattr(c, "POSSESSIVE_REPEAT"):
+        REPEATS.add(c.POSSESSIVE_REPEAT)
+    ATOMIC = getattr(c, "ATOMIC_GROUP", None)
+
+    out: List[List[str]] = []
+    run: List[str] = []
+
+    def flush():
+        if len(run) >= 3:
+            out.append(["".join(run)])
+        run.clear()
+
+    for op, av in seq:
+        if op == LITERAL:
+            run.append(chr(av))
+        elif op == IN and len(av) == 1 and av[0][0] == LITERAL:
+            run.append(chr(av[0][1]))
+        elif op == AT:
+            continue                                  # zero-width: the run goes on
+        elif op == SUBPATTERN or (ATOMIC is not None and op == ATOMIC):
+            sub = list(av[-1] if op == SUBPATTERN else av)
+            lit = _pure_literal(sub, LITERAL)
+            if lit is not None:
+                run.extend(lit)
+            else:
+                flush()
+                out.extend(_clauses(sub, sp))
+        elif op == BRANCH:
+            flush()
+            # Each branch contributes the alternatives of its most selective
+            # clause; a branch with none makes the whole alternation useless.
+            alts: Optional[List[str]] = []
+            for branch in av[1]:
+                best = max(_clauses(list(branch), sp),
+                           key=lambda cl: min(len(x) for x in cl), default=None)
+                if best is None:
+                    alts = None
+                    break
+                alts.extend(best)
+            if alts:
+                out.append(sorted(set(alts)))
+        elif op in REPEATS:
+            flush()
+            lo, _hi, sub = av
+            if lo >= 1:
+                out.extend(_clauses(list(sub), sp))
+        else:
+            flush()
+    flush()
+    return out
+
+
+def _pure_literal(seq, LITERAL) -> Optional[str]:
+    if seq and all(op == LITERAL for op, _ in seq):
+        return "".join(chr(av) for _, av in seq)
+    return None
+
+
+# ---- the index ----------------------------------------------------------------
+
+class TrigramIndex:
+    """Trigram postings for one project root. Files are numbered; a changed
+    file gets a new number and its old postings go stale (filtered by the
+    live set, dropped on save)."""
+
+    def __init__(self, root: Path, prune: Callable[[str, bool], bool],
+                 path: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.prune = prune
+        self.path = path or (_index_dir()
+                             / (re.sub(r"[^A-Za-z0-9]", "-", str(self.root)) + ".json.gz"))
+        if max_bytes is None:
+            try:
+                max_bytes = int(float(os.environ.get("ROBODOG_GREP_INDEX_MAX_KB")
+                                      or _DEFAULT_MAX_KB) * 1024)
+            except ValueError:
+                max_bytes = _DEFAULT_MAX_KB * 1024
+        self.max_bytes = max_bytes
+        self.files: Dict[str, list] = {}          # rel -> [mtime_ns, size, fid]; fid -1 = unindexed
+        self.postings: Dict[str, Set[int]] = {}
+        self._next_fid = 0
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self.stats = {"queries": 0, "narrowed": 0, "reindexed": 0}
+
+    # -- build / refresh --
+    def start(self) -> None:
+        threading.Thread(target=self._build, daemon=True,
+                         name="robodog-grep-index").start()
+
+    def _build(self) -> None:
+        try:
+            with self._lock:
+                self._load()
+                self._refresh()
+                self._save()
+        except Exception as exc:          # never take grep down with the index
+            logger.warning("grep index: build failed for %s: %s", self.root, exc)
+            return
+        self.ready.set()
+
+    def _walk(self) -> Dict[str, tuple]:
+        seen: Dict[str, tuple] = {}
+        stack = [str(self.root)]
+        while stack:
+            d = stack.pop()
+            try:
+                it = os.scandir(d)
+            except OSError:
+                continue
+            with it:
+                for e in it:
+                    try:
+                        is_dir = e.is_dir(follow_symlinks=False)
+                        if self.prune(e.path, is_dir):
+                            continue
+                        if is_dir:
+                            stack.append(e.path)
+                        elif e.is_file():
+                            st = e.stat()
+                            rel = os.path.relpath(e.path, self.root)
+                            seen[rel] = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        continue
+        return seen
+
+    def _index_file(self, rel: str, mtime: int, size: int) -> None:
+        fid = -1
+        if size <= self.max_bytes:
+            try:
+                with open(os.path.join(self.root, rel), "r", encoding="utf-8",
+                          errors="ignore") as fh:
+                    grams = trigrams(fh.read())
+            except OSError:
+                grams = None
+            if grams is not None:
+                fid = self._next_fid
+                self._next_fid += 1
+                postings = self.postings
+                for g in grams:
+                    fids = postings.get(g)
+                    if fids is None:
+                        postings[g] = {fid}
+                    else:
+                        fids.add(fid)
+        self.files[rel] = [mtime, size, fid]
+
+    def _refresh(self) -> int:
+        """Stat-walk the tree and re-read what changed (caller holds the lock).
+        Returns how many files were (re)indexed or dropped."""
+        seen = self._walk()
+        changed = 0
+        for rel in [r for r in self.files if r not in seen]:
+            del self.files[rel]
+            changed += 1
+        for rel, (mtime, size) in seen.items():
+            cur = self.files.get(rel)
+            if cur is None or cur[0] != mtime or cur[1] != size:
+                self._index_file(rel, mtime, size)
+                changed += 1
+        if changed:
+            self._dirty = True
+            self.stats["reindexed"] += changed
+        return changed
+
+    # -- query --
+    def candidates(self, under: Path, pattern: str, file_glob: str = "*") -> Optional[List[Path]]:
+        """Files under `under` that may match `pattern`, sorted; None when the
+        index can't answer (not built yet, or nothing to narrow on)."""
+        if not self.ready.is_set():
+            return None
+        clauses = required_literals(pattern)
+        if clauses is None:
+            return None
+        try:
+            prefix = os.path.relpath(under, self.root)
+        except ValueError:
+            return None
+        if prefix == ".." or prefix.startswith(".." + os.sep):
+            return None
+        prefix = "" if prefix == "." else prefix + os.sep
+        with self._lock:
+            self._refresh()
+            self.stats["queries"] += 1
+            live: Dict[int, str] = {}
+            always: List[str] = []
+            for rel, (_m, _s, fid) in self.files.items():
+                if not rel.startswith(prefix) or not fnmatch.fnmatch(
+                        os.path.basename(rel), file_glob):
+                    continue
+                if fid < 0:
+                    always.append(rel)
+                else:
+                    live[fid] = rel
+            hits: Optional[Set[int]] = None
+            for clause in clauses:
+                union: Set[int] = set()
+                for lit in clause:
+                    union |= self._containing(lit)
+                hits = union if hits is None else hits & union
+            keep = [live[f] for f in (hits or ()) if f in live] + always
+            if len(keep) < len(live) + len(always):
+                self.stats["narrowed"] += 1
+            self._maybe_save()
+        return sorted(self.root / rel for rel in keep)   # the full scan's order
+
+    def _containing(self, lit: str) -> Set[int]:
+        grams = sorted(trigrams(lit), key=lambda g: len(self.postings.get(g, ())))
+        if not grams:
+            return set()
+        out = set(self.postings.get(grams[0], ()))
+        for g in grams[1:]:
+            if not out:
+                break
+            out &= self.postings.get(g, set())
+        return out
+
+    # -- persistence --
+    def _load(self) -> None:
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError, EOFError):
+            return
+        if data.get("version") != _VERSION or data.get("root") != str(self.root):
+            return
+        self.files = {rel: list(v) for rel, v in data.get("files", {}).items()}
+        self.postings = {g: set(fids) for g, fids in data.get("postings", {}).items()}
+        self._next_fid = int(data.get("next_fid", 0))
+
+    def _save(self) -> None:
+        """Write the live postings atomically (caller holds the lock)."""
+        live = {v[2] for v in self.files.values() if v[2] >= 0}
+        postings = {}
+        for g, fids in list(self.postings.items()):
+            fids &= live
+            if fids:
+                postings[g] = sorted(fids)
+            else:
+                del self.postings[g]
+        data = {"version": _VERSION, "root": str(self.root), "files": self.files,
+                "next_fid": self._next_fid, "postings": postings}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=3) as fh:
+                json.dump(data, fh, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            logger.debug("grep index: save failed for %s: %s", self.root, exc)
+            return
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _maybe_save(self) -> None:
+        if self._dirty and time.monotonic() - self._last_save > _SAVE_INTERVAL_S:
+            self._save()
+
+    def flush(self) -> None:
+        if self.ready.is_set():
+            with self._lock:
+                if self._dirty:
+                    self._save()
+
+
+def index_for(root, prune: Callable[[str, bool], bool]) -> TrigramIndex:
+    """The process-wide index of project `root`, started on first use."""
+    key = str(Path(root).resolve())
+    with _INDEXES_LOCK:
+        idx = _INDEXES.get(key)
+        if idx is None:
+            idx = _INDEXES[key] = TrigramIndex(Path(key), prune)
+            idx.start()
+    return idx
+
+
+@atexit.register
+def _flush_all() -> None:
+    for idx in list(_INDEXES.values()):
+        idx.flush()
@@ -0,0 +1,238 @@
+# file: robodog_terminal/hedging.py
+"""
+Opt-in hedged requests and failover across LLM backends.
+
+A stalled gateway is expensive: GatewayClient.complete retries 5 times with
+backoff and each attempt may sit out the 300s custom-gateway timeout, so one
+slow call can eat many minutes of a turn. HedgedClient wraps the primary
+client (and optionally a secondary OpenAICompatClient) and races them:
+
+  1. the call goes to the healthiest backend (the configured primary unless
+     it's degraded);
+  2. if no good reply has arrived after the hedge delay — the p95 of that
+     backend's recent successful latencies, clamped to [min, max] — the
+     same call is fired at the secondary (or again at the same backend when
+     there's no secondary); an error before then fails over to the secondary
+     at once (with no secondary there is nothing to fail over to — the
+     client already did its own retries);
+  3. the first good reply wins. The loser can't be interrupted mid-request
+     (requests has no cancel), but it is cancelled (llm_client.cancellable):
+     it stops at its next retry or limiter wait, giving its concurrency slot
+     back instead of holding it through every retry, and its reply is
+     dropped. A loser that does finish still feeds the health score.
+
+BackendHealth tracks per-backend latency samples and an error EWMA; a
+backend with 3 failures in a row (or a >50% recent error rate) is degraded
+for a cooldown and routed around until it recovers.
+
+Enable with --hedge / ROBODOG_HEDGE=1. The secondary comes from
+ROBODOG_HEDGE_URL + ROBODOG_HEDGE_KEY (+ ROBODOG_HEDGE_MODEL, default: the
+primary's model); ROBODOG_HEDGE_MIN_S / ROBODOG_HEDGE_MAX_S bound the delay.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from .llm_client import (CallCancelled, Completion, LLMClient, OpenAICompatClient,
+                         _replay_chunks, cancellable)
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_MIN_DELAY = 2.0
+_DEFAULT_MAX_DELAY = 60.0
+_COLD_DELAY = 20.0          # hedge delay before a backend has enough samples
+_MIN_SAMPLES = 8
+
+
+class BackendHealth:
+    """Rolling health of one backend: recent successful latencies (for the
+    p95 hedge delay), an error-rate EWMA and a consecutive-failure count."""
+
+    def __init__(self, name: str, window: int = 64, cooldown: float = 60.0):
+        self.name = name
+        self.cooldown = cooldown
+        self.latencies: deque = deque(maxlen=window)
+        self.err_rate = 0.0
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.last_failure = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, latency: float) -> None:
+        with self._lock:
+            self.samples += 1
+            self.err_rate = 0.8 * self.err_rate + 0.2 * (0.0 if ok else 1.0)
+            if ok:
+                self.latencies.append(latency)
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                self.last_failure = time.monotonic()
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < _MIN_SAMPLES:
+                return None
+            xs = sorted(self.latencies)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+    @property
+    def degraded(self) -> bool:
+        with self._lock:
+            if time.monotonic() - self.last_failure > self.cooldown:
+                return False
+            return (self.consecutive_failures >= 3
+                    or (self.samples >= 4 and self.err_rate > 0.5))
+
+    def score(self) -> float:
+        """1.0 = healthy, 0.0 = degraded; in between, the recent success rate."""
+        return 0.0 if self.degraded else round(1.0 - self.err_rate, 3)
+
+
+class HedgedClient(LLMClient):
+    """Races a call across backends after a p95-derived delay (module doc).
+    Other attributes (model, url, diagnose…) are the primary's."""
+
+    def __init__(self, primary: LLMClient, secondary: Optional[LLMClient] = None,
+                 min_delay: float = _DEFAULT_MIN_DELAY,
+                 max_delay: float = _DEFAULT_MAX_DELAY, quantile: float = 0.95):
+        self.primary = primary
+        self.secondary = secondary
+        self.backends: List[LLMClient] = [primary] + ([secondary] if secondary else [])
+        self.health = {id(b): BackendHealth(getattr(b, "model", None) or b.name)
+                       for b in self.backends}
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.q = quantile
+        self.name = primary.name
+        self.supports_messages = bool(getattr(primary, "supports_messages", False))
+        self.calls = self.hedges = self.hedge_wins = self.failovers = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        primary = self.__dict__.get("primary")
+        if primary is None:
+            raise AttributeError(attr)
+        return getattr(primary, attr)
+
+    def hedge_delay(self, backend: LLMClient) -> float:
+        p = self.health[id(backend)].quantile(self.q)
+        delay = _COLD_DELAY if p is None else p
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def _order(self) -> List[LLMClient]:
+        """Configured order, except a degraded backend goes last."""
+        return sorted(self.backends, key=lambda b: self.health[id(b)].degraded)
+
+    def _race(self, call: Callable[[LLMClient], Completion]) -> Completion:
+        order = self._order()
+        first = order[0]
+        hedge_to = order[1] if len(order) > 1 else first
+        results: "queue.Queue" = queue.Queue()
+        cancels = (threading.Event(), threading.Event())
+
+        def run(idx: int, backend: LLMClient) -> None:
+            t0 = time.monotonic()
+            try:
+                with cancellable(cancels[idx]):
+                    out = call(backend)
+                good = bool((out.text or "").strip())
+            except CallCancelled as exc:     # lost the race: not the backend's fault
+                results.put((idx, exc, False))
+                return
+            except Exception as exc:     # reported through the queue
+                out, good = exc, False
+            self.health[id(backend)].record(good, time.monotonic() - t0)
+            results.put((idx, out, good))
+
+        def launch(idx: int, backend: LLMClient) -> None:
+            threading.Thread(target=run, args=(idx, backend), daemon=True,
+                             name=f"robodog-hedge-{idx}").start()
+
+        with self._lock:
+            self.calls += 1
+        launch(0, first)
+        launched, pending = 1, 1
+        deadline = time.monotonic() + self.hedge_delay(first)
+        last = None
+        while pending:
+            wait = None if launched == 2 else max(0.0, deadline - time.monotonic())
+            try:
+                idx, out, good = results.get(timeout=wait)
+            except queue.Empty:
+                with self._lock:
+                    self.hedges += 1
+                launch(1, hedge_to)
+                launched, pending = 2, pending + 1
+                continue
+            pending -= 1
+            if good:
+                cancels[1 - idx].set()
+                if idx == 1:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return out
+            last = out
+            if launched == 1 and hedge_to is not first:   # failed fast: fail over
+                with self._lock:
+                    self.failovers += 1
+                launch(1, hedge_to)
+                launched, pending = 2, pending + 1
+        if isinstance(last, Exception):
+            raise last
+        return last
+
+    def complete(self, prompt, context="", max_tokens=8192, temperature=0.3) -> Completion:
+        return self._race(lambda b: b.complete(prompt, context=context,
+                                               max_tokens=max_tokens,
+                                               temperature=temperature))
+
+    def complete_chat(self, messages, max_tokens=8192, temperature=0.3, on_delta=None,
+                      cache_breakpoints=()) -> Completion:
+        # Two live streams can't share one on_delta, so a hedged chat call
+        # completes first and replays (as complete_stream does, via the base).
+        completion = self._race(lambda b: b.complete_chat(
+            messages, max_tokens=max_tokens, temperature=temperature,
+            cache_breakpoints=cache_breakpoints))
+        if on_delta is not None:
+            _replay_chunks(completion.text, on_delta)
+        return completion
+
+    def hedge_stats(self) -> dict:
+        with self._lock:
+            out = {"calls": self.calls, "hedges": self.hedges,
+                   "hedge_wins": self.hedge_wins, "failovers": self.failovers}
+        out["backends"] = [
+            {"name": h.name, "score": h.score(), "p95_s": h.quantile(0.95),
+             "hedge_delay_s": round(self.hedge_delay(b), 2)}
+            for b, h in ((b, self.health[id(b)]) for b in self.backends)]
+        return out
+
+
+def hedge_from_env(primary: LLMClient, on_retry=None) -> HedgedClient:
+    """HedgedClient for `primary`, with the ROBODOG_HEDGE_* secondary when
+    one is configured (else hedges go to the primary itself)."""
+    def _num(name, default):
+        try:
+            return float(os.environ.get(name) or default)
+        except ValueError:
+            return default
+    secondary = None
+    url, key = os.environ.get("ROBODOG_HEDGE_URL"), os.environ.get("ROBODOG_HEDGE_KEY")
+    if url and key:
+        model = (os.environ.get("ROBODOG_HEDGE_MODEL")
+                 or getattr(primary, "model", None) or "")
+        try:
+            secondary = OpenAICompatClient(base_url=url, api_key=key, model=model,
+                                           on_retry=on_retry)
+        except ValueError as exc:
+            logger.warning("hedge: secondary backend not usable: %s", exc)
+    return HedgedClient(primary, secondary,
+                        min_delay=_num("ROBODOG_HEDGE_MIN_S", _DEFAULT_MIN_DELAY),
+                        max_delay=_num("ROBODOG_HEDGE_MAX_S", _DEFAULT_MAX_DELAY))
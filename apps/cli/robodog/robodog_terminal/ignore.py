@@ -0,0 +1,320 @@
+# file: robodog_terminal/ignore.py
+"""
+One ignore matcher for every walker: built-in excluded dirs plus nested
+.gitignore / .robodogignore rules.
+
+tools.py, CodeMapper and RobodogService each carried their own hard-coded
+exclude set and none read .gitignore, so grep/glob/code-map walked build
+outputs, target/, .next/, coverage/ … . An IgnoreMatcher covers one project
+(the nearest ancestor with a .git, else the root it was asked for):
+
+  - rules live in a trie of directory nodes, one per directory that has been
+    asked about, each holding the compiled rules of that directory's
+    .git/info/exclude (root only), .gitignore and .robodogignore (later
+    files win). A node re-stats its ignore files at most every _RECHECK_S,
+    so editing a .gitignore takes effect without a restart;
+  - within a node, plain names like `target/` are a set lookup and glob
+    patterns like `*.log` or `/docs/**/gen` one combined regex — unless the
+    node has `!negations`, when its rules are tried newest first, as git does;
+  - deeper directories override shallower ones, and the built-in
+    DEFAULT_EXCLUDE_DIRS — or the exclude set the caller passes instead —
+    apply last, so a `!dist/` in a .robodogignore can bring `dist/` back.
+
+A matcher is a `(path, is_dir) -> bool` callable taking absolute paths;
+walkers call it on each entry and never descend into an excluded dir.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Never walked, with or without a .gitignore.
+DEFAULT_EXCLUDE_DIRS = frozenset({
+    ".git", "node_modules", "__pycache__", "dist", "build", ".venv", "venv",
+    ".idea", ".vscode", ".pytest_cache", ".mypy_cache", "egg-info", ".tox",
+    "diffoutput",
+})
+IGNORE_FILES = (".gitignore", ".robodogignore")
+_RECHECK_S = 1.0
+
+_MATCHERS: Dict[Tuple[str, FrozenSet[str]], "IgnoreMatcher"] = {}
+_MATCHERS_LOCK = threading.Lock()
+
+
+def default_excluded(name: str, names: FrozenSet[str] = DEFAULT_EXCLUDE_DIRS) -> bool:
+    """Is `name` in the exclude set `names`? ("egg-info" there stands for
+    every *.egg-info dir.)"""
+    return name in names or ("egg-info" in names and name.endswith(".egg-info"))
+
+
+# ---- one ignore file -> compiled rules -------------------------------------------
+
+def _translate(glob: str) -> str:
+    """A gitignore glob (no leading/trailing slash) as a regex over a
+    /-separated relative path."""
+    out, i, n = [], 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i) and (i == 0 or glob[i - 1] == "/"):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i) and i + 2 == n and (i == 0 or glob[i - 1] == "/"):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = glob.find("]", i + 2 if glob.startswith(("[!", "[^"), i) else i + 1)
+            if j < 0:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = glob[i + 1:j]
+            if body[:1] in ("!", "^"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class _Rule:
+    __slots__ = ("negate", "dir_only", "name", "rx")
+
+    def __init__(self, negate: bool, dir_only: bool, name: Optional[str], rx):
+        self.negate = negate
+        self.dir_only = dir_only
+        self.name = name            # plain basename pattern, else None
+        self.rx = rx                # compiled full-path regex when name is None
+
+    def matches(self, rel: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.name is not None:
+            return name == self.name
+        return self.rx.match(rel) is not None
+
+
+def parse_rules(lines: Iterable[str]) -> List[_Rule]:
+    """gitignore lines -> rules, in file order."""
+    rules: List[_Rule] = []
+    for raw in lines:
+        line = raw.rstrip("\n").rstrip("\r")
+        if not line or line.startswith("#"):
+            continue
+        # Trailing spaces are dropped unless escaped.
+        stripped = line.rstrip(" ")
+        if stripped.endswith("\\") and len(stripped) < len(line):
+            stripped += " "
+        line = stripped
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith(("\\!", "\\#")):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not anchored and not any(ch in line for ch in "*?[\\"):
+            rules.append(_Rule(negate, dir_only, line, None))
+            continue
+        body = _translate(line)
+        rx = re.compile(("" if anchored else "(?:.*/)?") + body + r"\Z", re.DOTALL)
+        rules.append(_Rule(negate, dir_only, None, rx))
+    return rules
+
+
+class _Rules:
+    """The compiled rules of one directory."""
+
+    def __init__(self, rules: List[_Rule]):
+        self.rules = rules
+        self.ordered = any(r.negate for r in rules)
+        if not self.ordered:
+            self.names = {r.name for r in rules if r.name is not None and not r.dir_only}
+            self.dir_names = {r.name for r in rules if r.name is not None and r.dir_only}
+            pats = [r.rx.pattern for r in rules if r.rx is not None and not r.dir_only]
+            dpats = [r.rx.pattern for r in rules if r.rx is not None and r.dir_only]
+            self.rx = re.compile("|".join(f"(?:{p})" for p in pats), re.DOTALL) if pats else None
+            self.dir_rx = (re.compile("|".join(f"(?:{p})" for p in dpats), re.DOTALL)
+                           if dpats else None)
+
+    def decide(self, rel: str, name: str, is_dir: bool) -> Optional[bool]:
+        """True = ignored, False = re-included, None = no rule says."""
+        if self.ordered:
+            for r in reversed(self.rules):
+                if r.matches(rel, name, is_dir):
+                    return not r.negate
+            return None
+        if name in self.names or (is_dir and name in self.dir_names):
+            return True
+        if self.rx is not None and self.rx.match(rel):
+            return True
+        if is_dir and self.dir_rx is not None and self.dir_rx.match(rel):
+            return True
+        return None
+
+
+class _Node:
+    __slots__ = ("children", "rules", "stamp", "checked")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.rules: Optional[_Rules] = None
+        self.stamp: Optional[tuple] = None
+        self.checked = 0.0
+
+
+class IgnoreMatcher:
+    """`matcher(path, is_dir)` -> True when `path` is ignored under `root`."""
+
+    def __init__(self, root, exclude_dirs: Optional[Iterable[str]] = None):
+        self.root = str(Path(root).resolve())
+        self.exclude_dirs = (DEFAULT_EXCLUDE_DIRS if exclude_dirs is None
+                             else frozenset(exclude_dirs))
+        self._trie = _Node()
+        self._chains: Dict[str, List[Tuple[_Node, str]]] = {}
+        self._lock = threading.Lock()
+
+    def _sources(self, rel_dir: str) -> List[str]:
+        d = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        files = [os.path.join(d, f) for f in IGNORE_FILES]
+        if not rel_dir:
+            files.insert(0, os.path.join(self.root, ".git", "info", "exclude"))
+        return files
+
+    def _load(self, node: _Node, rel_dir: str) -> Optional[_Rules]:
+        now = time.monotonic()
+        if now - node.checked < _RECHECK_S:
+            return node.rules
+        node.checked = now
+        stamp, texts = [], []
+        for f in self._sources(rel_dir):
+            try:
+                st = os.stat(f)
+            except OSError:
+                stamp.append(None)
+                continue
+            stamp.append((st.st_mtime_ns, st.st_size))
+            texts.append(f)
+        stamp_t = tuple(stamp)
+        if stamp_t == node.stamp:
+            return node.rules
+        rules: List[_Rule] = []
+        for f in texts:
+            try:
+                with open(f, "r", encoding="utf-8", errors="ignore") as fh:
+                    rules.extend(parse_rules(fh))
+            except OSError:
+                continue
+        node.stamp = stamp_t
+        node.rules = _Rules(rules) if rules else None
+        return node.rules
+
+    def recheck(self) -> None:
+        """Re-stat every node's ignore files on its next query instead of
+        after _RECHECK_S — for a caller that has just seen one change."""
+        with self._lock:
+            stack = [self._trie]
+            while stack:
+                node = stack.pop()
+                node.checked = 0.0
+                stack.extend(node.children.values())
+
+    def _relative(self, path: str) -> Optional[str]:
+        path = str(path)
+        if not os.path.isabs(path):
+            return path.replace(os.sep, "/")
+        root = self.root
+        if path.startswith(root) and (len(path) == len(root) or path[len(root)] in "/\\"):
+            return path[len(root) + 1:].replace(os.sep, "/")
+        try:
+            rel = os.path.relpath(os.path.realpath(path), root)
+        except ValueError:
+            return None
+        if rel == ".." or rel.startswith(".." + os.sep):
+            return None
+        return "" if rel == "." else rel.replace(os.sep, "/")
+
+    def _chain(self, rel_dir: str) -> List[Tuple[_Node, str]]:
+        """The trie nodes from `rel_dir` up to the root, deepest first."""
+        chain = self._chains.get(rel_dir)
+        if chain is None:
+            if rel_dir:
+                parent, _, part = rel_dir.rpartition("/")
+                up = self._chain(parent)
+                node = up[0][0].children.setdefault(part, _Node())
+                chain = [(node, rel_dir)] + up
+            else:
+                chain = [(self._trie, "")]
+            self._chains[rel_dir] = chain
+        return chain
+
+    def __call__(self, path, is_dir: bool) -> bool:
+        """Is `path` itself ignored? (Its parents aren't checked — a walker
+        never gets below an ignored dir. See excluded_path for that.)"""
+        name = os.path.basename(str(path).rstrip("/\\"))
+        rel = self._relative(path)
+        if rel:
+            rel_dir = rel.rpartition("/")[0]
+            with self._lock:
+                for node, node_dir in self._chain(rel_dir):
+                    rules = self._load(node, node_dir)
+                    if rules is None:
+                        continue
+                    verdict = rules.decide(rel[len(node_dir) + 1:] if node_dir else rel,
+                                           name, is_dir)
+                    if verdict is not None:
+                        return verdict
+        return default_excluded(name, self.exclude_dirs)
+
+    def excluded_path(self, path) -> bool:
+        """Is `path`, or any directory between the root and it, ignored?"""
+        rel = self._relative(path)
+        if rel is None:
+            return any(default_excluded(p, self.exclude_dirs) for p in Path(path).parts)
+        if not rel:
+            return False
+        parts = rel.split("/")
+        for k in range(1, len(parts) + 1):
+            sub = os.path.join(self.root, *parts[:k])
+            if self(sub, k < len(parts) or os.path.isdir(sub)):
+                return True
+        return False
+
+
+def project_root(path) -> Path:
+    """The nearest ancestor of `path` (or itself) with a .git, else `path`."""
+    p = Path(path).resolve()
+    for base in (p, *p.parents):
+        if (base / ".git").exists():
+            return base
+    return p
+
+
+def matcher_for(root, exclude_dirs: Optional[Iterable[str]] = None) -> IgnoreMatcher:
+    """The process-wide matcher of the project containing `root`.
+    `exclude_dirs` replaces DEFAULT_EXCLUDE_DIRS as the built-in excludes."""
+    key = (str(project_root(root)),
+           DEFAULT_EXCLUDE_DIRS if exclude_dirs is None else frozenset(exclude_dirs))
+    with _MATCHERS_LOCK:
+        m = _MATCHERS.get(key)
+        if m is None:
+            m = _MATCHERS[key] = IgnoreMatcher(key[0], key[1])
+    return m
@@ -0,0 +1,323 @@
+# file: robodog_terminal/impact.py
+"""
+Test-impact selection and a result cache for the `run_tests` tool (pytest).
+
+run_tests used to run the whole suite after every change. With
+scope="impacted" it runs only what the change can have affected:
+
+  - an import graph of the project's .py files (ast, re-parsed only when a
+    file's mtime/size moves) gives each test file its inputs: the modules it
+    imports, transitively, plus the conftest.py files above it. Module names
+    follow pytest's default rootdir insertion — a file's name is its path
+    from the first ancestor without an __init__.py — and the project root
+    is a root too. An import of a package also counts its __init__;
+  - if the project has a coverage.py data file with per-test contexts
+    (`pytest --cov --cov-context=test`, stored as .coverage), the files each
+    test executed are added to its inputs — that catches what static
+    imports miss (importlib, plugins, data-driven dispatch). Optional:
+    without coverage installed, or without contexts, only imports count;
+  - a test file's cache key hashes its own content and every input's, the
+    pytest config files and the command. A file whose key matches a
+    passing run earlier in this session is not run again. Failures are
+    never cached (the environment may have been fixed since);
+  - of the files left, those whose inputs include a file changed at the
+    checkpointer's current marker (this prompt's edits) run first; the rest
+    can be started in the background, and their results are folded into the
+    cache on a later call if the inputs haven't moved since.
+
+Per-file outcomes and durations come from the junit XML report the run
+writes (testreport.py). Paths are relative to the project root,
+'/'-separated.
+"""
+from __future__ import annotations
+
+import ast
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import testreport
+
+CONFIG_FILES = ("pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini")
+
+_DIGESTS: Dict[str, Tuple[int, int, str]] = {}   # abs path -> (mtime_ns, size, digest)
+_DIGESTS_LOCK = threading.Lock()
+
+
+def is_test_file(rel: str) -> bool:
+    name = rel.rsplit("/", 1)[-1]
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def digest(path: Path) -> Optional[str]:
+    """blake2b of a file's bytes, cached by (mtime_ns, size); None if unreadable."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    key = str(path)
+    with _DIGESTS_LOCK:
+        hit = _DIGESTS.get(key)
+    if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+        return hit[2]
+    try:
+        value = hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+    with _DIGESTS_LOCK:
+        _DIGESTS[key] = (st.st_mtime_ns, st.st_size, value)
+    return value
+
+
+class ImportGraph:
+    """Static imports of every .py file under one root."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._parsed: Dict[str, Tuple[int, int, Tuple[str, ...]]] = {}  # rel -> (mtime, size, names)
+        self._modules: Dict[str, List[str]] = {}                        # dotted -> rels
+        self._files: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def refresh(self, py_files: Iterable[str]) -> None:
+        """Bring the graph up to date with `py_files` (rel paths)."""
+        with self._lock:
+            files = set(py_files)
+            for rel in list(self._parsed):
+                if rel not in files:
+                    del self._parsed[rel]
+            for rel in files:
+                try:
+                    st = (self.root / rel).stat()
+                except OSError:
+                    continue
+                hit = self._parsed.get(rel)
+                if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+                    continue
+                self._parsed[rel] = (st.st_mtime_ns, st.st_size, self._imports_of(rel))
+            if files != self._files:
+                self._files = files
+                self._modules = {}
+                for rel in sorted(files):
+                    for name in self._names_of(rel):
+                        self._modules.setdefault(name, []).append(rel)
+
+    def _names_of(self, rel: str) -> Set[str]:
+        parts = rel[:-3].split("/")
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        names = {".".join(parts)} if parts else set()
+        # pytest's rootdir insertion: up from the file while dirs are packages.
+        start = len(parts) - 1
+        while start > 0 and (self.root / "/".join(parts[:start]) / "__init__.py").is_file():
+            start -= 1
+        names.add(".".join(parts[start:]))
+        names.discard("")
+        return names
+
+    def _imports_of(self, rel: str) -> Tuple[str, ...]:
+        try:
+            tree = ast.parse((self.root / rel).read_bytes(), filename=rel)
+        except (OSError, SyntaxError, ValueError):
+            return ()
+        names: Set[str] = set()
+        pkg = rel.split("/")[:-1]
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(a.name for a in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = pkg[:len(pkg) - node.level + 1] if node.level <= len(pkg) + 1 else []
+                    # a relative import resolves against every root the file
+                    # could be imported from, so keep each suffix of the package
+                    heads = [".".join(base[i:]) for i in range(len(base))] or [""]
+                else:
+                    heads = [""]
+                for head in heads:
+                    mod = ".".join(p for p in (head, node.module or "") if p)
+                    if mod:
+                        names.add(mod)
+                    for a in node.names:
+                        if a.name != "*":
+                            names.add(f"{mod}.{a.name}" if mod else a.name)
+        return tuple(sorted(names))
+
+    def _resolve(self, name: str) -> List[str]:
+        out: List[str] = []
+        parts = name.split(".")
+        for k in range(1, len(parts) + 1):      # a.b.c also runs a and a.b
+            out.extend(self._modules.get(".".join(parts[:k]), ()))
+        return out
+
+    def closure(self, rel: str) -> Set[str]:
+        """`rel` and every project file it imports, transitively, plus the
+        conftest.py files pytest would load for it."""
+        with self._lock:
+            seen: Set[str] = set()
+            stack = [rel] + self._conftests(rel)
+            while stack:
+                cur = stack.pop()
+                if cur in seen:
+                    continue
+                seen.add(cur)
+                hit = self._parsed.get(cur)
+                for name in (hit[2] if hit else ()):
+                    stack.extend(r for r in self._resolve(name) if r not in seen)
+            return seen
+
+    def _conftests(self, rel: str) -> List[str]:
+        parts = rel.split("/")[:-1]
+        out = []
+        for k in range(len(parts) + 1):
+            cand = "/".join(parts[:k] + ["conftest.py"])
+            if cand in self._files:
+                out.append(cand)
+        return out
+
+
+_GRAPHS: Dict[str, ImportGraph] = {}
+_GRAPHS_LOCK = threading.Lock()
+
+
+def graph_for(root: Path) -> ImportGraph:
+    key = str(Path(root).resolve())
+    with _GRAPHS_LOCK:
+        graph = _GRAPHS.get(key)
+        if graph is None:
+            graph = _GRAPHS[key] = ImportGraph(Path(key))
+        return graph
+
+
+_COVERAGE: Dict[str, Tuple[int, Dict[str, Set[str]]]] = {}   # root -> (mtime_ns, map)
+
+
+def coverage_inputs(root: Path) -> Dict[str, Set[str]]:
+    """{test file: files it executed} from <root>/.coverage's per-test
+    contexts, or {} (no data, no contexts, or coverage not installed)."""
+    data_file = Path(root) / ".coverage"
+    try:
+        mtime = data_file.stat().st_mtime_ns
+    except OSError:
+        return {}
+    hit = _COVERAGE.get(str(root))
+    if hit and hit[0] == mtime:
+        return hit[1]
+    out: Dict[str, Set[str]] = {}
+    try:
+        from coverage import CoverageData
+        data = CoverageData(basename=str(data_file))
+        data.read()
+        base = str(Path(root).resolve())
+        for measured in data.measured_files():
+            try:
+                rel = os.path.relpath(measured, base).replace(os.sep, "/")
+            except ValueError:
+                continue
+            if rel.startswith("../"):
+                continue
+            for contexts in (data.contexts_by_lineno(measured) or {}).values():
+                for ctx in contexts:
+                    # pytest-cov names them "tests/test_x.py::test_y|run"
+                    test = ctx.split("::", 1)[0]
+                    if test and test != ctx:
+                        out.setdefault(test.replace(os.sep, "/"), set()).add(rel)
+    except Exception:
+        out = {}
+    _COVERAGE[str(root)] = (mtime, out)
+    return out
+
+
+def cache_key(root: Path, inputs: Iterable[str], command: str) -> str:
+    h = hashlib.blake2b(command.encode("utf-8"), digest_size=16)
+    for rel in sorted(set(inputs) | set(CONFIG_FILES)):
+        h.update(f"\0{rel}\0{digest(Path(root) / rel) or '-'}".encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass
+class ResultCache:
+    """One session's test-file results (lives on the registry)."""
+    passed: Dict[str, str] = field(default_factory=dict)        # rel -> key it passed with
+    seconds: Dict[str, float] = field(default_factory=dict)     # rel -> last recorded duration
+    pending: List[Tuple[str, Dict[str, str]]] = field(default_factory=list)  # (xml, keys) in background
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, outcomes: Dict[str, Tuple[bool, float]], keys: Dict[str, str]) -> None:
+        with self.lock:
+            for rel, (ok, secs) in outcomes.items():
+                self.seconds[rel] = secs
+                if ok and rel in keys:
+                    self.passed[rel] = keys[rel]
+                else:
+                    self.passed.pop(rel, None)
+
+    def harvest(self, current: Dict[str, str]) -> None:
+        """Fold finished background runs in, where the inputs haven't moved."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        still = []
+        for xml, keys in pending:
+            outcomes = read_junit(Path(xml), set(keys))
+            if outcomes is None:
+                still.append((xml, keys))
+                continue
+            self.record(outcomes, {r: k for r, k in keys.items() if current.get(r) == k})
+            try:
+                os.unlink(xml)
+            except OSError:
+                pass
+        with self.lock:
+            self.pending.extend(still)
+
+
+def read_junit(path: Path, tests: Set[str]) -> Optional[Dict[str, Tuple[bool, float]]]:
+    """{test file: (all cases passed or skipped, seconds)} from a junit XML
+    report, or None if it isn't there (yet) or doesn't parse."""
+    report = testreport.read([str(path)], tests)
+    return None if report is None else report.files
+
+
+@dataclass
+class Plan:
+    keys: Dict[str, str]          # every test file -> its current cache key
+    affected: List[str]           # stale files touching a changed file: run now
+    rest: List[str]               # stale files the change doesn't reach
+    cached: List[str]             # passed earlier with identical inputs
+    changed: List[str]            # changed project files (rel)
+
+
+def plan(root: Path, files: List[str], changed_abs: Iterable[str], cache: ResultCache,
+         command: str) -> Plan:
+    """Split the project's test files for an impacted run. `files` is every
+    file under root (rel, os.sep-separated); `changed_abs` the absolute paths
+    changed at the current marker (empty: every stale file counts as affected)."""
+    rels = sorted(f.replace(os.sep, "/") for f in files)
+    py = [r for r in rels if r.endswith(".py")]
+    graph = graph_for(root)
+    graph.refresh(py)
+    cov = coverage_inputs(root)
+    base = str(Path(root).resolve())
+    changed = set()
+    for p in changed_abs:
+        try:
+            rel = os.path.relpath(str(Path(p).resolve()), base).replace(os.sep, "/")
+        except ValueError:
+            continue
+        if not rel.startswith("../"):
+            changed.add(rel)
+    keys, affected, rest, cached = {}, [], [], []
+    for test in (r for r in py if is_test_file(r)):
+        inputs = graph.closure(test) | cov.get(test, set())
+        keys[test] = cache_key(root, inputs, command)
+        with cache.lock:
+            hit = cache.passed.get(test) == keys[test]
+        if hit:
+            cached.append(test)
+        elif not changed or inputs & changed:
+            affected.append(test)
+        else:
+            rest.append(test)
+    return Plan(keys, affected, rest, cached, sorted(changed))
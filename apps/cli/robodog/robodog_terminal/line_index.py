@@ -0,0 +1,142 @@
+# file: robodog_terminal/line_index.py
+"""
+Windowed reads of very large text files for `read_file`.
+
+read_file used to read_text() + splitlines() the whole file before slicing
+by offset/limit — 200 lines of a 500 MB log cost a full decode and a list of
+every line. For files of ROBODOG_READ_INDEX_MIN_KB (default 1024) or more,
+read_file comes here instead:
+
+  - a sparse line index per file: the file is mmapped and, per _CHUNK bytes,
+    the number of newlines before that chunk is recorded (bytes.count over
+    each chunk runs in C, so a 500 MB scan is a fraction of a second and the
+    index is a few KB). Indexes are cached by path and dropped when mtime or
+    size changes;
+  - a window seeks to the chunk holding its first line, finds the exact
+    line start within that one chunk, and decodes only the requested lines;
+  - a negative offset counts from the end (a tail of a log never touches
+    the head), using the total line count the index already has;
+  - with `max_chars`, one line longer than that (a minified bundle is often
+    a single line) is sliced in bytes before it's decoded, not decoded
+    whole and then cut.
+
+Lines are split on \\n (a trailing \\r is dropped), the way logs and bundles
+are written; small files keep read_file's splitlines() path.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+_CHUNK = 1 << 20
+_DEFAULT_MIN_KB = 1024
+_MAX_INDEXES = 32
+
+
+def min_bytes() -> int:
+    try:
+        return int(float(os.environ.get("ROBODOG_READ_INDEX_MIN_KB") or _DEFAULT_MIN_KB) * 1024)
+    except ValueError:
+        return _DEFAULT_MIN_KB * 1024
+
+
+class LineIndex:
+    """Newline counts at every _CHUNK boundary of one file version."""
+
+    def __init__(self, mtime_ns: int, size: int, before: array, lines: int):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.before = before        # before[c] = newlines in bytes [0, c * _CHUNK)
+        self.lines = lines          # splitlines()-style count: a final partial line counts
+
+    @classmethod
+    def build(cls, mm, mtime_ns: int, size: int) -> "LineIndex":
+        before = array("Q", [0])
+        total = 0
+        for start in range(0, size, _CHUNK):
+            total += mm[start:start + _CHUNK].count(b"\n")
+            before.append(total)
+        lines = total + (1 if size and mm[size - 1:size] != b"\n" else 0)
+        return cls(mtime_ns, size, before, lines)
+
+    def line_start(self, mm, n: int) -> int:
+        """Byte offset where 0-based line `n` begins."""
+        if n <= 0:
+            return 0
+        # The last chunk that starts with fewer than n newlines behind it
+        # holds the n-th newline.
+        lo, hi = 0, len(self.before) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.before[mid] < n:
+                lo = mid
+            else:
+                hi = mid - 1
+        pos, seen = lo * _CHUNK, self.before[lo]
+        while seen < n:
+            nl = mm.find(b"\n", pos)
+            if nl < 0:
+                return self.size
+            pos, seen = nl + 1, seen + 1
+        return pos
+
+
+_CACHE: "OrderedDict[str, LineIndex]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _index_for(path: str, mm, st) -> LineIndex:
+    with _LOCK:
+        idx = _CACHE.get(path)
+        if idx is not None and idx.mtime_ns == st.st_mtime_ns and idx.size == st.st_size:
+            _CACHE.move_to_end(path)
+            return idx
+    idx = LineIndex.build(mm, st.st_mtime_ns, st.st_size)
+    with _LOCK:
+        _CACHE[path] = idx
+        _CACHE.move_to_end(path)
+        while len(_CACHE) > _MAX_INDEXES:
+            _CACHE.popitem(last=False)
+    return idx
+
+
+def read_window(path, offset: int, limit: Optional[int],
+                max_chars: Optional[int] = None) -> Tuple[int, List[str], int]:
+    """Lines [offset, offset + limit) of `path` (offset < 0 = from the end;
+    limit None = to the end, or until `max_chars` characters; a line longer
+    than `max_chars` comes back cut, with a note). Returns (0-based first
+    line, the lines, total line count); an offset at or past the end gives
+    no lines, so the caller can tell it from an empty file by the count."""
+    with open(path, "rb") as fh:
+        st = os.fstat(fh.fileno())
+        if st.st_size == 0:
+            return 0, [], 0
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            idx = _index_for(str(path), mm, st)
+            first = max(0, idx.lines + offset) if offset < 0 else min(offset, idx.lines)
+            pos = idx.line_start(mm, first)
+            out: List[str] = []
+            used = 0
+            while pos < idx.size and (limit is None or len(out) < limit):
+                nl = mm.find(b"\n", pos)
+                end = idx.size if nl < 0 else nl
+                cut = end if max_chars is None else min(end, pos + 4 * max_chars)
+                while pos < cut < end and mm[cut] & 0xC0 == 0x80:
+                    cut -= 1                  # not inside a UTF-8 sequence
+                line = mm[pos:cut].decode("utf-8", errors="replace")
+                if max_chars is not None and (cut < end or len(line) > max_chars):
+                    line = line[:max_chars]
+                    rest = end - pos - len(line.encode("utf-8", "replace"))
+                    line += f" … [{rest} more bytes on this line]"
+                elif line.endswith("\r"):
+                    line = line[:-1]
+                out.append(line)
+                pos = end + 1
+                used += len(line) + 1
+                if limit is None and max_chars is not None and used >= max_chars:
+                    break
+            return first, out, idx.lines
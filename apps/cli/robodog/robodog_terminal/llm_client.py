@@ -9,19 +9,35 @@ Tool-calling is done in the loop via prompting (see loop.py / toolcall.py).
 Backends:
   - EchoClient : offline/dev mock (scriptable) — default when no the gateway config.
   - GatewayClient : real runPixel gateway endpoint (Basic auth, form-urlencoded).
-  - (OpenAI-compatible backend can be added later by reusing service.client.)
+  - OpenAICompatClient : /chat/completions (OpenRouter, OpenAI, LiteLLM…).
+
+`complete_stream()` is the streaming twin of `complete()`: SSE on
+OpenAI-compatible endpoints, a chunked replay of one ordinary completion
+everywhere else (the gateway has no streaming wire format).
+
+Both HTTP backends send through one shared, pooled keep-alive session
+(transport.shared_session) so concurrent subagents reuse warm connections.
+
+`complete_chat()` takes a real multi-message array (the loop's cache-aware
+mode); OpenAI-compatible endpoints send it as-is, with prompt-cache
+breakpoints where the provider honors them, and everything else flattens it
+back into one prompt.
 """
 from __future__ import annotations
 
+import json
 import logging
 import os
 import re
 import threading
 import time
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from typing import Callable, List, Optional, Union
 from urllib.parse import quote_plus
 
+from .transport import shared_session
+
 logger = logging.getLogger(__name__)
 
 # Cap concurrent OpenAI-compat calls across ALL loops — parallel subagents share
@@ -30,9 +46,13 @@ logger = logging.getLogger(__name__)
 # ReadTimeouts under it. So: explicit ROBODOG_LLM_MAX_CONCURRENCY wins; else a
 # CUSTOM gateway (a ROBODOG_LLM_URL that isn't a known fast host) gets a
 # conservative default so it works out of the box; known providers stay uncapped.
-_OPENAI_SEM = None
-_OPENAI_SEM_N = None
-_OPENAI_SEM_LOCK = threading.Lock()
+# The cap is ADAPTIVE (AdaptiveLimiter): a custom gateway starts at the default
+# and grows while calls succeed quickly, up to _ADAPTIVE_CEILING; an explicit
+# cap is the ceiling itself. Overload (429/5xx/timeouts/Retry-After) halves it.
+_OPENAI_LIMITER = None
+_OPENAI_LIMITER_KEY = None
+_OPENAI_LIMITER_LOCK = threading.Lock()
+_ADAPTIVE_CEILING = 16
 
 # Hosts known to handle heavy concurrency — everything else is a "custom gateway".
 _FAST_HOSTS = ("openrouter.ai", "api.openai.com", "api.groq.com",
@@ -41,6 +61,49 @@ _FAST_HOSTS = ("openrouter.ai", "api.openai.com", "api.groq.com",
 _DEFAULT_CUSTOM_CONCURRENCY = 2
 
 
+# A caller that stops wanting a reply (a hedge that lost its race, see
+# hedging.py) sets the Event its thread registered with cancellable(); the
+# call gives up at its next safe point — queued for a limiter slot, or
+# between retries — instead of holding a slot through every retry.
+_CALL = threading.local()
+
+
+class CallCancelled(RuntimeError):
+    """A model call abandoned by its caller before it finished."""
+
+
+@contextmanager
+def cancellable(event: threading.Event):
+    """Model calls made on this thread inside the block stop early once
+    `event` is set, raising CallCancelled."""
+    prev = getattr(_CALL, "cancel", None)
+    _CALL.cancel = event
+    try:
+        yield
+    finally:
+        _CALL.cancel = prev
+
+
+def current_cancel_event() -> Optional[threading.Event]:
+    """The event of the innermost cancellable() block on this thread, if any."""
+    return getattr(_CALL, "cancel", None)
+
+
+def _check_cancelled() -> None:
+    event = getattr(_CALL, "cancel", None)
+    if event is not None and event.is_set():
+        raise CallCancelled("model call cancelled by its caller")
+
+
+def _retry_sleep(delay: float) -> None:
+    """time.sleep(delay), cut short (CallCancelled) by the thread's cancel event."""
+    event = getattr(_CALL, "cancel", None)
+    if event is None:
+        time.sleep(delay)
+    elif event.wait(delay):
+        raise CallCancelled("model call cancelled by its caller")
+
+
 _DEFAULT_TIMEOUT = 120.0
 _DEFAULT_CUSTOM_TIMEOUT = 300.0   # custom gateways are slower; give big prompts room
 
@@ -79,17 +142,109 @@ def _effective_timeout(url: Optional[str] = None) -> float:
     return _DEFAULT_CUSTOM_TIMEOUT if _is_custom_gateway(probe) else _DEFAULT_TIMEOUT
 
 
-def _openai_semaphore():
-    """Shared BoundedSemaphore sized by the effective cap, or None (no cap)."""
-    global _OPENAI_SEM, _OPENAI_SEM_N
+class AdaptiveLimiter:
+    """Process-wide AIMD concurrency limit for model calls.
+
+    acquire() blocks while `inflight` is at the current limit and returns a
+    start time to hand back to release(). A success that arrives while the
+    limiter was saturated adds 1/limit (about +1 per round of calls) — unless
+    it was much slower than the smoothed latency, which means the backend is
+    already queueing. overload() (429, 5xx, a timeout, a Retry-After ask)
+    halves the limit, at most once per cooldown so one burst of failures
+    counts as one signal. The limit stays within [floor, ceiling].
+    """
+
+    def __init__(self, initial: int, ceiling: int, floor: int = 1):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = float(min(max(initial, self.floor), self.ceiling))
+        self.inflight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.cuts = 0
+        self.calls = 0
+        self.low = self.high = int(self.limit)
+        self._latency: Optional[float] = None     # EWMA of successful calls
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        cancel = getattr(_CALL, "cancel", None)
+        with self._cond:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                while self.inflight >= int(self.limit):
+                    if cancel is None:
+                        self._cond.wait()
+                        continue
+                    _check_cancelled()
+                    self._cond.wait(0.05)      # a cancel doesn't notify
+                _check_cancelled()
+            finally:
+                self.queued -= 1
+            self.inflight += 1
+            self.calls += 1
+            return time.monotonic()
+
+    def release(self, started: float, ok: bool = True) -> None:
+        latency = time.monotonic() - started
+        with self._cond:
+            saturated = self.inflight >= int(self.limit)
+            self.inflight -= 1
+            if ok:
+                slow = self._latency is not None and latency > 2 * self._latency
+                self._latency = (latency if self._latency is None
+                                 else 0.8 * self._latency + 0.2 * latency)
+                if saturated and not slow:
+                    self.limit = min(self.ceiling, self.limit + 1.0 / self.limit)
+                    self.high = max(self.high, int(self.limit))
+            self._cond.notify_all()
+
+    def overload(self) -> None:
+        now = time.monotonic()
+        with self._cond:
+            cooldown = max(1.0, self._latency or 0.0)
+            if now - self._last_cut < cooldown:
+                return
+            self._last_cut = now
+            self.limit = max(float(self.floor), self.limit / 2)
+            self.low = min(self.low, int(self.limit))
+            self.cuts += 1
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {"limit": int(self.limit), "inflight": self.inflight,
+                    "queued": self.queued, "peak_queued": self.peak_queued,
+                    "low": self.low, "high": self.high, "cuts": self.cuts,
+                    "ceiling": self.ceiling}
+
+
+def _openai_limiter() -> Optional[AdaptiveLimiter]:
+    """Shared AdaptiveLimiter for the effective cap, or None (no cap). Rebuilt
+    only when the cap settings change."""
+    global _OPENAI_LIMITER, _OPENAI_LIMITER_KEY
     n = _effective_max_concurrency()
     if n <= 0:
         return None
-    with _OPENAI_SEM_LOCK:
-        if _OPENAI_SEM is None or _OPENAI_SEM_N != n:
-            _OPENAI_SEM = threading.BoundedSemaphore(n)
-            _OPENAI_SEM_N = n
-        return _OPENAI_SEM
+    explicit = bool(os.environ.get("ROBODOG_LLM_MAX_CONCURRENCY"))
+    key = (n, explicit)
+    with _OPENAI_LIMITER_LOCK:
+        if _OPENAI_LIMITER is None or _OPENAI_LIMITER_KEY != key:
+            _OPENAI_LIMITER = AdaptiveLimiter(
+                n, n if explicit else max(n, _ADAPTIVE_CEILING))
+            _OPENAI_LIMITER_KEY = key
+        return _OPENAI_LIMITER
+
+
+def concurrency_snapshot() -> Optional[dict]:
+    """Current limit / inflight / queue depth of the model-call limiter in
+    use (OpenAI-compatible, else the gateway's), or None when uncapped."""
+    with _OPENAI_LIMITER_LOCK:
+        lim = _OPENAI_LIMITER
+    if lim is None and _GATEWAY_LIMITER.calls:
+        lim = _GATEWAY_LIMITER
+    return lim.snapshot() if lim is not None else None
 
 
 def _model_mismatch_hint(url: str, model: str) -> str:
@@ -214,8 +369,9 @@ def clean_text(s):
     return "".join(c for c in s if not 0xD800 <= ord(c) <= 0xDFFF)
 
 # Cap concurrent the gateway calls across ALL loops (foreground + background agents).
-# Internal gateway with unknown rate limits — stay conservative.
-_GATEWAY_SEMAPHORE = threading.Semaphore(2)
+# Internal gateway with unknown rate limits — start conservative and let the
+# AIMD limiter find what it actually sustains.
+_GATEWAY_LIMITER = AdaptiveLimiter(2, 8)
 
 
 @dataclass
@@ -229,6 +385,9 @@ class Completion:
     # "length" means the model was CUT OFF at max_tokens — the text may end
     # mid-tool-call and must not be treated as a finished answer.
     finish_reason: str = ""
+    # Prompt tokens the provider served from its prompt cache (a subset of
+    # prompt_tokens) — 0 when unknown or nothing was cached.
+    cached_tokens: int = 0
 
     @property
     def total_tokens(self) -> int:
@@ -239,10 +398,57 @@ class Completion:
         return self.finish_reason == "length"
 
 
+def _usage_cached_tokens(usage: Optional[dict]) -> int:
+    """Cached prompt tokens from a usage block: OpenAI/OpenRouter report
+    `prompt_tokens_details.cached_tokens`; Anthropic-shaped proxies pass
+    through `cache_read_input_tokens`."""
+    if not usage:
+        return 0
+    details = usage.get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or usage.get("cache_read_input_tokens") or 0)
+
+
+def _replay_chunks(text: str, on_delta: Optional[Callable[[str], None]]) -> None:
+    if on_delta is not None:
+        text = text or ""
+        for i in range(0, len(text), _STREAM_FALLBACK_CHUNK):
+            on_delta(text[i:i + _STREAM_FALLBACK_CHUNK])
+
+
+def flatten_messages(messages: List[dict]):
+    """(context, prompt) for a chat message array on a prompt-in backend: system
+    messages become the context, the rest the loop's USER:/ASSISTANT: transcript
+    layout. Content may be a string or a list of text parts."""
+    def _text(content) -> str:
+        if isinstance(content, list):
+            return "\n\n".join(p.get("text", "") for p in content if isinstance(p, dict))
+        return content or ""
+    system, convo = [], []
+    for m in messages:
+        role, text = m.get("role"), _text(m.get("content"))
+        if role == "system":
+            system.append(text)
+        elif role == "assistant":
+            convo.append(f"ASSISTANT: {text}")
+        else:
+            convo.append(f"USER: {text}")
+    convo.append("ASSISTANT:")
+    return "\n\n".join(system), "\n\n".join(convo)
+
+
+# Chunk size for the non-streaming fallback of complete_stream() — small
+# enough that a caller scanning deltas for a closing </tool> tag sees each
+# block close in its own step, as it would on a real SSE stream.
+_STREAM_FALLBACK_CHUNK = 256
+
+
 class LLMClient:
     """Abstract base. Implementations must provide `complete`."""
 
     name: str = "base"
+    # True when complete_chat() sends a real message array (so a stable message
+    # prefix can hit a provider prompt cache); False means it flattens.
+    supports_messages: bool = False
 
     def complete(
         self,
@@ -253,6 +459,45 @@ class LLMClient:
     ) -> Completion:
         raise NotImplementedError
 
+    def complete_stream(
+        self,
+        prompt: str,
+        context: str = "",
+        max_tokens: int = 8192,
+        temperature: float = 0.3,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> Completion:
+        """Streaming variant of complete(): `on_delta(text)` receives each piece
+        of the reply as it arrives, and the full Completion is still returned
+        at the end. This base version is the chunked fallback for backends
+        with no streaming wire format (the gateway, the echo mock): one
+        ordinary complete() call, replayed through on_delta in fixed-size
+        chunks, so a caller written against complete_stream works everywhere."""
+        completion = self.complete(prompt, context=context, max_tokens=max_tokens,
+                                   temperature=temperature)
+        _replay_chunks(completion.text, on_delta)
+        return completion
+
+    def complete_chat(
+        self,
+        messages: List[dict],
+        max_tokens: int = 8192,
+        temperature: float = 0.3,
+        on_delta: Optional[Callable[[str], None]] = None,
+        cache_breakpoints=(),
+    ) -> Completion:
+        """Complete a chat message array ({"role", "content"} dicts). This base
+        version flattens it into one prompt (see flatten_messages) for
+        backends that only take prompt + context; `cache_breakpoints` (indices
+        into `messages` worth caching up to) is meaningless there and ignored.
+        Streams through complete_stream() when `on_delta` is given."""
+        context, prompt = flatten_messages(messages)
+        if on_delta is not None:
+            return self.complete_stream(prompt, context=context, max_tokens=max_tokens,
+                                        temperature=temperature, on_delta=on_delta)
+        return self.complete(prompt, context=context, max_tokens=max_tokens,
+                             temperature=temperature)
+
 
 class EchoClient(LLMClient):
     """
@@ -346,9 +591,8 @@ class GatewayClient(LLMClient):
         self.on_retry = on_retry or (
             lambda a, m, d, r: logger.warning("the gateway retry %d/%d in %.0fs: %s", a, m, d, r)
         )
-        # requests is a robodog dependency already
-        import requests  # noqa: WPS433 (local import keeps module import cheap)
-        self._session = session or requests.Session()
+        # Shared, pooled keep-alive session (transport.py) unless one is injected.
+        self._session = session or shared_session()
 
     @staticmethod
     def _encode_command(prompt: str) -> str:
@@ -394,14 +638,17 @@ class GatewayClient(LLMClient):
             if attempt < self.max_attempts:
                 delay = _backoff_delay(attempt)   # jittered exponential backoff
                 self.on_retry(attempt, self.max_attempts, delay, last_err)
-                time.sleep(delay)
+                _retry_sleep(delay)
         raise RuntimeError(
             f"the gateway failed after {self.max_attempts} attempts: {last_err}")
 
     def _complete_once(self, prompt, context, max_tokens, temperature) -> Completion:
         expression = self._build_expression(prompt, context, max_tokens, temperature)
         body = "expression=" + quote_plus(expression) + "&tz=" + quote_plus(self.tz)
-        with _GATEWAY_SEMAPHORE:
+        import requests as _rq
+        started = _GATEWAY_LIMITER.acquire()
+        ok = False
+        try:
             resp = self._session.post(
                 self.endpoint,
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -409,6 +656,14 @@ class GatewayClient(LLMClient):
                 auth=(self.access_key, self.secret_key),
                 timeout=self.timeout,
             )
+            ok = resp.status_code == 200
+            if resp.status_code >= 500 or resp.status_code == 429:
+                _GATEWAY_LIMITER.overload()
+        except _rq.ReadTimeout:
+            _GATEWAY_LIMITER.overload()
+            raise
+        finally:
+            _GATEWAY_LIMITER.release(started, ok)
         if resp.status_code != 200:
             retryable = resp.status_code >= 500 or resp.status_code == 429
             raise _GatewayHTTPError(
@@ -442,6 +697,7 @@ class OpenAICompatClient(LLMClient):
     """
 
     name = "openai-compat"
+    supports_messages = True
 
     def __init__(self, base_url: str, api_key: str, model: str,
                  referer: str = "https://adourish.github.io",
@@ -468,24 +724,71 @@ class OpenAICompatClient(LLMClient):
         self.max_attempts = max_attempts
         self.on_retry = on_retry or (
             lambda a, m, d, r: logger.warning("LLM retry %d/%d in %.0fs: %s", a, m, d, r))
-        import requests
-        self._session = session or requests.Session()
+        # Anthropic models (direct, or routed through OpenRouter/LiteLLM) only
+        # cache a prompt prefix at explicit cache_control breakpoints; OpenAI
+        # and most others cache automatically. ROBODOG_CACHE_CONTROL=1/0
+        # overrides the guess for a proxy that hides the model family.
+        raw = os.environ.get("ROBODOG_CACHE_CONTROL", "").lower()
+        if raw in ("1", "true", "yes", "0", "false", "no"):
+            self.use_cache_control = raw in ("1", "true", "yes")
+        else:
+            probe = (self.url + " " + self.model).lower()
+            self.use_cache_control = "anthropic" in probe or "claude" in probe
+        self._session = session or shared_session()
 
-    def complete(self, prompt, context="", max_tokens=8192, temperature=0.3) -> Completion:
-        prompt, context = clean_text(prompt), clean_text(context)
-        import requests as _rq
+    def _payload(self, messages: List[dict], max_tokens: int, temperature: float) -> dict:
+        return {"model": self.model, "messages": messages,
+                "max_tokens": max_tokens, "temperature": temperature}
+
+    @staticmethod
+    def _prompt_messages(prompt: str, context: str) -> List[dict]:
         messages = []
         if context:
             messages.append({"role": "system", "content": context})
         messages.append({"role": "user", "content": prompt})
-        payload = {"model": self.model, "messages": messages,
-                   "max_tokens": max_tokens, "temperature": temperature}
+        return messages
+
+    def complete(self, prompt, context="", max_tokens=8192, temperature=0.3) -> Completion:
+        prompt, context = clean_text(prompt), clean_text(context)
+        return self._complete_payload(
+            self._payload(self._prompt_messages(prompt, context), max_tokens, temperature))
+
+    def complete_chat(self, messages, max_tokens=8192, temperature=0.3, on_delta=None,
+                      cache_breakpoints=()) -> Completion:
+        """Send `messages` as a real chat array. Each index in
+        `cache_breakpoints` gets an Anthropic-style `cache_control` marker when
+        this endpoint honors them (see use_cache_control). OpenAI-style
+        providers cache a long stable prefix on their own, and some reject
+        unknown content fields, so they get the plain array."""
+        out = []
+        marks = set(cache_breakpoints) if self.use_cache_control else set()
+        for i, m in enumerate(messages):
+            content = m.get("content")
+            if isinstance(content, list):
+                content = [dict(part, text=clean_text(part.get("text", "")))
+                           for part in content]
+            else:
+                content = clean_text(content or "")
+            if i in marks:
+                if not isinstance(content, list):
+                    content = [{"type": "text", "text": content}]
+                content[-1] = dict(content[-1], cache_control={"type": "ephemeral"})
+            out.append({"role": m.get("role", "user"), "content": content})
+        payload = self._payload(out, max_tokens, temperature)
+        if on_delta is not None:
+            return self._stream_payload(payload, on_delta)
+        return self._complete_payload(payload)
+
+    def _complete_payload(self, payload: dict) -> Completion:
+        import requests as _rq
+        max_tokens = payload["max_tokens"]
         # Serialize against the shared cap (if set) so a parallel subagent
         # fan-out doesn't overwhelm a slow gateway. Held across retries so a
-        # struggling call doesn't multiply concurrent load.
-        sem = _openai_semaphore()
-        if sem is not None:
-            sem.acquire()
+        # struggling call doesn't multiply concurrent load; every overload
+        # signal along the way lowers the limit for everyone else.
+        lim = _openai_limiter()
+        started = lim.acquire() if lim is not None else None
+        ok = False
         try:
             last_err = "unknown"
             for attempt in range(1, self.max_attempts + 1):
@@ -503,21 +806,13 @@ class OpenAICompatClient(LLMClient):
                         # A 200 with a garbled/missing body (proxy hiccup, SSE where
                         # JSON was expected) must be RETRIED, not crash the turn.
                         try:
-                            data = resp.json()
-                            choice = (data.get("choices") or [{}])[0]
-                            msg = choice.get("message") or {}
-                            text = msg.get("content") or ""
-                            usage = data.get("usage") or {}
-                        except (ValueError, TypeError, KeyError, IndexError):
+                            completion = self._parse_json_body(resp.json())
+                        except (ValueError, TypeError, KeyError, IndexError, AttributeError):
                             last_err = "malformed 200 response (unparseable body)"
-                            text = ""
-                        if text and text.strip():
-                            return Completion(
-                                text=text,
-                                prompt_tokens=usage.get("prompt_tokens", 0),
-                                completion_tokens=usage.get("completion_tokens", 0),
-                                raw=data,
-                                finish_reason=(choice.get("finish_reason") or ""))
+                            completion = None
+                        if completion is not None and completion.text.strip():
+                            ok = True
+                            return completion
                         if not last_err.startswith("malformed"):
                             last_err = "empty response"
                     elif resp.status_code == 402:
@@ -546,6 +841,8 @@ class OpenAICompatClient(LLMClient):
                         # Honor the server's backoff ask on rate-limit / overload.
                         retry_after = _parse_retry_after(
                             resp.headers.get("Retry-After"))
+                        if lim is not None:
+                            lim.overload()
                     else:
                         hint = _http_error_hint(resp.status_code, self.url, self.model, resp.text)
                         raise RuntimeError(f"LLM HTTP {resp.status_code}: {resp.text[:300]}{hint}")
@@ -553,6 +850,8 @@ class OpenAICompatClient(LLMClient):
                     last_err = ("connect timeout (>10s to reach the host — VPN down, "
                                 "wrong URL, or the gateway is unreachable)")
                 except _rq.ReadTimeout:
+                    if lim is not None:
+                        lim.overload()
                     last_err = (f"read timeout after {self.timeout:.0f}s (the gateway "
                                 "accepted the request but didn't answer in time — it's "
                                 "slow/overloaded, or the prompt is large. Raise "
@@ -564,11 +863,133 @@ class OpenAICompatClient(LLMClient):
                 if attempt < self.max_attempts:
                     delay = _backoff_delay(attempt, retry_after)
                     self.on_retry(attempt, self.max_attempts, delay, last_err)
-                    time.sleep(delay)
+                    _retry_sleep(delay)
             raise RuntimeError(f"LLM failed after {self.max_attempts} attempts: {last_err}")
         finally:
-            if sem is not None:
-                sem.release()
+            if lim is not None:
+                lim.release(started, ok)
+
+    @staticmethod
+    def _parse_json_body(data: dict) -> Completion:
+        """Completion from a non-streamed /chat/completions JSON body."""
+        choice = (data.get("choices") or [{}])[0]
+        msg = choice.get("message") or {}
+        usage = data.get("usage") or {}
+        return Completion(
+            text=msg.get("content") or "",
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            raw=data,
+            finish_reason=(choice.get("finish_reason") or ""),
+            cached_tokens=_usage_cached_tokens(usage))
+
+    def complete_stream(self, prompt, context="", max_tokens=8192, temperature=0.3,
+                        on_delta=None) -> Completion:
+        prompt, context = clean_text(prompt), clean_text(context)
+        return self._stream_payload(
+            self._payload(self._prompt_messages(prompt, context), max_tokens, temperature),
+            on_delta)
+
+    def _stream_payload(self, payload: dict, on_delta) -> Completion:
+        """SSE streaming (`"stream": true`). One streamed attempt; anything short
+        of a clean stream that hasn't emitted a delta yet (non-200, a network
+        error before the first byte, a proxy that answered with plain JSON)
+        falls back to the non-streaming path, which owns the retry/backoff,
+        Retry-After, 402-shrink and error-hint logic. A stream that breaks
+        AFTER deltas went out raises instead — replaying the whole reply on top
+        of a half-delivered one would hand the caller duplicated text."""
+        import requests as _rq
+        stream_payload = dict(payload, stream=True,
+                              stream_options={"include_usage": True})
+        emitted = [0]
+
+        def _emit(piece: str) -> None:
+            emitted[0] += len(piece)
+            if on_delta is not None:
+                on_delta(piece)
+
+        lim = _openai_limiter()
+        started = lim.acquire() if lim is not None else None
+        ok = False
+        resp = None
+        try:
+            try:
+                resp = self._session.post(
+                    self.url, json=stream_payload, timeout=(10, self.timeout), stream=True,
+                    headers={"Authorization": f"Bearer {self.api_key}",
+                             "HTTP-Referer": self.referer,
+                             "Accept": "text/event-stream"})
+            except (_rq.ConnectionError, _rq.Timeout) as exc:
+                if lim is not None and isinstance(exc, _rq.ReadTimeout):
+                    lim.overload()
+                resp = None
+            if lim is not None and resp is not None and (
+                    resp.status_code == 429 or resp.status_code >= 500):
+                lim.overload()
+            if resp is not None and resp.status_code == 200:
+                try:
+                    completion = self._consume_stream(resp, _emit)
+                except (_rq.ConnectionError, _rq.Timeout, ValueError) as exc:
+                    if emitted[0]:
+                        raise RuntimeError(
+                            f"LLM stream interrupted after {emitted[0]} chars "
+                            f"({type(exc).__name__})") from exc
+                    completion = None
+                if completion is not None and completion.text.strip():
+                    ok = True
+                    return completion
+                if emitted[0]:
+                    raise RuntimeError("LLM stream ended without content")
+        finally:
+            if resp is not None:
+                resp.close()        # an unread stream would hold its connection
+            if lim is not None:
+                lim.release(started, ok)
+        completion = self._complete_payload(payload)
+        _replay_chunks(completion.text, on_delta)
+        return completion
+
+    def _consume_stream(self, resp, emit: Callable[[str], None]) -> Optional[Completion]:
+        """Read an SSE body (`data: {json}` lines, ended by `data: [DONE]`),
+        emitting each content delta. A server that ignored `stream` and sent a
+        plain JSON body is handled too. Returns None for an unusable body."""
+        ctype = str((getattr(resp, "headers", None) or {}).get("content-type", "")).lower()
+        if "event-stream" not in ctype:
+            completion = self._parse_json_body(resp.json())
+            if completion.text:
+                emit(completion.text)
+            return completion
+        if getattr(resp, "encoding", None) is None:
+            resp.encoding = "utf-8"   # SSE is UTF-8 by spec
+        parts: List[str] = []
+        finish = ""
+        usage: dict = {}
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue    # blank separators, ": keep-alive" comments, event: lines
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                event = json.loads(data)
+            except ValueError:
+                continue
+            if event.get("usage"):
+                usage = event["usage"]
+            for choice in event.get("choices") or []:
+                piece = (choice.get("delta") or {}).get("content") or ""
+                if piece:
+                    parts.append(piece)
+                    emit(piece)
+                if choice.get("finish_reason"):
+                    finish = choice["finish_reason"]
+        return Completion(
+            text="".join(parts),
+            prompt_tokens=usage.get("prompt_tokens", 0) or 0,
+            completion_tokens=usage.get("completion_tokens", 0) or 0,
+            raw={"usage": usage} if usage else None,
+            finish_reason=finish,
+            cached_tokens=_usage_cached_tokens(usage))
 
     def diagnose(self, prompt: str = "ping", max_tokens: int = 5) -> dict:
         """One-shot TIMED probe for /test — no retries. Returns a dict with
@@ -8,15 +8,32 @@ Because the gateway has no native tool API, this is a prompted tool-calling loop
   3. ask the model to complete
   4. parse <tool> blocks from the text; if any, execute and append results
   5. repeat until the model returns a message with no tool blocks (final answer)
+
+With `stream_tools` on, step 3 streams (LLMClient.complete_stream) and
+parallel-safe calls start the moment their closing </tool> tag arrives,
+instead of after the whole reply has been generated.
+
+With `prompt_cache` on (and a client whose complete_chat sends real message
+arrays), step 2 builds a prefix-stable chat array instead — system catalog
+first, turns in order, cache breakpoints on the stable prefix — and trimming
+is batched so that prefix only changes at coarse boundaries.
+
+With `background_compaction` on, older turns are summarized speculatively on
+a worker thread once the transcript passes a soft watermark, and the summary
+is swapped in between iterations (see _BackgroundCompactor).
 """
 from __future__ import annotations
 
 import logging
+import re
+import threading
 from dataclasses import dataclass, field
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional
 
-from .llm_client import LLMClient, Completion
+from .llm_client import LLMClient, Completion, cancellable
+from .tokens import get_tokenizer, turn_tokens
 from .tools import ToolRegistry
+from .transport import summarize_timings, take_timings
 from .toolcall import (parse_tool_calls, has_unclosed_tool_call,
                        looks_like_attempted_tool)
 
@@ -40,6 +57,120 @@ class Turn:
     role: str          # "user" | "assistant" | "tool"
     content: str
     tool_name: str = ""
+    # (content, tokenizer, count) memo for tokens.turn_tokens — never persisted.
+    _tokens: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+
+def _render_turn(t: Turn) -> Optional[str]:
+    """One turn's transcript segment (None for a role the prompt doesn't show)."""
+    if t.role == "user":
+        return f"USER: {t.content}"
+    if t.role == "assistant":
+        return f"ASSISTANT: {t.content}"
+    if t.role == "tool":
+        return f"TOOL RESULT [{t.tool_name}]:\n{t.content}"
+    return None
+
+
+class _RenderedTranscript:
+    """Append-only rendered transcript: cached per-turn segments and a running
+    char total, kept in step with AgentLoop.history.
+
+    Re-joining the whole history every iteration was a few hundred MB of
+    string churn per user message on a 450k-char session (25 iterations, each
+    re-formatting every turn into a fresh copy and re-summing every len()).
+    Here each turn is formatted once; its segment is reused for as long as the
+    SAME Turn object still holds the SAME content object, so:
+      * appends (the normal case) format only the new turns, and the prompt is
+        a single join over the cached segments — one copy, not two;
+      * trim / compaction / /rewind / /clear — or anything else that rewrites
+        history in place (app.py mutates loop.history directly) — invalidate
+        from the first changed position only; intact turns after it (e.g. the
+        recent turns compaction keeps) reuse their segments.
+    Validation is identity checks over the turn list — O(turns), never
+    O(chars). The lock makes a mid-turn /btw render safe alongside the loop.
+    """
+
+    def __init__(self):
+        self._turns: List[Turn] = []
+        self._contents: List[str] = []   # content object each segment was built from
+        self._segs: List[Optional[str]] = []
+        self._cum: List[int] = []        # running sum of len(content) through each turn
+        self._nparts: List[int] = []     # len(_parts) through each turn
+        self._parts: List[str] = []      # the non-None segments, in order
+        self._lock = threading.Lock()
+
+    @property
+    def chars(self) -> int:
+        return self._cum[-1] if self._cum else 0
+
+    def sync(self, history: List[Turn]) -> None:
+        with self._lock:
+            self._sync(history)
+
+    def render(self, history: List[Turn], tail: str) -> str:
+        """The transcript joined with `tail` as its final segment."""
+        with self._lock:
+            self._sync(history)
+            parts = self._parts
+            parts.append(tail)
+            try:
+                return "\n\n".join(parts)
+            finally:
+                parts.pop()
+
+    def chat(self, history: List[Turn]) -> List[dict]:
+        """The transcript as chat messages: user turns and tool results (the
+        cached TOOL RESULT segments) go out as role "user", the model's own
+        turns as "assistant"; consecutive same-role turns are merged so roles
+        alternate, as Anthropic-style endpoints require. Earlier messages come
+        out byte-identical call to call until trim/compaction rewrites them."""
+        with self._lock:
+            self._sync(history)
+            out: List[dict] = []
+            for t, seg in zip(self._turns, self._segs):
+                if seg is None:
+                    continue
+                role = "assistant" if t.role == "assistant" else "user"
+                text = seg if t.role == "tool" else t.content
+                if out and out[-1]["role"] == role:
+                    out[-1]["content"] += "\n\n" + text
+                else:
+                    out.append({"role": role, "content": text})
+            return out
+
+    def _sync(self, history: List[Turn]) -> None:
+        turns, contents = self._turns, self._contents
+        n, h = len(turns), len(history)
+        i, lim = 0, min(n, h)
+        while i < lim and history[i] is turns[i] and history[i].content is contents[i]:
+            i += 1
+        if i == n == h:
+            return
+        if i < n:
+            # Segments past the first change stay reusable if their turn is
+            # intact (compaction keeps the recent turns as the same objects).
+            reuse = {id(turns[j]): (turns[j], contents[j], self._segs[j])
+                     for j in range(i, n)}
+            del self._parts[self._nparts[i - 1] if i else 0:]
+            for lst in (turns, contents, self._segs, self._cum, self._nparts):
+                del lst[i:]
+        else:
+            reuse = {}
+        parts = self._parts
+        cum = self._cum[-1] if self._cum else 0
+        for t in history[i:]:
+            content = t.content
+            hit = reuse.get(id(t))
+            seg = hit[2] if hit and hit[0] is t and hit[1] is content else _render_turn(t)
+            if seg is not None:
+                parts.append(seg)
+            cum += len(content)
+            turns.append(t)
+            contents.append(content)
+            self._segs.append(seg)
+            self._cum.append(cum)
+            self._nparts.append(len(parts))
 
 
 # Tools that are safe to run concurrently within one turn. Subagents (`agent`)
@@ -48,10 +179,22 @@ class Turn:
 # NOTE: this exact tool list is also named in tools.py's catalog() rule #7,
 # which tells the model it can batch these into one reply for a speed win —
 # keep the two in sync if this set changes.
-_PARALLEL_SAFE = {"agent", "task_output", "read_file", "glob", "grep",
+_PARALLEL_SAFE = {"agent", "task_output", "read_file", "read_many", "glob", "grep",
                   "list_dir", "ask_user"}
 
 
+def _call_parallel_safe(call) -> bool:
+    """True when one call may run concurrently with others: a _PARALLEL_SAFE
+    tool, and for `agent` only the read-only explore type (see below)."""
+    if call.name not in _PARALLEL_SAFE:
+        return False
+    if call.name == "agent":
+        agent_type = (call.args.get("type") or "explore").strip().lower()
+        if agent_type != "explore":
+            return False
+    return True
+
+
 def _batch_parallel_safe(registry, calls) -> bool:
     """True when a batch of >1 tool calls can be executed concurrently.
 
@@ -67,14 +210,275 @@ def _batch_parallel_safe(registry, calls) -> bool:
     """
     if len(calls) < 2:
         return False
-    for c in calls:
-        if c.name not in _PARALLEL_SAFE:
-            return False
-        if c.name == "agent":
-            agent_type = (c.args.get("type") or "explore").strip().lower()
-            if agent_type != "explore":
+    return all(_call_parallel_safe(c) for c in calls)
+
+
+# A delta that may have completed a tool block: a close tag, or the end of a
+# self-closing <tool …/>. Only then is the streamed text re-parsed.
+_BLOCK_END_RE = re.compile(r"</(?:tool|invoke)\s*>|/>", re.IGNORECASE)
+
+
+class _EarlyDispatcher:
+    """Starts parallel-safe tool calls while the model's reply is still
+    streaming (AgentLoop.stream_tools).
+
+    Fed each delta by complete_stream(). When a delta may have closed a tool
+    block, the text so far is parsed with the same parse_tool_calls() the loop
+    uses on the final reply (so <think>, fences and self-closing tags behave
+    identically) and every NEW call is submitted to a worker pool — but only
+    while all calls seen so far are parallel-safe. The first mutating call
+    closes the gate for the rest of the reply, so nothing ever runs ahead of
+    an edit it might depend on. `ask_user` is never started early: it would
+    prompt the user over the still-running model spinner.
+
+    claim() matches the started calls against the final parse (same index,
+    name and args); the loop then uses those futures instead of re-executing.
+    A call that stopped matching (e.g. a fence that closed later masked it)
+    is not claimed — it was read-only, so running it was harmless. Unclaimed
+    calls, and every call of a failed attempt, are abandoned: queued ones
+    never start, and each started one runs in a cancellable() block whose
+    event fires when it's abandoned or the loop's cancel_event is set — so
+    an `agent` subagent (and its model calls) stops instead of running on.
+    """
+
+    def __init__(self, registry, t0: float, cancel_event=None):
+        self._registry = registry
+        self._t0 = t0                  # LLM call start (monotonic)
+        self._cancel_event = cancel_event
+        self._pool = None
+        self.started: List[tuple] = []
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the text of a failed attempt (the loop-level retry streams
+        the reply again), abandoning the calls it started."""
+        self._abandon(self.started)
+        self._chunks: List[str] = []
+        self._tail = ""
+        self._seen = 0                 # calls parsed so far (started or not)
+        self._gate_closed = False
+        self.started = []              # (index, ToolCall, Future, abandon Event)
+        self.first_start_s: Optional[float] = None
+
+    def feed(self, delta: str) -> None:
+        self._chunks.append(delta)
+        probe = self._tail + delta
+        self._tail = probe[-16:]
+        if self._gate_closed or not _BLOCK_END_RE.search(probe):
+            return
+        text = "".join(self._chunks)
+        if text.count("```") % 2:
+            return   # inside an open fence: may be quoted example syntax
+        calls, _ = parse_tool_calls(text)
+        import time as _time
+        for idx in range(self._seen, len(calls)):
+            call = calls[idx]
+            if not _call_parallel_safe(call) or call.name == "ask_user":
+                self._gate_closed = True
+                break
+            if self._pool is None:
+                import concurrent.futures as _cf
+                self._pool = _cf.ThreadPoolExecutor(max_workers=8)
+            abandon = threading.Event()
+            fut = self._pool.submit(self._timed_exec, call, abandon)
+            self.started.append((idx, call, fut, abandon))
+            if self.first_start_s is None:
+                self.first_start_s = _time.monotonic() - self._t0
+            self._seen = idx + 1
+
+    def _timed_exec(self, call, abandon: threading.Event):
+        import time as _time
+        t0 = _time.monotonic()
+        with cancellable(_AnyEvent(abandon, self._cancel_event)):
+            r = self._registry.execute(call.name, call.args)
+        return r, _time.monotonic() - t0
+
+    @staticmethod
+    def _abandon(started) -> None:
+        for _idx, _call, fut, abandon in started:
+            fut.cancel()
+            abandon.set()
+
+    def claim(self, calls) -> Dict[int, object]:
+        """{index in `calls`: future} for started calls the final parse kept;
+        the rest are abandoned and the pool is shut down."""
+        out: Dict[int, object] = {}
+        for idx, call, fut, _abandon in self.started:
+            if (idx < len(calls) and calls[idx].name == call.name
+                    and calls[idx].args == call.args):
+                out[idx] = fut
+        self._abandon([s for s in self.started if s[0] not in out])
+        self._close(cancel_futures=not out)
+        return out
+
+    def close(self) -> None:
+        """Abandon every started call (the reply failed or was cancelled)."""
+        self._abandon(self.started)
+        self._close(cancel_futures=True)
+
+    def _close(self, cancel_futures: bool) -> None:
+        # A claimed call may still be queued, so only a pool with nothing
+        # claimed drops its queue.
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=cancel_futures)
+            self._pool = None
+
+
+class _AnyEvent:
+    """Set once any of `events` is: the is_set() / wait() a child loop and
+    its model calls poll, over a call's own abandon event and the loop's
+    cancel_event."""
+
+    def __init__(self, *events):
+        self._events = [e for e in events if e is not None]
+
+    def is_set(self) -> bool:
+        return any(e.is_set() for e in self._events)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        import time as _time
+        deadline = None if timeout is None else _time.monotonic() + timeout
+        while not self.is_set():
+            left = None if deadline is None else deadline - _time.monotonic()
+            if left is not None and left <= 0:
                 return False
-    return True
+            self._events[0].wait(0.05 if left is None else min(0.05, left))
+        return True
+
+
+def _transcript_text(turns) -> str:
+    """Plain-text rendering of `turns` for a summarization prompt."""
+    return "\n\n".join(seg for seg in map(_render_turn, turns) if seg is not None)
+
+
+class _BackgroundCompactor:
+    """Speculative compaction on a worker thread (AgentLoop.background_compaction).
+
+    Once the transcript passes the soft watermark, `start` snapshots the
+    middle of the history — everything after the first turn except the last
+    `keep_recent` — and cuts it into chunks at turn boundaries (~chunk_chars
+    each, greedily from the front, so the same turns always chunk the same
+    way). The worker folds the chunks into a rolling summary, one model call
+    per chunk: summary(k) = summarize(summary(k-1) + chunk k). Only COMPLETE
+    chunks are summarized; a trailing partial chunk stays verbatim.
+
+    Every rolling summary is cached under the identity of the turn range it
+    covers (turn objects + content objects, kept alive by the cache entry so
+    ids can't be recycled). A later job over a longer range re-uses the
+    summaries of the prefix it shares with an earlier one and only pays for
+    the new chunks. The loop `take`s the finished result at an iteration
+    boundary and swaps it in only if that range is still untouched.
+    """
+
+    _CACHE_MAX = 64
+    retry_after = 60.0    # seconds to wait after a failed job before another
+
+    def __init__(self, client: LLMClient, chunk_chars: int = 40_000):
+        self.client = client
+        self.chunk_chars = chunk_chars
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._result = None          # (turns, contents, summary, stats) when done
+        self._cache: Dict[tuple, tuple] = {}   # range key -> (summary, turns, contents)
+        self._last_key: Optional[tuple] = None
+        self._failed_at: Optional[float] = None
+        self.jobs = 0
+
+    @staticmethod
+    def _key(turns, contents) -> tuple:
+        return tuple((id(t), id(c)) for t, c in zip(turns, contents))
+
+    def busy(self) -> bool:
+        with self._lock:
+            return self._thread is not None or self._result is not None
+
+    def start(self, history: List["Turn"], keep_recent: int, context: str) -> bool:
+        """Snapshot the compactable range of `history` and summarize it on a
+        worker thread. False when there's nothing (new) to summarize."""
+        import time as _time
+        if self.busy():
+            return False
+        if (self._failed_at is not None
+                and _time.monotonic() - self._failed_at < self.retry_after):
+            return False
+        middle = history[1:len(history) - keep_recent] if keep_recent > 0 else history[1:]
+        bounds, size = [], 0
+        for i, t in enumerate(middle):
+            size += len(t.content)
+            if size >= self.chunk_chars:
+                bounds.append(i + 1)
+                size = 0
+        if not bounds:
+            return False
+        turns = tuple(middle[:bounds[-1]])
+        contents = tuple(t.content for t in turns)
+        key = self._key(turns, contents)
+        if key == self._last_key:      # already offered; the loop declined it
+            return False
+        self._last_key = key
+        self.jobs += 1
+        th = threading.Thread(target=self._work, args=(turns, contents, bounds, context),
+                              name="robodog-compact", daemon=True)
+        with self._lock:
+            self._thread = th
+        th.start()
+        return True
+
+    def _work(self, turns, contents, bounds, context) -> None:
+        import time as _time
+        t0 = _time.monotonic()
+        summary, prev_end, calls, reused = "", 0, 0, 0
+        try:
+            for end in bounds:
+                key = self._key(turns[:end], contents[:end])
+                with self._lock:
+                    hit = self._cache.get(key)
+                if hit is not None:
+                    summary, reused = hit[0], reused + 1
+                else:
+                    text = _transcript_text(turns[prev_end:end])
+                    if summary:
+                        text = f"USER: [earlier conversation summary]\n{summary}\n\n{text}"
+                    summary = (self.client.complete(
+                        AgentLoop._COMPACT_PROMPT + text, context=context,
+                        max_tokens=1500).text or "").strip()
+                    if not summary:
+                        raise ValueError("empty summary")
+                    calls += 1
+                    with self._lock:
+                        if len(self._cache) >= self._CACHE_MAX:
+                            self._cache.pop(next(iter(self._cache)))
+                        self._cache[key] = (summary, turns[:end], contents[:end])
+                prev_end = end
+            stats = {"duration_s": _time.monotonic() - t0, "turns": len(turns),
+                     "chunks": len(bounds), "reused": reused, "calls": calls}
+            with self._lock:
+                self._result = (turns, contents, summary, stats)
+        except Exception as exc:   # never surfaces: the history is simply left alone
+            logger.debug("background compaction failed: %s", exc)
+            with self._lock:
+                self._failed_at = _time.monotonic()
+                self._last_key = None      # the same range may be retried later
+        finally:
+            with self._lock:
+                self._thread = None
+
+    def take(self):
+        """The finished (turns, contents, summary, stats), or None. One-shot."""
+        with self._lock:
+            res, self._result = self._result, None
+            return res
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        th = self._thread
+        if th is not None:
+            th.join(timeout)
+
+    def reset(self) -> None:
+        """Drop cached summaries (their ranges no longer exist after a swap)."""
+        with self._lock:
+            self._cache.clear()
+            self._last_key = None
 
 
 @dataclass
@@ -86,6 +490,7 @@ class LoopResult:
     duration: float = 0.0        # wall-clock seconds for the turn
     prompt_tokens: int = 0       # input tokens (for cost accounting)
     completion_tokens: int = 0   # output tokens
+    cached_tokens: int = 0       # input tokens served from the provider's prompt cache
 
 
 class AgentLoop:
@@ -100,6 +505,9 @@ class AgentLoop:
         system_suffix: str = "",
         cancel_event=None,
         trace_enabled: bool = False,
+        stream_tools: bool = False,
+        prompt_cache: bool = False,
+        background_compaction: bool = False,
     ):
         self.client = client
         self.registry = registry
@@ -111,6 +519,7 @@ class AgentLoop:
         self.cancel_event = cancel_event  # threading.Event; checked between steps
         self.api_retry_pause = 4.0        # seconds before the loop-level API retry
         self.history: List[Turn] = []
+        self._rendered = _RenderedTranscript()   # incremental render of history
         # Opt-in wall-clock breakdown of where a turn's time actually goes
         # (LLM call vs. tool execution vs. prompt rendering vs. parsing) — off
         # by default so normal sessions pay zero timing overhead; turn on with
@@ -119,6 +528,17 @@ class AgentLoop:
         # call in this session, not just the current turn.
         self.trace_enabled = trace_enabled
         self.trace: List[dict] = []
+        # Opt-in streaming mode (--stream / ROBODOG_STREAM=1): the reply is
+        # streamed and parallel-safe tool calls start as soon as their closing
+        # tag arrives — see _EarlyDispatcher. Off by default; the non-streaming
+        # path is unchanged when it's off.
+        self.stream_tools = stream_tools
+        # Opt-in cache-aware prompt layout (--prompt-cache /
+        # ROBODOG_PROMPT_CACHE=1): a real chat array with cache breakpoints on
+        # the stable prefix, for clients with supports_messages; batched
+        # trimming (trim_batch_fraction) so the prefix changes rarely. Others
+        # keep the flat prompt.
+        self.prompt_cache = prompt_cache
         # the gateway re-sends the full transcript every iteration, so trim old tool
         # outputs first (a modern agentic terminal's compaction order) before any summarizing.
         # Raised from 120k (~30k tokens): live sessions with 20-40+ tool calls in one
@@ -133,21 +553,94 @@ class AgentLoop:
         # wasted/duplicate work.
         self.max_transcript_chars = 450_000  # ~112k tokens
         self.trim_keep_recent = 20  # turns never eligible for trim-to-placeholder
+        # Token budgeting (tokens.py). When max_transcript_tokens is set —
+        # build_core derives it from the model's context window — trim and
+        # compaction decisions count real tokens with `tokenizer` instead of
+        # chars: code-heavy output costs far more tokens per char than prose,
+        # so the char budget trims prose too early and overflows on code.
+        # None keeps the char budget (unknown model / custom gateway).
+        self.tokenizer = get_tokenizer("")
+        self.max_transcript_tokens: Optional[int] = None
+        # In prompt_cache mode a trim clears down to this fraction of the
+        # budget in ONE pass: every trim rewrites old turns and so invalidates
+        # the provider's cached prefix from that point on, and trimming just
+        # enough each iteration would do that on every call once over budget.
+        self.trim_batch_fraction = 0.75
+        # Opt-in background compaction (--bg-compact / ROBODOG_BG_COMPACT=1).
+        # compact() blocks the turn on one big summarization call and only
+        # runs when asked or near the ceiling. With this on, crossing the SOFT
+        # watermark (a fraction of context_fill) starts summarizing the older
+        # turns on a worker thread, chunk by chunk (_BackgroundCompactor);
+        # the finished summary is swapped in at the next iteration boundary,
+        # and only if the turns it covers are still exactly what's in the
+        # history — so nobody waits on it, and a stale summary is dropped.
+        self.background_compaction = background_compaction
+        self.compact_soft_watermark = 0.7
+        self.compact_keep_recent = 20     # turns the background summary never covers
+        self._bg_compactor: Optional[_BackgroundCompactor] = None
+        # read_file de-duplication (ToolRegistry._read_dedup): an unchanged
+        # re-read becomes a stub only while the earlier output is still in
+        # the history — a trim, compaction, /rewind or /clear that removed it
+        # means the next read returns the content again. `steps` counts
+        # iterations across run() calls so the stub's "step N" stays unique.
+        self.steps = 0
+        if hasattr(registry, "read_visible"):
+            registry.read_visible = self._tool_output_visible
+
+    def _tool_output_visible(self, text: str) -> bool:
+        # Whole results only: a short output like "(empty file)" also turns
+        # up inside unrelated ones. A read_many result holds each file's
+        # read_file output as one "=== spec ===" section, so a section that
+        # is exactly `text` counts too.
+        section = "===\n" + text
+        for t in list(self.history):
+            if t.role != "tool":
+                continue
+            if t.content == text:
+                return True
+            if t.tool_name == "read_many" and (t.content.endswith(section)
+                                               or section + "\n=== " in t.content):
+                return True
+        return False
 
     def transcript_chars(self) -> int:
-        return sum(len(t.content) for t in self.history)
+        self._rendered.sync(self.history)
+        return self._rendered.chars
+
+    def transcript_tokens(self) -> int:
+        """Transcript size in tokens (per-Turn cached — see tokens.turn_tokens)."""
+        tok = self.tokenizer
+        return sum(turn_tokens(t, tok) for t in list(self.history))
+
+    def context_fill(self) -> float:
+        """How full the trim window is (1.0 = at the budget), in tokens when a
+        token budget is set, else in chars. Drives the status-bar %, /stats
+        and auto-compaction."""
+        if self.max_transcript_tokens:
+            return self.transcript_tokens() / self.max_transcript_tokens
+        return self.transcript_chars() / max(1, self.max_transcript_chars)
 
     def _trim_history(self):
-        total = self.transcript_chars()
-        if total <= self.max_transcript_chars:
+        if self.max_transcript_tokens:
+            tok = self.tokenizer
+            size = lambda t: turn_tokens(t, tok)   # noqa: E731
+            total, budget = self.transcript_tokens(), self.max_transcript_tokens
+        else:
+            size = lambda t: len(t.content)        # noqa: E731
+            total, budget = self.transcript_chars(), self.max_transcript_chars
+        if total <= budget:
             return
+        target = budget
+        if self.prompt_cache:
+            target = int(target * self.trim_batch_fraction)
         placeholder = "[old tool output cleared to save context]"
         keep = self.trim_keep_recent
         for t in (self.history[:-keep] if keep > 0 else self.history):
             if t.role == "tool" and len(t.content) > len(placeholder):
-                total -= len(t.content) - len(placeholder)
+                before = size(t)
                 t.content = placeholder
-                if total <= self.max_transcript_chars:
+                total -= before - size(t)
+                if total <= target:
                     break
 
     # Structured schema so the compaction summary keeps what a resuming agent
@@ -173,15 +666,7 @@ class AgentLoop:
         middle = self.history[1:-keep_recent]
         if not middle:
             return False
-        parts = []
-        for t in middle:
-            if t.role == "user":
-                parts.append(f"USER: {t.content}")
-            elif t.role == "assistant":
-                parts.append(f"ASSISTANT: {t.content}")
-            else:
-                parts.append(f"TOOL RESULT [{t.tool_name}]:\n{t.content}")
-        middle_text = "\n\n".join(parts)
+        middle_text = _transcript_text(middle)
         try:
             summary = self.client.complete(
                 self._COMPACT_PROMPT + middle_text,
@@ -194,13 +679,57 @@ class AgentLoop:
         rebuilt.extend(recent)
         # Only adopt the compaction if it actually shrank the transcript (a summary
         # somehow larger than the middle it replaced would be worse than nothing).
-        old_chars = self.transcript_chars()
-        new_chars = sum(len(t.content) for t in rebuilt)
-        if new_chars >= old_chars:
+        if self.max_transcript_tokens:
+            old_size = self.transcript_tokens()
+            new_size = sum(turn_tokens(t, self.tokenizer) for t in rebuilt)
+        else:
+            old_size = self.transcript_chars()
+            new_size = sum(len(t.content) for t in rebuilt)
+        if new_size >= old_size:
             return False
         self.history[:] = rebuilt
         return True
 
+    def _background_compaction_step(self) -> None:
+        """Iteration boundary: adopt a finished background summary, then start
+        the next job if the transcript is past the soft watermark."""
+        if not self.background_compaction:
+            return
+        bg = self._bg_compactor
+        if bg is None:
+            bg = self._bg_compactor = _BackgroundCompactor(self.client)
+        bg.client = self.client            # follow a /model switch
+        done = bg.take()
+        if done is not None:
+            self._adopt_compaction(*done)
+        if self.context_fill() >= self.compact_soft_watermark:
+            bg.start(self.history, self.compact_keep_recent, self._system_context())
+
+    def _adopt_compaction(self, turns, contents, summary, stats) -> bool:
+        """Swap turns[1:1+n] for one summary turn — only when that range is
+        still the exact same turn/content objects (no trim, /rewind, /clear or
+        sync compact touched it meanwhile) and the summary is smaller."""
+        n, hist = len(turns), self.history
+        if len(hist) <= n + 1 or any(
+                hist[1 + i] is not turns[i] or hist[1 + i].content is not contents[i]
+                for i in range(n)):
+            return False
+        new = Turn("user", f"[earlier conversation summary]\n{summary}")
+        if self.max_transcript_tokens:
+            tok = self.tokenizer
+            before = sum(turn_tokens(t, tok) for t in turns)
+            after = turn_tokens(new, tok)
+        else:
+            before, after = sum(len(c) for c in contents), len(new.content)
+        if after >= before:
+            return False
+        self.history[:] = [hist[0], new] + hist[1 + n:]
+        self._bg_compactor.reset()
+        self._trace("bg_compact", **stats)
+        self.on_event("compacted", {"start": 1, "end": 1 + n, "removed": list(turns),
+                                    "before": before, "after": after})
+        return True
+
     # ---- prompt rendering ----------------------------------------------
     def _system_context(self) -> str:
         base = self.registry.catalog()
@@ -208,16 +737,30 @@ class AgentLoop:
 
     def _render_prompt(self) -> str:
         self._trim_history()
-        buf = []
-        for t in self.history:
-            if t.role == "user":
-                buf.append(f"USER: {t.content}")
-            elif t.role == "assistant":
-                buf.append(f"ASSISTANT: {t.content}")
-            elif t.role == "tool":
-                buf.append(f"TOOL RESULT [{t.tool_name}]:\n{t.content}")
-        buf.append("ASSISTANT:")
-        return "\n\n".join(buf)
+        return self._rendered.render(self.history, "ASSISTANT:")
+
+    def _use_chat(self) -> bool:
+        return self.prompt_cache and getattr(self.client, "supports_messages", False)
+
+    def _render_messages(self):
+        """(messages, cache_breakpoints) for the cache-aware layout. Breakpoints
+        (at most 3 of the 4 Anthropic allows): the system catalog — identical
+        across every call and every subagent of the same type — the last
+        message, so the next call can read everything up to it from cache,
+        and the tail of the PREVIOUS call (the user message before the last
+        assistant turn), which is where that call's cache entry ends."""
+        self._trim_history()
+        messages = [{"role": "system", "content": self._system_context()}]
+        messages.extend(self._rendered.chat(self.history))
+        breakpoints = [0]
+        last = len(messages) - 1
+        if last > 0:
+            breakpoints.append(last)
+            for i in range(last - 1, 0, -1):
+                if messages[i]["role"] == "user" and messages[i + 1]["role"] == "assistant":
+                    breakpoints.insert(1, i)
+                    break
+        return messages, breakpoints
 
     def _abort_text(self, reason: str, prose: str) -> str:
         """Message for a circuit-breaker abort that PRESERVES any answer the
@@ -232,7 +775,8 @@ class AgentLoop:
         if self.trace_enabled:
             self.trace.append({"kind": kind, **fields})
 
-    def _safe_complete(self, prompt: str, max_tokens_override: Optional[int] = None):
+    def _safe_complete(self, prompt: Optional[str], max_tokens_override: Optional[int] = None,
+                       stream: Optional[_EarlyDispatcher] = None, chat=None):
         """Call the client with one loop-level retry ABOVE its own backoff, so a
         transient backend outage (e.g. a gateway ReadTimeout) that outlasts the
         client's retries doesn't crash the whole turn. Returns the Completion,
@@ -244,11 +788,30 @@ class AgentLoop:
         grant a larger ceiling for the retry (Qwen Code precedent: a truncation
         is direct evidence the current ceiling was too small for this response;
         asking the model to "make it smaller" alone can still truncate again if
-        it misjudges size)."""
+        it misjudges size).
+
+        `stream`, when given, makes this a complete_stream() call whose deltas
+        feed that dispatcher (reset before each attempt).
+
+        `chat`, a (messages, cache_breakpoints) pair from _render_messages,
+        replaces `prompt` with a complete_chat() call."""
         import time as _t
         last_exc = None
+        streaming = stream is not None and hasattr(self.client, "complete_stream")
         for attempt in range(2):   # 1 retry on top of the client's internal backoff
             try:
+                if streaming:
+                    stream.reset()
+                if chat is not None:
+                    return self.client.complete_chat(
+                        chat[0], max_tokens=max_tokens_override or self.max_tokens,
+                        temperature=self.temperature, cache_breakpoints=chat[1],
+                        on_delta=stream.feed if streaming else None), None
+                if streaming:
+                    return self.client.complete_stream(
+                        prompt, context=self._system_context(),
+                        max_tokens=max_tokens_override or self.max_tokens,
+                        temperature=self.temperature, on_delta=stream.feed), None
                 return self.client.complete(
                     prompt, context=self._system_context(),
                     max_tokens=max_tokens_override or self.max_tokens,
@@ -274,6 +837,7 @@ class AgentLoop:
         total_tokens = 0
         ptok_sum = 0
         ctok_sum = 0
+        cached_sum = 0
         iterations = 0
         final_text = ""
         nudged = False
@@ -287,19 +851,41 @@ class AgentLoop:
             if self.cancel_event is not None and self.cancel_event.is_set():
                 final_text = "[cancelled]"
                 break
+            self._background_compaction_step()
             iterations += 1
+            self.steps += 1
+            if hasattr(self.registry, "step"):
+                self.registry.step = self.steps
             _render_t0 = _time.monotonic()
-            prompt = self._render_prompt()
+            if self._use_chat():
+                prompt, chat = None, self._render_messages()
+                prompt_chars = sum(len(m["content"]) for m in chat[0])
+            else:
+                prompt, chat = self._render_prompt(), None
+                prompt_chars = len(prompt)
             self._trace("render_prompt", iteration=iterations,
-                       duration_s=_time.monotonic() - _render_t0, prompt_chars=len(prompt))
+                       duration_s=_time.monotonic() - _render_t0, prompt_chars=prompt_chars)
             self.on_event("llm_start", {"iteration": iterations})
             _llm_t0 = _time.monotonic()
-            completion, api_exc = self._safe_complete(prompt, max_tokens_override=next_max_tokens)
+            dispatcher = (_EarlyDispatcher(self.registry, _llm_t0, self.cancel_event)
+                          if self.stream_tools else None)
+            if self.trace_enabled:
+                take_timings()           # drop requests made outside this call
+            completion = None
+            try:
+                completion, api_exc = self._safe_complete(
+                    prompt, max_tokens_override=next_max_tokens, stream=dispatcher,
+                    chat=chat)
+            finally:
+                if dispatcher is not None and completion is None:
+                    dispatcher.close()   # no reply to claim the started calls
             _llm_dt = _time.monotonic() - _llm_t0
+            _net = (summarize_timings(take_timings()) if self.trace_enabled else None) or {}
             next_max_tokens = None  # one-shot: never sticky past the call it was set for
             if completion is None:
                 self._trace("llm_call", iteration=iterations, duration_s=_llm_dt,
-                           ok=False, error=type(api_exc).__name__ if api_exc else "error")
+                           ok=False, error=type(api_exc).__name__ if api_exc else "error",
+                           **_net)
                 if self.cancel_event is not None and self.cancel_event.is_set():
                     final_text = "[cancelled]"
                     break
@@ -312,15 +898,21 @@ class AgentLoop:
             total_tokens += completion.total_tokens
             ptok_sum += getattr(completion, "prompt_tokens", 0) or 0
             ctok_sum += getattr(completion, "completion_tokens", 0) or 0
+            cached_sum += getattr(completion, "cached_tokens", 0) or 0
             self._trace("llm_call", iteration=iterations, duration_s=_llm_dt, ok=True,
                        prompt_tokens=getattr(completion, "prompt_tokens", 0) or 0,
-                       completion_tokens=getattr(completion, "completion_tokens", 0) or 0)
+                       completion_tokens=getattr(completion, "completion_tokens", 0) or 0,
+                       cached_tokens=getattr(completion, "cached_tokens", 0) or 0,
+                       **_net)
             text = completion.text or ""
             _parse_t0 = _time.monotonic()
             calls, prose = parse_tool_calls(text)
             self._trace("parse_tool_calls", iteration=iterations,
                        duration_s=_time.monotonic() - _parse_t0,
                        text_chars=len(text), n_calls=len(calls))
+            # Claimed right away: early calls the final parse dropped (or a
+            # reply with no calls at all) are abandoned, not left running.
+            early = dispatcher.claim(calls) if dispatcher is not None else {}
             self.on_event("llm_done", {
                 "iteration": iterations, "text": text,
                 "prose": prose, "n_calls": len(calls),
@@ -396,6 +988,12 @@ class AgentLoop:
             # CONCURRENTLY and collect results in order; otherwise sequentially.
             if self.cancel_event is not None and self.cancel_event.is_set():
                 break
+            if early:
+                self._trace("first_tool_start", iteration=iterations,
+                            duration_s=dispatcher.first_start_s, streamed=True)
+            else:
+                self._trace("first_tool_start", iteration=iterations,
+                            duration_s=_time.monotonic() - _llm_t0, streamed=False)
             if _batch_parallel_safe(self.registry, calls):
                 for call in calls:
                     self.on_event("tool_start", {"name": call.name, "args": call.args})
@@ -406,24 +1004,36 @@ class AgentLoop:
                     r = self.registry.execute(c.name, c.args)
                     return r, _time.monotonic() - t0
 
-                with _cf.ThreadPoolExecutor(max_workers=min(8, len(calls))) as _ex:
-                    timed = list(_ex.map(_timed_exec, calls))
+                pending = [(i, c) for i, c in enumerate(calls) if i not in early]
+                timed = [None] * len(calls)
+                for i, fut in early.items():
+                    timed[i] = fut.result()
+                if pending:
+                    with _cf.ThreadPoolExecutor(max_workers=min(8, len(pending))) as _ex:
+                        for (i, _c), res in zip(pending, _ex.map(_timed_exec,
+                                                                 [c for _i, c in pending])):
+                            timed[i] = res
                 results = [r for r, _dt in timed]
                 # Appended on the MAIN thread only (after _ex.map returns), not
                 # from within worker threads — self.trace isn't thread-safe.
-                for call, (_r, _dt) in zip(calls, timed):
+                for i, (call, (_r, _dt)) in enumerate(zip(calls, timed)):
                     self._trace("tool_call", iteration=iterations, name=call.name,
-                               duration_s=_dt, parallel=True)
+                               duration_s=_dt, parallel=True, early=i in early)
             else:
                 results = []
-                for call in calls:
+                for i, call in enumerate(calls):
                     if self.cancel_event is not None and self.cancel_event.is_set():
                         break
                     self.on_event("tool_start", {"name": call.name, "args": call.args})
-                    _tool_t0 = _time.monotonic()
-                    r = self.registry.execute(call.name, call.args)
-                    self._trace("tool_call", iteration=iterations, name=call.name,
-                               duration_s=_time.monotonic() - _tool_t0, parallel=False)
+                    if i in early:
+                        r, _dt = early[i].result()
+                        self._trace("tool_call", iteration=iterations, name=call.name,
+                                   duration_s=_dt, parallel=False, early=True)
+                    else:
+                        _tool_t0 = _time.monotonic()
+                        r = self.registry.execute(call.name, call.args)
+                        self._trace("tool_call", iteration=iterations, name=call.name,
+                                   duration_s=_time.monotonic() - _tool_t0, parallel=False)
                     results.append(r)
 
             for call, result in zip(calls, results):
@@ -500,4 +1110,5 @@ class AgentLoop:
             duration=_time.time() - _t0,
             prompt_tokens=ptok_sum,
             completion_tokens=ctok_sum,
+            cached_tokens=cached_sum,
         )
@@ -0,0 +1,82 @@
+# file: robodog_terminal/perf_checkpoint.py
+"""
+OFFLINE benchmark for checkpoint.py: an agent making many small edits to one
+large file, each preceded by a snapshot (what the registry does before every
+mutation). The old store copied the whole file each time; the object store
+keeps each content once, compressed, and later versions as deltas.
+
+ROBODOG_PERF_CKPT_EDITS edits (default 30) to a ROBODOG_PERF_CKPT_MB file
+(default 2) of source-like lines; every marker is then restored and must
+match the content it had, byte for byte.
+
+No network, no LLM. Run:
+  python robodog_terminal/perf_checkpoint.py
+
+Pass criteria: exact restores, and
+  ROBODOG_PERF_MIN_CKPT_RATIO (default 10)
+      bytes full copies would take / bytes the store holds
+"""
+from __future__ import annotations
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal.checkpoint import Checkpointer                 # noqa: E402
+
+
+def main() -> int:
+    edits = int(os.environ.get("ROBODOG_PERF_CKPT_EDITS", "30"))
+    size_mb = float(os.environ.get("ROBODOG_PERF_CKPT_MB", "2"))
+    min_ratio = float(os.environ.get("ROBODOG_PERF_MIN_CKPT_RATIO", "10"))
+    rng = random.Random(7)
+    lines = []
+    while sum(map(len, lines)) < size_mb * 1024 * 1024:
+        n = len(lines)
+        lines.append(f"    value_{n} = compute({n}, {rng.randint(0, 10 ** 6)})  # step {n}\n")
+
+    wd = Path(tempfile.mkdtemp(prefix="rd_perf_ckpt_"))
+    try:
+        f = wd / "big.py"
+        f.write_text("".join(lines), encoding="utf-8")
+        cp = Checkpointer(wd / ".ckpt")
+        versions = []
+        t0 = time.perf_counter()
+        for k in range(edits):
+            cp.set_marker(k)
+            versions.append(f.read_bytes())
+            cp.snapshot(f)
+            lines[rng.randrange(len(lines))] = f"    patched_{k} = True\n"
+            f.write_text("".join(lines), encoding="utf-8")
+        snap_s = time.perf_counter() - t0
+        stats = cp.stats()
+        t0 = time.perf_counter()
+        exact = True
+        for k in reversed(range(edits)):
+            cp.restore(k)
+            exact = exact and f.read_bytes() == versions[k]
+        restore_s = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(wd, ignore_errors=True)
+
+    ratio = stats["logical_bytes"] / max(stats["stored_bytes"], 1)
+    print(f"{edits} edits to a {size_mb:g} MB file")
+    print(f"  full copies would take : {stats['logical_bytes'] / 1e6:8.2f} MB")
+    print(f"  object store holds     : {stats['stored_bytes'] / 1e6:8.2f} MB "
+          f"({stats['objects']} objects)")
+    print(f"  ratio                  : {ratio:8.1f}x  (need >= {min_ratio})")
+    print(f"  snapshot               : {snap_s / edits * 1000:8.1f} ms each")
+    print(f"  restore                : {restore_s / edits * 1000:8.1f} ms each")
+    print(f"  exact restores         : {exact}")
+    passed = exact and ratio >= min_ratio
+    print("\nPERF CHECKPOINT:", "PASS" if passed else "FAIL")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,9 @@ Uses the real backend wiring (build_backend): gateway / OpenRouter / OpenAI —
 whatever your env/KeePass provides. If no live backend is configured it resolves
 to the echo mock and the test SKIPS (exit 0), so it's safe in keyless CI.
 
+With ROBODOG_LLM_CACHE=record a live run is captured to the response cache;
+ROBODOG_LLM_CACHE=replay then re-runs it offline (response_cache.py).
+
 Run:
   python robodog_terminal/perf_fanout.py            # N=8
   python robodog_terminal/perf_fanout.py 12         # N=12
@@ -0,0 +1,172 @@
+# file: robodog_terminal/perf_grep.py
+"""
+OFFLINE benchmark for the grep tool: the old single-threaded loop vs the
+streaming engine (grep_engine.py) vs the engine behind the trigram index.
+
+Builds a synthetic tree (ROBODOG_PERF_GREP_FILES files of ~16 KB of
+source-like text, spread over nested packages) and times, on the same
+patterns: the pre-engine loop (collect sorted rglob, read_text +
+splitlines + regex every line, stop at 300), and the `grep` tool from
+default_registry with ROBODOG_GREP_INDEX unset (engine walk) and set (index
+picks the candidates, then the engine). Patterns cover the shapes agents
+actually send:
+  * a rare identifier          — the index's best case, a handful of files;
+  * a common keyword           — most files are candidates anyway;
+  * an alternation             — an OR clause over two literals;
+  * `\\w+_handler\\(`          — a literal run after a class;
+  * `\\w+\\s*=`                — undecomposable: both sides do the full scan.
+Each query's output must be identical all three ways. The index build (one-off,
+background in real use) and the warm re-load from disk are timed too.
+
+No network, no LLM. Run:
+  python robodog_terminal/perf_grep.py
+  ROBODOG_PERF_GREP_FILES=20000 python robodog_terminal/perf_grep.py
+
+Pass criteria: identical results, and
+  ROBODOG_PERF_MIN_SCAN_SPEEDUP (default 1.0)
+      old loop time / engine time for the rare identifier (every file read)
+  ROBODOG_PERF_MIN_GREP_SPEEDUP (default 3.0)
+      engine time / indexed time for the rare identifier
+"""
+from __future__ import annotations
+
+import fnmatch
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import grep_index                              # noqa: E402
+from robodog_terminal.ignore import matcher_for                      # noqa: E402
+from robodog_terminal.tools import _is_excluded, default_registry    # noqa: E402
+
+REPEAT = 3
+WORDS = ("self value result config handler request response parse render "
+         "buffer index token session client server update return import").split()
+
+
+def _make_tree(root: Path, n_files: int) -> int:
+    rng = random.Random(7)
+    total = 0
+    for i in range(n_files):
+        d = root / f"pkg{i % 40:02d}" / f"mod{i % 7}"
+        d.mkdir(parents=True, exist_ok=True)
+        lines = []
+        for j in range(400):
+            w = rng.sample(WORDS, 4)
+            lines.append(f"    {w[0]}_{j} = {w[1]}.{w[2]}_handler({w[3]}, {j})")
+        if i % 500 == 0:
+            lines.insert(200, f"def rare_identifier_{i}(): pass")
+        body = "\n".join(lines) + "\n"
+        (d / f"file{i:05d}.py").write_text(body)
+        total += len(body)
+    return total
+
+
+def _old_loop(root: Path, pattern: str) -> str:
+    """The grep tool before grep_engine, verbatim but for the tool plumbing."""
+    rx = re.compile(pattern)
+    results = []
+    targets = sorted(p for p in root.rglob("*")
+                     if p.is_file() and not _is_excluded(p.relative_to(root))
+                     and fnmatch.fnmatch(p.name, "*"))
+    for fp in targets:
+        for i, line in enumerate(fp.read_text(encoding="utf-8", errors="ignore")
+                                 .splitlines(), 1):
+            if rx.search(line):
+                results.append(f"{fp.relative_to(root)}:{i}: {line.strip()[:200]}")
+                if len(results) >= 300:
+                    break
+        if len(results) >= 300:
+            break
+    if not results:
+        return f"No matches for /{pattern}/."
+    capped = " (showing first 300)" if len(results) >= 300 else ""
+    return f"{len(results)} match(es) for /{pattern}/{capped}:\n" + "\n".join(results)
+
+
+def _best(fn) -> tuple:
+    best, out = float("inf"), ""
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _time(reg, pattern: str, indexed: bool) -> tuple:
+    # The grep tool reads ROBODOG_GREP_INDEX per call.
+    if indexed:
+        os.environ["ROBODOG_GREP_INDEX"] = "1"
+    else:
+        os.environ.pop("ROBODOG_GREP_INDEX", None)
+    return _best(lambda: reg.execute("grep", {"pattern": pattern}))
+
+
+def main() -> int:
+    n_files = int(os.environ.get("ROBODOG_PERF_GREP_FILES", "3000"))
+    min_speedup = float(os.environ.get("ROBODOG_PERF_MIN_GREP_SPEEDUP", "3.0"))
+    min_scan = float(os.environ.get("ROBODOG_PERF_MIN_SCAN_SPEEDUP", "1.0"))
+    work = Path(tempfile.mkdtemp(prefix="rd_perf_grep_"))
+    saved = {k: os.environ.get(k) for k in ("ROBODOG_GREP_INDEX", "ROBODOG_GREP_INDEX_DIR")}
+    os.environ["ROBODOG_GREP_INDEX_DIR"] = str(work / "store")
+    try:
+        proj = work / "proj"
+        size = _make_tree(proj, n_files)
+        print(f"tree: {n_files:,} files, {size / 1e6:.1f} MB")
+
+        t0 = time.perf_counter()
+        idx = grep_index.TrigramIndex(proj.resolve(), matcher_for(proj.resolve()))
+        idx._build()
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        warm = grep_index.TrigramIndex(proj.resolve(), matcher_for(proj.resolve()))
+        warm._build()
+        t_warm = time.perf_counter() - t0
+        print(f"index build: {t_build:.2f}s cold, {t_warm:.2f}s warm from disk "
+              f"({idx.path.stat().st_size / 1e6:.1f} MB on disk)")
+
+        with grep_index._INDEXES_LOCK:
+            grep_index._INDEXES[str(proj.resolve())] = warm
+        reg = default_registry(cwd=str(proj))
+
+        patterns = [("rare identifier", "rare_identifier_1500"),
+                    ("common keyword", "return"),
+                    ("alternation", "(session|config)_12 ="),
+                    ("class + literal", r"\w+_handler\(self, 399"),
+                    ("undecomposable", r"\w+\s*=")]
+        print(f"\n{'pattern':<18} {'old loop':>10} {'engine':>10} {'indexed':>10} "
+              f"{'engine/old':>11} {'index/engine':>13}")
+        same, scan_x, index_x = True, {}, {}
+        for label, pat in patterns:
+            t_old, o = _best(lambda: _old_loop(proj, pat))
+            t_plain, a = _time(reg, pat, indexed=False)
+            t_idx, b = _time(reg, pat, indexed=True)
+            same = same and o == a == b
+            scan_x[label], index_x[label] = t_old / t_plain, t_plain / t_idx
+            print(f"{label:<18} {t_old * 1e3:>7.1f} ms {t_plain * 1e3:>7.1f} ms "
+                  f"{t_idx * 1e3:>7.1f} ms {t_old / t_plain:>10.1f}x "
+                  f"{t_plain / t_idx:>12.1f}x{'' if o == a == b else '  MISMATCH'}")
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        shutil.rmtree(work, ignore_errors=True)
+
+    scan, speedup = scan_x["rare identifier"], index_x["rare identifier"]
+    print(f"\nidentical results: {same} · rare identifier: engine {scan:.1f}x the old "
+          f"loop (min {min_scan}), index {speedup:.1f}x the engine (min {min_speedup})")
+    ok = same and scan >= min_scan and speedup >= min_speedup
+    print("PERF GREP:", "PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
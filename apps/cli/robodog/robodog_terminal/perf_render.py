@@ -0,0 +1,137 @@
+# file: robodog_terminal/perf_render.py
+"""
+OFFLINE micro-benchmark for AgentLoop prompt rendering.
+
+Grows a synthetic session (assistant / tool turns, ~2k-char tool results)
+and times one `_render_prompt()` per iteration at several history sizes,
+against the old full re-join (every turn re-formatted + re-summed each
+iteration). Per render it reports:
+  * formatted — chars of NEW segment text built. The incremental renderer only
+    formats the turns appended since the last call, so this stays flat as the
+    history grows; the full re-join re-formats the whole transcript every time.
+  * time — wall clock per render. Both still end in one join that copies the
+    prompt (the client needs a str), so absolute time tracks prompt size; the
+    incremental path drops the per-turn re-formatting and second copy on top.
+
+Also times the trim path: once the transcript crosses max_transcript_chars,
+one old tool result is cleared per iteration, which invalidates from that turn
+on — unchanged later turns keep their cached segments and are only re-joined.
+
+No network, no LLM (echo client). Run:
+  python robodog_terminal/perf_render.py
+  ROBODOG_PERF_RENDER_STEPS=4000 python robodog_terminal/perf_render.py
+
+Pass criteria: formatted chars per render flat (within 5%) across sizes, and
+  ROBODOG_PERF_MIN_RENDER_SPEEDUP (default 1.0)
+      full re-join time / incremental time at the largest size
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import loop as loop_mod                     # noqa: E402
+from robodog_terminal.llm_client import EchoClient               # noqa: E402
+from robodog_terminal.loop import AgentLoop, Turn                # noqa: E402
+from robodog_terminal.tools import default_registry              # noqa: E402
+
+SAMPLES = 40          # renders timed per measurement point
+
+
+def _full_rejoin(loop: AgentLoop) -> str:
+    """The pre-incremental renderer, kept here as the comparison baseline."""
+    sum(len(t.content) for t in loop.history)        # the old _trim_history sum
+    buf = []
+    for t in loop.history:
+        if t.role == "user":
+            buf.append(f"USER: {t.content}")
+        elif t.role == "assistant":
+            buf.append(f"ASSISTANT: {t.content}")
+        elif t.role == "tool":
+            buf.append(f"TOOL RESULT [{t.tool_name}]:\n{t.content}")
+    buf.append("ASSISTANT:")
+    return "\n\n".join(buf)
+
+
+def _add_step(loop: AgentLoop, i: int) -> None:
+    loop.history.append(Turn("assistant", f"step {i}: reading the next file " * 4))
+    loop.history.append(Turn("tool", (f"{i:>6}\tline of file content\n" * 80), "read_file"))
+
+
+def _time_per_render(fn, loop: AgentLoop) -> float:
+    """Average seconds for one render when ONE new step lands before each
+    render — the shape of a real agentic iteration."""
+    total = 0.0
+    base = len(loop.history)
+    for k in range(SAMPLES):
+        _add_step(loop, base + k)
+        t0 = time.perf_counter()
+        fn()
+        total += time.perf_counter() - t0
+    return total / SAMPLES
+
+
+def main() -> int:
+    max_steps = int(os.environ.get("ROBODOG_PERF_RENDER_STEPS", "1000"))
+    min_speedup = float(os.environ.get("ROBODOG_PERF_MIN_RENDER_SPEEDUP", "1.0"))
+    sizes = [n for n in (50, 125, 250, 500, 1000, 2000, 4000) if n <= max_steps]
+
+    formatted = [0]
+    real_render_turn = loop_mod._render_turn
+
+    def counting_render_turn(t):
+        seg = real_render_turn(t)
+        formatted[0] += len(seg or "")
+        return seg
+    loop_mod._render_turn = counting_render_turn
+
+    reg = default_registry(cwd=str(Path.cwd()))
+    inc = AgentLoop(EchoClient(), reg)
+    inc.max_transcript_chars = 10 ** 12          # isolate rendering from trimming
+    ref = AgentLoop(EchoClient(), reg)
+    for lp in (inc, ref):
+        lp.history.append(Turn("user", "refactor the parser"))
+
+    print(f"{'steps':>6} {'chars':>11} {'formatted/render':>17} "
+          f"{'incremental':>12} {'full re-join':>13} {'speedup':>8}")
+    rows = []
+    for n in sizes:
+        while len(inc.history) < 2 * n:
+            _add_step(inc, len(inc.history))
+            _add_step(ref, len(ref.history))
+        inc._render_prompt()                     # warm: render what's there once
+        formatted[0] = 0
+        t_inc = _time_per_render(inc._render_prompt, inc)
+        per_render = formatted[0] // SAMPLES
+        t_ref = _time_per_render(lambda: _full_rejoin(ref), ref)
+        if inc._render_prompt() != _full_rejoin(inc):
+            print("FAIL: incremental render differs from the full re-join")
+            return 1
+        rows.append((n, per_render, t_inc, t_ref))
+        print(f"{n:>6} {inc.transcript_chars():>11,} {per_render:>17,} "
+              f"{t_inc * 1e3:>9.3f} ms {t_ref * 1e3:>10.3f} ms {t_ref / t_inc:>7.1f}x")
+
+    # Trim pressure: over budget, each iteration clears one more old result.
+    inc.max_transcript_chars = inc.transcript_chars()
+    inc.trim_keep_recent = 20
+    formatted[0] = 0
+    t_trim = _time_per_render(inc._render_prompt, inc)
+    print(f"trim-every-iteration at {len(inc.history)} turns: {t_trim * 1e3:.3f} ms, "
+          f"{formatted[0] // SAMPLES:,} chars formatted/render")
+    loop_mod._render_turn = real_render_turn
+
+    per = [r[1] for r in rows]
+    flat = max(per) <= min(per) * 1.05
+    speedup = rows[-1][3] / rows[-1][2]
+    print(f"\nformatted chars/render flat across sizes: {flat} · "
+          f"speedup at {rows[-1][0]} steps: {speedup:.1f}x (min {min_speedup})")
+    ok = flat and speedup >= min_speedup
+    print("PERF RENDER:", "PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# file: robodog_terminal/perf_shell.py
+"""
+OFFLINE benchmark for the bash tool on POSIX: a fresh `/bin/sh -c` per call
+(_run_streaming, ROBODOG_PERSISTENT_SHELL=0) vs the persistent session
+(_PersistentPosixShell).
+
+Runs ROBODOG_PERF_SHELL_N short commands through the production path
+(default_registry().execute("bash", ...)) each way — a mix of the shapes an
+agent sends between edits: an echo, a builtin, a tiny external process, a
+failing command and one with stderr. Every result must be identical both
+ways; then the wall time per call is compared.
+
+No network, no LLM. POSIX only (SKIPS on Windows, exit 0). Run:
+  python robodog_terminal/perf_shell.py
+  ROBODOG_PERF_SHELL_N=500 python robodog_terminal/perf_shell.py
+
+Pass criteria: identical results, and
+  ROBODOG_PERF_MIN_SHELL_SPEEDUP (default 1.5)
+      one-shot time / persistent time for the N commands (the one-shot path
+      starts no threads since the reactor, so what's left is the fork/exec)
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+COMMANDS = (
+    "echo step {i}",
+    "test -d . && printf 'ok %s\\n' {i}",
+    "ls -d .",
+    "false",
+    "echo warn {i} >&2",
+)
+
+
+def _run(wd: Path, persistent: bool, n: int):
+    os.environ["ROBODOG_PERSISTENT_SHELL"] = "1" if persistent else "0"
+    reg = default_registry(str(wd))
+    try:
+        reg.execute("bash", {"command": "true"})       # the session's cold start
+        results = []
+        t0 = time.perf_counter()
+        for i in range(n):
+            results.append(reg.execute("bash", {"command": COMMANDS[i % len(COMMANDS)]
+                                                .format(i=i)}))
+        return time.perf_counter() - t0, results
+    finally:
+        reg.close()
+
+
+def main() -> int:
+    if os.name == "nt":
+        print("SKIP: POSIX only (Windows uses the PowerShell session)")
+        return 0
+    n = int(os.environ.get("ROBODOG_PERF_SHELL_N", "100"))
+    min_speedup = float(os.environ.get("ROBODOG_PERF_MIN_SHELL_SPEEDUP", "1.5"))
+    saved = os.environ.get("ROBODOG_PERSISTENT_SHELL")
+    wd = Path(tempfile.mkdtemp(prefix="rd_perf_shell_"))
+    try:
+        one_shot, want = _run(wd, False, n)
+        persistent, got = _run(wd, True, n)
+    finally:
+        if saved is None:
+            os.environ.pop("ROBODOG_PERSISTENT_SHELL", None)
+        else:
+            os.environ["ROBODOG_PERSISTENT_SHELL"] = saved
+        shutil.rmtree(wd, ignore_errors=True)
+
+    same = got == want
+    speedup = one_shot / max(persistent, 1e-9)
+    print(f"{n} commands")
+    print(f"  one-shot /bin/sh -c : {one_shot:7.3f}s  ({one_shot / n * 1000:6.2f} ms/call)")
+    print(f"  persistent session  : {persistent:7.3f}s  ({persistent / n * 1000:6.2f} ms/call)")
+    print(f"  speedup             : {speedup:7.1f}x  (need >= {min_speedup})")
+    print(f"  identical results   : {same}")
+    passed = same and speedup >= min_speedup
+    print("\nPERF SHELL:", "PASS" if passed else "FAIL")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
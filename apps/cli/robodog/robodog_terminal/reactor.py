@@ -0,0 +1,381 @@
+# file: robodog_terminal/reactor.py
+"""
+One process-wide I/O reactor for child-process output (POSIX).
+
+Every _run_streaming call used to start three daemon threads (a reader per
+pipe and an idle watcher polling proc.poll() once a second), and every
+BackgroundManager.spawn_bash task a worker thread plus a threading.Timer for
+its timeout. With background tasks and fanned-out subagents all running
+shell commands, thread count grew with the number of commands in flight.
+
+Here a single daemon thread owns every watched child:
+
+  - its pipes are registered with one selector (epoll/kqueue), read
+    non-blocking, split into lines and handed to per-pipe sinks;
+  - its exit is seen through a pidfd where the OS has them (Linux 5.3+),
+    otherwise by a poll on the timer wheel;
+  - idle notices and timeouts are entries on one hashed timer wheel
+    (_TICK resolution), so a thousand quiet commands cost a thousand list
+    entries, not a thousand sleeping threads. A timeout SIGKILLs the
+    child's process group (children are started with start_new_session).
+
+A watch is done once the child has exited and its pipes are at EOF — or
+_EXIT_GRACE seconds after the exit if something it started in the
+background still holds them open (the old reader threads were joined with
+the same 5s bound).
+
+Sinks and callbacks run on the reactor thread: they must be quick (append
+to a list, hand a line to the UI) and never block. Exceptions from them are
+logged and swallowed. Windows pipes aren't selectable, so available() is
+False there and callers keep their thread-based path.
+"""
+from __future__ import annotations
+
+import collections
+import logging
+import math
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from typing import IO, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TICK = 0.1            # timer wheel resolution, seconds
+_SLOTS = 512           # ~51s per revolution; later timers wait out extra laps
+_EXIT_GRACE = 5.0      # after exit, how long to wait for pipes held by orphans
+_POLL_EVERY = 0.25     # exit polling interval when there are no pidfds
+
+Sink = Callable[[str], None]
+
+
+def available() -> bool:
+    """True where child pipes can be selected on (everything but Windows)."""
+    return os.name != "nt"
+
+
+class _Timer:
+    __slots__ = ("tick", "fn", "cancelled")
+
+    def __init__(self, tick: int, fn: Callable[[], None]):
+        self.tick = tick
+        self.fn = fn
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class _TimerWheel:
+    """A hashed timer wheel: timer t sits in slot t.tick % _SLOTS, and each
+    advance visits only the slots of the ticks that have passed. Not
+    thread-safe — it belongs to the reactor thread."""
+
+    def __init__(self, now: float):
+        self._slots: List[List[_Timer]] = [[] for _ in range(_SLOTS)]
+        self._cursor = int(now / _TICK)    # the last tick processed
+        self._count = 0
+
+    def add(self, when: float, fn: Callable[[], None]) -> _Timer:
+        timer = _Timer(max(math.ceil(when / _TICK), self._cursor + 1), fn)
+        self._slots[timer.tick % _SLOTS].append(timer)
+        self._count += 1
+        return timer
+
+    def next_timeout(self, now: float) -> Optional[float]:
+        """Seconds until the next tick, or None when nothing is scheduled."""
+        if not self._count:
+            return None
+        return max(0.0, (self._cursor + 1) * _TICK - now)
+
+    def advance(self, now: float) -> List[_Timer]:
+        """Take every timer due by `now` out of the wheel, in tick order."""
+        target = int(now / _TICK)
+        if not self._count or target <= self._cursor:
+            self._cursor = max(self._cursor, target)
+            return []
+        if target - self._cursor >= _SLOTS:
+            indices = range(_SLOTS)                  # a full lap: every slot
+        else:
+            indices = (t % _SLOTS for t in range(self._cursor + 1, target + 1))
+        due: List[_Timer] = []
+        for i in indices:
+            slot = self._slots[i]
+            if slot:
+                keep = [t for t in slot if t.tick > target]
+                due.extend(t for t in slot if t.tick <= target)
+                self._slots[i] = keep
+        self._cursor = target
+        self._count -= len(due)
+        due.sort(key=lambda t: t.tick)
+        return [t for t in due if not t.cancelled]
+
+
+class Watch:
+    """One child process under the reactor. wait() blocks until it's done;
+    then `returncode` and `timed_out` are final."""
+
+    def __init__(self, proc: subprocess.Popen, pipes: Sequence[Tuple[IO, Sink]],
+                 timeout: Optional[float], idle_seconds: Optional[float],
+                 on_idle: Optional[Callable[[float], None]],
+                 on_timeout: Optional[Callable[[], None]],
+                 on_done: Optional[Callable[["Watch"], None]]):
+        self.proc = proc
+        self.timed_out = False
+        self.returncode: Optional[int] = None
+        self._pipes = {p.fileno(): [p, sink, b""] for p, sink in pipes}
+        self._timeout = timeout
+        self._idle_seconds = idle_seconds
+        self._on_idle = on_idle
+        self._on_timeout = on_timeout
+        self._on_done = on_done
+        self._pidfd: Optional[int] = None
+        # One pending timer per purpose ("timeout", "idle", "poll", "grace"):
+        # a reschedule replaces its slot, so a long quiet or pidfd-less watch
+        # doesn't pile up fired timers.
+        self._timers: Dict[str, _Timer] = {}
+        self._last_activity = time.monotonic()
+        self._exited = False
+        self._done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the watch is done; False if `timeout` ran out first."""
+        return self._done.wait(timeout)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+
+class Reactor:
+    """The selector loop. Use the process-wide instance from get()."""
+
+    def __init__(self):
+        self._sel = selectors.DefaultSelector()
+        self._wheel = _TimerWheel(time.monotonic())
+        self._calls: Deque[Callable[[], None]] = collections.deque()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, self._drain_calls)
+        self._watches = 0
+        self._thread = threading.Thread(target=self._loop, name="robodog-reactor",
+                                        daemon=True)
+        self._thread.start()
+
+    # ---- any thread --------------------------------------------------------------------
+    def watch(self, proc: subprocess.Popen, pipes: Sequence[Tuple[IO, Sink]],
+              timeout: Optional[float] = None, idle_seconds: Optional[float] = None,
+              on_idle: Optional[Callable[[float], None]] = None,
+              on_timeout: Optional[Callable[[], None]] = None,
+              on_done: Optional[Callable[[Watch], None]] = None) -> Watch:
+        """Start watching `proc`: each line read from a pipe goes to its sink
+        (decoded UTF-8, newline stripped). `on_idle(seconds_quiet)` fires
+        after `idle_seconds` with no output and again every `idle_seconds`
+        of continued silence; past `timeout` the process group is killed and
+        `on_timeout()` called. `on_done(watch)` runs once when it's over.
+        Nothing else may read the pipes: the reactor reads their file
+        descriptors directly and decodes the bytes itself."""
+        w = Watch(proc, pipes, timeout, idle_seconds, on_idle, on_timeout, on_done)
+        self.call_soon(lambda: self._start(w))
+        return w
+
+    def call_soon(self, fn: Callable[[], None]) -> None:
+        """Run fn on the reactor thread."""
+        self._calls.append(fn)
+        try:
+            os.write(self._wake_w, b"x")
+        except BlockingIOError:
+            pass                     # the pipe is full of wakeups already
+
+    def active(self) -> int:
+        """How many watches are running (approximate off-thread)."""
+        return self._watches
+
+    # ---- reactor thread ------------------------------------------------------------------
+    def _loop(self) -> None:
+        while True:
+            try:
+                events = self._sel.select(self._wheel.next_timeout(time.monotonic()))
+                for key, _mask in events:
+                    key.data(key.fd)
+                for timer in self._wheel.advance(time.monotonic()):
+                    timer.fn()
+            except Exception:
+                logger.exception("reactor iteration failed")
+
+    def _drain_calls(self, _fd: int) -> None:
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self._calls:
+            fn = self._calls.popleft()
+            try:
+                fn()
+            except Exception:
+                logger.exception("reactor call failed")
+
+    def _start(self, w: Watch) -> None:
+        self._watches += 1
+        now = time.monotonic()
+        for fd, (pipe, _sink, _buf) in w._pipes.items():
+            os.set_blocking(fd, False)
+            self._sel.register(fd, selectors.EVENT_READ, lambda fd, w=w: self._read(w, fd))
+        try:
+            w._pidfd = os.pidfd_open(w.proc.pid)
+            self._sel.register(w._pidfd, selectors.EVENT_READ, lambda _fd, w=w: self._reap(w))
+        except (AttributeError, OSError):
+            w._pidfd = None          # no pidfds here (or the child is already reaped)
+            self._schedule_poll(w)
+        if w._timeout:
+            self._arm(w, "timeout", now + w._timeout, lambda: self._expire(w))
+        if w._idle_seconds and w._on_idle is not None:
+            self._arm(w, "idle", now + w._idle_seconds, lambda: self._idle(w))
+        if w.proc.poll() is not None:
+            self._reap(w)
+
+    def _read(self, w: Watch, fd: int) -> None:
+        state = w._pipes.get(fd)
+        if state is None:
+            return
+        try:
+            chunk = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b""
+        if not chunk:
+            if state[2]:
+                self._deliver(state[1], state[2])
+            self._close_pipe(w, fd)
+            self._maybe_finish(w)
+            return
+        w._last_activity = time.monotonic()
+        *lines, state[2] = (state[2] + chunk).split(b"\n")
+        for raw in lines:
+            self._deliver(state[1], raw)
+
+    @staticmethod
+    def _deliver(sink: Sink, raw: bytes) -> None:
+        try:
+            sink(raw.decode("utf-8", errors="replace").rstrip("\r"))
+        except Exception:
+            logger.exception("output sink failed")   # a UI error must never stop the reactor
+
+    def _close_pipe(self, w: Watch, fd: int) -> None:
+        pipe = w._pipes.pop(fd)[0]
+        try:
+            self._sel.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+        try:
+            pipe.close()
+        except Exception:
+            pass
+
+    def _arm(self, w: Watch, name: str, when: float, fn: Callable[[], None]) -> None:
+        old = w._timers.get(name)
+        if old is not None:
+            old.cancel()             # a no-op once it has fired
+        w._timers[name] = self._wheel.add(when, fn)
+
+    def _schedule_poll(self, w: Watch) -> None:
+        def _poll():
+            if w.proc.poll() is not None:
+                self._reap(w)
+            elif not w.done():
+                self._schedule_poll(w)
+        self._arm(w, "poll", time.monotonic() + _POLL_EVERY, _poll)
+
+    def _reap(self, w: Watch) -> None:
+        if w._exited:
+            return
+        if w.proc.poll() is None:
+            return                   # spurious wakeup
+        w._exited = True
+        if w._pidfd is not None:
+            self._sel.unregister(w._pidfd)
+            os.close(w._pidfd)
+            w._pidfd = None
+        if w._pipes:
+            self._arm(w, "grace", time.monotonic() + _EXIT_GRACE, lambda: self._finish(w))
+        self._maybe_finish(w)
+
+    def _idle(self, w: Watch) -> None:
+        if w.done():
+            return
+        now = time.monotonic()
+        quiet = now - w._last_activity
+        if quiet >= w._idle_seconds:
+            try:
+                w._on_idle(quiet)
+            except Exception:
+                logger.exception("idle callback failed")
+            nxt = now + w._idle_seconds
+        else:
+            nxt = w._last_activity + w._idle_seconds
+        self._arm(w, "idle", nxt, lambda: self._idle(w))
+
+    def _expire(self, w: Watch) -> None:
+        if w.done() or w._exited:
+            return
+        w.timed_out = True
+        if w._on_timeout is not None:
+            try:
+                w._on_timeout()
+            except Exception:
+                logger.exception("timeout callback failed")
+        kill_group(w.proc)
+
+    def _maybe_finish(self, w: Watch) -> None:
+        if w._exited and not w._pipes:
+            self._finish(w)
+
+    def _finish(self, w: Watch) -> None:
+        if w.done():
+            return
+        for fd in list(w._pipes):
+            state = w._pipes[fd]
+            if state[2]:
+                self._deliver(state[1], state[2])
+            self._close_pipe(w, fd)
+        for timer in w._timers.values():
+            timer.cancel()
+        w._timers.clear()
+        w.returncode = w.proc.returncode
+        self._watches -= 1
+        w._done.set()
+        if w._on_done is not None:
+            try:
+                w._on_done(w)
+            except Exception:
+                logger.exception("done callback failed")
+
+
+def kill_group(proc: subprocess.Popen) -> None:
+    """SIGKILL proc's process group (it must lead one: start_new_session=True),
+    falling back to the process itself. Never blocks."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+_reactor: Optional[Reactor] = None
+_reactor_lock = threading.Lock()
+
+
+def get() -> Reactor:
+    """The process-wide reactor, started on first use."""
+    global _reactor
+    with _reactor_lock:
+        if _reactor is None:
+            _reactor = Reactor()
+        return _reactor
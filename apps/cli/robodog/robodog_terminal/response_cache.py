@@ -0,0 +1,265 @@
+# file: robodog_terminal/response_cache.py
+"""
+Opt-in, content-addressed on-disk cache of LLM responses.
+
+Re-running the same headless `-p` prompt, the same subagent task in
+perf_fanout.py, or the same selftest makes byte-identical model calls every
+time. CachingClient wraps any LLMClient and keys each call by a SHA-256 of
+(model, context, prompt, max_tokens, temperature); a chat array is keyed by
+its flattened form (flatten_messages), and the wrapper always advertises the
+chat layout, so a --prompt-cache loop makes the same keyed calls against a
+chat backend, a prompt-in backend, or a replay with no backend at all.
+
+Modes (--llm-cache / ROBODOG_LLM_CACHE):
+  cache  : read-through — a fresh entry is served, a miss calls the backend
+           and stores the reply.
+  record : always call the backend and (over)write the entry — capture a
+           live session for later replay.
+  replay : serve ONLY from the cache, with no backend at all (a miss is an
+           error) — deterministic, offline, full-speed runs of AgentLoop.
+
+Entries live one JSON file each under ROBODOG_LLM_CACHE_DIR (default
+~/.robodog/llm_cache/<k[:2]>/<k>.json). Least-recently-used entries are
+evicted past ROBODOG_LLM_CACHE_MAX_MB (default 200); `cache` mode treats
+entries older than ROBODOG_LLM_CACHE_TTL_S (default 7 days) as misses,
+`replay` ignores the TTL (a recording doesn't go stale).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from .llm_client import Completion, LLMClient, _replay_chunks, flatten_messages
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "cache", "record", "replay")
+_DEFAULT_MAX_MB = 200
+_DEFAULT_TTL_S = 7 * 24 * 3600
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+def cache_mode(explicit: Optional[str] = None) -> str:
+    """Effective mode: the flag, else ROBODOG_LLM_CACHE, else "off"."""
+    mode = (explicit or os.environ.get("ROBODOG_LLM_CACHE") or "off").strip().lower()
+    return mode if mode in MODES else "off"
+
+
+def model_id(client: LLMClient) -> str:
+    """What a client's replies depend on besides the prompt: its model id
+    (OpenAI-compatible), engine id (gateway), or backend name."""
+    return (getattr(client, "model", None) or getattr(client, "engine_id", None)
+            or client.name)
+
+
+class ResponseCache:
+    """The on-disk store. Recency is the file mtime (touched on every hit),
+    so LRU order survives restarts without an index file."""
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None,
+                 ttl_s: Optional[float] = None):
+        env_dir = os.environ.get("ROBODOG_LLM_CACHE_DIR")
+        self.root = Path(root or env_dir or Path.home() / ".robodog" / "llm_cache")
+        self.max_bytes = int(max_bytes if max_bytes is not None else
+                             _env_float("ROBODOG_LLM_CACHE_MAX_MB", _DEFAULT_MAX_MB)
+                             * 1024 * 1024)
+        self.ttl_s = ttl_s if ttl_s is not None else _env_float(
+            "ROBODOG_LLM_CACHE_TTL_S", _DEFAULT_TTL_S)
+        self.hits = self.misses = self.stores = self.evictions = 0
+        self._total: Optional[int] = None      # bytes on disk, scanned lazily
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, context: str, prompt: str, max_tokens: int,
+            temperature: float) -> str:
+        blob = json.dumps([model, context, prompt, int(max_tokens), float(temperature)],
+                          ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8", "replace")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str, honor_ttl: bool = True) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if honor_ttl and self.ttl_s and time.time() - record.get("created", 0) > self.ttl_s:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)           # LRU: a hit is a use
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        path = self._path(key)
+        data = json.dumps(dict(record, created=time.time()), ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old = path.stat().st_size if path.exists() else 0
+            tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.debug("llm cache: store failed: %s", exc)
+            return
+        with self._lock:
+            self.stores += 1
+            if self._total is None:
+                self._total = self._scan_total()
+            else:
+                self._total += size - old
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[os.DirEntry]:
+        out = []
+        if not self.root.is_dir():
+            return out
+        for sub in os.scandir(self.root):
+            if sub.is_dir():
+                out.extend(e for e in os.scandir(sub.path) if e.name.endswith(".json"))
+        return out
+
+    def _scan_total(self) -> int:
+        return sum(e.stat().st_size for e in self._entries())
+
+    def _evict(self) -> None:
+        """Drop least-recently-used entries until 90% of the budget (caller
+        holds the lock)."""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        for e in entries:
+            if self._total <= target:
+                break
+            size = e.stat().st_size
+            if self._remove(Path(e.path)):
+                self._total -= size
+                self.evictions += 1
+
+    @staticmethod
+    def _remove(path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except OSError:
+            return False
+
+
+class CachingClient(LLMClient):
+    """LLMClient wrapper that serves/records replies through a ResponseCache.
+    Anything else (model, url, diagnose, on_retry…) is the wrapped client's;
+    in replay mode there is no wrapped client and `model` names the recording."""
+
+    def __init__(self, inner: Optional[LLMClient], mode: str = "cache",
+                 cache: Optional[ResponseCache] = None, model: Optional[str] = None):
+        if mode not in ("cache", "record", "replay"):
+            raise ValueError(f"CachingClient mode must be cache/record/replay, not {mode!r}")
+        if inner is None and mode != "replay":
+            raise ValueError("CachingClient needs a backend client unless replaying")
+        self.inner = inner
+        self.mode = mode
+        self.cache = cache or ResponseCache()
+        self.model = model or (model_id(inner) if inner is not None else "")
+        self.name = inner.name if inner is not None else "replay"
+        # Always the chat layout, so a loop's calls are keyed the same whether
+        # or not the backend (or, in replay, no backend) takes a real chat
+        # array: chat calls are keyed by their flattened form, and a
+        # prompt-in backend gets that same flattened form (the base
+        # complete_chat). Otherwise a --prompt-cache session recorded against
+        # a chat backend would never hit on replay.
+        self.supports_messages = True
+
+    def __getattr__(self, attr):
+        inner = self.__dict__.get("inner")
+        if inner is None:
+            raise AttributeError(attr)
+        return getattr(inner, attr)
+
+    def _lookup(self, context, prompt, max_tokens, temperature):
+        key = ResponseCache.key(self.model, context, prompt, max_tokens, temperature)
+        if self.mode == "record":
+            return key, None
+        record = self.cache.get(key, honor_ttl=self.mode == "cache")
+        if record is None and self.mode == "replay":
+            raise RuntimeError(
+                f"llm cache replay: no recorded response for this call (model "
+                f"{self.model!r}, key {key[:12]}) — record it first with "
+                f"--llm-cache record")
+        if record is None:
+            return key, None
+        return key, Completion(text=record.get("text", ""),
+                               prompt_tokens=record.get("prompt_tokens", 0),
+                               completion_tokens=record.get("completion_tokens", 0),
+                               raw={"llm_cache": "hit"},
+                               finish_reason=record.get("finish_reason", ""),
+                               cached_tokens=record.get("cached_tokens", 0))
+
+    def _store(self, key: str, completion: Completion) -> Completion:
+        if (completion.text or "").strip():
+            self.cache.put(key, {"text": completion.text,
+                                 "prompt_tokens": completion.prompt_tokens,
+                                 "completion_tokens": completion.completion_tokens,
+                                 "finish_reason": completion.finish_reason,
+                                 "cached_tokens": completion.cached_tokens})
+        return completion
+
+    def complete(self, prompt, context="", max_tokens=8192, temperature=0.3) -> Completion:
+        key, hit = self._lookup(context, prompt, max_tokens, temperature)
+        if hit is not None:
+            return hit
+        return self._store(key, self.inner.complete(
+            prompt, context=context, max_tokens=max_tokens, temperature=temperature))
+
+    def complete_stream(self, prompt, context="", max_tokens=8192, temperature=0.3,
+                        on_delta: Optional[Callable[[str], None]] = None) -> Completion:
+        key, hit = self._lookup(context, prompt, max_tokens, temperature)
+        if hit is not None:
+            _replay_chunks(hit.text, on_delta)
+            return hit
+        return self._store(key, self.inner.complete_stream(
+            prompt, context=context, max_tokens=max_tokens, temperature=temperature,
+            on_delta=on_delta))
+
+    def complete_chat(self, messages, max_tokens=8192, temperature=0.3, on_delta=None,
+                      cache_breakpoints=()) -> Completion:
+        context, prompt = flatten_messages(messages)
+        key, hit = self._lookup(context, prompt, max_tokens, temperature)
+        if hit is not None:
+            _replay_chunks(hit.text, on_delta)
+            return hit
+        return self._store(key, self.inner.complete_chat(
+            messages, max_tokens=max_tokens, temperature=temperature, on_delta=on_delta,
+            cache_breakpoints=cache_breakpoints))
+
+
+def wrap_client(client: LLMClient, mode: str, model: Optional[str] = None) -> LLMClient:
+    """`client` behind the response cache for `mode` ("off" returns it as-is)."""
+    if mode == "off":
+        return client
+    if mode == "replay":
+        return CachingClient(None, "replay", model=model or model_id(client))
+    return CachingClient(client, mode, model=model)
@@ -48,11 +48,29 @@ SUITES = [
     "test_turnrunner.py",     # threaded turns: cancel/background/queue
     "test_rendering.py",      # banner, status, diff, markdown, clickable links, /open
     "test_llm_client.py",     # the gateway/OpenAI-compat wire + retry + factory
+    "test_transport.py",      # shared pooled keep-alive session + connect/TLS/TTFB timings
+    "test_response_cache.py", # on-disk LLM response cache: cache / record / replay
+    "test_hedging.py",        # hedged LLM calls, failover, backend health routing
+    "test_grep_index.py",     # trigram index behind grep: narrowing, freshness, persistence
+    "test_grep_engine.py",    # streaming grep: scandir walk, cap/early stop, context, count
+    "test_file_tree.py",      # shared dir snapshot behind glob / basename hints
+    "test_ignore.py",         # .gitignore/.robodogignore matcher shared by every walker
+    "test_line_index.py",     # windowed / tail read_file of huge files via a line index
+    "test_edit_match.py",     # linear-time fuzzy edit match, nearest-miss hints, one-pass multi_edit
+    "test_read_dedup.py",     # unchanged re-reads become stubs while the original is visible
+    "test_verify.py",         # post-edit syntax check: in-memory text, hash cache, warm node worker
+    "test_batch_tools.py",    # read_many / edit_many: many files in one atomic call
+    "test_diffing.py",        # edit diff preview: trimmed / patience diff, size cutoff, line cap
+    "test_posix_shell.py",    # persistent bash session behind the bash tool: framing, state, resets
+    "test_reactor.py",        # one selector thread for child output: timer wheel, timeouts, no thread per command
+    "test_impact.py",         # run_tests scope=impacted: import graph, result cache, background rest
+    "test_testreport.py",     # run_tests: junit failure records, sharded pytest runs
     "test_loop_checkpoint.py",# loop trim/nudge/breaker/cancel + checkpointer + tool safety
     "test_app.py",            # headless -p, CLI flags, interactive REPL drive, agents bg
     "test_integration.py",    # plan mode, @-mentions, bg-bash hook, wiring
     "test_regressions.py",    # one assertion per REAL live-session failure scenario
     "test_core.py",           # build_core(): no-UI embedding seam, safe defaults, gating
+    "test_tokens.py",         # offline tokenizer layer + token-budget trim/compaction
 ]
 
 # Opt-in LIVE suites (network / real browser / real LLM). Off by default so
@@ -61,6 +79,10 @@ SUITES = [
 #   ROBODOG_LIVE=1 python robodog_terminal/run_tests.py   (live web/API/playwright E2E)
 if os.environ.get("ROBODOG_PERF") == "1":
     SUITES.append("perf_fanout.py")   # live subagent fan-out concurrency benchmark
+    SUITES.append("perf_render.py")   # offline incremental prompt-render micro-benchmark
+    SUITES.append("perf_grep.py")     # offline grep benchmark: old loop vs engine vs trigram index
+    SUITES.append("perf_checkpoint.py")  # offline checkpoint store: full copies vs deltas
+    SUITES.append("perf_shell.py")    # offline bash tool: one-shot /bin/sh vs the persistent session
 if os.environ.get("ROBODOG_LIVE") == "1":
     SUITES.append("test_live_web.py")  # parallel live-site fetch, polyglot squad, playwright
 
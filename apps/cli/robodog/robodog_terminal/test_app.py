@@ -199,25 +199,27 @@ def main() -> int:
     check("no session to resume" in out, "--resume with bad id falls back fresh")
 
     # ---------------- checkpoint prune + corrupt manifest ----------------
-    from robodog_terminal.checkpoint import Checkpointer, MAX_SNAPSHOTS
+    from robodog_terminal.checkpoint import Checkpointer
     cw = Path(tempfile.mkdtemp(prefix="rd_ck_"))
     cp = Checkpointer(cw / "ck")
     (cw / "ck" / "manifest.jsonl").write_text('{"broken json\n', encoding="utf-8")
     cp2 = Checkpointer(cw / "ck")  # tolerant load
     check(cp2.markers() == {}, "checkpointer tolerates corrupt manifest line")
     f = cw / "many.txt"
-    for i in range(MAX_SNAPSHOTS + 5):
+    cp2.max_bytes = 2_000
+    for i in range(105):
+        cp2.set_marker(i)
         f.write_text(f"v{i}", encoding="utf-8")
         cp2.snapshot(f)
-    live = [e for e in cp2._entries if e["snap"]]
-    check(len(live) <= MAX_SNAPSHOTS, f"prune caps snapshots at {MAX_SNAPSHOTS}")
+    check(cp2.stats()["stored_bytes"] <= 2_000 and cp2.stats()["snapshots"] < 105,
+          "prune keeps snapshots within the size budget")
 
     # ---------------- background bash timeout path ------------------------
     from robodog_terminal.background import BackgroundManager as BM
     bm = BM()
     t0 = time.time()
     task = bm.spawn_bash("Start-Sleep -Seconds 30", str(cw), timeout=2)
-    task.thread.join(timeout=15)
+    task.join(timeout=15)
     check(task.status in ("done", "failed", "killed") and time.time() - t0 < 15,
           f"spawn_bash timeout enforced ({task.status})")
 
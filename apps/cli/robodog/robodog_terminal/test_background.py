@@ -71,8 +71,7 @@ def main() -> int:
     print("=== 2. spawn_bash echo ===")
     mgr2 = BackgroundManager()
     t2 = mgr2.spawn_bash("echo line1; echo line2", cwd=cwd)
-    t2.thread.join(30)
-    check(not t2.thread.is_alive(), "bash task finished")
+    check(t2.join(30), "bash task finished")
     check(t2.status == "done", f"status is done (got {t2.status})")
     out = mgr2.output(t2.id)
     check("line1" in out, "output() contains line1")
@@ -114,9 +113,9 @@ def main() -> int:
     msg = mgr4.kill(t4.id)
     check(msg.startswith("Killed"), f"kill() confirms (got {msg!r})")
     check(t4.status == "killed", f"status is killed (got {t4.status})")
-    t4.thread.join(5)
+    stopped = t4.join(5)
     joined = time.time() - killed_at
-    check(not t4.thread.is_alive(), f"worker thread joined within ~5s ({joined:.1f}s)")
+    check(stopped, f"worker stopped within ~5s ({joined:.1f}s)")
     check(t4.cancel_event.is_set(), "cancel_event was set")
     check(mgr4.running_count() == 0, "running_count back to 0 after kill")
     notes4 = mgr4.drain_notifications()
@@ -0,0 +1,137 @@
+# file: robodog_terminal/test_batch_tools.py
+"""
+Tests for read_many / edit_many: several files and line ranges read in one
+call (and counted as read, so edits are allowed), edits across files applied
+all-or-nothing with one diff and per-file verify results, the usual refusals
+(unread, stale, listed twice), a failed write rolling back every file
+(the one that failed included), and read_many being parallel-safe while
+edit_many is not.
+Run: python robodog_terminal/test_batch_tools.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal.loop import _batch_parallel_safe               # noqa: E402
+from robodog_terminal.toolcall import ToolCall                       # noqa: E402
+from robodog_terminal import tools as tools_mod                       # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_bt_"))
+    (wd / "pkg").mkdir()
+    for name in ("a", "b", "c"):
+        (wd / "pkg" / f"{name}.py").write_text(
+            "".join(f"{name}{i} = old_name({i})\n" for i in range(1, 21)), encoding="utf-8")
+    reg = default_registry(str(wd))
+
+    # ---- read_many ------------------------------------------------------------------
+    out = reg.execute("read_many", {"paths": "pkg/a.py\npkg/b.py:3-4, pkg/c.py:-2"})
+    check(out.startswith("3 file(s):") and "=== pkg/a.py ===\n1\ta1 = old_name(1)" in out,
+          "read_many: one section per entry, read_file numbering")
+    check("=== pkg/b.py:3-4 ===\n3\tb3 = old_name(3)\n4\tb4 = old_name(4)\n===" in out,
+          "read_many: path:START-END is 1-based and inclusive")
+    check(out.endswith("=== pkg/c.py:-2 ===\n19\tc19 = old_name(19)\n20\tc20 = old_name(20)"),
+          "read_many: path:-N is a tail")
+    out = reg.execute("read_many", {"paths": "pkg/a.py\npkg/nope.py"})
+    check("=== pkg/nope.py ===\nERROR: file not found" in out and "a1 = old_name" in out,
+          "read_many: a missing file is reported in its own section")
+    check(_batch_parallel_safe(reg, [ToolCall("read_many", {"paths": "x"}, ""),
+                                     ToolCall("grep", {"pattern": "y"}, "")])
+          and not _batch_parallel_safe(reg, [ToolCall("read_many", {"paths": "x"}, ""),
+                                             ToolCall("edit_many", {"edits": "y"}, "")]),
+          "read_many is parallel-safe; edit_many is not")
+
+    # ---- edit_many -------------------------------------------------------------------
+    diffs = []
+    reg.on_diff = lambda p, d: diffs.append((p, d))
+    edits = ("FILE: pkg/a.py\na1 = old_name(1)>>>a1 = new_name(1)\n===\n"
+             "a2 = old_name(2)>>>a2 = new_name(2)\n===\n"
+             "FILE: pkg/b.py\nb3 = old_name(3)>>>b3 = new_name(3)\n")
+    r = reg.execute("edit_many", {"edits": edits})
+    a_txt = (wd / "pkg" / "a.py").read_text()
+    check(r.startswith("Applied 3 edits across 2 file(s) atomically:")
+          and "a1 = new_name(1)\na2 = new_name(2)\na3 = old_name(3)" in a_txt
+          and "b3 = new_name(3)" in (wd / "pkg" / "b.py").read_text(),
+          "edit_many: every edit in every file is applied")
+    check(len(diffs) == 1 and "+a1 = new_name(1)" in diffs[0][1]
+          and "+b3 = new_name(3)" in diffs[0][1], "edit_many: one combined diff")
+
+    before = {n: (wd / "pkg" / f"{n}.py").read_text() for n in "abc"}
+    r = reg.execute("edit_many", {"edits": "FILE: pkg/a.py\na4 = old_name(4)>>>x\n===\n"
+                                           "FILE: pkg/c.py\nnot there>>>y\n"})
+    check("pkg/c.py: edit #1 not found" in r and "NO files changed" in r
+          and all((wd / "pkg" / f"{n}.py").read_text() == before[n] for n in "abc"),
+          "edit_many: one failing edit leaves every file untouched")
+    r = reg.execute("edit_many", {"edits": "FILE: pkg/a.py\na4>>>x\n===\nFILE: pkg/a.py\na5>>>y\n"})
+    check("listed twice" in r, "edit_many: a file listed twice is refused")
+    r = reg.execute("edit_many", {"edits": "a4>>>x"})
+    check("FILE: <path>" in r, "edit_many: edits without a FILE: line are refused")
+    (wd / "pkg" / "notes.md").write_text("FILE: old.txt\n", encoding="utf-8")
+    reg.execute("read_file", {"path": "pkg/notes.md"})
+    r = reg.execute("edit_many", {"edits": "FILE: pkg/notes.md\nFILE: old.txt>>>FILE: new.txt"})
+    check(r.startswith("Applied 1 edits")
+          and (wd / "pkg" / "notes.md").read_text() == "FILE: new.txt\n",
+          "edit_many: a 'FILE:' line inside an edit is content, not a header")
+    r = reg.execute("edit_many", {"edits": "FILE: pkg/notes.md\n"})
+    check(r.startswith("ERROR: ") and "notes.md: no edits provided." in r
+          and r.endswith("NO files changed."), "edit_many: a file with no edits names it")
+
+    (wd / "pkg" / "d.py").write_text("d = 1\n", encoding="utf-8")
+    r = reg.execute("edit_many", {"edits": "FILE: pkg/a.py\na6 = old_name(6)>>>z\n===\n"
+                                           "FILE: pkg/d.py\nd = 1>>>d = 2\n"})
+    check("read it first" in r and "a6 = old_name(6)" in (wd / "pkg" / "a.py").read_text(),
+          "edit_many: an unread file blocks the whole batch")
+    st = (wd / "pkg" / "b.py").stat()
+    os.utime(wd / "pkg" / "b.py", (st.st_atime + 100, st.st_mtime + 100))
+    r = reg.execute("edit_many", {"edits": "FILE: pkg/b.py\nb5 = old_name(5)>>>z\n"})
+    check("CHANGED ON DISK" in r, "edit_many: a stale file blocks the batch")
+
+    reg.execute("read_many", {"paths": "pkg/b.py, pkg/c.py"})
+    r = reg.execute("edit_many", {"edits": "FILE: pkg/b.py\nb5 = old_name(5)>>>b5 = (\n===\n"
+                                           "FILE: pkg/c.py\nc5 = old_name(5)>>>c5 = 5\n"})
+    check("Applied 2 edits" in r and "VERIFY FAILED: " in r and r.count("VERIFY FAILED") == 1
+          and "b.py" in r.split("VERIFY FAILED")[1],
+          "edit_many: files read via read_many can be edited; verify names the broken file")
+
+    before = {n: (wd / "pkg" / f"{n}.py").read_text() for n in "bc"}
+    real_open = open
+
+    def failing_open(path, mode="r", *a, **kw):
+        fh = real_open(path, mode, *a, **kw)
+        if "w" in mode and Path(path).name == "c.py" and fh.tell() == 0 and failing_open.armed:
+            failing_open.armed = False
+            fh.write("c1 = hal")                    # half-written, then the disk is full
+            fh.close()
+            raise OSError(28, "No space left on device")
+        return fh
+    failing_open.armed = True
+    tools_mod.open = failing_open
+    try:
+        r = reg.execute("edit_many", {"edits": "FILE: pkg/b.py\nb5 = (>>>b5 = 5\n===\n"
+                                               "FILE: pkg/c.py\nc5 = 5>>>c5 = 6\n"})
+    finally:
+        del tools_mod.open
+    check("writing" in r and "NO files changed" in r
+          and all((wd / "pkg" / f"{n}.py").read_text() == before[n] for n in "bc"),
+          "edit_many: a failed write restores every file, the failing one included")
+
+    print("\nBATCH TOOLS:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
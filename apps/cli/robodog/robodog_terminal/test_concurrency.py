@@ -75,7 +75,7 @@ def main() -> int:
     task2 = mgr.spawn_bash("echo second", tempfile.mkdtemp())
     check(mgr.running_count() >= 1, "second task spawned alongside the first")
     # now let them finish
-    task.thread.join(timeout=10)
+    task.join(timeout=10)
     notes = mgr.drain_notifications()
     check(any(task.id in nt for nt in notes), "completion notification fired for bg task")
 
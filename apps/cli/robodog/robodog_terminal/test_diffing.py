@@ -0,0 +1,159 @@
+# file: robodog_terminal/test_diffing.py
+"""
+Tests for diffing.py: every diff (difflib path and patience path) applies
+back to the new text, a plain edit matches difflib byte for byte, a huge
+change degrades to a summary hunk, max_lines caps the whole output (headers
+and the count of what's left included, so the UI preview shows all of it),
+and the registry only builds a diff when on_diff is wired.
+Run: python robodog_terminal/test_diffing.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import contextlib
+import difflib
+import io
+import random
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import diffing                                 # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _apply(a, diff):
+    """Apply a unified diff to the line list `a` (strict: context must match)."""
+    lines = diff.splitlines(keepends=True)[2:]
+    out, pos, k = [], 0, 0
+    while k < len(lines):
+        m = re.match(r"@@ -(\d+)(?:,(\d+))? \+", lines[k])
+        start = int(m.group(1)) - (0 if m.group(2) == "0" else 1)
+        out += a[pos:start]
+        pos, k = start, k + 1
+        while k < len(lines) and not lines[k].startswith("@@"):
+            tag, ln = lines[k][0], lines[k][1:]
+            if tag in " -":
+                if a[pos] != ln:
+                    raise ValueError(f"context mismatch at {pos}")
+                pos += 1
+            if tag in " +":
+                out.append(ln)
+            k += 1
+    return out + a[pos:]
+
+
+def _mutate(rng, a):
+    b = list(a)
+    for _ in range(rng.randint(0, 6)):
+        p = rng.randint(0, len(b))
+        r = rng.random()
+        if r < 0.4:
+            b.insert(p, f"new{rng.randint(0, 9)}")
+        elif b and r < 0.8:
+            b.pop(min(p, len(b) - 1))
+        elif b:
+            b[min(p, len(b) - 1)] = "changed"
+    return b
+
+
+def main() -> int:
+    # ---- correctness --------------------------------------------------------------------
+    rng = random.Random(3)
+    valid = True
+    saved = diffing._DIFFLIB_MAX_CELLS
+    try:
+        for _ in range(600):
+            a = [f"l{rng.randint(0, 25)}" for _ in range(rng.randint(0, 50))]
+            old = "\n".join(a) + ("\n" if rng.random() < 0.5 else "")
+            new = "\n".join(_mutate(rng, a))
+            for cells in (saved, 0):          # 0 forces the patience path
+                diffing._DIFFLIB_MAX_CELLS = cells
+                d = diffing.unified(old, new, "a/f", "b/f")
+                want = diffing._nl_terminated(new)
+                if (d == "") != (diffing._nl_terminated(old) == want) or (
+                        d and _apply(diffing._nl_terminated(old), d) != want):
+                    valid = False
+    finally:
+        diffing._DIFFLIB_MAX_CELLS = saved
+    check(valid, "every diff applies back to the new text (difflib and patience paths)")
+
+    body = [f"line {i}\n" for i in range(500)]
+    old, new = "".join(body), "".join(body[:200] + ["edited\n"] + body[201:])
+    check(diffing.unified(old, new, "a/x", "b/x")
+          == "".join(difflib.unified_diff(body, body[:200] + ["edited\n"] + body[201:],
+                                          "a/x", "b/x", n=2)),
+          "a plain edit is byte-identical to difflib.unified_diff")
+    check(diffing.unified(old, old) == "", "no change -> empty")
+    d = diffing.unified("a\nb", "a\nc")
+    check("-b\n+c\n" in d, "a last line without a newline is not glued to the next")
+
+    # ---- limits -----------------------------------------------------------------------
+    saved = diffing._MAX_LINES
+    diffing._MAX_LINES = 100
+    try:
+        d = diffing.unified(old, "".join(reversed(body)), "a/x", "b/x")
+    finally:
+        diffing._MAX_LINES = saved
+    check(d.count("\n") == 3 and "too large to show" in d
+          and d.splitlines()[2].startswith("@@ -1,"), "past _MAX_LINES: one summary hunk header")
+    many = "".join(f"row {i}\n" for i in range(2000))
+    changed = "".join(f"row {i}\n" if i % 10 else f"ROW {i}\n" for i in range(2000))
+    d = diffing.unified(many, changed, "a/x", "b/x", max_lines=40)
+    lines = d.splitlines()
+    left = re.fullmatch(r"@@ … rest of the diff not shown: -(\d+) \+(\d+) lines @@", lines[-1])
+    shown_dels = sum(ln.startswith("-") and not ln.startswith("---") for ln in lines)
+    check(len(lines) == 40 and left and int(left.group(1)) + shown_dels == 200,
+          "max_lines: 40 lines in all, the last a count of the removed/added lines left out")
+    full = diffing.unified(many, changed, "a/x", "b/x")
+    check(full.startswith("\n".join(lines[:-1])), "max_lines: the shown part is the diff's head")
+    small = diffing.unified("a\nb\n", "a\nc\n", "a/x", "b/x", max_lines=40)
+    check(small == diffing.unified("a\nb\n", "a\nc\n", "a/x", "b/x")
+          and "rest of the diff" not in small, "max_lines: a diff that fits is left whole")
+    exact = diffing.unified(many, changed, "a/x", "b/x", max_lines=len(full.splitlines()))
+    check(exact == full, "max_lines: a diff exactly max_lines long needs no summary")
+
+    from robodog_terminal.ui import UI
+    ui = UI(model_name="test/model", cwd=str(Path.cwd()))
+    ui.console = None
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        ui.diff("x", d)
+    check(lines[-1] in buf.getvalue() and "more diff lines" not in buf.getvalue(),
+          "UI.diff: a capped diff is shown whole, its summary included")
+
+    # ---- the registry -----------------------------------------------------------------
+    wd = Path(tempfile.mkdtemp(prefix="rd_df_"))
+    reg = default_registry(str(wd))
+    (wd / "f.txt").write_text(many, encoding="utf-8")
+    reg.execute("read_file", {"path": "f.txt"})
+    calls = []
+    real = diffing.unified
+    diffing.unified = lambda *a, **k: calls.append(k) or real(*a, **k)
+    try:
+        reg.execute("write_file", {"path": "f.txt", "content": changed})
+        check(not calls, "no on_diff: no diff is computed")
+        shown = []
+        reg.on_diff = lambda p, d: shown.append(d)
+        reg.diff_max_lines = 40
+        reg.execute("write_file", {"path": "f.txt", "content": many})
+        check(calls and calls[-1].get("max_lines") == 40 and len(shown[-1].splitlines()) == 40,
+              "on_diff: the diff is capped at diff_max_lines")
+    finally:
+        diffing.unified = real
+
+    print("\nDIFFING:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
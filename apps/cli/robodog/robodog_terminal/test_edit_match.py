@@ -0,0 +1,122 @@
+# file: robodog_terminal/test_edit_match.py
+"""
+Tests for edit_match.py: the rolling-hash block finder against a brute-force
+scan, nearest-miss ranking (a block off by one line, an indentation-only
+difference, a single mistyped line), one-pass span splicing, and multi_edit
+taking the one-pass path while still handling chained and failing edits.
+Run: python robodog_terminal/test_edit_match.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import edit_match                              # noqa: E402
+from robodog_terminal.edit_match import LineTable                    # noqa: E402
+from robodog_terminal.tools import default_registry, edit_not_found_hint  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _brute(original, old):
+    """The old slice-compare matcher, kept here as the reference."""
+    target = [ln.rstrip() for ln in old.strip("\n").split("\n")]
+    src = original.split("\n")
+    offsets, pos = [], 0
+    for ln in src:
+        offsets.append(pos)
+        pos += len(ln) + 1
+    norm = [ln.rstrip() for ln in src]
+    n = len(target)
+    return [(offsets[i], offsets[i + n - 1] + len(src[i + n - 1]))
+            for i in range(len(src) - n + 1) if norm[i:i + n] == target]
+
+
+def main() -> int:
+    # ---- find_spans == the brute-force scan ------------------------------------------
+    rng = random.Random(7)
+    words = ["a", "b", "  b", "b  ", "", "c\t"]
+    same = True
+    for _ in range(300):
+        src = "\n".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+        lines = src.split("\n")
+        k = rng.randint(0, len(lines) - 1)
+        old = "\n".join(lines[k:k + rng.randint(1, 4)]) if rng.random() < 0.7 else \
+            "\n".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+        if not any(ln.rstrip() for ln in old.strip("\n").split("\n")):
+            continue
+        same = same and edit_match.find_spans(LineTable(src), old) == _brute(src, old)
+    check(same, "find_spans: same spans as the slice-compare scan (random texts)")
+    src = "x = 1   \ny = 2\nx = 1\ny = 2\n"
+    check(edit_match.find_spans(LineTable(src), "\nx = 1\ny = 2\n\n") == [(0, 14), (15, 26)],
+          "find_spans: trailing whitespace and surrounding blank lines are ignored")
+    check(edit_match.find_spans(LineTable(src), "  x = 1") == [],
+          "find_spans: indentation still has to match")
+
+    # ---- nearest misses --------------------------------------------------------------
+    body = [f"    value_{i} = compute({i})" for i in range(2000)]
+    big = "def f():\n" + "\n".join(body) + "\n    return 0\n"
+    old = "\n".join(body[1500:1504]).replace("compute(1502)", "compute(9999)")
+    h = edit_not_found_hint(big, old)
+    check("lines 1502-1505" in h and "3 of your 4 lines" in h and "compute(1502)" in h
+          and "compute(9999)" in h, "hint: a block off by one line names that line")
+    h = edit_not_found_hint(big, "\n".join(ln.strip() for ln in body[10:13]))
+    check("lines 12-14" in h and "indentation" in h, "hint: an indentation-only difference")
+    h = edit_not_found_hint(big, "value_1234 = compte(1234)")
+    check("closest line in the file is line 1236" in h and "also similar" in h,
+          "hint: a mistyped single line -> the closest line, with runners-up")
+    ranked = edit_match.closest_lines(LineTable(big), "zzzz qqqq")
+    check(ranked == [], "closest_lines: nothing similar -> nothing")
+
+    # ---- apply_spans -------------------------------------------------------------------
+    check(edit_match.apply_spans("abcdef", [(4, 5, "E"), (0, 1, "A")]) == "AbcdEf",
+          "apply_spans: replacements in any order, one join")
+    try:
+        edit_match.apply_spans("abcdef", [(0, 3, "x"), (2, 4, "y")])
+        check(False, "apply_spans: overlap raises")
+    except ValueError:
+        check(True, "apply_spans: overlap raises")
+
+    # ---- multi_edit --------------------------------------------------------------------
+    wd = Path(tempfile.mkdtemp(prefix="rd_em_"))
+    reg = default_registry(str(wd))
+    f = wd / "m.py"
+    f.write_text("A = 1\nB = 2   \nC = 3\n", encoding="utf-8")
+    reg.execute("read_file", {"path": "m.py"})
+    calls = []
+    real = edit_match.apply_spans
+    edit_match.apply_spans = lambda *a: calls.append(1) or real(*a)
+    try:
+        r = reg.execute("multi_edit", {"path": "m.py",
+                                       "edits": "C = 3>>>C = 30\n===\nB = 2\nC = 3x>>>no\n"})
+        check("edit #2 not found" in r and f.read_text() == "A = 1\nB = 2   \nC = 3\n",
+              "multi_edit: a failing edit still reports its number and changes nothing")
+        r = reg.execute("multi_edit", {"path": "m.py", "edits": (
+            "C = 3>>>C = 30\n===\nA = 1  \nB = 2>>>A = 10\nB = 20")})
+        check("Applied 2 edits" in r and calls
+              and f.read_text() == "A = 10\nB = 20\nC = 30\n",
+              "multi_edit: exact + whitespace-tolerant edits spliced in one pass")
+        calls.clear()
+        reg.execute("read_file", {"path": "m.py"})
+        r = reg.execute("multi_edit", {"path": "m.py",
+                                       "edits": "A = 10>>>A = 11\n===\nA = 11>>>A = 12"})
+        check("Applied 2 edits" in r and not calls and f.read_text().startswith("A = 12\n"),
+              "multi_edit: an edit of an earlier edit's result still applies in order")
+    finally:
+        edit_match.apply_spans = real
+
+    print("\nEDIT MATCH:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# file: robodog_terminal/test_file_tree.py
+"""
+Tests for file_tree.py: the shared per-project snapshot — one tree per root
+(reused for subdirs and across registries), pruned excludes, incremental
+refresh after files/dirs are added, removed or renamed, a rebuild when the
+ignore rules change, the basename and suffix indexes, the file cap (and
+glob and FileService.search_files reporting it) — and glob /
+find_by_basename / the not-found hints answered from it.
+Run: python robodog_terminal/test_file_tree.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import file_tree                               # noqa: E402
+from robodog_terminal.file_tree import FileTree                      # noqa: E402
+from robodog_terminal.ignore import matcher_for                      # noqa: E402
+from robodog_terminal.tools import (default_registry, dir_not_found_hint,  # noqa: E402
+                                    find_by_basename)
+from file_service import FileService                                 # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _s(*parts):
+    return os.path.join(*parts)
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_ft_")).resolve()
+    (wd / "src" / "pkg").mkdir(parents=True)
+    (wd / "node_modules" / "dep").mkdir(parents=True)
+    (wd / "src" / "main.py").write_text("x\n")
+    (wd / "src" / "pkg" / "util.py").write_text("x\n")
+    (wd / "src" / "pkg" / "App.test.js").write_text("x\n")
+    (wd / "README.md").write_text("x\n")
+    (wd / ".bashrc").write_text("x\n")
+    (wd / "node_modules" / "dep" / "util.py").write_text("x\n")
+
+    # ---- snapshot ----------------------------------------------------------------
+    tree = FileTree(wd, matcher_for(wd))
+    check(tree.files() == sorted([".bashrc", "README.md", _s("src", "main.py"),
+                                  _s("src", "pkg", "App.test.js"), _s("src", "pkg", "util.py")]),
+          "snapshot: sorted file list, excluded dirs pruned")
+    check(tree.files("src") == [_s("src", "main.py"), _s("src", "pkg", "App.test.js"),
+                                _s("src", "pkg", "util.py")], "snapshot: files under a prefix")
+    check(tree.glob("*.py") == [_s("src", "main.py"), _s("src", "pkg", "util.py")]
+          and tree.glob("*.test.js") == [_s("src", "pkg", "App.test.js")]
+          and tree.glob("*.bashrc") == [".bashrc"], "glob: suffix-index patterns")
+    check(tree.glob("u*l.py", "src") == [_s("src", "pkg", "util.py")],
+          "glob: general fnmatch patterns under a prefix")
+    check(tree.named("UTIL.PY") == [_s("src", "pkg", "util.py")]
+          and tree.named("pkg", kind="dir") == [_s("src", "pkg")]
+          and tree.named("pkg") == [], "named: case-insensitive, files vs dirs")
+
+    # ---- incremental refresh -----------------------------------------------------------
+    scans = tree.stats["rescanned"]
+    tree.files()
+    tree.files()
+    rescans = tree.stats["rescanned"] - scans
+    (wd / "src" / "pkg" / "new.py").write_text("x\n")
+    check(_s("src", "pkg", "new.py") in tree.glob("*.py"), "refresh: a new file shows up")
+    (wd / "src" / "deep" / "er").mkdir(parents=True)
+    (wd / "src" / "deep" / "er" / "leaf.py").write_text("x\n")
+    check(tree.named("leaf.py") == [_s("src", "deep", "er", "leaf.py")],
+          "refresh: a new nested dir is scanned")
+    (wd / "src" / "main.py").rename(wd / "src" / "entry.py")
+    names = tree.files("src")
+    check(_s("src", "entry.py") in names and _s("src", "main.py") not in names,
+          "refresh: a rename is picked up")
+    shutil.rmtree(wd / "src" / "deep")
+    check(tree.named("leaf.py") == [] and tree.listing(_s("src", "deep")) is None,
+          "refresh: a removed subtree drops out")
+    check(rescans <= 6, f"refresh: unchanged dirs aren't rescanned ({rescans} racy rescans)")
+
+    # ---- ignore rules ------------------------------------------------------------------
+    (wd / ".gitignore").write_text("*.md\n")
+    check("README.md" not in tree.files() and tree.stats["rebuilds"] == 1,
+          "rules: a new .gitignore rebuilds the tree under it")
+    (wd / ".gitignore").write_text("*.js\nsrc/pkg/new.py\n")      # in place: no dir mtime moves
+    names = tree.files()
+    check("README.md" in names and _s("src", "pkg", "App.test.js") not in names
+          and _s("src", "pkg", "new.py") not in names and tree.stats["rebuilds"] == 2,
+          "rules: an edited .gitignore is picked up too")
+    (wd / ".gitignore").unlink()
+    check(_s("src", "pkg", "App.test.js") in tree.files() and tree.stats["rebuilds"] == 3,
+          "rules: a removed .gitignore brings the files back")
+
+    # ---- cap ---------------------------------------------------------------------------
+    capped = FileTree(wd, matcher_for(wd), max_files=2)
+    check(len(capped.files()) == 2 and capped.truncated, "cap: stops at max_files, truncated")
+    many = Path(tempfile.mkdtemp(prefix="rd_ftcap_")).resolve()
+    for i in range(3):
+        (many / f"f{i}.txt").write_text("x\n")
+    saved = os.environ.get("ROBODOG_FILE_TREE_MAX")
+    os.environ["ROBODOG_FILE_TREE_MAX"] = "2"
+    try:
+        out = default_registry(str(many)).execute("glob", {"pattern": "*.txt"})
+        fs = FileService([str(many)])
+        found = fs.search_files("*.txt")
+    finally:
+        if saved is None:
+            os.environ.pop("ROBODOG_FILE_TREE_MAX", None)
+        else:
+            os.environ["ROBODOG_FILE_TREE_MAX"] = saved
+    check(out.startswith("2 file(s)") and "stopped at 2 files" in out,
+          "cap: glob says its results may be incomplete")
+    check(len(found) == 2 and fs.truncated, "cap: FileService.search_files reports it too")
+    shutil.rmtree(many, ignore_errors=True)
+
+    # ---- sharing + tools -----------------------------------------------------------
+    shared, prefix = file_tree.tree_for(wd, matcher_for(wd))
+    sub, sub_prefix = file_tree.tree_for(wd / "src", matcher_for(wd))
+    check(sub is shared and sub_prefix == "src" and prefix == "",
+          "sharing: a subdir reuses the project's tree")
+    nm, nm_prefix = file_tree.tree_for(wd / "node_modules", matcher_for(wd))
+    check(nm is not shared and nm.files() == [_s("dep", "util.py")],
+          "sharing: a root inside a pruned dir gets its own tree")
+
+    hits = find_by_basename(wd, "Util.py")
+    check(hits == [str(wd / "src" / "pkg" / "util.py")],
+          "find_by_basename: from the snapshot, node_modules pruned")
+    check(find_by_basename(wd / "src", "pkg", kind="dir") == [str(wd / "src" / "pkg")],
+          "find_by_basename: dirs, from a subdir root")
+    reg = default_registry(str(wd))
+    out = reg.execute("glob", {"pattern": "*.py"})
+    check(out.startswith("3 file(s) matching '*.py':") and _s("src", "pkg", "new.py") in out,
+          "glob tool: count + relative paths")
+    out = reg.execute("glob", {"pattern": "*.rs", "path": "src"})
+    check("files ARE present" in out and "entry.py" in out, "glob tool: no-match sample")
+    out = reg.execute("read_file", {"path": "lib/new.py"})
+    check("Did you mean" in out and _s("src", "pkg", "new.py") in out,
+          "read_file miss: same basename elsewhere")
+    check("Did you mean" in dir_not_found_hint(wd / "src" / "pkgs"),
+          "list_dir miss: near-named subdir from the snapshot listing")
+
+    shutil.rmtree(wd, ignore_errors=True)
+    print("\nFILE TREE:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# file: robodog_terminal/test_grep_engine.py
+"""
+Tests for grep_engine.py: the pruned scandir walk and its order, binary
+sniffing, the mmap path for large files, deterministic output under the
+thread pool, early stop at the match cap, -B/-A context, and count mode —
+plus the grep tool's rendering of each.
+Run: python robodog_terminal/test_grep_engine.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import grep_engine                             # noqa: E402
+from robodog_terminal.ignore import matcher_for                      # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _rel(paths, root):
+    return [str(p.relative_to(root)).replace("\\", "/") for p in paths]
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_ge_"))
+    (wd / "pkg" / "sub").mkdir(parents=True)
+    (wd / "node_modules" / "dep").mkdir(parents=True)
+    (wd / "b.py").write_text("alpha = 1\nbeta = 2\n")
+    (wd / "a.txt").write_text("alpha in text\n")
+    (wd / "pkg" / "mod.py").write_text("\n".join(f"line {i}" for i in range(1, 11)) + "\n")
+    (wd / "pkg" / "sub" / "deep.py").write_text("alpha deep\n")
+    (wd / "node_modules" / "dep" / "index.py").write_text("alpha vendored\n")
+    (wd / "blob.bin").write_bytes(b"alpha\0\x01\x02 binary")
+
+    # ---- walk ---------------------------------------------------------------------
+    walked = _rel(grep_engine.iter_files(wd, matcher_for(wd)), wd)
+    check(walked == sorted(walked, key=lambda s: s.split("/")) and "b.py" in walked,
+          "walk: files come out in sorted-path order")
+    check(not any(w.startswith("node_modules") for w in walked),
+          "walk: excluded dirs are pruned, never descended into")
+    check(_rel(grep_engine.iter_files(wd, matcher_for(wd), "*.py"), wd)
+          == ["b.py", "pkg/mod.py", "pkg/sub/deep.py"], "walk: the glob filters by filename")
+
+    # ---- search -------------------------------------------------------------------
+    files = list(grep_engine.iter_files(wd, matcher_for(wd)))
+    res = grep_engine.search(files, re.compile("alpha"))
+    check(_rel([fh.path for fh in res.files], wd) == ["a.txt", "b.py", "pkg/sub/deep.py"],
+          "search: results in walk order; the binary file is sniffed out")
+    check(res.matches == 3 and not res.capped, "search: match total, not capped")
+    same = all(
+        [(fh.path, fh.lines) for fh in grep_engine.search(files, re.compile(r"\w+"),
+                                                          workers=w).files]
+        == [(fh.path, fh.lines) for fh in grep_engine.search(files, re.compile(r"\w+"),
+                                                             workers=1).files]
+        for w in (2, 8))
+    check(same, "search: identical output for any worker count")
+
+    many = wd / "many"
+    many.mkdir()
+    for k in range(40):
+        (many / f"f{k:02d}.txt").write_text("hit\n" * 10)
+    targets = list(grep_engine.iter_files(many, matcher_for(many)))
+    res = grep_engine.search(targets, re.compile("hit"), max_matches=25, workers=4)
+    check(res.capped and res.matches == 25 and sum(len(f.lines) for f in res.files) == 25,
+          "cap: stops at exactly max_matches lines")
+    check(_rel([fh.path for fh in res.files], many) == ["f00.txt", "f01.txt", "f02.txt"]
+          and res.files[-1].count == 5, "cap: the first files in order, last one truncated")
+    check(res.files_scanned < len(targets), "cap: the rest of the files are never consumed")
+    res = grep_engine.search(targets, re.compile("hit"), max_matches=30, workers=4)
+    check(res.capped and res.matches == 30 and len(res.files) == 3,
+          "cap: a full cap with matches still to come is capped")
+    (many / "f00.txt").write_text("hit\n" * 300)
+    res = grep_engine.search(targets[:1], re.compile("hit"), max_matches=300)
+    check(not res.capped and res.matches == 300, "cap: exactly max_matches is not capped")
+    res = grep_engine.search(targets[:2], re.compile("hit"), max_matches=300)
+    check(res.capped and res.matches == 300 and len(res.files) == 1,
+          "…but one more match in a later file is")
+    (many / "f00.txt").write_text("hit\n" * 10)
+
+    # ---- context / count -----------------------------------------------------------------
+    mod = [wd / "pkg" / "mod.py"]
+    res = grep_engine.search(mod, re.compile(r"line (4|6)$"), before=1, after=1)
+    check(res.files[0].lines == [(3, "line 3", False), (4, "line 4", True),
+                                 (5, "line 5", False), (6, "line 6", True),
+                                 (7, "line 7", False)],
+          "context: -B/-A lines around each match, overlaps merged")
+    res = grep_engine.search(mod, re.compile("line"), max_matches=2, after=2)
+    check([n for n, _t, _m in res.files[0].lines] == [1, 2, 3, 4],
+          "context: capped file keeps the last match's trailing context")
+    res = grep_engine.search(targets, re.compile("hit"), max_matches=25, count_only=True)
+    check(not res.capped and res.matches == 400 and all(f.count == 10 for f in res.files)
+          and not any(f.lines for f in res.files), "count: per-file counts, no cap, no lines")
+
+    # ---- large files (mmap) ------------------------------------------------------------
+    big = wd / "big.log"
+    with open(big, "w") as fh:
+        for i in range(1, 60_001):
+            fh.write(f"entry {i} " + ("x" * 20) + "\n")
+    check(big.stat().st_size >= grep_engine.MMAP_MIN_BYTES, "mmap: the fixture is large enough")
+    res = grep_engine.search([big], re.compile(r"entry 54321 "))
+    check(res.matches == 1 and res.files[0].lines[0][0] == 54321,
+          "mmap: a match deep in a large file, with its line number")
+    res = grep_engine.search([big], re.compile("no_such_literal"))
+    check(res.matches == 0, "mmap: the literal pre-check rejects a non-matching file")
+    res = grep_engine.search([big], re.compile("ENTRY 7 ", re.IGNORECASE))
+    check(res.matches == 1, "mmap: case-insensitive patterns skip the byte pre-check")
+    for pat in (r"(?i:ENTRY) 7 ", r"entry (?i:7 X)", r"NONE 7 x|(?i:ENTRY 7 x)"):
+        res = grep_engine.search([big], re.compile(pat))
+        check(res.matches == 1, f"mmap: a scoped (?i:…) skips it too ({pat})")
+
+    # ---- the tool --------------------------------------------------------------------
+    reg = default_registry(str(wd))
+    out = reg.execute("grep", {"pattern": "alpha", "glob": "*.py"})
+    check(out.startswith("2 match(es) for /alpha/:") and "b.py:1: alpha = 1" in out,
+          "tool: file:line: match format")
+    out = reg.execute("grep", {"pattern": "line 5$", "path": "pkg", "context": "1"})
+    check("mod.py-4- line 4" in out and "mod.py:5: line 5" in out and "mod.py-6- line 6" in out,
+          "tool: context lines rendered as file-line-")
+    out = reg.execute("grep", {"pattern": "hit", "path": "many", "count": "true"})
+    check(out.startswith("400 matching line(s) for /hit/ in 40 file(s):")
+          and "f07.txt: 10" in out, "tool: count mode lists per-file counts")
+    out = reg.execute("grep", {"pattern": "hit", "path": "many"})
+    check("(showing first 300)" in out and out.count("\n") == 300, "tool: 300-match cap")
+    check(reg.execute("grep", {"pattern": "zzz_nothing"}) == "No matches for /zzz_nothing/.",
+          "tool: no matches")
+
+    print("\nGREP ENGINE:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
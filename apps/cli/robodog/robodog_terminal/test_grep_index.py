@@ -0,0 +1,138 @@
+# file: robodog_terminal/test_grep_index.py
+"""
+Tests for grep_index.py: regex -> required-literal decomposition, candidate
+narrowing, freshness after edits / deletes / new files, persistence across
+processes, and the grep tool returning exactly the full scan's output with
+ROBODOG_GREP_INDEX=1.
+Run: python robodog_terminal/test_grep_index.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import grep_index                              # noqa: E402
+from robodog_terminal.grep_index import TrigramIndex, required_literals  # noqa: E402
+from robodog_terminal.ignore import matcher_for                      # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _names(paths):
+    return sorted(p.name for p in paths)
+
+
+def _bump(path: Path, text: str) -> None:
+    path.write_text(text)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000))
+
+
+def main() -> int:
+    global ok
+    wd = Path(tempfile.mkdtemp(prefix="rd_gi_"))
+    saved = {k: os.environ.get(k) for k in ("ROBODOG_GREP_INDEX", "ROBODOG_GREP_INDEX_DIR")}
+    os.environ["ROBODOG_GREP_INDEX_DIR"] = str(wd / "store")
+
+    # ---- decomposition ---------------------------------------------------------
+    check(required_literals("def parse_args") == [["def parse_args"]],
+          "literals: a plain string is one clause")
+    check(required_literals(r"class \w+\(Base") == [["class "], ["(Base"]],
+          "literals: runs split around non-literal items")
+    check(required_literals(r"(alpha|beta)_gamma") == [["alpha", "beta"], ["_gamma"]],
+          "literals: an alternation becomes one OR clause")
+    check(required_literals(r"\w+\s*=") is None and required_literals("ab|cd") is None,
+          "literals: nothing 3+ chars long -> None (full scan)")
+    check(required_literals(r"x(abc)*y") is None and required_literals(r"(abc)+") == [["abc"]],
+          "literals: optional repeats don't count, required ones do")
+    check(required_literals("[") is None, "literals: a bad regex -> None")
+
+    # ---- a small project --------------------------------------------------------
+    proj = wd / "proj"
+    (proj / "src").mkdir(parents=True)
+    (proj / "node_modules" / "dep").mkdir(parents=True)
+    (proj / "src" / "a.py").write_text("def alpha():\n    return 1\n")
+    (proj / "src" / "b.py").write_text("def beta():\n    return HelloWorld\n")
+    (proj / "notes.md").write_text("alpha release notes\n")
+    (proj / "node_modules" / "dep" / "x.js").write_text("alpha()\n")
+    (proj / "big.log").write_text("alpha " * 400)
+
+    idx = TrigramIndex(proj, matcher_for(proj), path=wd / "store" / "t.json.gz",
+                       max_bytes=1024)
+    check(idx.candidates(proj, "alpha") is None, "query: None until the index is built")
+    idx._build()
+    check(idx.ready.is_set() and "node_modules/dep/x.js" not in idx.files,
+          "build: walks the project, pruning excluded dirs")
+    check(_names(idx.candidates(proj, "alpha")) == ["a.py", "big.log", "notes.md"],
+          "query: only files holding the literal (+ the unindexed big file)")
+    check(_names(idx.candidates(proj, "alpha", "*.py")) == ["a.py"],
+          "query: the glob filter applies")
+    check(_names(idx.candidates(proj / "src", "(?i)helloworld")) == ["b.py"],
+          "query: casefolded trigrams narrow (?i) patterns; scoped to a subdir")
+    check(_names(idx.candidates(proj, r"(alpha|beta)\(\):")) == ["a.py", "b.py", "big.log"],
+          "query: alternations union their candidates")
+    check(idx.candidates(proj, r"\w+") is None, "query: undecomposable -> None")
+    check(idx.candidates(wd, "alpha") is None, "query: outside the project -> None")
+
+    # ---- freshness ----------------------------------------------------------------
+    _bump(proj / "src" / "a.py", "def gamma():\n    pass\n")
+    (proj / "notes.md").unlink()
+    (proj / "src" / "c.py").write_text("alpha = 3\n")
+    check(_names(idx.candidates(proj, "alpha")) == ["big.log", "c.py"],
+          "fresh: edited, deleted and new files are picked up before the query")
+    check(_names(idx.candidates(proj, "gamma")) == ["a.py", "big.log"],
+          "fresh: an edited file is re-indexed")
+
+    # ---- persistence -----------------------------------------------------------------
+    idx.flush()
+    again = TrigramIndex(proj, matcher_for(proj), path=idx.path, max_bytes=1024)
+    again._load()
+    check(set(again.files) == set(idx.files)
+          and again.files["src/c.py"] == idx.files["src/c.py"],
+          "persist: the file table round-trips")
+    again._build()
+    check(again.stats["reindexed"] == 0 and _names(again.candidates(proj, "alpha"))
+          == ["big.log", "c.py"], "persist: a warm start re-reads nothing")
+
+    # ---- grep tool: identical output, indexed or not ---------------------------------
+    try:
+        os.environ.pop("ROBODOG_GREP_INDEX", None)
+        plain = default_registry(cwd=str(proj))
+        os.environ["ROBODOG_GREP_INDEX"] = "1"
+        indexed = default_registry(cwd=str(proj))
+        live = grep_index.index_for(proj, matcher_for(proj))
+        check(live.ready.wait(10), "tool: the registry starts the background build")
+        for pat, glob in (("alpha", "*"), ("def \\w+", "*.py"), ("return", "*"),
+                          ("nomatch_here", "*")):
+            a = plain.execute("grep", {"pattern": pat, "glob": glob})
+            b = indexed.execute("grep", {"pattern": pat, "glob": glob})
+            check(sorted(a.splitlines()) == sorted(b.splitlines()),
+                  f"tool: /{pat}/ same result indexed and unindexed")
+        check(live.stats["narrowed"] >= 1, "tool: the index narrowed the scan")
+        (proj / "src" / "d.py").write_text("fresh_symbol = 1\n")
+        check("d.py" in indexed.execute("grep", {"pattern": "fresh_symbol"}),
+              "tool: a file written just now is found")
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    print("\nGREP INDEX:", "ALL PASS" if ok else "FAILURES")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
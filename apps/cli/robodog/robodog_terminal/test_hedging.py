@@ -0,0 +1,220 @@
+# file: robodog_terminal/test_hedging.py
+"""
+Tests for hedging.py: a slow primary is hedged after the delay and the hedge
+wins, an erroring primary fails over at once (and not onto itself), a
+losing hedge gives its limiter slot back, the p95-derived hedge delay,
+degraded-backend routing, hedged chat replaying through on_delta, and the
+build_backend wiring (--hedge).
+Run: python robodog_terminal/test_hedging.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal.hedging import BackendHealth, HedgedClient, hedge_from_env  # noqa: E402
+from robodog_terminal.llm_client import (AdaptiveLimiter, Completion,         # noqa: E402
+                                         EchoClient, LLMClient, _retry_sleep)
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+class Fake(LLMClient):
+    """Backend that answers `text` after `delay` seconds, or raises."""
+
+    def __init__(self, name, delay=0.0, text=None, fail=False):
+        self.name = name
+        self.model = name
+        self.delay = delay
+        self.text = text or f"from {name}"
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt, context="", max_tokens=8192, temperature=0.3):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return Completion(text=self.text)
+
+    def complete_chat(self, messages, max_tokens=8192, temperature=0.3, on_delta=None,
+                      cache_breakpoints=()):
+        return self.complete(messages[-1]["content"])
+
+
+class Retrying(Fake):
+    """Backend that holds one limiter slot across a long retry loop, the way
+    OpenAICompatClient does against a struggling gateway."""
+
+    def __init__(self, name, lim):
+        super().__init__(name)
+        self.lim = lim
+
+    def complete(self, prompt, context="", max_tokens=8192, temperature=0.3):
+        started = self.lim.acquire()
+        try:
+            for _ in range(50):
+                _retry_sleep(0.1)
+            return Completion(text=self.text)
+        finally:
+            self.lim.release(started, False)
+
+
+def main() -> int:
+    global ok
+
+    # ---- BackendHealth ------------------------------------------------------
+    h = BackendHealth("b")
+    check(h.quantile(0.95) is None, "health: no p95 before enough samples")
+    for i in range(20):
+        h.record(True, 0.1 * (i + 1))
+    check(abs(h.quantile(0.95) - 2.0) < 1e-9 and h.score() == 1.0,
+          f"health: p95 over the recent latencies ({h.quantile(0.95):.2f}s)")
+    for _ in range(3):
+        h.record(False, 0.1)
+    check(h.degraded and h.score() == 0.0, "health: 3 failures in a row degrade a backend")
+    h.record(True, 0.1)
+    check(h.consecutive_failures == 0, "health: a success resets the failure run")
+    h2 = BackendHealth("c", cooldown=0.05)
+    for _ in range(3):
+        h2.record(False, 0.1)
+    time.sleep(0.1)
+    check(not h2.degraded, "health: degradation expires after the cooldown")
+
+    # ---- hedge delay ---------------------------------------------------------
+    hc = HedgedClient(Fake("p"), min_delay=0.5, max_delay=5)
+    check(hc.hedge_delay(hc.primary) == 5, "delay: a cold backend uses the (clamped) default")
+    for _ in range(10):
+        hc.health[id(hc.primary)].record(True, 0.01)
+    check(hc.hedge_delay(hc.primary) == 0.5, "delay: p95 clamped up to min_delay")
+
+    # ---- slow primary: the hedge wins -----------------------------------------
+    slow, fast = Fake("slow", delay=1.0), Fake("fast", delay=0.01)
+    hc = HedgedClient(slow, fast, min_delay=0.05, max_delay=0.05)
+    t0 = time.monotonic()
+    out = hc.complete("q")
+    took = time.monotonic() - t0
+    check(out.text == "from fast" and took < 0.5,
+          f"hedge: a slow primary is raced and the secondary wins ({took:.2f}s)")
+    st = hc.hedge_stats()
+    check(st["calls"] == 1 and st["hedges"] == 1 and st["hedge_wins"] == 1
+          and st["failovers"] == 0, "hedge: counted in hedge_stats")
+
+    # ---- fast primary: no hedge -------------------------------------------------
+    quick, spare = Fake("quick"), Fake("spare")
+    hc = HedgedClient(quick, spare, min_delay=0.5, max_delay=0.5)
+    check(hc.complete("q").text == "from quick" and spare.calls == 0,
+          "hedge: a reply inside the delay never touches the secondary")
+
+    # ---- failover ---------------------------------------------------------------
+    down, up = Fake("down", fail=True), Fake("up")
+    hc = HedgedClient(down, up, min_delay=5, max_delay=5)
+    t0 = time.monotonic()
+    out = hc.complete("q")
+    check(out.text == "from up" and time.monotonic() - t0 < 1.0
+          and hc.hedge_stats()["failovers"] == 1,
+          "failover: an error fires the secondary immediately")
+    both = HedgedClient(Fake("x", fail=True), Fake("y", fail=True), min_delay=5)
+    try:
+        both.complete("q")
+        check(False, "failover: both failing raises")
+    except RuntimeError as exc:
+        check("is down" in str(exc), "failover: both failing raises the last error")
+
+    solo = Fake("solo", fail=True)
+    hc1 = HedgedClient(solo, min_delay=5)
+    try:
+        hc1.complete("q")
+        check(False, "failover: no secondary raises")
+    except RuntimeError:
+        check(solo.calls == 1 and hc1.hedge_stats()["failovers"] == 0,
+              "failover: with no secondary the failed backend isn't re-run")
+
+    # ---- a losing hedge is cancelled ----------------------------------------------
+    lim = AdaptiveLimiter(2, 2)
+    stuck = Retrying("stuck", lim)
+    hc2 = HedgedClient(stuck, Fake("quick2", delay=0.01), min_delay=0.05, max_delay=0.05)
+    check(hc2.complete("q").text == "from quick2", "cancel: the hedge wins")
+    deadline = time.monotonic() + 2.0
+    while lim.inflight and time.monotonic() < deadline:
+        time.sleep(0.02)
+    check(lim.inflight == 0, "cancel: the loser stops retrying and releases its slot")
+    check(hc2.health[id(stuck)].samples == 0,
+          "cancel: a cancelled loser isn't scored as a failure")
+
+    # ---- degraded routing ------------------------------------------------------
+    for _ in range(3):
+        hc.complete("q")
+    check(hc.health[id(down)].degraded and hc._order()[0] is up,
+          "routing: a degraded primary goes behind the secondary")
+    before = down.calls
+    check(hc.complete("q").text == "from up" and down.calls == before,
+          "routing: calls go to the healthy backend first")
+    names = [b["name"] for b in hc.hedge_stats()["backends"]]
+    check(names == ["down", "up"], "hedge_stats: per-backend health")
+
+    # ---- chat: completes, then replays through on_delta -------------------------
+    pieces = []
+    hc = HedgedClient(Fake("c1", text="hello there world"))
+    c = hc.complete_chat([{"role": "user", "content": "hi"}], on_delta=pieces.append)
+    check(c.text == "hello there world" and "".join(pieces) == c.text,
+          "chat: the winning reply is replayed to on_delta")
+    check(hc.model == "c1" and hc.name == "c1", "wrapper: attributes are the primary's")
+
+    # ---- env + build_backend wiring --------------------------------------------
+    keys = ("ROBODOG_HEDGE", "ROBODOG_HEDGE_URL", "ROBODOG_HEDGE_KEY",
+            "ROBODOG_HEDGE_MODEL", "ROBODOG_HEDGE_MIN_S", "ROBODOG_HEDGE_MAX_S",
+            "ROBODOG_LLM_CACHE", "ROBODOG_TERMINAL_ECHO")
+    saved = {k: os.environ.get(k) for k in keys}
+    try:
+        for k in keys:
+            os.environ.pop(k, None)
+        os.environ.update({"ROBODOG_HEDGE_URL": "http://127.0.0.1:9/v1",
+                           "ROBODOG_HEDGE_KEY": "k", "ROBODOG_HEDGE_MIN_S": "1",
+                           "ROBODOG_HEDGE_MAX_S": "3"})
+        hc = hedge_from_env(Fake("prim"))
+        check(hc.secondary is not None and hc.secondary.model == "prim"
+              and hc.min_delay == 1 and hc.max_delay == 3,
+              "hedge_from_env: secondary + delays from ROBODOG_HEDGE_*")
+        from robodog_terminal import app
+        args = Namespace(echo=False, backend="auto", model=None, llm_cache=None, hedge=True)
+        real = app._select_backend
+        app._select_backend = lambda a, on_retry=None: (Fake("live"), "live")
+        try:
+            c1, label = app.build_backend(args)
+            check(isinstance(c1, HedgedClient) and label == "live",
+                  "build_backend: --hedge wraps the backend")
+            args.hedge = False
+            c2, _ = app.build_backend(args)
+            check(not isinstance(c2, HedgedClient), "build_backend: off by default")
+        finally:
+            app._select_backend = real
+        c3, _ = app.build_backend(Namespace(echo=True, backend="auto", model=None,
+                                            llm_cache=None, hedge=True))
+        check(isinstance(c3, EchoClient), "build_backend: the echo backend isn't hedged")
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    print("\nHEDGING:", "ALL PASS" if ok else "FAILURES")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
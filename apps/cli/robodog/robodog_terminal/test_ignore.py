@@ -0,0 +1,132 @@
+# file: robodog_terminal/test_ignore.py
+"""
+Tests for ignore.py: gitignore rule parsing (anchoring, dir-only, **,
+classes, escapes, negation order), nested .gitignore / .robodogignore
+precedence, the built-in excludes (or a caller's set in their place) and
+their override, picking up an edited .gitignore, and grep / glob / the
+file-tree snapshot never entering an ignored tree.
+Run: python robodog_terminal/test_ignore.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import ignore                                  # noqa: E402
+from robodog_terminal.ignore import IgnoreMatcher, _Rules, parse_rules  # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+from code_map import CodeMapper                                      # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _decide(lines, rel, is_dir=False):
+    return _Rules(parse_rules(lines)).decide(rel, rel.rsplit("/", 1)[-1], is_dir)
+
+
+def main() -> int:
+    # ---- rules ---------------------------------------------------------------------
+    check(_decide(["target/"], "a/target", True) is True
+          and _decide(["target/"], "a/target", False) is None,
+          "rules: a trailing slash matches directories only")
+    check(_decide(["*.log"], "x/y/z.log") is True and _decide(["*.log"], "z.logs") is None,
+          "rules: an unanchored glob matches at any depth")
+    check(_decide(["/out"], "out", True) is True and _decide(["/out"], "src/out", True) is None,
+          "rules: a leading slash anchors to the ignore file's dir")
+    check(_decide(["docs/gen"], "docs/gen", True) is True
+          and _decide(["docs/gen"], "x/docs/gen", True) is None,
+          "rules: a middle slash anchors too")
+    check(_decide(["**/cache"], "a/b/cache", True) is True
+          and _decide(["a/**/z"], "a/z") is True and _decide(["a/**/z"], "a/b/c/z") is True
+          and _decide(["a/**"], "a/b/c") is True and _decide(["a/**"], "a", True) is None,
+          "rules: ** forms")
+    check(_decide(["file[0-9].txt"], "file7.txt") is True
+          and _decide(["file[!0-9].txt"], "file7.txt") is None
+          and _decide(["?.py"], "a.py") is True and _decide(["?.py"], "ab.py") is None,
+          "rules: classes and ?")
+    check(_decide(["\\#notes", "# comment", "", "\\!bang"], "#notes") is True
+          and _decide(["\\!bang"], "!bang") is True, "rules: comments, blanks and escapes")
+    check(_decide(["*.log", "!keep.log"], "keep.log") is False
+          and _decide(["!keep.log", "*.log"], "keep.log") is True,
+          "rules: with negations the last matching rule wins")
+
+    # ---- a project --------------------------------------------------------------------
+    wd = Path(tempfile.mkdtemp(prefix="rd_ig_")).resolve()
+    (wd / ".git" / "info").mkdir(parents=True)
+    (wd / "src" / "gen").mkdir(parents=True)
+    (wd / "target" / "classes").mkdir(parents=True)
+    (wd / "dist").mkdir()
+    (wd / "coverage").mkdir()
+    (wd / ".gitignore").write_text("target/\ncoverage\n*.tmp\n")
+    (wd / ".git" / "info" / "exclude").write_text("local.cfg\n")
+    (wd / "src" / ".gitignore").write_text("gen/\n!keep.tmp\n")
+    (wd / ".robodogignore").write_text("!dist/\n")
+    for rel in ("src/app.py", "src/gen/out.py", "target/classes/App.py", "dist/bundle.py",
+                "coverage/index.py", "a.tmp", "src/keep.tmp", "local.cfg", "README.md"):
+        (wd / rel).write_text("needle\n")
+
+    m = IgnoreMatcher(wd)
+    check(m(str(wd / "target"), True) and m(str(wd / "coverage"), True),
+          "matcher: root .gitignore dirs")
+    check(m(str(wd / "src" / "gen"), True), "matcher: a nested .gitignore applies to its subtree")
+    check(m(str(wd / "a.tmp"), False) and not m(str(wd / "src" / "keep.tmp"), False),
+          "matcher: a deeper negation overrides the root rule")
+    check(m(str(wd / "local.cfg"), False), "matcher: .git/info/exclude")
+    check(m(str(wd / ".git"), True) and not m(str(wd / "dist"), True),
+          "matcher: built-in excludes apply, and a .robodogignore can re-include one")
+    check(not m(str(wd / "src" / "app.py"), False) and not m(str(wd / "README.md"), False),
+          "matcher: ordinary files pass")
+    check(m.excluded_path(wd / "target" / "classes" / "App.py")
+          and not m.excluded_path(wd / "src" / "app.py"),
+          "matcher: excluded_path checks every parent dir")
+    custom = IgnoreMatcher(wd, {"src"})
+    check(custom(str(wd / "src"), True) and not custom(str(wd / "build"), True)
+          and not custom(str(wd / "pkg.egg-info"), True),
+          "matcher: a caller's exclude set replaces the built-in one")
+    check(m(str(wd / "build"), True) and m(str(wd / "pkg.egg-info"), True),
+          "matcher: …which covers build/ and *.egg-info")
+    (wd / "build").mkdir()
+    (wd / "build" / "gen.py").write_text("x = 1\n")
+    own = CodeMapper([str(wd)], {"node_modules"})._walk_directory(wd, [".py"])
+    default = CodeMapper([str(wd)])._walk_directory(wd, [".py"])
+    check(wd / "build" / "gen.py" in own and wd / "build" / "gen.py" not in default
+          and wd / "target" / "classes" / "App.py" not in own,
+          "CodeMapper: its own exclude_dirs can opt back into build/ (.gitignore still applies)")
+    shutil.rmtree(wd / "build")
+    check(ignore.matcher_for(wd / "src") is ignore.matcher_for(wd),
+          "matcher_for: one matcher per project (the .git root)")
+
+    (wd / ".gitignore").write_text("target/\ncoverage\n*.tmp\nREADME.md\n")
+    st = (wd / ".gitignore").stat()
+    os.utime(wd / ".gitignore", ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000))
+    time.sleep(ignore._RECHECK_S + 0.1)
+    check(m(str(wd / "README.md"), False), "matcher: an edited .gitignore is picked up")
+
+    # ---- walkers ----------------------------------------------------------------------
+    reg = default_registry(str(wd))
+    out = reg.execute("grep", {"pattern": "needle"})
+    check("src/app.py" in out.replace("\\", "/") and "dist/bundle.py" in out.replace("\\", "/")
+          and not any(s in out for s in ("target", "coverage", "out.py", "a.tmp", "local.cfg")),
+          "grep: ignored trees and files are skipped")
+    out = reg.execute("glob", {"pattern": "*.py"})
+    check(out.startswith("2 file(s)") and "App.py" not in out,
+          "glob: ignored trees are skipped")
+
+    shutil.rmtree(wd, ignore_errors=True)
+    print("\nIGNORE:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# file: robodog_terminal/test_impact.py
+"""
+Tests for impact.py and run_tests(scope='impacted'): the import graph
+(absolute, relative and package imports, conftest.py, rootdir insertion),
+junit parsing by file and by classname, and the tool end to end on a small
+pytest project — only test files reaching this prompt's changes run,
+files that passed with unchanged inputs are skipped with the time saved
+reported, failures are never cached, a full run fills the cache, and the
+unaffected rest can run in the background and be folded in later.
+Run: python robodog_terminal/test_impact.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import impact, testreport                      # noqa: E402
+from robodog_terminal.checkpoint import Checkpointer                 # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _write(root: Path, rel: str, text: str) -> None:
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _project(root: Path) -> None:
+    _write(root, "app/__init__.py", "")
+    _write(root, "app/core.py", "def add(a, b):\n    return a + b\n")
+    _write(root, "app/util.py", "from .core import add\n\ndef twice(x):\n    return add(x, x)\n")
+    _write(root, "app/text.py", "def shout(s):\n    return s.upper()\n")
+    _write(root, "tests/conftest.py", "")
+    _write(root, "tests/test_core.py", "from app.core import add\n\n"
+                                       "def test_add():\n    assert add(1, 2) == 3\n")
+    _write(root, "tests/test_util.py", "from app import util\n\n"
+                                       "def test_twice():\n    assert util.twice(2) == 4\n")
+    _write(root, "tests/test_text.py", "import app.text as t\n\n"
+                                       "def test_shout():\n    assert t.shout('a') == 'A'\n")
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_imp_"))
+    _project(wd)
+
+    # ---- graph + junit -------------------------------------------------------------------
+    g = impact.ImportGraph(wd)
+    g.refresh([str(p.relative_to(wd)).replace(os.sep, "/") for p in wd.rglob("*.py")])
+    check(g.closure("tests/test_util.py") >= {"app/util.py", "app/core.py", "app/__init__.py",
+                                              "tests/conftest.py"},
+          "graph: transitive + relative imports, the package __init__ and conftest.py")
+    check("app/core.py" not in g.closure("tests/test_text.py"),
+          "graph: a test doesn't reach modules it never imports")
+    _write(wd, "report.xml",
+           '<testsuites><testsuite>'
+           '<testcase file="tests/test_core.py" classname="tests.test_core" name="a" time="0.5"/>'
+           '<testcase classname="tests.test_util.TestX" name="b" time="0.25">'
+           '<failure message="x"/></testcase>'
+           '<testcase classname="" name="tests.test_text" time="0"><error message="coll"/></testcase>'
+           '</testsuite></testsuites>')
+    got = impact.read_junit(wd / "report.xml", {"tests/test_core.py", "tests/test_util.py",
+                                                "tests/test_text.py"})
+    check(got == {"tests/test_core.py": (True, 0.5), "tests/test_util.py": (False, 0.25),
+                  "tests/test_text.py": (False, 0.0)},
+          "junit: outcome and time per file (file attr, classname, collection error)")
+    (wd / "report.xml").unlink()
+    check(impact.read_junit(wd / "missing.xml", set()) is None, "junit: no report yet -> None")
+
+    # ---- the tool --------------------------------------------------------------------------
+    if importlib.util.find_spec("pytest") is None:
+        print("  [SKIP] pytest not installed — run_tests(scope='impacted') checks skipped")
+    else:
+        reg = default_registry(str(wd))
+        reg.checkpointer = Checkpointer(wd / ".ckpt")
+        reg.checkpointer.set_marker(1)
+        ran = []
+        real = testreport.read
+        testreport.read = lambda paths, tests: ran.append(sorted(tests)) or real(paths, tests)
+        try:
+            r = reg.execute("run_tests", {"scope": "impacted"})
+            check("[PASS] 3 passed" in r and "ran 3 of 3 test file(s)" in r,
+                  "first impacted run, no changes recorded: every file runs")
+
+            reg.checkpointer.set_marker(2)
+            reg.execute("read_file", {"path": "app/core.py"})
+            reg.execute("edit_file", {"path": "app/core.py", "old_string": "return a + b",
+                                      "new_string": "return b + a"})
+            r = reg.execute("run_tests", {"scope": "impacted"})
+            check("[PASS] 2 passed" in r and "ran 2 of 3 test file(s) affected by 1 changed "
+                  "file(s) (app/core.py)" in r and "skipped 1 (1 passed earlier" in r
+                  and ran[-1] == ["tests/test_core.py", "tests/test_util.py"],
+                  "an edit to app/core.py runs only the tests that import it")
+            check("s saved" in r or "time saved" in r, "the time saved is reported")
+
+            r = reg.execute("run_tests", {"scope": "impacted"})
+            check(r.startswith("[PASS] nothing affected") and "3 passed earlier" in r
+                  and "~" in r and "s saved" in r,
+                  "unchanged inputs: nothing re-runs, the saved time is the recorded one")
+
+            reg.checkpointer.set_marker(3)
+            reg.execute("read_file", {"path": "app/text.py"})
+            reg.execute("edit_file", {"path": "app/text.py", "old_string": "s.upper()",
+                                      "new_string": "s.lower()"})
+            r = reg.execute("run_tests", {"scope": "impacted"})
+            check("[FAIL]" in r and "ran 1 of 3" in r, "a breaking change fails its test")
+            r = reg.execute("run_tests", {"scope": "impacted"})
+            check("[FAIL]" in r and "ran 1 of 3" in r, "a failure is not cached: it runs again")
+            reg.execute("edit_file", {"path": "app/text.py", "old_string": "s.lower()",
+                                      "new_string": "s.upper()"})
+
+            reg2 = default_registry(str(wd))
+            r = reg2.execute("run_tests", {})
+            check("[PASS] 3 passed" in r and "Impact:" not in r, "scope=all runs the suite as before")
+            r = reg2.execute("run_tests", {"scope": "impacted"})
+            check("[PASS] nothing affected" in r and "3 passed earlier" in r,
+                  "…and fills the cache for a later impacted run")
+
+            reg3 = default_registry(str(wd))
+            reg3.checkpointer = Checkpointer(wd / ".ckpt3")
+            reg3.checkpointer.set_marker(1)
+            reg3.execute("read_file", {"path": "app/text.py"})
+            reg3.execute("edit_file", {"path": "app/text.py", "old_string": "s.upper()",
+                                       "new_string": "s.upper() "})
+            spawned = []
+
+            def _bg(cmd, cwd):
+                spawned.append(cmd)
+                subprocess.run(cmd, shell=True, cwd=cwd, capture_output=True)
+                return "Started background task bg1."
+
+            reg3.background_spawn = _bg
+            r = reg3.execute("run_tests", {"scope": "impacted", "rest": "background"})
+            check("ran 1 of 3" in r and "2 unaffected file(s) run in the background" in r
+                  and "test_core.py" in spawned[0] and "test_text.py" not in spawned[0],
+                  "rest='background' starts the unaffected files separately")
+            r = reg3.execute("run_tests", {"scope": "impacted"})
+            check("[PASS] nothing affected" in r and "3 passed earlier" in r,
+                  "the background results are folded into the cache")
+
+            r = reg3.execute("run_tests", {"scope": "impacted",
+                                           "command": "python -c \"print('1 passed')\""})
+            check(r.startswith("(scope='impacted' needs a plain pytest command"),
+                  "a non-pytest command runs whole, with a note")
+        finally:
+            testreport.read = real
+
+    shutil.rmtree(wd, ignore_errors=True)
+    print("\nIMPACT:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,7 @@ from __future__ import annotations
 
 import sys
 import tempfile
+import threading
 import time
 from pathlib import Path
 
@@ -17,6 +18,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from robodog_terminal.tools import default_registry            # noqa: E402
 from robodog_terminal.llm_client import EchoClient             # noqa: E402
 from robodog_terminal.loop import AgentLoop                    # noqa: E402
+from robodog_terminal.agents import register_agent_tool        # noqa: E402
 from robodog_terminal.background import BackgroundManager      # noqa: E402
 from robodog_terminal.tasklist import (TaskChecklist,          # noqa: E402
                                register_task_tools, register_ask_tool)
@@ -48,6 +50,43 @@ def main() -> int:
     check("Created" in r, "yolo mode allows write again")
     check("PLAN MODE" not in reg.catalog(), "catalog note removed in yolo")
 
+    # ---------------- catalog memo ----------------------------------------
+    cat1 = reg.catalog()
+    check(reg.catalog() is cat1, "catalog memoized between calls (same object)")
+    reg.cycle_permission_mode()
+    while reg.mode != "plan":
+        reg.cycle_permission_mode()
+    check("PLAN MODE IS ACTIVE" in reg.catalog(), "permission-mode cycle invalidates the catalog")
+    reg.mode = "yolo"
+    from robodog_terminal.tools import Tool, ToolParam
+    reg.register(Tool(name="zz_probe", description="probe tool", params=[
+        ToolParam("x", "an arg")], handler=lambda a: "ok"))
+    check("zz_probe" in reg.catalog(), "register() invalidates the catalog")
+    reg._tools = {k: v for k, v in reg._tools.items() if k != "zz_probe"}
+    check("zz_probe" not in reg.catalog(), "a directly filtered _tools dict is noticed too")
+    from robodog_terminal.agents import _child_registry
+    kid_a, kid_b = _child_registry(reg, "explore"), _child_registry(reg, "explore")
+    kid_g = _child_registry(reg, "general")
+    check(kid_a.catalog() is kid_b.catalog() and kid_g.catalog() is not kid_a.catalog(),
+          "children of one agent type share a single rendered catalog")
+    check("- bash(" not in kid_a.catalog() and "- bash(" in kid_g.catalog(),
+          "shared child catalogs still match each type's tool set")
+    kid_c = _child_registry(reg, "explore")
+    probe = next(iter(kid_c._tools.values()))
+    kid_c._tools = dict(kid_c._tools)
+    kid_c._tools[probe.name] = Tool(name=probe.name, description="CHANGED SCHEMA",
+                                    params=probe.params, handler=probe.handler)
+    check("CHANGED SCHEMA" in kid_c.catalog() and "CHANGED SCHEMA" not in kid_a.catalog(),
+          "a changed schema under the same tool names isn't served the shared text")
+    for i in range(50):
+        reg._shared_catalogs[("filler", i)] = "x"
+    kid_c._tools = dict(kid_c._tools)
+    kid_c._tools[probe.name] = Tool(name=probe.name, description="CHANGED AGAIN",
+                                    params=probe.params, handler=probe.handler)
+    kid_c.catalog()
+    from robodog_terminal.tools import _SHARED_CATALOGS_MAX
+    check(len(reg._shared_catalogs) <= _SHARED_CATALOGS_MAX, "the shared catalog store is bounded")
+
     # ---------------- @-mentions ----------------------------------------
     from robodog_terminal.app import _expand_mentions
     (wd / "notes.txt").write_text("SECRET-MARKER-42", encoding="utf-8")
@@ -227,6 +266,94 @@ def main() -> int:
     check(all(e["duration_s"] >= 0 for e in lpTr2.trace),
           "every traced event has a non-negative duration")
 
+    # Streaming mode (stream_tools): a parallel-safe call starts as soon as its
+    # closing tag arrives — before the rest of the reply has been generated.
+    (wd / "early.txt").write_text("early content\n", encoding="utf-8")
+
+    class _SlowStreamClient(EchoClient):
+        def __init__(self, script):
+            super().__init__(script=script)
+            self.started_mid_stream = None
+
+        def complete_stream(self, prompt, context="", max_tokens=8192,
+                            temperature=0.3, on_delta=None):
+            comp = self.complete(prompt, context, max_tokens, temperature)
+            head, sep, tail = comp.text.partition("</tool>")
+            on_delta(head + sep)
+            if tail:
+                # the read must already be running while the reply continues
+                self.started_mid_stream = read_seen.wait(5)
+                on_delta(tail)
+            return comp
+
+    read_seen = threading.Event()
+    regSt = default_registry(cwd=str(wd))
+    _orig_read = regSt._tools["read_file"].handler
+    regSt._tools["read_file"].handler = lambda a: (read_seen.set(), _orig_read(a))[1]
+    stc = _SlowStreamClient([
+        '<tool name="read_file"><param name="path">early.txt</param></tool>'
+        + " and a long explanation" * 50,
+        "Done."])
+    lpSt = AgentLoop(stc, regSt, max_iterations=4, trace_enabled=True, stream_tools=True)
+    resSt = lpSt.run("read it")
+    check(stc.started_mid_stream is True,
+          "stream_tools: read_file started before the reply finished streaming")
+    check(resSt.final_text == "Done." and any(
+        t.role == "tool" and "early content" in t.content for t in lpSt.history),
+        "stream_tools: the early result is used (not re-run) and lands in history")
+    check(sum(1 for e in lpSt.trace if e["kind"] == "tool_call") == 1,
+          "stream_tools: the early-started call ran exactly once")
+    fts = [e for e in lpSt.trace if e["kind"] == "first_tool_start"]
+    check(len(fts) == 1 and fts[0]["streamed"] is True,
+          "stream_tools: time-to-first-tool-start recorded as a mid-stream start")
+
+    regSt2 = default_registry(cwd=str(wd))
+    lpSt2 = AgentLoop(EchoClient(script=[
+        '<tool name="write_file"><param name="path">st2.txt</param>'
+        '<param name="content">x</param></tool>'
+        '<tool name="read_file"><param name="path">st2.txt</param></tool>', "Done."]),
+        regSt2, max_iterations=4, trace_enabled=True, stream_tools=True)
+    lpSt2.run("write then read")
+    check(not any(e.get("early") for e in lpSt2.trace if e["kind"] == "tool_call")
+          and any(t.role == "tool" and "\tx" in t.content for t in lpSt2.history),
+          "stream_tools: nothing starts early after a mutating call (read sees the write)")
+
+    # An early-started subagent whose reply attempt failed (the retry streams
+    # a different reply) is told to stop — it doesn't keep calling the model.
+    child_calls = []
+    child_up = threading.Event()
+
+    def _abandon_script(prompt, ctx=""):
+        if "ABANDONED CHILD" in prompt:
+            child_calls.append(time.monotonic())
+            child_up.set()
+            time.sleep(0.1)
+            return '<tool name="glob"><param name="pattern">*.txt</param></tool>'
+        return "Done."
+
+    class _DroppedStreamClient(EchoClient):
+        attempts = 0
+
+        def complete_stream(self, prompt, context="", max_tokens=8192,
+                            temperature=0.3, on_delta=None):
+            self.attempts += 1
+            if self.attempts == 1:
+                on_delta('<tool name="agent"><param name="prompt">ABANDONED CHILD'
+                         '</param></tool>')
+                child_up.wait(5)
+                raise ConnectionError("stream dropped")
+            return self.complete(prompt, context, max_tokens, temperature)
+
+    dsc = _DroppedStreamClient(script=_abandon_script)
+    regAb = default_registry(cwd=str(wd))
+    register_agent_tool(regAb, dsc)
+    lpAb = AgentLoop(dsc, regAb, max_iterations=4, stream_tools=True)
+    lpAb.api_retry_pause = 0
+    resAb = lpAb.run("delegate")
+    time.sleep(1.0)
+    check(resAb.final_text == "Done." and 1 <= len(child_calls) <= 2,
+          f"stream_tools: an abandoned early subagent stops ({len(child_calls)} model calls)")
+
     # (1.3) Unknown tool name suggests the closest real one.
     r = default_registry(cwd=str(wd)).execute("write_files", {"path": "x", "content": "y"})
     check("unknown tool" in r and "Did you mean 'write_file'" in r,
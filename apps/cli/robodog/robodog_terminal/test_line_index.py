@@ -0,0 +1,115 @@
+# file: robodog_terminal/test_line_index.py
+"""
+Tests for line_index.py: windows anywhere in a multi-chunk file (across
+chunk boundaries, CRLF, a final line without a newline), tail reads, a
+single huge line sliced before decoding, the cached index being dropped
+when the file changes, and read_file returning the same text through the
+index as through its small-file path (an offset past the end included).
+Run: python robodog_terminal/test_line_index.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import line_index                              # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_li_"))
+    big = wd / "big.log"
+    # Uneven line lengths so lines straddle the 1 MB chunk boundaries.
+    rows = [f"{i:07d} " + "x" * (i % 97) for i in range(60_000)]
+    big.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    check(big.stat().st_size > 2 * line_index._CHUNK, "fixture spans several chunks")
+
+    first, got, total = line_index.read_window(big, 0, 5)
+    check(first == 0 and got == rows[:5] and total == len(rows), "window: the head")
+    for off in (1, 12_345, 21_000, 40_001, 59_990):
+        first, got, _ = line_index.read_window(big, off, 10)
+        if not (first == off and got == rows[off:off + 10]):
+            check(False, f"window: offset {off}")
+            break
+    else:
+        check(True, "window: offsets across chunk boundaries")
+    first, got, _ = line_index.read_window(big, -3, None)
+    check(first == len(rows) - 3 and got == rows[-3:], "tail: a negative offset reads the end")
+    first, got, _ = line_index.read_window(big, 70_000, 10)
+    check(got == [] and first == len(rows), "window: past the end is empty")
+    first, got, _ = line_index.read_window(big, 0, None, max_chars=1000)
+    check(0 < len(got) < 100 and got == rows[:len(got)], "no limit: stops at max_chars")
+
+    one = wd / "bundle.min.js"
+    body = ("é" + "ab" * 7) * 200_000                    # 3.4 MB of one line, multibyte
+    one.write_text(body + "\n", encoding="utf-8")
+    first, got, total = line_index.read_window(one, 0, None, max_chars=1000)
+    rest = len(body.encode("utf-8")) - len(body[:1000].encode("utf-8"))
+    check(total == 1 and len(got) == 1 and got[0].startswith(body[:1000])
+          and got[0].endswith(f" … [{rest} more bytes on this line]"),
+          "huge line: cut at max_chars on a character boundary, with what's left")
+
+    builds = []
+    real_build = line_index.LineIndex.build
+    line_index.LineIndex.build = classmethod(
+        lambda cls, *a: builds.append(1) or real_build.__func__(cls, *a))
+    try:
+        line_index.read_window(big, 100, 1)
+        line_index.read_window(big, 200, 1)
+        check(not builds, "cache: an unchanged file reuses its index")
+        with open(big, "a", encoding="utf-8") as fh:
+            fh.write("appended\r\nlast-no-newline")
+        first, got, total = line_index.read_window(big, -2, None)
+        check(builds and got == ["appended", "last-no-newline"] and total == len(rows) + 2,
+              "cache: a changed file is re-indexed; CRLF and a final partial line")
+    finally:
+        line_index.LineIndex.build = real_build
+
+    # ---- the tool: index path == small-file path -----------------------------------
+    mid = wd / "mid.txt"
+    mid.write_text("".join(f"line {i}\n" for i in range(500)), encoding="utf-8")
+    reg = default_registry(str(wd))
+    saved = os.environ.get("ROBODOG_READ_INDEX_MIN_KB")
+    try:
+        same = True
+        for args in ({"offset": 10, "limit": 5}, {"offset": -4}, {"limit": 3},
+                     {"offset": 498, "limit": 10}, {"offset": 600}, {}):
+            os.environ.pop("ROBODOG_READ_INDEX_MIN_KB", None)
+            plain = reg.execute("read_file", {"path": "mid.txt", **args})
+            os.environ["ROBODOG_READ_INDEX_MIN_KB"] = "0"
+            indexed = reg.execute("read_file", {"path": "mid.txt", **args})
+            same = same and plain == indexed
+        check(same, "tool: the same output through the index as through splitlines()")
+        check(reg.execute("read_file", {"path": "mid.txt", "offset": -2})
+              == "499\tline 498\n500\tline 499", "tool: tail numbering")
+        check(reg.execute("read_file", {"path": "mid.txt", "offset": 600}).startswith(
+              "(offset 600 is past the end — the file has 500 line(s)"),
+              "tool: an offset past the end says how many lines there are")
+    finally:
+        if saved is None:
+            os.environ.pop("ROBODOG_READ_INDEX_MIN_KB", None)
+        else:
+            os.environ["ROBODOG_READ_INDEX_MIN_KB"] = saved
+    out = reg.execute("read_file", {"path": "big.log"})
+    check("… [showing lines 1-" in out and "negative offset" in out,
+          "tool: a huge file without a limit shows a window and says how to page")
+    out = reg.execute("read_file", {"path": "big.log", "offset": 30_000, "limit": 2})
+    check(out == f"30001\t{rows[30_000]}\n30002\t{rows[30_001]}", "tool: windowed read")
+
+    print("\nLINE INDEX:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,6 +35,9 @@ class FakeResp:
     def json(self):
         return self._p
 
+    def close(self):
+        self.closed = True
+
 
 class FakeSession:
     def __init__(self, responses):
@@ -412,8 +415,8 @@ def main() -> int:
     try:
         _os.environ.pop("ROBODOG_LLM_MAX_CONCURRENCY", None)
         _os.environ.pop("ROBODOG_LLM_URL", None)
-        lc._OPENAI_SEM = None
-        check(lc._openai_semaphore() is None, "no cap, no url -> no semaphore (unbounded)")
+        lc._OPENAI_LIMITER = None
+        check(lc._openai_limiter() is None, "no cap, no url -> no limiter (unbounded)")
 
         # a known fast provider stays uncapped by default
         _os.environ["ROBODOG_LLM_URL"] = "https://openrouter.ai/api/v1"
@@ -441,8 +444,8 @@ def main() -> int:
         _os.environ.pop("ROBODOG_LLM_URL", None)
 
         _os.environ["ROBODOG_LLM_MAX_CONCURRENCY"] = "2"
-        lc._OPENAI_SEM = None
-        check(lc._openai_semaphore() is not None, "cap set -> semaphore created")
+        lc._OPENAI_LIMITER = None
+        check(lc._openai_limiter() is not None, "cap set -> limiter created")
 
         active = {"now": 0, "max": 0}
         lk = _th.Lock()
@@ -473,6 +476,34 @@ def main() -> int:
             t.join()
         check(active["max"] <= 2,
               f"6 concurrent calls throttled to the cap of 2 (peak {active['max']})")
+
+        # An explicit cap is the ceiling; a custom gateway's auto cap is only
+        # the starting point of an adaptive limit.
+        check(lc._openai_limiter().ceiling == 2, "explicit cap -> adaptive ceiling")
+        _os.environ.pop("ROBODOG_LLM_MAX_CONCURRENCY", None)
+        _os.environ["ROBODOG_LLM_URL"] = "https://elsa.example/Monolith/api/model/openai"
+        auto = lc._openai_limiter()
+        check(auto.limit == lc._DEFAULT_CUSTOM_CONCURRENCY
+              and auto.ceiling == lc._ADAPTIVE_CEILING,
+              "custom gateway -> starts at the default, may grow to the ceiling")
+
+        class _Resp429:
+            status_code = 429
+            headers = {"Retry-After": "0"}
+            text = "slow down"
+
+        class _OverloadSession:
+            def post(self, *a, **k):
+                return _Resp429()
+        auto.limit = 8.0
+        try:
+            OpenAICompatClient(base_url="https://x", api_key="k", model="m",
+                               max_attempts=1, on_retry=lambda *a: None,
+                               session=_OverloadSession()).complete("hi")
+        except RuntimeError:
+            pass
+        check(auto.limit == 4.0 and auto.cuts == 1 and auto.inflight == 0,
+              f"429 halves the shared limit and frees the slot ({auto.limit})")
     finally:
         for _k, _v in (("ROBODOG_LLM_MAX_CONCURRENCY", _saved),
                        ("ROBODOG_LLM_URL", _saved_url)):
@@ -480,7 +511,39 @@ def main() -> int:
                 _os.environ.pop(_k, None)
             else:
                 _os.environ[_k] = _v
-        lc._OPENAI_SEM = None
+        lc._OPENAI_LIMITER = None
+
+    # ---- AdaptiveLimiter (AIMD) ------------------------------------------
+    lim = lc.AdaptiveLimiter(2, 6)
+    for _ in range(12):                 # saturated, fast successes -> grows
+        a, b = lim.acquire(), lim.acquire()
+        lim.release(a)
+        lim.release(b)
+    check(lim.limit > 3 and lim.snapshot()["high"] >= 3,
+          f"AIMD: saturated fast successes raise the limit ({lim.limit:.2f})")
+    for _ in range(40):
+        s1 = [lim.acquire() for _ in range(int(lim.limit))]
+        for x in s1:
+            lim.release(x)
+    check(lim.limit == 6, "AIMD: never above the ceiling")
+    lim.overload()
+    lim.overload()                      # same burst: cooldown ignores it
+    check(lim.limit == 3 and lim.cuts == 1,
+          "AIMD: overload halves once per cooldown")
+    solo = lc.AdaptiveLimiter(4, 8)
+    x = solo.acquire()
+    solo.release(x)
+    check(solo.limit == 4, "AIMD: an unsaturated success doesn't grow the limit")
+    one = lc.AdaptiveLimiter(1, 1)
+    held = one.acquire()
+    waiter = _th.Thread(target=lambda: one.release(one.acquire()))
+    waiter.start()
+    _th.Event().wait(0.05)
+    snap = one.snapshot()
+    one.release(held)
+    waiter.join(2)
+    check(snap["queued"] == 1 and snap["inflight"] == 1 and not waiter.is_alive(),
+          "AIMD: queue depth visible while a caller waits for a slot")
 
     # ---- error classification: connect vs read timeout ------------------
     import requests as _requests
@@ -557,6 +620,128 @@ def main() -> int:
     check(_backoff_delay(20, retry_after=9999) <= 60.5,
           "backoff caps a huge Retry-After at ~60s")
 
+    # ---- streaming: complete_stream (SSE + fallbacks) ---------------------
+    import json as _json
+
+    class FakeStreamResp(FakeResp):
+        def __init__(self, events, ctype="text/event-stream"):
+            super().__init__(200)
+            self.headers = {"content-type": ctype}
+            self.encoding = None
+            self._lines = [f"data: {_json.dumps(ev)}" if isinstance(ev, dict) else ev
+                           for ev in events]
+
+        def iter_lines(self, decode_unicode=False):
+            for ln in self._lines:
+                yield ln
+                yield ""
+
+    sse = FakeStreamResp([
+        ": keep-alive",
+        {"choices": [{"delta": {"content": "Hel"}}]},
+        {"choices": [{"delta": {"content": "lo"}, "finish_reason": "stop"}]},
+        {"choices": [], "usage": {"prompt_tokens": 11, "completion_tokens": 2}},
+        "data: [DONE]",
+    ])
+    ss = FakeSession([sse])
+    sc = OpenAICompatClient(base_url="https://x/v1", api_key="k", model="m", session=ss)
+    deltas = []
+    comp = sc.complete_stream("hi", on_delta=deltas.append)
+    check(deltas == ["Hel", "lo"] and comp.text == "Hello",
+          "complete_stream: SSE content deltas emitted in order and joined")
+    check(comp.finish_reason == "stop" and comp.prompt_tokens == 11
+          and comp.completion_tokens == 2,
+          "complete_stream: finish_reason + final usage chunk captured")
+    check(ss.calls[0][1]["json"]["stream"] is True and ss.calls[0][1].get("stream") is True,
+          "complete_stream: requests stream=true on the wire and a streamed body")
+
+    ss2 = FakeSession([FakeStreamResp([], ctype="application/json")])
+    ss2.responses[0]._p = oai_payload("plain body")
+    sc2 = OpenAICompatClient(base_url="https://x/v1", api_key="k", model="m", session=ss2)
+    d2 = []
+    check(sc2.complete_stream("hi", on_delta=d2.append).text == "plain body"
+          and d2 == ["plain body"],
+          "complete_stream: server that ignores stream=true (plain JSON) still works")
+
+    ss3_first = FakeResp(400, text="stream unsupported")
+    ss3 = FakeSession([ss3_first, FakeResp(200, oai_payload("via fallback"))])
+    sc3 = OpenAICompatClient(base_url="https://x/v1", api_key="k", model="m", session=ss3)
+    d3 = []
+    check(sc3.complete_stream("hi", on_delta=d3.append).text == "via fallback"
+          and "".join(d3) == "via fallback" and "stream" not in ss3.calls[1][1]["json"],
+          "complete_stream: non-200 stream falls back to the non-streaming path")
+    check(getattr(ss3_first, "closed", False),
+          "complete_stream: the unread non-200 stream is closed before the fallback")
+
+    class BrokenStreamResp(FakeStreamResp):
+        def iter_lines(self, decode_unicode=False):
+            yield 'data: {"choices": [{"delta": {"content": "par"}}]}'
+            raise requests.ConnectionError("reset")
+
+    sc4 = OpenAICompatClient(base_url="https://x/v1", api_key="k", model="m",
+                             session=FakeSession([BrokenStreamResp([])]))
+    try:
+        sc4.complete_stream("hi", on_delta=lambda d: None)
+        check(False, "complete_stream: mid-stream break raises")
+    except RuntimeError as exc:
+        check("interrupted" in str(exc),
+              "complete_stream: a break after deltas raises (never replays duplicate text)")
+
+    long_text = "x" * 600
+    d5 = []
+    c5 = EchoClient(script=[long_text]).complete_stream("p", on_delta=d5.append)
+    check(c5.text == long_text and "".join(d5) == long_text and len(d5) == 3,
+          "complete_stream fallback (echo/gateway) replays the reply in chunks")
+
+    # ---- complete_chat: message arrays + prompt-cache breakpoints ----------
+    chat = [{"role": "system", "content": "catalog"},
+            {"role": "user", "content": "goal"},
+            {"role": "assistant", "content": "reading"},
+            {"role": "user", "content": "TOOL RESULT [read_file]:\nbody"}]
+    cached_body = oai_payload("ok")
+    cached_body["usage"]["prompt_tokens_details"] = {"cached_tokens": 2}
+    cs = FakeSession([FakeResp(200, cached_body)])
+    cc = OpenAICompatClient(base_url="https://openrouter.ai/api/v1", api_key="k",
+                            model="anthropic/claude-sonnet-4.6", session=cs)
+    comp = cc.complete_chat(chat, cache_breakpoints=[0, 3])
+    sent = cs.calls[0][1]["json"]["messages"]
+    check(len(sent) == 4 and [m["role"] for m in sent] == [m["role"] for m in chat],
+          "complete_chat: the message array goes out as-is (no flattening)")
+    check(sent[0]["content"][-1].get("cache_control") == {"type": "ephemeral"}
+          and sent[3]["content"][-1]["text"].endswith("body")
+          and sent[3]["content"][-1].get("cache_control")
+          and sent[1]["content"] == "goal",
+          "complete_chat: cache_control only on the breakpoint messages (Claude model)")
+    check(comp.cached_tokens == 2 and chat[0]["content"] == "catalog",
+          "complete_chat: cached_tokens parsed from usage; caller's messages untouched")
+
+    gs = FakeSession([FakeResp(200, oai_payload("ok"))])
+    OpenAICompatClient(base_url="https://api.openai.com/v1", api_key="k", model="gpt-4o",
+                       session=gs).complete_chat(chat, cache_breakpoints=[0, 3])
+    check(all(isinstance(m["content"], str) for m in gs.calls[0][1]["json"]["messages"]),
+          "complete_chat: no cache_control for providers that cache prefixes automatically")
+
+    sse_cached = FakeStreamResp([
+        {"choices": [{"delta": {"content": "hi"}, "finish_reason": "stop"}]},
+        {"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 1,
+                                  "cache_read_input_tokens": 8}},
+        "data: [DONE]"])
+    sc6 = OpenAICompatClient(base_url="https://x/v1", api_key="k", model="m",
+                             session=FakeSession([sse_cached]))
+    d6 = []
+    c6 = sc6.complete_chat(chat, on_delta=d6.append)
+    check(c6.text == "hi" and d6 == ["hi"] and c6.cached_tokens == 8,
+          "complete_chat(on_delta=…) streams and reads Anthropic-style cached usage")
+
+    seen = []
+    fe = EchoClient(script=lambda p, c: (seen.append((p, c)), "flat")[1])
+    check(fe.complete_chat(chat, cache_breakpoints=[0]).text == "flat"
+          and seen[0][1] == "catalog"
+          and seen[0][0] == ("USER: goal\n\nASSISTANT: reading\n\n"
+                             "USER: TOOL RESULT [read_file]:\nbody\n\nASSISTANT:")
+          and not EchoClient.supports_messages and OpenAICompatClient.supports_messages,
+          "complete_chat fallback flattens to context + transcript prompt")
+
     print("\nLLM CLIENT:", "ALL PASS" if ok else "FAILURES")
     return 0 if ok else 1
 
@@ -1,12 +1,13 @@
 # file: robodog_terminal/test_loop_checkpoint.py
 """
 Tests for loop.py (trim, nudge, circuit breaker, cancel) and checkpoint.py
-(snapshot/restore/prune/markers) and the tools.py safety layer
+(snapshot/restore/markers, the deduplicating delta store and its size budget) and the tools.py safety layer
 (read-before-edit, diff hook, excluded dirs, clamp, param validation).
 Run: python robodog_terminal/test_loop_checkpoint.py   (from robodogcli/robodog)
 """
 from __future__ import annotations
 
+import os
 import sys
 import tempfile
 import threading
@@ -15,7 +16,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from robodog_terminal.llm_client import EchoClient          # noqa: E402
 from robodog_terminal.tools import default_registry, _clamp  # noqa: E402
-from robodog_terminal.loop import AgentLoop, Turn            # noqa: E402
+from robodog_terminal.loop import AgentLoop, Turn, _BackgroundCompactor  # noqa: E402
 from robodog_terminal.checkpoint import Checkpointer         # noqa: E402
 
 ok = True
@@ -48,6 +49,107 @@ def main() -> int:
     check(cleared > 0, f"old tool outputs cleared ({cleared})")
     check(loop.history[-1].content == "latest question", "recent turns untouched")
 
+    # ---------------- loop: incremental prompt rendering ------------------
+    # The cached render must always equal a from-scratch join, whatever
+    # rewrote history in between (trim, compaction, /rewind, /clear, edits).
+    def _fresh(lp):
+        segs = []
+        for t in lp.history:
+            if t.role == "user":
+                segs.append(f"USER: {t.content}")
+            elif t.role == "assistant":
+                segs.append(f"ASSISTANT: {t.content}")
+            elif t.role == "tool":
+                segs.append(f"TOOL RESULT [{t.tool_name}]:\n{t.content}")
+        return "\n\n".join(segs + ["ASSISTANT:"])
+
+    rl = AgentLoop(EchoClient(script=["done"]), default_registry(cwd=str(wd)))
+    check(rl._render_prompt() == "ASSISTANT:", "render: empty history")
+    rl.history.append(Turn("user", "goal"))
+    for i in range(12):
+        rl.history.append(Turn("assistant", f"step {i}"))
+        rl.history.append(Turn("tool", f"out {i} " * 40, tool_name="read_file"))
+        if rl._render_prompt() != _fresh(rl):
+            check(False, f"render: matches full join after append {i}")
+            break
+    else:
+        check(True, "render: matches a full join after every append")
+    check(rl.transcript_chars() == sum(len(t.content) for t in rl.history),
+          "render: running char total matches the summed history")
+    rl.max_transcript_chars = rl.transcript_chars() - 500
+    rl.trim_keep_recent = 4
+    p_trim = rl._render_prompt()
+    check("[old tool output cleared" in p_trim and p_trim == _fresh(rl)
+          and rl.transcript_chars() == sum(len(t.content) for t in rl.history),
+          "render: trim invalidates the rewritten turns (prompt + total stay exact)")
+    rl.history[3].content = "edited in place"
+    check(rl._render_prompt() == _fresh(rl), "render: in-place content rewrite picked up")
+    rl.history[:] = [rl.history[0], Turn("user", "[summary]")] + rl.history[-4:]
+    check(rl._render_prompt() == _fresh(rl)
+          and rl.transcript_chars() == sum(len(t.content) for t in rl.history),
+          "render: compaction-style history[:] rebuild")
+    del rl.history[3:]
+    rl.history.append(Turn("tool", "after rewind", tool_name="bash"))
+    check(rl._render_prompt() == _fresh(rl), "render: /rewind-style truncate + append")
+    rl.history.clear()
+    check(rl._render_prompt() == "ASSISTANT:" and rl.transcript_chars() == 0,
+          "render: /clear resets the cache")
+
+    # ---------------- loop: cache-aware prompt layout (prompt_cache) -------
+    class _ChatClient(EchoClient):
+        supports_messages = True
+
+        def __init__(self, script):
+            super().__init__(script=script)
+            self.sent = []
+
+        def complete_chat(self, messages, max_tokens=8192, temperature=0.3,
+                          on_delta=None, cache_breakpoints=()):
+            self.sent.append(([dict(m) for m in messages], list(cache_breakpoints)))
+            comp = self.complete("x")
+            comp.prompt_tokens, comp.cached_tokens = 100, 60
+            return comp
+
+    (wd / "pc.txt").write_text("cached prefix\n", encoding="utf-8")
+    cc = _ChatClient([
+        '<tool name="read_file"><param name="path">pc.txt</param></tool>',
+        '<tool name="list_dir"><param name="path">.</param></tool>',
+        "all done"])
+    pl = AgentLoop(cc, default_registry(cwd=str(wd)), prompt_cache=True)
+    pres = pl.run("look around")
+    (m1, b1), (m2, b2), (m3, b3) = cc.sent
+    check(m1[0]["role"] == "system" and "read_file" in m1[0]["content"]
+          and m1[1] == {"role": "user", "content": "look around"},
+          "prompt_cache: system catalog first, then the raw user turn")
+    check(m3[:len(m2)] == m2 and m2[:len(m1)] == m1,
+          "prompt_cache: each call's messages are a byte-identical prefix of the next")
+    check([m["role"] for m in m3] == ["system", "user", "assistant", "user",
+                                      "assistant", "user"]
+          and m3[3]["content"].startswith("TOOL RESULT [read_file]:"),
+          "prompt_cache: roles alternate, tool results go out as user messages")
+    check(b1 == [0, 1] and b3 == [0, 3, 5],
+          f"prompt_cache: breakpoints on system / previous tail / last ({b3})")
+    check(pres.cached_tokens == 180 and pres.final_text == "all done",
+          "prompt_cache: cached tokens summed into the LoopResult")
+    plain = AgentLoop(EchoClient(script=["ok"]), default_registry(cwd=str(wd)),
+                      prompt_cache=True)
+    check(plain.run("hi").final_text == "ok",
+          "prompt_cache: a prompt-only client keeps the flat prompt")
+
+    tb = AgentLoop(EchoClient(script=["done"]), default_registry(cwd=str(wd)),
+                   prompt_cache=True)
+    tb.max_transcript_chars, tb.trim_keep_recent = 10_000, 2
+    for i in range(30):
+        tb.history.append(Turn("tool", "y" * 500, tool_name="bash"))
+    tb._trim_history()
+    check(tb.transcript_chars() <= 7_500,
+          f"prompt_cache: trim clears to the batch watermark ({tb.transcript_chars()})")
+    tb.history.append(Turn("tool", "z" * 500, tool_name="bash"))
+    snapshot = [t.content for t in tb.history]
+    tb._trim_history()
+    check([t.content for t in tb.history] == snapshot,
+          "prompt_cache: the next small overflow doesn't re-trim (prefix left alone)")
+
     # Regression: the default budget/window must be large enough for real
     # multi-hundred-K-token agentic sessions. Live usage showed the OLD
     # 120k-char / keep-8 defaults trim a read_file result from 15-20 calls
@@ -62,6 +164,104 @@ def main() -> int:
           f"default keep-recent window protects enough recent turns "
           f"({default_loop.trim_keep_recent})")
 
+    # ---------------- loop: background compaction --------------------------
+    summaries = []
+
+    def summarizer(prompt, context):
+        if prompt.startswith(AgentLoop._COMPACT_PROMPT[:40]):
+            summaries.append(prompt)
+            return f"## Goal\nsummary #{len(summaries)}"
+        return "done"
+
+    bgl = AgentLoop(EchoClient(script=summarizer), default_registry(cwd=str(wd)),
+                    background_compaction=True)
+    bgl.max_transcript_chars = 12_000
+    bgl.compact_keep_recent = 2
+    bgl._bg_compactor = _BackgroundCompactor(bgl.client, chunk_chars=2_500)
+    bgl.history.append(Turn("user", "the goal"))
+    for i in range(10):
+        bgl.history.append(Turn("tool", f"{i}" * 1000, tool_name="read_file"))
+    recent = bgl.history[-2:]
+    bgl._background_compaction_step()          # past the watermark -> job starts
+    check(bgl._bg_compactor.busy() and len(bgl.history) == 11,
+          "bg compaction: job starts past the soft watermark, history untouched")
+    bgl._bg_compactor.wait(5)
+    check(len(summaries) == 2 and "USER: [earlier conversation summary]" in summaries[1],
+          "bg compaction: complete chunks only, folded into a rolling summary")
+    bgl._background_compaction_step()          # next iteration boundary -> swap
+    check(len(bgl.history) == 1 + 1 + 2 + 2 and bgl.history[0].content == "the goal"
+          and bgl.history[1].content.startswith("[earlier conversation summary]")
+          and bgl.history[-2] is recent[0] and bgl.history[-1] is recent[1],
+          "bg compaction: summary swapped in at the boundary (goal, partial "
+          "chunk and recent turns kept verbatim)")
+
+    # A job over a longer range re-uses the summaries of the prefix it shares.
+    comp = _BackgroundCompactor(EchoClient(script=summarizer), chunk_chars=2_500)
+    hist = [Turn("user", "g")] + [Turn("tool", "y" * 1000, tool_name="grep")
+                                  for _ in range(8)]
+    summaries.clear()
+    comp.start(hist, 0, "")
+    comp.wait(5)
+    first = comp.take()
+    hist += [Turn("tool", "z" * 1000, tool_name="grep") for _ in range(4)]
+    comp.start(hist, 0, "")
+    comp.wait(5)
+    second = comp.take()
+    check(first[3]["calls"] == 2 and second[3]["reused"] == 2
+          and second[3]["calls"] == 2 and len(summaries) == 4,
+          "bg compaction: chunk summaries cached per turn range and re-used")
+
+    # The range changed while the worker ran -> the summary is discarded.
+    stale = AgentLoop(EchoClient(script=summarizer), default_registry(cwd=str(wd)),
+                      background_compaction=True)
+    stale.max_transcript_chars = 12_000
+    stale.compact_keep_recent = 2
+    stale._bg_compactor = _BackgroundCompactor(stale.client, chunk_chars=2_500)
+    stale.history.append(Turn("user", "the goal"))
+    for i in range(10):
+        stale.history.append(Turn("tool", "w" * 1000, tool_name="bash"))
+    events = []
+    stale.on_event = lambda kind, data: events.append(kind)
+    stale._background_compaction_step()
+    stale._bg_compactor.wait(5)
+    stale.history[2].content = "[old tool output cleared to save context]"
+    stale.max_transcript_chars = 10 ** 9       # below the watermark: no new job
+    stale._background_compaction_step()
+    check(len(stale.history) == 11 and "compacted" not in events,
+          "bg compaction: a summary whose range was rewritten is dropped")
+    # A failed job doesn't block a retry of the same range; a /model switch
+    # (a new loop.client) is picked up by the compactor.
+    calls = []
+
+    def flaky(prompt, context):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("backend down")
+        return "## Goal\nretried"
+
+    fl = AgentLoop(EchoClient(script=flaky), default_registry(cwd=str(wd)),
+                   background_compaction=True)
+    fl.max_transcript_chars = 12_000
+    fl.compact_keep_recent = 2
+    fl._bg_compactor = _BackgroundCompactor(fl.client, chunk_chars=2_500)
+    fl._bg_compactor.retry_after = 0
+    fl.history.append(Turn("user", "the goal"))
+    fl.history.extend(Turn("tool", "f" * 1000, tool_name="bash") for _ in range(10))
+    fl._background_compaction_step()
+    fl._bg_compactor.wait(5)
+    fl._background_compaction_step()        # same range, after the failure
+    check(fl._bg_compactor.jobs == 2, "bg compaction: a failed range is retried")
+    fl._bg_compactor.wait(5)
+    fl.client = EchoClient(script=summarizer)
+    fl._background_compaction_step()
+    check(fl._bg_compactor.client is fl.client, "bg compaction: follows the loop's client")
+
+    off = AgentLoop(EchoClient(script=summarizer), default_registry(cwd=str(wd)))
+    off.max_transcript_chars = 100
+    off.history.extend(Turn("tool", "v" * 1000, tool_name="bash") for _ in range(5))
+    off._background_compaction_step()
+    check(off._bg_compactor is None, "bg compaction: off by default")
+
     # ---------------- loop: nudge on intent-without-action ----------------
     loop2 = AgentLoop(EchoClient(script=[
         "I'll create the file for you.",       # intent, no tool blocks -> nudge
@@ -183,6 +383,68 @@ def main() -> int:
     cp2 = Checkpointer(wd / ".ckpt")
     check(cp2.markers() == marks, "manifest reloads from disk")
 
+    # ---------------- checkpoint object store -----------------------------
+    cs = Checkpointer(wd / ".ckpt_store")
+    twin = wd / "twin.txt"
+    twin.write_text("v1", encoding="utf-8")
+    cs.snapshot(f)
+    cs.snapshot(twin)
+    check(cs.stats()["objects"] == 1 and cs.stats()["snapshots"] == 2,
+          "identical contents are stored once")
+    big = wd / "big.py"
+    rows = [f"row_{i} = {i * 7919 % 104729}\n" for i in range(20000)]
+    versions = []
+    for k in range(20):
+        cs.set_marker(10 + k)
+        versions.append(big.read_bytes() if big.exists() else None)
+        if big.exists():
+            cs.snapshot(big)
+        rows[(k * 997) % len(rows)] = f"edited_{k} = True\n"
+        rows.insert(k * 13, f"inserted_{k} = 1\n")
+        big.write_text("".join(rows), encoding="utf-8")
+    st = cs.stats()
+    check(st["stored_bytes"] * 10 < st["logical_bytes"],
+          f"small edits to a big file are stored as deltas "
+          f"({st['stored_bytes']} of {st['logical_bytes']} bytes)")
+    cs_again = Checkpointer(wd / ".ckpt_store")
+    exact = True
+    for k in reversed(range(1, 20)):
+        cs_again.restore(10 + k)
+        exact = exact and big.read_bytes() == versions[k]
+    check(exact, "every marker restores byte for byte (delta chains, after a reload)")
+
+    cb = Checkpointer(wd / ".ckpt_budget", max_bytes=40_000)
+    noise = wd / "noise.bin"
+    for k in range(10):
+        cb.set_marker(k)
+        noise.write_bytes(os.urandom(10_000))
+        cb.snapshot(noise)
+    st = cb.stats()
+    check(st["stored_bytes"] <= 40_000 and st["snapshots"] < 10,
+          f"a size budget, not a count cap ({st['snapshots']} snapshots in "
+          f"{st['stored_bytes']} bytes)")
+    kept = noise.read_bytes()
+    cb.snapshot(noise)                      # the current marker is never dropped
+    noise.write_bytes(b"changed")
+    acts = cb.restore(9)
+    check(noise.read_bytes() == kept and acts == [f"restored {noise}"],
+          "the current prompt's snapshots survive the budget")
+    acts = cb.restore(0)
+    check(acts == [f"restored {noise}"] and noise.read_bytes() != b"changed",
+          "dropped snapshots are skipped: the oldest kept one restores")
+    noise.write_bytes(b"changed")
+    cb_again = Checkpointer(wd / ".ckpt_budget", max_bytes=40_000)
+    acts = cb_again.restore(0)
+    check(cb_again.stats() == cb.stats() and acts == [f"restored {noise}"]
+          and noise.read_bytes() != b"changed",
+          "…and stay dropped after a reload")
+    legacy = Checkpointer(wd / ".ckpt_legacy")
+    (wd / ".ckpt_legacy" / "00000.txt").write_text("old style", encoding="utf-8")
+    legacy._append({"seq": 0, "marker": 0, "kind": "modified", "path": str(twin),
+                    "snap": "00000.txt", "ts": 0})
+    Checkpointer(wd / ".ckpt_legacy").restore(0)
+    check(twin.read_text() == "old style", "a pre-object-store manifest still restores")
+
     # ---------------- tools: safety layer ---------------------------------
     reg = default_registry(cwd=str(wd))
     diffs = []
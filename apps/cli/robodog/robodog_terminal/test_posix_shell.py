@@ -0,0 +1,149 @@
+# file: robodog_terminal/test_posix_shell.py
+"""
+Tests for the persistent POSIX shell behind the bash tool: one process
+serves every call, cd/export persist while a cwd param stays scoped, exit
+codes and stderr come back per call (including output with no final newline
+and commands with unbalanced quotes), `exit N` and a timeout reset the
+session (the timeout killing what the command started),
+ROBODOG_PERSISTENT_SHELL=0 goes back to one-shot /bin/sh, and a subagent's
+session ends with the subagent.
+Run: python robodog_terminal/test_posix_shell.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal.agents import register_agent_tool                  # noqa: E402
+from robodog_terminal.llm_client import EchoClient                         # noqa: E402
+from robodog_terminal.loop import AgentLoop                                # noqa: E402
+from robodog_terminal.tools import _PersistentPosixShell, default_registry  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def main() -> int:
+    if os.name == "nt":
+        print("  [SKIP] POSIX only — the PowerShell session is covered by test_tools_scripts")
+        print("\nPOSIX SHELL:", "ALL PASS")
+        return 0
+    wd = Path(tempfile.mkdtemp(prefix="rd_psh_"))
+    (wd / "sub").mkdir()
+    reg = default_registry(str(wd))
+
+    # ---- one session, state carries over -----------------------------------------------
+    r = reg.execute("bash", {"command": "echo $$"})
+    pid = reg._shell._proc.pid                                       # noqa: SLF001
+    check(isinstance(reg._shell, _PersistentPosixShell) and str(pid) in r,  # noqa: SLF001
+          "the first call starts a session and runs in it")
+    reg.execute("bash", {"command": "export RD_PROBE=kept; cd sub"})
+    r = reg.execute("bash", {"command": "echo \"$RD_PROBE\"; pwd; echo $$"})
+    check("kept" in r and str(wd / "sub") in r and str(pid) in r,
+          "export and a bare cd persist to the next call, same process")
+    reg.execute("bash", {"command": f"cd {wd}"})
+    r = reg.execute("bash", {"command": "pwd", "cwd": "sub"})
+    check(str(wd / "sub") in r, "a cwd param applies to its own call (resolved against the registry)")
+    r = reg.execute("bash", {"command": "pwd"})
+    check(r.rstrip().endswith(str(wd)), "…and does not leak into the next one")
+    r = reg.execute("bash", {"command": "pwd", "cwd": "no_such_dir"})
+    check("COMMAND FAILED (exit 1)" in r and "no_such_dir" in r,
+          "a missing cwd fails the call instead of running elsewhere")
+
+    # ---- framing --------------------------------------------------------------------------
+    r = reg.execute("bash", {"command": "echo out; echo err >&2; printf tail; exit_code() "
+                                        "{ return 4; }; exit_code"})
+    check("COMMAND FAILED (exit 4)" in r and "--- stdout ---\nout\ntail" in r
+          and "--- stderr ---\nerr" in r,
+          "exit code, stdout, stderr and a last line without a newline")
+    r = reg.execute("bash", {"command": "echo 'never closed"})
+    check("COMMAND FAILED (exit 2)" in r, "an unbalanced quote fails alone")
+    r = reg.execute("bash", {"command": "printf 'a\\nb\\n' | grep -c .; echo '@@ROBODOG_DONE:x:0@@'"})
+    check("(exit 0)" in r and "2\n@@ROBODOG_DONE:x:0@@" in r,
+          "sentinel-looking output is just output")
+    r = reg.execute("bash", {"command": "cat; echo after-cat"})
+    check("after-cat" in r, "a command reading stdin gets EOF, not the protocol")
+    lines = []
+    reg.on_bash_line = lines.append
+    reg.execute("bash", {"command": "echo one; echo two >&2"})
+    reg.on_bash_line = None
+    check(lines == ["one", "two"], "each line is streamed to on_bash_line")
+    lines = []
+    rc, out, _err, _t = reg._shell.run("sleep 1.5; echo done", None, str(wd), 10,  # noqa: SLF001
+                                       on_line=lines.append, idle_note_seconds=1)
+    check(rc == 0 and out == ["done"] and "still running" in lines[0],
+          "a quiet command gets an idle note and still finishes")
+
+    # ---- resets -------------------------------------------------------------------------
+    r = reg.execute("bash", {"command": "exit 3"})
+    check("COMMAND FAILED (exit 3)" in r, "`exit N` reports N")
+    r = reg.execute("bash", {"command": "echo $$"})
+    check("(exit 0)" in r and str(pid) not in r, "the next call starts a fresh session")
+    marker = wd / "survived"
+    t0 = time.monotonic()
+    r = reg.execute("bash", {"command": f"(sleep 3; touch {marker}) & sleep 30",
+                             "timeout": "1"})
+    check("timed out after 1s" in r and time.monotonic() - t0 < 5,
+          "a timeout returns promptly")
+    time.sleep(3.5)
+    check(not marker.exists(), "a timeout kills what the command started, too")
+    check("back" in reg.execute("bash", {"command": "echo back"}), "…and the session recovers")
+
+    # ---- toggle -----------------------------------------------------------------------------
+    os.environ["ROBODOG_PERSISTENT_SHELL"] = "0"
+    try:
+        reg2 = default_registry(str(wd))
+        r = reg2.execute("bash", {"command": "echo one-shot"})
+        check("one-shot" in r and reg2._shell is None,                # noqa: SLF001
+              "ROBODOG_PERSISTENT_SHELL=0: one-shot /bin/sh, no session")
+    finally:
+        del os.environ["ROBODOG_PERSISTENT_SHELL"]
+
+    reg.close()
+    check(reg._shell is None, "close() ends the session")             # noqa: SLF001
+
+    # ---- subagents ----------------------------------------------------------------------------
+    def script(prompt, ctx=""):
+        if "TOOL RESULT [agent]" in prompt:
+            return "done"
+        if "SHELLCHILD" in prompt:
+            if "TOOL RESULT [bash]" in prompt:
+                return "child done"
+            return ('<tool name="bash"><param name="command">echo $$ > shell.pid'
+                    '</param></tool>')
+        return ('<tool name="agent"><param name="prompt">SHELLCHILD</param>'
+                '<param name="type">general</param></tool>')
+
+    client = EchoClient(script=script)
+    parent = default_registry(str(wd))
+    register_agent_tool(parent, client)
+    gc.disable()        # dropping the child registry alone must not be what ends it
+    try:
+        AgentLoop(client, parent, max_iterations=4).run("delegate")
+        pid = int((wd / "shell.pid").read_text())
+        try:
+            os.kill(pid, 0)
+            gone = False
+        except ProcessLookupError:
+            gone = True
+        check(gone, "a subagent's bash session ends when the subagent does")
+    finally:
+        gc.enable()
+    shutil.rmtree(wd, ignore_errors=True)
+    print("\nPOSIX SHELL:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
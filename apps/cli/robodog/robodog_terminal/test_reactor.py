@@ -0,0 +1,160 @@
+# file: robodog_terminal/test_reactor.py
+"""
+Tests for reactor.py: the timer wheel fires in order (across laps, skipping
+cancelled timers), a watch delivers lines per pipe (split reads, no final
+newline, UTF-8), idle notes repeat without killing (or piling up timers),
+a timeout kills the
+whole process group, a pipe held open by an orphan ends after the grace
+period, and many concurrent commands — one-shot bash calls and background
+tasks — run without the thread count growing.
+Run: python robodog_terminal/test_reactor.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import reactor                                 # noqa: E402
+from robodog_terminal.background import BackgroundManager            # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _sh(script: str) -> subprocess.Popen:
+    return subprocess.Popen(["/bin/sh", "-c", script], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, start_new_session=True)
+
+
+def main() -> int:
+    # ---- timer wheel -------------------------------------------------------------------
+    wheel = reactor._TimerWheel(100.0)
+    fired = []
+    wheel.add(100.35, lambda: fired.append("b"))
+    wheel.add(100.15, lambda: fired.append("a"))
+    gone = wheel.add(100.2, lambda: fired.append("x"))
+    wheel.add(100.0 + reactor._SLOTS * reactor._TICK * 2.5, lambda: fired.append("far"))
+    gone.cancel()
+    check(wheel.next_timeout(100.0) is not None and wheel.advance(100.05) == [],
+          "wheel: nothing fires early")
+    for t in wheel.advance(101.0):
+        t.fn()
+    check(fired == ["a", "b"], "wheel: due timers fire in tick order; a cancelled one never")
+    for t in wheel.advance(100.0 + reactor._SLOTS * reactor._TICK * 2):
+        t.fn()
+    check(fired == ["a", "b"], "wheel: a timer laps ahead waits out its laps")
+    for t in wheel.advance(100.0 + reactor._SLOTS * reactor._TICK * 3):
+        t.fn()
+    check(fired[-1] == "far" and wheel.next_timeout(0) is None, "wheel: …then fires, and it's empty")
+
+    if not reactor.available():
+        print("  [SKIP] no selectable pipes on this platform — watch checks skipped")
+        print("\nREACTOR:", "ALL PASS" if ok else "SOME FAILED")
+        return 0 if ok else 1
+    r = reactor.get()
+
+    # ---- one watch -----------------------------------------------------------------------
+    out, err = [], []
+    proc = _sh("printf 'a\\nb'; sleep 0.2; printf 'c\\n'; echo café >&2; printf tail; exit 7")
+    w = r.watch(proc, [(proc.stdout, out.append), (proc.stderr, err.append)])
+    check(w.wait(10) and w.returncode == 7 and not w.timed_out, "watch: exit code")
+    check(out == ["a", "bc", "tail"] and err == ["café"],
+          "watch: lines per pipe, joined across reads, the last without a newline")
+
+    notes, lines = [], []
+    proc = _sh("sleep 1.3; echo done")
+    w = r.watch(proc, [(proc.stdout, lines.append), (proc.stderr, lines.append)],
+                idle_seconds=0.5, on_idle=notes.append)
+    w.wait(10)
+    check(len(notes) >= 2 and all(n >= 0.5 for n in notes) and lines == ["done"]
+          and w.returncode == 0, f"idle: repeated notes, never a kill ({len(notes)} notes)")
+
+    held, box = [], []
+    proc = _sh("sleep 1.5")
+    box.append(r.watch(proc, [(proc.stdout, lines.append), (proc.stderr, lines.append)],
+                       timeout=30, idle_seconds=0.1,
+                       on_idle=lambda _q: held.append(len(box[0]._timers) if box else 0)))
+    box[0].wait(10)
+    check(len(held) >= 5 and max(held) <= 3 and not box[0]._timers,
+          f"idle: each reschedule reuses its timer slot (at most {max(held or [0])} held)")
+
+    marker = Path(tempfile.mkdtemp(prefix="rd_rx_")) / "survived"
+    expired = []
+    proc = _sh(f"(sleep 2; touch {marker}) & sleep 30")
+    t0 = time.monotonic()
+    w = r.watch(proc, [(proc.stdout, lines.append), (proc.stderr, lines.append)],
+                timeout=0.5, on_timeout=lambda: expired.append(1))
+    check(w.wait(10) and w.timed_out and expired and time.monotonic() - t0 < 3,
+          "timeout: fires once and the watch ends promptly")
+    time.sleep(2.5)
+    check(not marker.exists(), "timeout: the whole process group is killed")
+
+    saved = reactor._EXIT_GRACE
+    reactor._EXIT_GRACE = 0.5
+    try:
+        lines = []
+        proc = _sh("echo parent; sleep 30 &")
+        t0 = time.monotonic()
+        w = r.watch(proc, [(proc.stdout, lines.append), (proc.stderr, lines.append)])
+        check(w.wait(10) and w.returncode == 0 and lines == ["parent"]
+              and time.monotonic() - t0 < 3,
+              "an orphan holding the pipes: done after the grace period")
+        reactor.kill_group(proc)
+    finally:
+        reactor._EXIT_GRACE = saved
+
+    # ---- many commands, one thread ------------------------------------------------------------
+    os.environ["ROBODOG_PERSISTENT_SHELL"] = "0"
+    try:
+        wd = tempfile.mkdtemp(prefix="rd_rx_")
+        regs = [default_registry(wd) for _ in range(16)]
+        results, peak = [None] * 16, [0]
+        base = threading.active_count() + 16       # the 16 calling threads themselves
+
+        def _call(i):
+            results[i] = regs[i].execute("bash", {"command": f"sleep 0.5; echo job{i}"})
+
+        callers = [threading.Thread(target=_call, args=(i,)) for i in range(16)]
+        for t in callers:
+            t.start()
+        while any(t.is_alive() for t in callers):
+            peak[0] = max(peak[0], threading.active_count())
+            time.sleep(0.05)
+        check(all(f"job{i}" in results[i] and "(exit 0)" in results[i] for i in range(16)),
+              "16 concurrent one-shot bash calls all complete")
+        check(peak[0] <= base, f"…with no threads per call (peak {peak[0]}, callers+base {base})")
+    finally:
+        del os.environ["ROBODOG_PERSISTENT_SHELL"]
+
+    mgr = BackgroundManager()
+    before = threading.active_count()
+    tasks = [mgr.spawn_bash(f"sleep 0.5; echo bg{i}", wd) for i in range(40)]
+    during = threading.active_count()
+    check(all(t.join(15) for t in tasks)
+          and all(t.status == "done" and t.result.startswith("(exit 0)")
+                  and f"bg{i}" in t.result for i, t in enumerate(tasks)),
+          "40 background bash tasks all finish with their output")
+    check(during <= before, f"…without a thread each ({before} -> {during})")
+    t = mgr.spawn_bash("echo start; sleep 30", wd, timeout=1)
+    check(t.join(10) and "[timeout after 1s" in mgr.output(t.id) and "start" in mgr.output(t.id),
+          "a background timeout kills the task and says so")
+    check(r.active() == 0, "every watch is finished")
+
+    print("\nREACTOR:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# file: robodog_terminal/test_read_dedup.py
+"""
+Tests for read_file de-duplication (ToolRegistry._read_dedup + AgentLoop):
+an unchanged re-read becomes a stub pointing at the earlier step, while a
+changed file, a different range, full=true, or an earlier result that's no
+longer in the transcript (trimmed / cleared) all return the content again.
+Only a whole tool result (or a whole read_many section) counts as still in
+the transcript. A registry with no loop attached never stubs.
+Run: python robodog_terminal/test_read_dedup.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal.llm_client import EchoClient                   # noqa: E402
+from robodog_terminal.loop import AgentLoop, Turn                    # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _read(path, **extra):
+    params = "".join(f'<param name="{k}">{v}</param>'
+                     for k, v in {"path": path, **extra}.items())
+    return f'<tool name="read_file">{params}</tool>'
+
+
+def _age(path: Path, seconds: float = 10.0) -> None:
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - int(seconds * 1e9)))
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_dd_"))
+    src = wd / "mod.py"
+    src.write_text("".join(f"x{i} = {i}\n" for i in range(40)), encoding="utf-8")
+    _age(src)
+
+    # ---- without a loop ----------------------------------------------------------
+    reg = default_registry(str(wd))
+    a = reg.execute("read_file", {"path": "mod.py"})
+    b = reg.execute("read_file", {"path": "mod.py"})
+    check(a == b and a.startswith("1\tx0 = 0"), "no loop: repeated reads return the content")
+
+    # ---- through the loop ------------------------------------------------------------
+    reg = default_registry(str(wd))
+    loop = AgentLoop(EchoClient(script=[_read("mod.py"), _read("mod.py"), "done"]), reg)
+    loop.run("read it twice")
+    tools = [t.content for t in loop.history if t.role == "tool"]
+    check(tools[0].startswith("1\tx0 = 0"), "loop: the first read returns the content")
+    check(tools[1].startswith("[unchanged since step 1:") and "mod.py" in tools[1]
+          and "full=true" in tools[1], "loop: an unchanged re-read is a stub naming the step")
+
+    def rerun(*replies):
+        loop.client = EchoClient(script=[*replies, "done"])
+        loop.run("again")
+        return [t.content for t in loop.history if t.role == "tool"][-len(replies):]
+
+    (got,) = rerun(_read("mod.py", full="true"))
+    check(got.startswith("1\tx0 = 0"), "full=true forces the content")
+    (got,) = rerun(_read("mod.py", offset=5, limit=3))
+    check(got == "6\tx5 = 5\n7\tx6 = 6\n8\tx7 = 7", "a different range is read normally")
+    (got,) = rerun(_read("mod.py", offset=5, limit=3))
+    check(got.startswith("[unchanged since step") and "lines 6-8" in got,
+          "the same range again is stubbed")
+
+    src.write_text(src.read_text(encoding="utf-8").replace("x3 = 3", "x3 = 33"),
+                   encoding="utf-8")
+    (got,) = rerun(_read("mod.py"))
+    check("x3 = 33" in got, "a changed file returns the new content")
+
+    os.utime(src, ns=(src.stat().st_atime_ns, src.stat().st_mtime_ns + 1))
+    (got,) = rerun(_read("mod.py"))
+    check(got.startswith("[unchanged since step"), "touched but identical content is still a stub")
+
+    for t in loop.history:
+        if t.role == "tool" and t.content.startswith("1\tx0 = 0"):
+            t.content = "[old tool output cleared to save context]"
+    (got,) = rerun(_read("mod.py"))
+    check(got.startswith("1\tx0 = 0"), "once the earlier output is trimmed, content comes back")
+
+    loop.history.clear()
+    (got,) = rerun(_read("mod.py"))
+    check(got.startswith("1\tx0 = 0"), "after /clear the content comes back")
+
+    probe = AgentLoop(EchoClient(), default_registry(str(wd)))
+    probe.history = [Turn("tool", "notes.txt: (empty file) — nothing to do", tool_name="bash"),
+                     Turn("tool", "2 file(s):\n=== a.py ===\n1\ta = 1\n2\tb = 2\n"
+                                  "=== b.py ===\n(empty file)", tool_name="read_many")]
+    check(not probe._tool_output_visible("1\ta = 1")
+          and not probe._tool_output_visible("\n2\tb = 2"),
+          "visible: part of a result or section doesn't count")
+    check(probe._tool_output_visible("1\ta = 1\n2\tb = 2")
+          and probe._tool_output_visible("(empty file)"),
+          "visible: a whole read_many section does")
+    probe.history = probe.history[:1]
+    check(not probe._tool_output_visible("(empty file)"),
+          "visible: a short output quoted inside another result doesn't")
+
+    saved = os.environ.get("ROBODOG_READ_DEDUP")
+    os.environ["ROBODOG_READ_DEDUP"] = "0"
+    try:
+        (got,) = rerun(_read("mod.py"))
+        check(got.startswith("1\tx0 = 0"), "ROBODOG_READ_DEDUP=0 turns it off")
+    finally:
+        if saved is None:
+            os.environ.pop("ROBODOG_READ_DEDUP", None)
+        else:
+            os.environ["ROBODOG_READ_DEDUP"] = saved
+
+    print("\nREAD DEDUP:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
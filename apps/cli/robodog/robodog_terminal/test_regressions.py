@@ -418,7 +418,7 @@ def main() -> int:
     cat = ireg.catalog()
     check("emit ALL of those" in cat and "ONE reply" in cat,
           "catalog tells the model to batch independent read-only calls")
-    check("read_file/glob/grep/list_dir/ask_user/task_output" in cat,
+    check("read_file/read_many/glob/grep/list_dir/ask_user/task_output" in cat,
           "batching rule names the exact _PARALLEL_SAFE tool set (kept in sync)")
     check("never batch an edit with" in cat,
           "batching rule warns against batching dependent/conflicting calls")
@@ -462,6 +462,9 @@ def main() -> int:
           "permission label is appended, not replacing the fan-out stats")
     no_cap = fanout_label(1, 1, 2, 0, "")
     check("model cap" not in no_cap, "cap segment omitted when there's no concurrency cap")
+    queued = fanout_label(3, 3, 0, 2, "", queued=4)
+    check("model cap 2 (4 queued)" in queued,
+          f"fan-out label shows the adaptive limit's queue depth ({queued!r})")
 
     # ---------------- color themes (/theme) -------------------------------
     theme_ui, _ = capture()
@@ -540,6 +543,24 @@ def main() -> int:
           "per-tool breakdown is sorted slowest-total-first (bash before read_file)")
     check("slowest individual calls" in summary and "3.00s" in summary,
           "slowest-calls section lists the biggest single sample")
+    metric_loop = SimpleNamespace(trace_enabled=True, trace=sample + [
+        {"kind": "first_tool_start", "iteration": 1, "duration_s": 9.0, "streamed": True},
+        {"kind": "first_tool_start", "iteration": 2, "duration_s": 1.0, "streamed": False},
+    ])
+    msum = fmt_trace(metric_loop)
+    check("time to first tool start: 5.00s avg" in msum and "1 started mid-stream" in msum,
+          "time-to-first-tool-start metric summarized (avg + streamed count)")
+    cache_loop = SimpleNamespace(trace_enabled=True, trace=[
+        {"kind": "llm_call", "iteration": 1, "duration_s": 1.0, "ok": True,
+         "prompt_tokens": 1000, "cached_tokens": 0},
+        {"kind": "llm_call", "iteration": 2, "duration_s": 1.0, "ok": True,
+         "prompt_tokens": 1000, "cached_tokens": 800}])
+    check("prompt cache: 800 of 2,000 prompt tokens cached (40%) · 1/2 calls hit"
+          in fmt_trace(cache_loop),
+          "trace summary reports provider prompt-cache hits")
+    check("prompt cache" not in summary, "no prompt-cache line when nothing was cached")
+    check("9.00s" not in msum.split("slowest individual calls")[1],
+          "latency metrics are not listed as slow calls / summed into the breakdown")
 
     print("\nRENDERING:", "ALL PASS" if ok else "FAILURES")
     return 0 if ok else 1
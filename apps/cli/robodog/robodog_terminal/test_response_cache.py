@@ -0,0 +1,205 @@
+# file: robodog_terminal/test_response_cache.py
+"""
+Tests for response_cache.py: content-addressed keys, cache / record / replay
+modes, TTL, LRU size eviction, streaming + chat replay, an AgentLoop run
+replayed offline (flat and --prompt-cache layouts), and the build_backend
+wiring (--llm-cache).
+Run: python robodog_terminal/test_response_cache.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal.llm_client import EchoClient, flatten_messages  # noqa: E402
+from robodog_terminal.loop import AgentLoop                           # noqa: E402
+from robodog_terminal.response_cache import (CachingClient, ResponseCache,  # noqa: E402
+                                             wrap_client)
+from robodog_terminal.tools import default_registry                   # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+class Counting(EchoClient):
+    """Echo backend that counts the calls that actually reach it."""
+
+    def __init__(self, script=None):
+        super().__init__(script)
+        self.calls = 0
+
+    def complete(self, prompt, context="", max_tokens=8192, temperature=0.3):
+        self.calls += 1
+        return super().complete(prompt, context, max_tokens, temperature)
+
+
+def main() -> int:
+    global ok
+    wd = Path(tempfile.mkdtemp(prefix="rd_rc_"))
+
+    # ---- keys ---------------------------------------------------------------
+    k = ResponseCache.key("m", "ctx", "p", 100, 0.3)
+    check(k == ResponseCache.key("m", "ctx", "p", 100, 0.3) and len(k) == 64,
+          "key: stable sha256")
+    check(len({k, ResponseCache.key("m2", "ctx", "p", 100, 0.3),
+               ResponseCache.key("m", "ctx2", "p", 100, 0.3),
+               ResponseCache.key("m", "ctx", "p2", 100, 0.3),
+               ResponseCache.key("m", "ctx", "p", 200, 0.3),
+               ResponseCache.key("m", "ctx", "p", 100, 0.0)}) == 6,
+          "key: model, context, prompt, max_tokens and temperature all count")
+
+    # ---- cache mode: read-through ---------------------------------------------
+    store = ResponseCache(root=wd / "c1")
+    inner = Counting(script=lambda p, c: f"answer to {p}")
+    cc = CachingClient(inner, "cache", cache=store)
+    a1 = cc.complete("q1", context="sys")
+    a2 = cc.complete("q1", context="sys")
+    check(a1.text == a2.text == "answer to q1" and inner.calls == 1,
+          "cache: a repeated call is served from disk")
+    check(a2.raw == {"llm_cache": "hit"} and store.hits == 1 and store.stores == 1,
+          "cache: hit marked on the Completion, stats counted")
+    cc.complete("q1", context="sys", max_tokens=10)
+    check(inner.calls == 2, "cache: different max_tokens is a different entry")
+    check(cc.model == "echo" and cc.name == "echo", "wrapper: model id + name from the backend")
+
+    # ---- TTL --------------------------------------------------------------------
+    stale = ResponseCache(root=wd / "ttl", ttl_s=0.05)
+    stale.put(k, {"text": "old"})
+    check(stale.get(k) is not None, "ttl: a fresh entry is a hit")
+    time.sleep(0.1)
+    check(stale.get(k) is None and not stale._path(k).exists(),
+          "ttl: an expired entry is a miss (and removed)")
+
+    # ---- record + replay --------------------------------------------------------
+    rec_store = ResponseCache(root=wd / "rec")
+    live = Counting(script=lambda p, c: "v1")
+    rec = wrap_client(live, "record")
+    rec.cache = rec_store
+    rec.complete("task")
+    rec.complete("task")
+    check(live.calls == 2, "record: always calls the backend")
+    live._script = lambda p, c: "v2"
+    rec.complete("task")
+    replay = CachingClient(None, "replay", cache=rec_store, model="echo")
+    check(replay.complete("task").text == "v2", "record: overwrites; replay serves the latest")
+    try:
+        replay.complete("never recorded")
+        check(False, "replay: a miss raises")
+    except RuntimeError as exc:
+        check("no recorded response" in str(exc), "replay: a miss raises a clear error")
+    expired = CachingClient(None, "replay", cache=ResponseCache(root=wd / "rec", ttl_s=1e-9),
+                            model="echo")
+    check(expired.complete("task").text == "v2", "replay: ignores the TTL")
+
+    # ---- streaming + chat ---------------------------------------------------------
+    pieces = []
+    s1 = cc.complete_stream("q1", context="sys", on_delta=pieces.append)
+    check(s1.text == "answer to q1" and "".join(pieces) == s1.text and inner.calls == 2,
+          "stream: a hit replays through on_delta without the backend")
+    msgs = [{"role": "system", "content": "sys"}, {"role": "user", "content": "chat q"}]
+    ctx, prm = flatten_messages(msgs)
+    c1 = cc.complete_chat(msgs)
+    c2 = cc.complete(prm, context=ctx)
+    check(c1.text == c2.text and inner.calls == 3,
+          "chat: keyed by its flattened form (same entry as the flat prompt)")
+
+    # ---- LRU size eviction -------------------------------------------------------
+    small = ResponseCache(root=wd / "lru", max_bytes=2_500)
+    for i in range(6):
+        small.put(f"{i:064x}", {"text": "x" * 300})
+        time.sleep(0.02)
+    first = f"{0:064x}"
+    os.utime(small._path(first))                 # most recently used now
+    for i in range(6, 9):
+        small.put(f"{i:064x}", {"text": "x" * 300})
+        time.sleep(0.02)
+    check(small._scan_total() <= 2_500 and small.evictions > 0,
+          f"lru: size held under the budget ({small._scan_total()} bytes)")
+    check(small.get(first) is not None and small.get(f"{1:064x}") is None,
+          "lru: the recently used entry survives, the oldest unused goes")
+
+    # ---- AgentLoop: record a run, replay it offline -----------------------------
+    script = ['<tool name="list_dir">\n<param name="path">.</param>\n</tool>',
+              "Listed the directory. Done."]
+    (wd / "proj").mkdir()
+    (wd / "proj" / "a.txt").write_text("hi")
+    loop_store = ResponseCache(root=wd / "loop")
+    backend = Counting(script=list(script))
+    recorder = CachingClient(backend, "record", cache=loop_store)
+    r1 = AgentLoop(recorder, default_registry(cwd=str(wd / "proj"))).run("list files")
+    offline = CachingClient(None, "replay", cache=loop_store, model="echo")
+    r2 = AgentLoop(offline, default_registry(cwd=str(wd / "proj"))).run("list files")
+    check(backend.calls == 2 and r1.final_text == r2.final_text
+          and r2.iterations == r1.iterations,
+          "loop: a recorded run replays identically with no backend")
+
+    class ChatCounting(Counting):
+        """A backend that takes real chat arrays."""
+        supports_messages = True
+
+        def complete_chat(self, messages, max_tokens=8192, temperature=0.3, on_delta=None,
+                          cache_breakpoints=()):
+            context, prompt = flatten_messages(messages)
+            return self.complete(prompt, context, max_tokens, temperature)
+
+    for label, backend_cls in (("a chat backend", ChatCounting),
+                               ("a prompt-in backend", Counting)):
+        store = ResponseCache(root=wd / f"pc_{backend_cls.__name__}")
+        backend = backend_cls(script=list(script))
+        recorder = CachingClient(backend, "record", cache=store)
+        r1 = AgentLoop(recorder, default_registry(cwd=str(wd / "proj")),
+                       prompt_cache=True).run("list files")
+        offline = CachingClient(None, "replay", cache=store, model="echo")
+        try:
+            r2 = AgentLoop(offline, default_registry(cwd=str(wd / "proj")),
+                           prompt_cache=True).run("list files")
+            same = r1.final_text == r2.final_text
+        except RuntimeError:
+            same = False
+        check(backend.calls == 2 and same,
+              f"loop: a --prompt-cache run recorded against {label} replays offline")
+
+    # ---- build_backend wiring ---------------------------------------------------
+    from robodog_terminal.app import build_backend
+    saved = {k: os.environ.get(k) for k in ("ROBODOG_LLM_CACHE", "ROBODOG_LLM_CACHE_DIR",
+                                            "ROBODOG_TERMINAL_ECHO")}
+    try:
+        os.environ["ROBODOG_LLM_CACHE_DIR"] = str(wd / "env")
+        os.environ.pop("ROBODOG_TERMINAL_ECHO", None)
+        args = Namespace(echo=True, backend="auto", model=None, llm_cache=None)
+        os.environ.pop("ROBODOG_LLM_CACHE", None)
+        c0, _ = build_backend(args)
+        check(not isinstance(c0, CachingClient), "build_backend: off by default")
+        os.environ["ROBODOG_LLM_CACHE"] = "cache"
+        c1b, label = build_backend(args)
+        check(isinstance(c1b, CachingClient) and c1b.mode == "cache"
+              and c1b.cache.root == wd / "env" and label == "echo/demo",
+              "build_backend: ROBODOG_LLM_CACHE wraps the client")
+        args.llm_cache = "replay"
+        c2b, label2 = build_backend(args)
+        check(isinstance(c2b, CachingClient) and c2b.inner is None
+              and label2 == "echo (replay)",
+              "build_backend: --llm-cache replay needs no backend")
+    finally:
+        for k_, v in saved.items():
+            if v is None:
+                os.environ.pop(k_, None)
+            else:
+                os.environ[k_] = v
+
+    print("\nRESPONSE CACHE:", "ALL PASS" if ok else "FAILURES")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# file: robodog_terminal/test_testreport.py
+"""
+Tests for testreport.py and run_tests' sharded pytest runs: junit reports
+merge into counts, per-file outcomes and compact failure records (test id,
+file:line, the `E` line, a trimmed traceback); run_tests splits the suite
+over ROBODOG_TEST_SHARDS processes, returns those records instead of the
+raw output tail, keeps the old output when pytest itself fails, and runs
+a fast suite — or one whose command or config picks or collects more than
+test files — unsplit.
+Run: python robodog_terminal/test_testreport.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import testreport                              # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _write(root: Path, rel: str, text: str) -> None:
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+TRACE = "\n".join(["self = &lt;x&gt;", "", "    def test_y(self):"]
+                  + [f"        step{i}()" for i in range(20)]
+                  + [">       assert 1 == 2", "E       assert 1 == 2", "",
+                     "tests/test_a.py:31: AssertionError"])
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_trep_"))
+
+    # ---- parsing -----------------------------------------------------------------------------
+    _write(wd, "a.xml",
+           '<testsuites><testsuite>'
+           '<testcase file="tests/test_a.py" classname="tests.test_a.TestX" name="test_y" '
+           f'time="0.5"><failure message="assert 1 == 2">{TRACE}</failure></testcase>'
+           '<testcase file="tests/test_a.py" classname="tests.test_a" name="test_z" time="0.25"/>'
+           '</testsuite></testsuites>')
+    _write(wd, "b.xml",
+           '<testsuites><testsuite>'
+           '<testcase classname="tests.test_b" name="test_s" time="0.1"><skipped/></testcase>'
+           '<testcase classname="" name="tests.test_c" time="0">'
+           '<error message="collection failure">ImportError: no module named nope</error>'
+           '</testcase></testsuite></testsuites>')
+    tests = {"tests/test_a.py", "tests/test_b.py", "tests/test_c.py"}
+    rep = testreport.read([wd / "a.xml", wd / "b.xml", wd / "missing.xml"], tests)
+    check(rep is not None and (rep.passed, rep.failed, rep.errors, rep.skipped) == (1, 1, 1, 1),
+          "reports merge: passed / failed / errors / skipped")
+    check(rep.files == {"tests/test_a.py": (False, 0.75), "tests/test_b.py": (True, 0.1),
+                        "tests/test_c.py": (False, 0.0)},
+          "per file: every case passed or skipped, and the summed time")
+    f, e = rep.failures
+    check(f.test_id == "tests/test_a.py::TestX::test_y" and f.where == "tests/test_a.py:31"
+          and f.line == "E       assert 1 == 2" and f.kind == "failed",
+          "failure record: test id, file:line, the E line")
+    check(len(f.trace.splitlines()) == testreport.TRACE_LINES and "step0()" not in f.trace
+          and f.trace.endswith("AssertionError"), "…and only the end of the traceback")
+    check(e.test_id == "tests/test_c.py" and e.kind == "error" and e.line == "collection failure",
+          "a collection error names the file")
+    text = testreport.failure_records(rep, limit=1)
+    check(text.startswith("FAILED tests/test_a.py::TestX::test_y — tests/test_a.py:31")
+          and "… and 1 more: tests/test_c.py" in text, "records: the first in full, the rest by id")
+    check(testreport.summary(rep, 1.25) == "1 passed, 1 failed, 1 errors, 1 skipped in 1.2s"
+          and testreport.summary(testreport.Report(), 0) == "no tests ran in 0.0s",
+          "summary line")
+    check(testreport.read([wd / "missing.xml"], tests) is None, "no report at all -> None")
+
+    # ---- run_tests ------------------------------------------------------------------------------
+    if importlib.util.find_spec("pytest") is None:
+        print("  [SKIP] pytest not installed — sharded run_tests checks skipped")
+    else:
+        proj = wd / "proj"
+        for i in range(3):
+            _write(proj, f"tests/test_slow{i}.py",
+                   "import os, time\n\ndef test_slow():\n    time.sleep(1)\n"
+                   "    with open('pids', 'a') as f:\n        f.write(f'{os.getpid()}\\n')\n")
+        _write(proj, "tests/test_math.py",
+               "class TestMath:\n    def test_bad(self):\n        x = 2\n"
+               "        assert x + 1 == 4, 'math is hard'\n\n"
+               "def test_fine():\n    print('NOISE ' * 50)\n")
+        saved = os.environ.get("ROBODOG_TEST_SHARDS")
+        os.environ["ROBODOG_TEST_SHARDS"] = "3"
+        try:
+            reg = default_registry(str(proj))
+            t0 = time.monotonic()
+            r = reg.execute("run_tests", {})
+            took = time.monotonic() - t0
+            pids = set((proj / "pids").read_text().split())
+            check(r.startswith("[FAIL] 4 passed, 1 failed in") and "(3 shards)" in r,
+                  "sharded run: merged counts and the shard count")
+            check(len(pids) == 3 and took < 3.0,
+                  f"…the slow files ran in separate processes at once ({took:.1f}s)")
+            check("FAILED tests/test_math.py::TestMath::test_bad — tests/test_math.py:4" in r
+                  and "E       AssertionError: math is hard" in r,
+                  "the failure comes back as a compact record")
+            check("--- stdout ---" not in r and "NOISE" not in r, "…instead of the output tail")
+
+            (proj / "pids").unlink()
+            _write(proj, "tests/test_math.py", "def test_fine():\n    pass\n")
+            r = reg.execute("run_tests", {})
+            check(r.startswith("[PASS] 4 passed in") and "(3 shards)" in r,
+                  "a passing sharded run")
+            r = reg.execute("run_tests", {"command": "python -m pytest -q tests/test_slow0.py"})
+            check(r.startswith("[PASS] 1 passed in") and "shards" not in r,
+                  "a command naming its own paths runs just those, unsplit")
+            r = reg.execute("run_tests", {"command": "python -m pytest -q -k slow1"})
+            check(r.startswith("[PASS] 1 passed in") and "shards" not in r, "…and so does -k")
+
+            r = reg.execute("run_tests", {"command": "python -m pytest -q --no-such-flag"})
+            check(r.startswith("[FAIL] exit") and "--- stderr ---" in r,
+                  "pytest's own failure (usage error): the raw output, as before")
+            r = reg.execute("run_tests", {"command": "echo pytest"})
+            check(r.startswith("[PASS]") and "junitxml" not in r,
+                  "a command that only names pytest gets no pytest arguments")
+
+            for i in range(3):
+                _write(proj, f"tests/test_slow{i}.py", "def test_quick():\n    pass\n")
+            reg.execute("run_tests", {})                # records the new durations
+            r = reg.execute("run_tests", {})
+            check(r.startswith("[PASS] 4 passed in") and "shards" not in r,
+                  "a suite recorded as fast runs in one process")
+            _write(proj, "pytest.ini", "[pytest]\naddopts = --doctest-modules\n")
+            for i in range(3):
+                _write(proj, f"tests/test_slow{i}.py", "import time\n\ndef test_slow():\n"
+                                                       "    time.sleep(1)\n")
+            r = default_registry(str(proj)).execute("run_tests", {})   # nothing timed yet
+            check(r.startswith("[PASS]") and "shards" not in r,
+                  "a config collecting more than test files runs whole")
+            _write(proj, "pytest.ini", "[pytest]\ntestpaths = tests/test_slow0.py\n")
+            r = default_registry(str(proj)).execute("run_tests", {})
+            check(r.startswith("[PASS] 1 passed in") and "shards" not in r,
+                  "…as does one with testpaths")
+        finally:
+            if saved is None:
+                os.environ.pop("ROBODOG_TEST_SHARDS", None)
+            else:
+                os.environ["ROBODOG_TEST_SHARDS"] = saved
+
+    shutil.rmtree(wd, ignore_errors=True)
+    print("\nTESTREPORT:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
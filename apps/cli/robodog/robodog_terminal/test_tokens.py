@@ -0,0 +1,172 @@
+# file: robodog_terminal/test_tokens.py
+"""
+Tests for tokens.py (offline tokenizer layer + token budgets) and the loop's
+token-based trim / compaction decisions.
+Run: python robodog_terminal/test_tokens.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import base64
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import tokens                             # noqa: E402
+from robodog_terminal.tokens import (BPETokenizer, HeuristicTokenizer,  # noqa: E402
+                                     get_tokenizer, encoding_for_model,
+                                     transcript_token_budget, turn_tokens)
+from robodog_terminal.llm_client import EchoClient               # noqa: E402
+from robodog_terminal.loop import AgentLoop, Turn                # noqa: E402
+from robodog_terminal.tools import default_registry              # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def _write_table(path: Path, merges) -> dict:
+    """A tiny `.tiktoken` table: all 256 single bytes, then `merges` in rank order."""
+    ranks = {bytes([i]): i for i in range(256)}
+    for m in merges:
+        ranks[m] = len(ranks)
+    path.write_text("".join(f"{base64.b64encode(k).decode()} {v}\n"
+                            for k, v in ranks.items()), encoding="ascii")
+    return ranks
+
+
+def main() -> int:
+    global ok
+    wd = Path(tempfile.mkdtemp(prefix="rd_tok_"))
+
+    # ---- heuristic fallback ---------------------------------------------
+    h = HeuristicTokenizer()
+    prose = "The quick brown fox jumps over the lazy dog. " * 20
+    code = "    if (x[i] != y[j]) { return f(a, b) + 0x1f; }\n" * 20
+    check(h.count("") == 0 and h.count("hello") == 1, "heuristic: empty / one word")
+    check(len(code) / h.count(code) < len(prose) / h.count(prose),
+          "heuristic: code costs more tokens per char than prose")
+    check(3.5 <= len(prose) / h.count(prose) <= 5.5,
+          f"heuristic: prose lands near ~4 chars/token ({len(prose) / h.count(prose):.2f})")
+    check(h.count("1234567") == 3, "heuristic: digits split in groups of 3")
+
+    # ---- BPE over a local rank table -------------------------------------
+    table = wd / "test_base.tiktoken"
+    ranks = _write_table(table, [b"he", b"ll", b"hell", b"hello",
+                                  b" w", b"or", b" wor", b"ld"])
+    bpe = BPETokenizer.from_file(table)
+    check(bpe.name == "test_base" and len(bpe._ranks) == len(ranks),
+          "BPE: table loaded (name from the file stem)")
+    check(bpe.count("hello") == 1, "BPE: fully-merged piece is one token")
+    check(bpe.count("hello world") == 1 + 2, "BPE: ' world' merges to ' wor' + 'ld'")
+    check(bpe.count("xyz") == 3, "BPE: unknown bytes stay one token each")
+    check(bpe.count("hello hello") == bpe.count("hello") + bpe.count(" hello"),
+          "BPE: counts are additive over pre-tokenized pieces (memo reused)")
+    check(bpe.count("é") == 2, "BPE: counts bytes, not chars, for non-ASCII")
+
+    # ---- per-model vocab selection ----------------------------------------
+    check(encoding_for_model("openai/gpt-4o-mini") == "o200k_base"
+          and encoding_for_model("gpt-4-0613") == "cl100k_base"
+          and encoding_for_model("anthropic/claude-sonnet-4.6") is None,
+          "encoding_for_model: longest-match vocab per model id")
+    (wd / "cl100k_base.tiktoken").write_bytes(table.read_bytes())
+    old_dir = os.environ.get("ROBODOG_TOKENIZER_DIR")
+    os.environ["ROBODOG_TOKENIZER_DIR"] = str(wd)
+    tokens._LOADED.clear()
+    try:
+        t4 = get_tokenizer("gpt-4")
+        check(isinstance(t4, BPETokenizer) and t4.name == "cl100k_base",
+              "get_tokenizer: installed table used for a matching model")
+        check(isinstance(get_tokenizer("gpt-4o"), HeuristicTokenizer),
+              "get_tokenizer: missing table falls back to the heuristic")
+        check(isinstance(get_tokenizer("claude-3-5-sonnet"), HeuristicTokenizer),
+              "get_tokenizer: model with no public vocab uses the heuristic")
+        os.environ["ROBODOG_TOKENIZER"] = "heuristic"
+        check(isinstance(get_tokenizer("gpt-4"), HeuristicTokenizer),
+              "ROBODOG_TOKENIZER=heuristic forces the fallback")
+    finally:
+        os.environ.pop("ROBODOG_TOKENIZER", None)
+        if old_dir is None:
+            os.environ.pop("ROBODOG_TOKENIZER_DIR", None)
+        else:
+            os.environ["ROBODOG_TOKENIZER_DIR"] = old_dir
+        tokens._LOADED.clear()
+
+    # ---- budgets ------------------------------------------------------------
+    check(transcript_token_budget("echo") is None, "budget: unknown model keeps chars")
+    b4o = transcript_token_budget("openai/gpt-4o", max_tokens=8192)
+    check(b4o is not None and 80_000 < b4o < 128_000 - 8192,
+          f"budget: fits inside gpt-4o's window with room to reply ({b4o})")
+    check(transcript_token_budget("gemini-1.5-pro") == tokens._AUTO_BUDGET_CAP,
+          "budget: huge windows are capped for an AUTO budget")
+    check(transcript_token_budget("gpt-4", max_tokens=8192) is None
+          and transcript_token_budget("gpt-3.5-turbo", max_tokens=8192) is None,
+          "budget: a window with no room past the reply keeps chars")
+    b35 = transcript_token_budget("gpt-3.5-turbo", max_tokens=1024)
+    check(b35 is not None and b35 + 1024 + tokens._WINDOW_RESERVE <= 16_385,
+          f"budget: a small window's budget still fits it ({b35})")
+
+    # ---- per-Turn cache ---------------------------------------------------
+    class Counting(HeuristicTokenizer):
+        calls = 0
+
+        def count(self, text):
+            Counting.calls += 1
+            return super().count(text)
+
+    ct = Counting()
+    turn = Turn("tool", "def f(x):\n    return x\n" * 10, tool_name="read_file")
+    n1 = turn_tokens(turn, ct)
+    n2 = turn_tokens(turn, ct)
+    check(n1 == n2 and Counting.calls == 1, "turn_tokens: cached on the Turn")
+    turn.content = "[old tool output cleared to save context]"
+    check(turn_tokens(turn, ct) != n1 and Counting.calls == 2,
+          "turn_tokens: a rewritten content is recounted")
+    check(Turn("user", "a") == Turn("user", "a") and "_tokens" not in repr(turn),
+          "Turn: token memo is invisible to equality/repr")
+
+    # ---- loop: token-based trim + compaction --------------------------------
+    loop = AgentLoop(EchoClient(script=["done"]), default_registry(cwd=str(wd)))
+    loop.max_transcript_chars = 10 ** 9          # chars alone would never trim
+    loop.max_transcript_tokens = 3_000
+    loop.trim_keep_recent = 2
+    for i in range(20):
+        loop.history.append(Turn("tool", "x = f(a[i], b[j]) + 1;\n" * 60, tool_name="bash"))
+    check(loop.context_fill() > 1.0, f"context_fill in tokens ({loop.context_fill():.2f})")
+    loop._trim_history()
+    check(loop.transcript_tokens() <= 3_000 and loop.history[-1].content.startswith("x = f"),
+          f"trim honors the token budget ({loop.transcript_tokens()} tokens)")
+    loop.max_transcript_tokens = None
+    check(abs(loop.context_fill() - loop.transcript_chars() / 10 ** 9) < 1e-12,
+          "no token budget -> context_fill falls back to chars")
+
+    comp = AgentLoop(EchoClient(script=["short summary"]), default_registry(cwd=str(wd)))
+    comp.max_transcript_tokens = 100_000
+    comp.history.append(Turn("user", "goal"))
+    for i in range(12):
+        comp.history.append(Turn("tool", "{[(<>)]}" * 200, tool_name="grep"))
+    check(comp.compact(keep_recent=4) and len(comp.history) == 6,
+          "compaction compares sizes in tokens when budgeted")
+
+    # ---- build_core wiring --------------------------------------------------
+    from robodog_terminal.core import build_core
+    core = build_core(str(wd), EchoClient(), model="openai/gpt-4o")
+    check(core.loop.max_transcript_tokens == b4o
+          and isinstance(core.loop.tokenizer, HeuristicTokenizer),
+          "build_core: model -> tokenizer + window-derived token budget")
+    core2 = build_core(str(wd), EchoClient(), model="openai/gpt-4o", max_transcript_tokens=0)
+    check(core2.loop.max_transcript_tokens is None, "build_core: 0 keeps the char budget")
+    core3 = build_core(str(wd), EchoClient())
+    check(core3.loop.max_transcript_tokens is None, "build_core: no model -> char budget")
+
+    print("\nTOKENS:", "ALL PASS" if ok else "FAILURES")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# file: robodog_terminal/test_transport.py
+"""
+Tests for transport.py: the shared pooled keep-alive session the LLM clients
+send through — connection reuse, pool sizing under a fan-out, idle eviction,
+per-request connect/TLS/TTFB timings and their /trace line. Runs against a
+local HTTP/1.1 server (no network).
+Run: python robodog_terminal/test_transport.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import transport                        # noqa: E402
+from robodog_terminal.llm_client import OpenAICompatClient    # noqa: E402
+from robodog_terminal.loop import AgentLoop                   # noqa: E402
+from robodog_terminal.tools import default_registry           # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive
+    peers: set = set()
+    delay = 0.0
+
+    def log_message(self, *a):
+        pass
+
+    def _reply(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        _Handler.peers.add(self.client_address)
+        time.sleep(_Handler.delay)
+        self._reply(b'{"ok": true}')
+
+    def do_POST(self):
+        _Handler.peers.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(json.dumps({"choices": [{"message": {"content": "done"},
+                                             "finish_reason": "stop"}],
+                                "usage": {"prompt_tokens": 5,
+                                          "completion_tokens": 1}}).encode())
+
+
+def main() -> int:
+    global ok
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    os.environ.pop("ROBODOG_HTTP2", None)
+    transport.reset_shared_session()
+
+    try:
+        sess = transport.shared_session()
+        check(sess is transport.shared_session(), "shared_session: one per process")
+        adapter = sess.get_adapter(base)
+        check(adapter._pool_maxsize >= 32, f"pool sized for a fan-out ({adapter._pool_maxsize})")
+
+        # ---- keep-alive reuse + timings ------------------------------------
+        transport.take_timings()
+        for _ in range(3):
+            sess.get(base + "/x", timeout=5)
+        tm = transport.take_timings()
+        check(len(tm) == 3 and len(_Handler.peers) == 1,
+              f"keep-alive: 3 requests over {len(_Handler.peers)} connection")
+        check(tm[0]["connect_s"] > 0 and not tm[0]["reused"]
+              and tm[1]["reused"] and tm[2]["connect_s"] == 0.0,
+              "timings: first request connects, the rest reuse")
+        check(all(t["ttfb_s"] > 0 and t["status"] == 200 for t in tm),
+              "timings: TTFB + status recorded per request")
+        check(transport.take_timings() == [], "take_timings: drains this thread's records")
+
+        # ---- fan-out: pool holds every concurrent connection ---------------
+        _Handler.peers.clear()
+        _Handler.delay = 0.2
+
+        def wave():
+            ts = [threading.Thread(target=lambda: sess.get(base + "/f", timeout=10))
+                  for _ in range(12)]
+            for t in ts:
+                t.start()
+            for t in ts:
+                t.join()
+        wave()
+        first = set(_Handler.peers)
+        wave()
+        check(len(first) >= 10 and len(_Handler.peers - first) == 0,
+              f"fan-out: 12 concurrent calls, second wave reuses all pooled "
+              f"connections ({len(first)} opened, {len(_Handler.peers - first)} new)")
+        _Handler.delay = 0.0
+
+        # ---- idle eviction -------------------------------------------------
+        adapter.idle_s = 0.05
+        transport.take_timings()
+        sess.get(base + "/warm", timeout=5)
+        time.sleep(0.15)
+        sess.get(base + "/after-idle", timeout=5)
+        tm = transport.take_timings()
+        check(tm[-1]["connect_s"] > 0 and not tm[-1]["reused"],
+              "idle eviction: a connection parked past idle_s is not reused")
+        adapter.idle_s = transport._DEFAULT_IDLE_S
+
+        # ---- HTTP/2 opt-in falls back without httpx ------------------------
+        os.environ["ROBODOG_HTTP2"] = "1"
+        transport.reset_shared_session()
+        h2 = transport.shared_session().get_adapter(base)
+        try:
+            import httpx  # noqa: F401
+            import h2 as _h2  # noqa: F401
+            have_h2 = True
+        except ImportError:
+            have_h2 = False
+        check(have_h2 or hasattr(h2, "poolmanager"),
+              "ROBODOG_HTTP2 without httpx[http2] falls back to the HTTP/1.1 pool")
+        if have_h2:
+            transport.take_timings()
+            transport.shared_session().get(base + "/own-tls", timeout=5, verify=False)
+            tm = transport.take_timings()
+            check(tm and tm[-1]["reused"] is not None,
+                  "HTTP/2: a request with its own TLS settings goes via the HTTP/1.1 pool")
+        os.environ.pop("ROBODOG_HTTP2", None)
+        transport.reset_shared_session()
+
+        # ---- clients + loop trace ------------------------------------------
+        c = OpenAICompatClient(base, "k", "m")
+        check(c._session is transport.shared_session(),
+              "OpenAICompatClient defaults to the shared session")
+        loop = AgentLoop(c, default_registry(cwd=str(Path.cwd())), trace_enabled=True)
+        loop.run("hi")
+        calls = [e for e in loop.trace if e["kind"] == "llm_call"]
+        check(calls and "ttfb_s" in calls[0] and calls[0]["requests"] == 1,
+              "loop: llm_call trace carries connect/TLS/TTFB")
+        from robodog_terminal.app import _format_trace_summary
+        check("network: time to first byte" in _format_trace_summary(loop),
+              "/trace: network line")
+    finally:
+        srv.shutdown()
+        transport.reset_shared_session()
+
+    print("\nTRANSPORT:", "ALL PASS" if ok else "FAILURES")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
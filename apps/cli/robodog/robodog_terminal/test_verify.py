@@ -0,0 +1,110 @@
+# file: robodog_terminal/test_verify.py
+"""
+Tests for verify.py: checks run on the in-memory text (not a re-read),
+results cached by content hash, one warm node worker reused across JS
+checks (CommonJS, ES modules, .mjs/.cjs) and replaced if it dies, a
+failed check never cached as clean, and write_file / edit_file surfacing
+the result.
+Run: python robodog_terminal/test_verify.py   (from robodogcli/robodog)
+"""
+from __future__ import annotations
+
+import queue
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from robodog_terminal import verify                                  # noqa: E402
+from robodog_terminal.tools import default_registry                  # noqa: E402
+
+ok = True
+
+
+def check(cond, msg):
+    global ok
+    print(f"  [{'PASS' if cond else 'FAIL'}] {msg}")
+    ok = ok and cond
+
+
+def main() -> int:
+    wd = Path(tempfile.mkdtemp(prefix="rd_vf_"))
+
+    # ---- in-memory text, cache ------------------------------------------------------
+    ghost = wd / "never_written.py"
+    check("line 1" in (verify.check_text(ghost, "def f(:\n") or ""),
+          "python: checks the text it is given; the file need not exist")
+    check(verify.check_text(wd / "x.json", '{"a": [1, 2]}') is None
+          and "JSON" in (verify.check_text(wd / "x.json", '{"a": }') or ""), "json")
+    check(verify.check_text(wd / "notes.md", "def f(:") is None,
+          "unknown extensions are not checked")
+
+    calls = []
+    real = verify._check
+    verify._check = lambda *a: calls.append(a) or real(*a)
+    try:
+        src = "value = 1  # cache probe\n"
+        verify.check_text(wd / "a.py", src)
+        verify.check_text(wd / "b.py", src)
+        check(len(calls) == 1, "cache: the same content is parsed once")
+        verify.check_text(wd / "a.py", src + "x = 2\n")
+        check(len(calls) == 2, "cache: different content is parsed again")
+    finally:
+        verify._check = real
+
+    # ---- JS via the warm worker -------------------------------------------------------
+    if shutil.which("node"):
+        js = wd / "app.js"
+        check("line 2" in (verify.check_text(js, "let a = 1;\nlet x = ;\n") or ""),
+              "js: a syntax error with its line")
+        check(verify.check_text(js, "import x from 'y';\nexport const a = x;\n") is None,
+              "js: ES module syntax in a .js file is accepted")
+        check(verify.check_text(js, "const a = 1;\nreturn a;\n") is None,
+              "js: CommonJS top-level return is accepted")
+        check(verify.check_text(js, "const v = await load();\n") is not None,
+              "js: top-level await in CommonJS is an error, not a reason to try ESM")
+        check(verify.check_text(wd / "m.mjs", "export const a = ;\n") is not None
+              and verify.check_text(wd / "c.cjs", "import x from 'y';\n") is not None,
+              "js: .mjs parses as a module, .cjs as CommonJS")
+        worker = verify._node_worker()
+        first = worker.proc
+        verify.check_text(js, "const reuse = 1;\n")
+        check(worker.proc is first and first.poll() is None,
+              "js: one node process serves every check")
+        first.kill()
+        first.wait()
+        check("JS syntax error" in (verify.check_text(js, "let dead = ;\n") or "")
+              and worker.proc is not first, "js: a dead worker is replaced")
+
+        class Silent(queue.Queue):                   # the reply never arrives in time
+            def get(self, block=True, timeout=None):
+                raise queue.Empty
+        worker.replies = Silent()
+        miss = verify.check_text(js, "let flaky = ;\n")
+        check(miss is None and "JS syntax error" in (verify.check_text(js, "let flaky = ;\n")
+                                                     or ""),
+              "js: a timed-out check reads as clean once, but isn't cached")
+    else:
+        print("  [SKIP] node not on PATH — JS worker checks skipped")
+
+    # ---- through the tools ------------------------------------------------------------
+    reg = default_registry(str(wd))
+    r = reg.execute("write_file", {"path": "w.py", "content": "def g(\n"})
+    check("VERIFY FAILED" in r and "Python syntax error" in r,
+          "write_file: the error is appended to the result")
+    reg.execute("read_file", {"path": "w.py"})
+    r = reg.execute("edit_file", {"path": "w.py", "old_string": "def g(",
+                                  "new_string": "def g():\n    pass"})
+    check("Edited" in r and "VERIFY FAILED" not in r, "edit_file: a fixed file is clean")
+    reg.verify_edits = False
+    r = reg.execute("write_file", {"path": "w2.py", "content": "def h(\n"})
+    check("VERIFY FAILED" not in r, "verify_edits=False skips the check")
+
+    shutil.rmtree(wd, ignore_errors=True)
+    print("\nVERIFY:", "ALL PASS" if ok else "SOME FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
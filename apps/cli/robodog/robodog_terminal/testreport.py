@@ -0,0 +1,164 @@
+# file: robodog_terminal/testreport.py
+"""
+Structured pytest results for the `run_tests` tool.
+
+run_tests used to regex "N passed / N failed" out of the combined output and
+hand the model the last 12k characters of it. A pytest run now writes a
+junit XML report (one per shard when the suite is split across processes)
+and this module turns the reports into:
+
+  - counts (passed / failed / errors / skipped) for the summary line;
+  - per test file: did every case pass, and how long it took (impact.py's
+    cache and the shard balancing feed on these);
+  - one compact record per failure: the test id, the file:line pytest
+    stopped at, the assertion / exception line (pytest's `E   ...`) and the
+    last few lines of the traceback — instead of a tail clamp that often
+    cuts the one failure that mattered.
+
+Reports use junit_family=xunit1, so each case names its file; a report
+without file attributes is matched by classname (or, for a collection
+error, by name) against the test files' module paths.
+"""
+from __future__ import annotations
+
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TRACE_LINES = 12           # traceback lines kept per failure
+MAX_RECORDS = 10           # failures shown in full; the rest are listed by id
+_LINE_CHARS = 300
+
+_WHERE_RE = re.compile(r"^(\S+?\.py):(\d+):", re.MULTILINE)
+
+
+@dataclass
+class Failure:
+    test_id: str           # tests/test_a.py::TestX::test_y
+    kind: str              # "failed" | "error"
+    where: str             # "tests/test_a.py:12", or "" if the report doesn't say
+    line: str              # the `E   ...` line (or the junit message)
+    trace: str             # trimmed traceback
+
+
+@dataclass
+class Report:
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    failures: List[Failure] = field(default_factory=list)
+    files: Dict[str, Tuple[bool, float]] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return self.passed + self.failed + self.errors + self.skipped
+
+
+def _module_index(tests: Iterable[str]) -> List[Tuple[str, str]]:
+    return sorted(((t[:-3].replace("/", "."), t) for t in tests),
+                  key=lambda mt: len(mt[0]), reverse=True)
+
+
+def _file_of(case: ET.Element, tests: Set[str], modules: List[Tuple[str, str]]) -> str:
+    rel = (case.get("file") or "").replace(os.sep, "/")
+    if rel in tests or (rel and not tests):
+        return rel
+    # no usable file attribute: match the classname — or, for a collection
+    # error (empty classname), the name — against the module path
+    dotted = case.get("classname") or case.get("name") or ""
+    return next((t for m, t in modules if dotted == m or dotted.startswith(m + ".")), "")
+
+
+def _test_id(case: ET.Element, rel: str) -> str:
+    cls = case.get("classname") or ""
+    name = case.get("name") or ""
+    if not rel:
+        return ".".join(p for p in (cls, name) if p)
+    module = rel[:-3].replace("/", ".")
+    inner = cls[len(module) + 1:] if cls.startswith(module + ".") else ""
+    if not cls and name == module:
+        return rel                              # collection error: the file itself
+    parts = [rel] + (inner.split(".") if inner else []) + [name]
+    return "::".join(parts)
+
+
+def _failure(case: ET.Element, node: ET.Element, rel: str) -> Failure:
+    text = (node.text or "").rstrip()
+    lines = text.splitlines()
+    e_line = next((ln.strip() for ln in lines if ln.startswith("E ")), "")
+    if not e_line:
+        e_line = (node.get("message") or (lines[-1] if lines else "")).strip()
+    where = ""
+    hits = _WHERE_RE.findall(text)
+    if hits:
+        # the innermost frame in the test file itself, else the last frame
+        own = [h for h in hits if h[0].replace(os.sep, "/").endswith(rel)] if rel else []
+        path, line = (own or hits)[-1]
+        where = f"{path}:{line}"
+    trace = "\n".join(ln[:_LINE_CHARS] for ln in lines[-TRACE_LINES:])
+    return Failure(_test_id(case, rel), "failed" if node.tag == "failure" else "error",
+                   where, e_line[:_LINE_CHARS], trace)
+
+
+def read(paths: Iterable[str], tests: Set[str]) -> Optional[Report]:
+    """Merge the junit reports at `paths`; None if none of them exists (yet)
+    or parses. `tests` are the candidate test files (rel, '/'-separated)."""
+    report = Report()
+    modules = _module_index(tests)
+    found = False
+    for path in paths:
+        try:
+            root = ET.parse(str(path)).getroot()
+        except (OSError, ET.ParseError):
+            continue
+        found = True
+        for case in root.iter("testcase"):
+            rel = _file_of(case, tests, modules)
+            bad = next((c for c in case if c.tag in ("failure", "error")), None)
+            if bad is not None:
+                report.failures.append(_failure(case, bad, rel))
+                if bad.tag == "failure":
+                    report.failed += 1
+                else:
+                    report.errors += 1
+            elif any(c.tag == "skipped" for c in case):
+                report.skipped += 1
+            else:
+                report.passed += 1
+            if rel:
+                try:
+                    secs = float(case.get("time") or 0)
+                except ValueError:
+                    secs = 0.0
+                ok, total = report.files.get(rel, (True, 0.0))
+                report.files[rel] = (ok and bad is None, total + secs)
+    return report if found else None
+
+
+def summary(report: Report, seconds: float) -> str:
+    """'40 passed, 2 failed, 1 skipped in 3.2s' (zero counts left out)."""
+    parts = [f"{n} {label}" for n, label in ((report.passed, "passed"),
+                                             (report.failed, "failed"),
+                                             (report.errors, "errors"),
+                                             (report.skipped, "skipped")) if n]
+    return f"{', '.join(parts) or 'no tests ran'} in {seconds:.1f}s"
+
+
+def failure_records(report: Report, limit: int = MAX_RECORDS) -> str:
+    """The failures as compact records, the first `limit` in full."""
+    out: List[str] = []
+    for f in report.failures[:limit]:
+        head = f"{f.kind.upper()} {f.test_id}" + (f" — {f.where}" if f.where else "")
+        out.append(head)
+        if f.line:
+            out.append(f"  {f.line}")
+        if f.trace and f.trace.strip() != f.line:
+            out.append("  | " + f.trace.replace("\n", "\n  | "))
+    rest = report.failures[limit:]
+    if rest:
+        out.append(f"… and {len(rest)} more: " + ", ".join(f.test_id for f in rest[:20])
+                   + (" …" if len(rest) > 20 else ""))
+    return "\n".join(out)
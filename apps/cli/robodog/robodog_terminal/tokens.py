@@ -0,0 +1,260 @@
+# file: robodog_terminal/tokens.py
+"""
+Offline token counting for context budgeting.
+
+The loop used to budget the transcript in characters (450k chars ≈ "112k
+tokens" by the chars/4 rule of thumb). Code-heavy tool output tokenizes very
+differently from prose — indentation, punctuation runs and identifiers cost
+far more tokens per char — so a char budget either trims far too early on
+prose or overflows a 128k window on code. This module counts real(ish) tokens:
+
+  - BPETokenizer : byte-level BPE over a local rank table (the `.tiktoken`
+    text format: one `base64(token) rank` per line — the same file tiktoken
+    caches). Exact merges; pre-tokenization approximates the encoding's regex
+    with stdlib `re`. Tables are looked up in ROBODOG_TOKENIZER_DIR, then
+    ~/.robodog/tokenizers/<encoding>.tiktoken. Nothing is ever downloaded.
+  - HeuristicTokenizer : the fast fallback when no table is present — a
+    per-character-class estimate (letters, digit groups, punctuation runs,
+    newlines) that tracks BPE counts on code far better than chars/4.
+
+get_tokenizer(model) picks the vocabulary for a model id (o200k for the
+gpt-4o/4.1/o-series family, cl100k for gpt-4/3.5) and falls back to the
+heuristic; transcript_token_budget(model, max_tokens) turns the model's
+context window into a trim budget. Counts are cached per Turn (turn_tokens)
+so a turn is tokenized once, not once per iteration.
+"""
+from __future__ import annotations
+
+import base64
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+# Pre-tokenizer: cl100k/o200k's split pattern translated to stdlib `re`
+# (\p{L} -> [^\W\d_], \p{N} -> \d). Close enough that piece boundaries — and
+# so merge counts — match on ordinary code and prose.
+_PRETOKENIZE = re.compile(
+    r"(?i:'s|'t|'re|'ve|'m|'ll|'d)"
+    r"|(?:[^\r\n\w]|_)?[^\W\d_]+"
+    r"|\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+[\r\n]*"
+    r"|\s*[\r\n]+"
+    r"|\s+(?!\S)"
+    r"|\s+")
+
+# Model id substring -> BPE encoding name. Longest match wins (same rule as
+# llm_client.estimate_cost), so "gpt-4o" beats "gpt-4".
+_MODEL_ENCODINGS = {
+    "gpt-4o": "o200k_base", "gpt-4.1": "o200k_base", "gpt-4.5": "o200k_base",
+    "gpt-5": "o200k_base", "o1": "o200k_base", "o3": "o200k_base",
+    "o4-mini": "o200k_base",
+    "gpt-4": "cl100k_base", "gpt-3.5": "cl100k_base",
+}
+
+# Model id substring -> context window (tokens). Rough, like _PRICE_PER_1M: a
+# custom gateway / unknown model returns None and keeps the char budget.
+_CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000, "gpt-4.1": 1_000_000, "gpt-4-turbo": 128_000,
+    "gpt-4": 8_192, "gpt-3.5": 16_385, "gpt-5": 400_000,
+    "o1": 200_000, "o3": 200_000, "o4-mini": 200_000,
+    "claude": 200_000,
+    "gemini-1.5-pro": 2_000_000, "gemini": 1_000_000,
+    "deepseek": 64_000, "llama-3.1": 128_000, "llama-3.3": 128_000,
+    "mistral-large": 128_000,
+}
+
+# Headroom in the window for what the transcript budget doesn't cover: the
+# system catalog (~3-5k tokens), the "ASSISTANT:" cue, and tokenizer error.
+_WINDOW_RESERVE = 8_000
+# Upper bound on an AUTO budget. Past this, every iteration re-sends a prompt
+# that costs more than it helps (and recall degrades); a 1M-window model can
+# still use more via --max-transcript-tokens.
+_AUTO_BUDGET_CAP = 160_000
+# Smallest AUTO budget worth trimming to; a window with less room than this
+# after the reply and the reserve gets no token budget at all.
+_AUTO_BUDGET_MIN = 4_000
+
+
+def _longest_match(model: str, table: dict):
+    m = (model or "").lower()
+    best = None
+    for key in table:
+        if key in m and (best is None or len(key) > len(best)):
+            best = key
+    return table[best] if best is not None else None
+
+
+class HeuristicTokenizer:
+    """Fast offline estimate by character class: a run of letters costs one
+    token per ~8 chars (common words are one token, long identifiers split),
+    digits go in groups of 3 (as cl100k/o200k split them), punctuation runs
+    cost one token per 2 chars, and each newline-bearing whitespace run one
+    token (plain spaces ride along with the next word)."""
+
+    name = "heuristic"
+    _RUNS = re.compile(r"([^\W\d_]+)|(\d+)|(\s+)|((?:[^\w\s]|_)+)")
+
+    def count(self, text: str) -> int:
+        n = 0
+        for m in self._RUNS.finditer(text or ""):
+            k = m.lastindex
+            ln = m.end() - m.start()
+            if k == 1:
+                n += (ln + 7) // 8
+            elif k == 2:
+                n += (ln + 2) // 3
+            elif k == 3:
+                if "\n" in m.group() or ln > 1:
+                    n += 1
+            else:
+                n += (ln + 1) // 2
+        return n
+
+
+class BPETokenizer:
+    """Byte-level BPE counter over a `.tiktoken` rank table. Only COUNTS (no
+    ids are needed for budgeting). Each pre-tokenized piece is merged lowest
+    rank first until no adjacent pair is in the table; piece counts are
+    memoized, since code repeats the same pieces endlessly."""
+
+    _PIECE_CACHE_MAX = 200_000
+
+    def __init__(self, ranks: Dict[bytes, int], name: str = "bpe"):
+        self.name = name
+        self._ranks = ranks
+        self._cache: Dict[bytes, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: Path, name: Optional[str] = None) -> "BPETokenizer":
+        ranks: Dict[bytes, int] = {}
+        with open(path, "rb") as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) == 2:
+                    ranks[base64.b64decode(parts[0])] = int(parts[1])
+        if not ranks:
+            raise ValueError(f"empty BPE table: {path}")
+        return cls(ranks, name or Path(path).stem)
+
+    def _piece_count(self, piece: bytes) -> int:
+        ranks = self._ranks
+        if piece in ranks:
+            return 1
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            best, best_rank = -1, None
+            for i in range(len(parts) - 1):
+                r = ranks.get(parts[i] + parts[i + 1])
+                if r is not None and (best_rank is None or r < best_rank):
+                    best, best_rank = i, r
+            if best < 0:
+                break
+            parts[best:best + 2] = [parts[best] + parts[best + 1]]
+        return len(parts)
+
+    def count(self, text: str) -> int:
+        n = 0
+        cache = self._cache
+        for piece in _PRETOKENIZE.findall(text or ""):
+            b = piece.encode("utf-8", "replace")
+            c = cache.get(b)
+            if c is None:
+                c = self._piece_count(b)
+                with self._lock:
+                    if len(cache) >= self._PIECE_CACHE_MAX:
+                        cache.clear()
+                    cache[b] = c
+            n += c
+        return n
+
+
+_HEURISTIC = HeuristicTokenizer()
+_LOADED: Dict[str, object] = {}     # encoding name -> BPETokenizer | None (missing)
+_LOAD_LOCK = threading.Lock()
+
+
+def _table_dirs():
+    env = os.environ.get("ROBODOG_TOKENIZER_DIR")
+    if env:
+        yield Path(env).expanduser()
+    yield Path.home() / ".robodog" / "tokenizers"
+
+
+def _load_encoding(encoding: str):
+    with _LOAD_LOCK:
+        if encoding in _LOADED:
+            return _LOADED[encoding]
+        tok = None
+        for d in _table_dirs():
+            path = d / f"{encoding}.tiktoken"
+            if path.is_file():
+                try:
+                    tok = BPETokenizer.from_file(path, encoding)
+                    break
+                except (OSError, ValueError):
+                    continue
+        _LOADED[encoding] = tok
+        return tok
+
+
+def encoding_for_model(model: str) -> Optional[str]:
+    """The BPE encoding a model id uses, or None when it's not a known one."""
+    return _longest_match(model, _MODEL_ENCODINGS)
+
+
+def get_tokenizer(model: str = ""):
+    """Tokenizer for `model`: its BPE table when one is installed locally,
+    else the heuristic. ROBODOG_TOKENIZER=heuristic forces the fallback;
+    ROBODOG_TOKENIZER=<encoding> forces a table (e.g. for a gateway model
+    whose id doesn't say what it is)."""
+    forced = os.environ.get("ROBODOG_TOKENIZER", "").strip()
+    if forced.lower() == "heuristic":
+        return _HEURISTIC
+    encoding = forced or encoding_for_model(model)
+    if encoding:
+        tok = _load_encoding(encoding)
+        if tok is not None:
+            return tok
+    return _HEURISTIC
+
+
+def context_window(model: str) -> Optional[int]:
+    """Context window (tokens) for a model id, or None when unknown."""
+    return _longest_match(model, _CONTEXT_WINDOWS)
+
+
+def transcript_token_budget(model: str, max_tokens: int = 8192) -> Optional[int]:
+    """Trim budget for the running transcript, in tokens: the model's window
+    minus the completion ceiling and a catalog reserve, with 15% slack for
+    tokenizer error — capped at _AUTO_BUDGET_CAP. None for an unknown model,
+    or one whose window leaves less than _AUTO_BUDGET_MIN after the reply
+    and the reserve (the caller keeps its char budget)."""
+    window = context_window(model)
+    if not window:
+        return None
+    room = int((window - max_tokens - _WINDOW_RESERVE) * 0.85)
+    if room < _AUTO_BUDGET_MIN:
+        return None
+    return min(_AUTO_BUDGET_CAP, room)
+
+
+def turn_tokens(turn, tokenizer) -> int:
+    """Token count of one Turn's content, cached ON the turn and keyed by the
+    content object + tokenizer — so a turn is tokenized once, and a trim or
+    edit that replaces its content is recounted automatically."""
+    content = turn.content
+    cached = getattr(turn, "_tokens", None)
+    if cached is not None and cached[0] is content and cached[1] is tokenizer:
+        return cached[2]
+    n = tokenizer.count(content)
+    turn._tokens = (content, tokenizer, n)
+    return n
+
+
+def estimate_tokens(text: str, model: str = "") -> int:
+    """One-off count for display (e.g. /test agents' padding estimate)."""
+    return get_tokenizer(model).count(text)
+
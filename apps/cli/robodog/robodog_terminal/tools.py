@@ -14,11 +14,12 @@ can be added later in permissions.py.
 from __future__ import annotations
 
 import base64
-import fnmatch
 import json
 import os
 import queue
 import re
+import selectors
+import shlex
 import shutil
 import signal
 import subprocess
@@ -27,11 +28,24 @@ import tempfile
 import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Tuple
 
+from . import (diffing, edit_match, file_tree, grep_engine, grep_index, ignore, impact,
+               line_index, reactor, testreport, verify)
+
 MAX_OUTPUT = 30_000  # clamp tool output fed back to the model
+_READ_MANY_MAX = 50
+_SHARED_CATALOGS_MAX = 32  # rendered child catalogs kept per parent registry
+_SHARD_MIN_SECONDS = 2.0   # run_tests: a suite recorded faster than this isn't split
+# read_many range suffix: `path:12-40`, `path:12`, `path:-50`. A Windows
+# drive colon (C:\x) is never followed by digits-to-the-end, so it can't match.
+_RANGE_RE = re.compile(r"^(.*?):(-?\d+)(?:-(\d+))?$")
+# edit_many file header: first in the payload or right after a '===' line —
+# anywhere else, a 'FILE:' line is edit content.
+_FILE_HEADER_RE = re.compile(r"(?:\A\s*|^===\n)FILE:[ \t]*(.+?)[ \t]*$", re.MULTILINE)
 
 
 # ========================================================================
@@ -39,77 +53,29 @@ MAX_OUTPUT = 30_000  # clamp tool output fed back to the model
 # so the agent learns immediately when it wrote something broken and can fix it.
 # Returns an error string (to append to the tool result) or None when clean/NA.
 # ========================================================================
-def verify_syntax(path: Path) -> Optional[str]:
-    suffix = path.suffix.lower()
-    try:
-        if suffix == ".py":
-            src = path.read_text(encoding="utf-8", errors="replace")
-            try:
-                compile(src, str(path), "exec")
-            except SyntaxError as exc:
-                return f"Python syntax error at line {exc.lineno}: {exc.msg}"
-        elif suffix == ".json":
-            try:
-                json.loads(path.read_text(encoding="utf-8", errors="replace"))
-            except json.JSONDecodeError as exc:
-                return f"JSON parse error at line {exc.lineno}, col {exc.colno}: {exc.msg}"
-        elif suffix in (".yaml", ".yml"):
-            try:
-                import yaml  # PyYAML is a robodog dependency
-            except ImportError:
-                return None
-            try:
-                yaml.safe_load(path.read_text(encoding="utf-8", errors="replace"))
-            except yaml.YAMLError as exc:
-                return f"YAML parse error: {str(exc).splitlines()[0]}"
-        elif suffix == ".toml":
-            try:
-                import tomllib  # py3.11+
-            except ImportError:
-                return None
-            try:
-                tomllib.loads(path.read_text(encoding="utf-8", errors="replace"))
-            except Exception as exc:
-                return f"TOML parse error: {exc}"
-        elif suffix in (".js", ".mjs", ".cjs", ".ts", ".jsx", ".tsx"):
-            node = shutil.which("node")
-            if not node or suffix in (".ts", ".tsx"):
-                return None  # no node, or TS needs a real compiler — skip
-            proc = subprocess.run([node, "--check", str(path)],
-                                  capture_output=True, text=True, timeout=15)
-            if proc.returncode != 0:
-                msg = (proc.stderr or proc.stdout).strip().splitlines()
-                return "JS syntax error: " + (msg[0] if msg else "check failed")
-    except Exception:
-        return None  # verification must never break the edit
-    return None
+def verify_syntax(path: Path, text: Optional[str] = None) -> Optional[str]:
+    """Check `text` (default: the file's current content) as `path`'s language.
+    The parsers, the content-hash cache and the warm node worker live in
+    verify.py; _finalize_write calls verify.submit() directly."""
+    if text is None:
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return None
+    return verify.check_text(path, text)
 
 
-def _fuzzy_find(original: str, old: str) -> Optional[Tuple[int, int]]:
+def _fuzzy_find(original: str, old: str,
+                table: Optional[edit_match.LineTable] = None) -> Optional[Tuple[int, int]]:
     """
     Whitespace-tolerant fallback for edit_file: match `old` against `original`
     ignoring only TRAILING whitespace per line and surrounding blank lines
     (indentation is preserved). Returns (start, end) char span of the UNIQUE
-    match in `original`, or None if zero/ambiguous.
+    match in `original`, or None if zero/ambiguous. Linear in the file (a
+    rolling hash over line hashes); pass `table` to reuse one LineTable.
     """
-    target = [ln.rstrip() for ln in old.strip("\n").split("\n")]
-    if not target or not any(target):
-        return None
-    src_lines = original.split("\n")
-    # precompute char offset of each source line start
-    offsets, pos = [], 0
-    for ln in src_lines:
-        offsets.append(pos)
-        pos += len(ln) + 1  # +1 for the '\n'
-    norm = [ln.rstrip() for ln in src_lines]
-    n = len(target)
-    matches = []
-    for i in range(0, len(src_lines) - n + 1):
-        if norm[i:i + n] == target:
-            start = offsets[i]
-            end = offsets[i + n - 1] + len(src_lines[i + n - 1])
-            matches.append((start, end))
-    return matches[0] if len(matches) == 1 else None
+    spans = edit_match.find_spans(table or edit_match.LineTable(original), old)
+    return spans[0] if len(spans) == 1 else None
 
 
 def edit_not_found_hint(original: str, old: str, new: str = "") -> str:
@@ -120,8 +86,10 @@ def edit_not_found_hint(original: str, old: str, new: str = "") -> str:
 
     Detects, in priority order: the edit was ALREADY applied (idempotency); the
     text is present but with different line endings; present but with different
-    leading/trailing whitespace; a non-unique whitespace-normalized match; or
-    shows the closest actual line in the file with its line number.
+    leading/trailing whitespace; a non-unique whitespace-normalized match; a
+    multi-line block whose lines mostly ARE in the file (names the first line
+    that differs, or an indentation-only difference); or shows the closest
+    actual line in the file with its line number.
     """
     if not old.strip():
         return " old_string is empty — nothing to find."
@@ -150,70 +118,86 @@ def edit_not_found_hint(original: str, old: str, new: str = "") -> str:
     if occ > 1:
         return (f" the text appears {occ}× (ignoring trailing whitespace); add "
                 "more surrounding context so old_string is unique.")
-    # 4. Point at the closest actual line so the model sees the real content.
-    import difflib
+    table = edit_match.LineTable(original)
+    # 4. A multi-line block that lines up with the file except for a line or two.
+    miss = edit_match.block_miss(table, old)
+    if miss is not None:
+        start, n, agree, diff = miss
+        where = f"lines {start + 1}-{start + n}"
+        if diff < 0:
+            return (f" {where} of the file hold the same lines with different "
+                    "indentation — copy the exact leading whitespace from read_file.")
+        if agree * 2 >= n:
+            mine = old.strip("\n").split("\n")[diff].strip()
+            at = start + diff
+            theirs = (f"line {at + 1} is {table.norm[at].strip()!r}"
+                      if 0 <= at < len(table.norm) else f"the file ends before line {at + 1}")
+            return (f" {agree} of your {n} lines match {where} of the file, but "
+                    f"{theirs} where your old_string has {mine!r}. Re-read those "
+                    "lines and copy the exact current text.")
+    # 5. Point at the closest actual line so the model sees the real content.
     anchor = next((l for l in old.strip("\n").split("\n") if l.strip()), "")
     if anchor:
-        src_lines = original.split("\n")
-        best_i, best_r = -1, 0.0
-        a = anchor.strip()
-        for i, l in enumerate(src_lines):
-            r = difflib.SequenceMatcher(None, a, l.strip()).ratio()
-            if r > best_r:
-                best_i, best_r = i, r
-        if best_i >= 0 and best_r >= 0.5:
-            actual = src_lines[best_i].strip()
+        ranked = edit_match.closest_lines(table, anchor)
+        if ranked:
+            best_i = ranked[0][0]
+            actual = table.norm[best_i].strip()
+            also = ""
+            if len(ranked) > 1:
+                also = (" (also similar: "
+                        + ", ".join(f"line {i + 1}" for i, _r in ranked[1:]) + ")")
             return (f" closest line in the file is line {best_i + 1}: "
-                    f"{actual!r} — your old_string began {a!r}. "
+                    f"{actual!r}{also} — your old_string began {anchor.strip()!r}. "
                     "Re-read the file and copy the exact current text.")
     return " re-read the file with read_file and copy the exact current text."
 
-# Directories glob/grep never descend into (mirrors .gitignore-aware search).
-EXCLUDE_DIRS = {
-    ".git", "node_modules", "__pycache__", "dist", "build", ".venv", "venv",
-    ".idea", ".vscode", ".pytest_cache", ".mypy_cache", "egg-info", ".tox",
-}
+# Directories glob/grep never descend into, .gitignore or not. The walkers
+# prune with an ignore.py matcher, which adds the project's nested
+# .gitignore / .robodogignore rules on top of these.
+EXCLUDE_DIRS = ignore.DEFAULT_EXCLUDE_DIRS
+_excluded_name = ignore.default_excluded
 
 
 def _is_excluded(path: Path) -> bool:
-    return any(part in EXCLUDE_DIRS or part.endswith(".egg-info")
-               for part in path.parts)
+    return any(_excluded_name(part) for part in path.parts)
 
 
 def find_by_basename(root: Path, name: str, limit: int = 5,
-                     max_scan: int = 40_000, kind: str = "file") -> List[str]:
+                     kind: str = "file") -> List[str]:
     """Find files (or directories) named exactly `name` (case-insensitive)
-    anywhere under `root`, skipping EXCLUDE_DIRS. Used to turn a read_file
+    anywhere under `root`, skipping ignored paths. Used to turn a read_file
     'not found' into a 'did you mean …' when the model has the right filename
     but the wrong directory — and, with kind="dir"/"any", a `cd`/Set-Location
     miss into a 'did you mean …' too (that error names a DIRECTORY, which the
-    file-only search could never find). Uses os.walk with in-place dir
-    pruning so node_modules/.git etc. are never descended into; bounded by
-    `max_scan` entries so a huge tree can't stall it."""
-    name_l = name.lower()
-    hits, scanned = [], 0
+    file-only search could never find). Answered from the shared file_tree
+    snapshot's basename index, not a walk of the tree."""
     try:
-        for dirpath, dirnames, filenames in os.walk(str(root)):
-            dirnames[:] = [d for d in dirnames
-                           if d not in EXCLUDE_DIRS and not d.endswith(".egg-info")]
-            if kind in ("dir", "any"):
-                for dn in dirnames:
-                    if dn.lower() == name_l:
-                        hits.append(os.path.join(dirpath, dn))
-                        if len(hits) >= limit:
-                            return hits
-            if kind in ("file", "any"):
-                scanned += len(filenames)
-                for fn in filenames:
-                    if fn.lower() == name_l:
-                        hits.append(os.path.join(dirpath, fn))
-                        if len(hits) >= limit:
-                            return hits
-            if scanned > max_scan:
-                break
+        tree, prefix = file_tree.tree_for(root, ignore.matcher_for(root))
+        hits = tree.named(name, kind=kind, prefix=prefix)
     except (OSError, RuntimeError):
-        pass
-    return hits
+        return []
+    base = str(root)
+    return [os.path.join(base, os.path.relpath(h, prefix) if prefix else h)
+            for h in hits[:limit]]
+
+
+def _dir_listing(d: Path) -> Optional[Tuple[List[str], List[str]]]:
+    """(subdirs, files) of `d`, sorted — from the file_tree snapshot when one
+    already covers it, else a single iterdir. None if `d` isn't a directory."""
+    found = file_tree.lookup(d)
+    if found is not None:
+        got = found[0].listing(found[1])
+        if got is not None:
+            return list(got[0]), list(got[1])
+    if not d.is_dir():
+        return None
+    dirs, files = [], []
+    for p in d.iterdir():
+        if p.is_dir():
+            dirs.append(p.name)
+        elif p.is_file():
+            files.append(p.name)
+    return sorted(dirs), sorted(files)
 
 
 def read_not_found_hint(root: Path, requested: Path) -> str:
@@ -231,9 +215,10 @@ def read_not_found_hint(root: Path, requested: Path) -> str:
     # Parent dir exists but the file doesn't — fuzzy-match against its siblings.
     parent = requested.parent
     try:
-        if parent.is_dir():
+        listing = _dir_listing(parent)
+        if listing is not None:
             import difflib
-            siblings = sorted(p.name for p in parent.iterdir() if p.is_file())
+            siblings = listing[1]
             if siblings:
                 near = difflib.get_close_matches(requested.name, siblings, n=3, cutoff=0.5)
                 if near:
@@ -255,8 +240,9 @@ def dir_not_found_hint(requested: Path) -> str:
     Returns a hint (leading space) or "". Assumes `requested` doesn't exist."""
     parent = requested.parent
     try:
-        if parent.is_dir():
-            subdirs = sorted(p.name for p in parent.iterdir() if p.is_dir())
+        listing = _dir_listing(parent)
+        if listing is not None:
+            subdirs = listing[0]
             if subdirs:
                 import difflib
                 near = difflib.get_close_matches(requested.name, subdirs, n=3, cutoff=0.4)
@@ -1397,9 +1383,23 @@ class ToolRegistry:
         self.read_paths: dict = {}
         self.checkpointer = None          # Checkpointer — snapshots before mutation
         self.on_diff: Optional[Callable[[str, str], None]] = None  # UI diff preview
+        # Diff lines the on_diff consumer will show; hunks past it are counted,
+        # not formatted. None = the whole diff.
+        self.diff_max_lines: Optional[int] = None
         self.on_bash_line: Optional[Callable[[str], None]] = None  # UI live output, per line
         # Plan mode: when "plan", mutating tools are refused (read-only propose-first).
-        self.mode: str = "yolo"  # "yolo" | "plan"
+        self._mode: str = "yolo"  # "yolo" | "plan" — see the `mode` property
+        # catalog() memo. The rendered text depends only on the tool set and
+        # the mode, so it's cached against a version bumped by register() and
+        # by every mode change; the identity/size of _tools is checked too,
+        # because a few callers filter that dict directly (core.py, agents.py).
+        self._catalog_version = 0
+        self._catalog_cache = None   # (key, _tools dict it was built from, text)
+        # (store, key) to share one rendered catalog between registries with
+        # identical tool sets — _child_registry points every child of one agent
+        # type at the parent's _shared_catalogs, so a fan-out renders it once.
+        self.catalog_share = None
+        self._shared_catalogs: dict = {}
         # Background bash hook (app wires to BackgroundManager.spawn_bash).
         self.background_spawn: Optional[Callable[[str, str], str]] = None
         # Post-edit syntax verification (self-healing edits).
@@ -1422,22 +1422,46 @@ class ToolRegistry:
         self.test_command: Optional[str] = None
         # Hooks + permission rules (hooks.HookEngine; wired by app.py).
         self.hooks = None
-        # Persistent PowerShell session for the bash tool (Windows only, lazy —
-        # created on first bash call; see _PersistentPowerShell above).
-        self._shell: Optional["_PersistentPowerShell"] = None
+        # Persistent shell session for the bash tool (lazy — created on the
+        # first bash call; _PersistentPowerShell on Windows, else
+        # _PersistentPosixShell).
+        self._shell: Optional["_PersistentPowerShell | _PersistentPosixShell"] = None
+        # read_file de-duplication (on unless ROBODOG_READ_DEDUP=0). AgentLoop
+        # sets read_visible to "is this exact tool output still in the
+        # transcript?" and keeps `step` current; a re-read of an unchanged
+        # range then returns a one-line stub pointing back at the earlier
+        # result instead of a second copy that's re-sent every iteration.
+        # With no loop attached (read_visible None) reads are never stubbed.
+        self.read_visible: Optional[Callable[[str], bool]] = None
+        self.step = 0
+        self._read_memo: Dict[tuple, tuple] = {}   # (path, offset, limit) -> (stat, step, output)
+        self._read_memo_lock = threading.Lock()
+        # run_tests results this session, by test file (impact.py).
+        self._test_results = impact.ResultCache()
 
     def close(self) -> None:
         """Release any long-lived resources (the persistent shell session).
-        Call when the registry's session is ending — never required for
-        correctness (an orphaned powershell.exe is harmless and short-lived
-        in practice), just tidy."""
+        Call when the registry's session is ending: the shell process lives
+        until then — dropping the registry doesn't end it (the tool closures
+        keep it alive until a gc cycle runs)."""
         if self._shell is not None:
             self._shell.kill()
             self._shell = None
 
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @mode.setter
+    def mode(self, value: str) -> None:
+        if value != self._mode:
+            self._mode = value
+            self._catalog_version += 1   # plan mode adds a line to the catalog
+
     # ---- registration ---------------------------------------------------
     def register(self, tool: Tool) -> None:
         self._tools[tool.name] = tool
+        self._catalog_version += 1
 
     def get(self, name: str) -> Optional[Tool]:
         return self._tools.get(name)
@@ -1594,6 +1618,56 @@ class ToolRegistry:
         except OSError:
             return False
 
+    def _read_dedup(self, path: Path, offset: int, limit: Optional[int],
+                    produce: Callable[[], str]) -> str:
+        """produce() — or, when the same range of the same file content was
+        already returned and that output is still in the transcript, a stub
+        that points back at it. Keyed by (path, offset, limit); an unchanged
+        mtime/size skips re-reading unless the mtime is recent enough that a
+        same-tick edit could hide behind it, then the output itself decides."""
+        if (self.read_visible is None or os.environ.get("ROBODOG_READ_DEDUP", "1")
+                .strip().lower() in ("0", "false", "no", "off")):
+            return produce()
+        try:
+            st = path.stat()
+        except OSError:
+            return produce()
+        key = (str(path), offset, limit)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._read_memo_lock:
+            memo = self._read_memo.get(key)
+        if (memo is not None and memo[0] == stamp
+                and time.time_ns() - st.st_mtime_ns > 2_000_000_000
+                and self.read_visible(memo[2])):
+            return self._read_stub(path, offset, limit, memo[1])
+        text = produce()
+        shown = _clamp(text)
+        if memo is not None and memo[2] == shown and self.read_visible(shown):
+            with self._read_memo_lock:
+                self._read_memo[key] = (stamp, memo[1], shown)
+            return self._read_stub(path, offset, limit, memo[1])
+        with self._read_memo_lock:
+            self._read_memo.pop(key, None)
+            self._read_memo[key] = (stamp, self.step, shown)
+            while len(self._read_memo) > 256:
+                self._read_memo.pop(next(iter(self._read_memo)))
+        return text
+
+    def _read_stub(self, path: Path, offset: int, limit: Optional[int], step: int) -> str:
+        try:
+            shown = path.relative_to(self.cwd)
+        except ValueError:
+            shown = path
+        if limit is not None:
+            span = f"lines {offset + 1}-{offset + limit} of {shown}"
+        elif offset:
+            span = f"{shown} from line {offset + 1}" if offset > 0 else f"the last {-offset} lines of {shown}"
+        else:
+            span = str(shown)
+        return (f"[unchanged since step {step}: {span} is exactly what read_file "
+                f"returned then, and that result is still above. Pass full=true "
+                f"to get the content again.]")
+
     # ---- path helper ----------------------------------------------------
     def _project_root(self) -> Optional[Path]:
         """Nearest ancestor of cwd containing a .git (the repo root), or None."""
@@ -1633,7 +1707,34 @@ class ToolRegistry:
 
     # ---- system-prompt catalog -----------------------------------------
     def catalog(self) -> str:
-        """Render the tool catalog + output contract for the system context."""
+        """The tool catalog + output contract for the system context. Called on
+        every LLM call and every compaction, so it's memoized (see
+        _catalog_version) and only re-rendered after a register() or a mode
+        change."""
+        key = (self._catalog_version, self._mode, len(self._tools))
+        cached = self._catalog_cache
+        if cached is not None and cached[0] == key and cached[1] is self._tools:
+            return cached[2]
+        text = None
+        if self.catalog_share is not None:
+            store, share_key = self.catalog_share
+            # Keyed on the schemas, not just the names: a tool re-registered
+            # with a new description or params must not reuse the old text.
+            share_key = (share_key, self._mode, tuple(
+                (t.name, t.description, tuple((p.name, p.description, p.required)
+                                              for p in t.params))
+                for t in self._tools.values()))
+            text = store.get(share_key)
+        if text is None:
+            text = self._render_catalog()
+            if self.catalog_share is not None:
+                while len(store) >= _SHARED_CATALOGS_MAX:
+                    del store[next(iter(store))]     # oldest first
+                store[share_key] = text
+        self._catalog_cache = (key, self._tools, text)
+        return text
+
+    def _render_catalog(self) -> str:
         lines = [
             "You are Robodog, an agentic coding assistant running in a terminal.",
             "You perform actions by CALLING TOOLS — never by describing what you would do.",
@@ -1656,10 +1757,12 @@ class ToolRegistry:
             "   emit ALL of those <tool> blocks together in ONE reply instead of one call",
             "   per reply. Each reply costs a full round trip to the model — batching",
             "   independent calls saves those round trips entirely, and",
-            "   read_file/glob/grep/list_dir/ask_user/task_output and type=explore agent",
-            "   calls also run CONCURRENTLY when batched, so it's faster too. Only batch",
-            "   calls that don't depend on each other's results (never batch an edit with",
-            "   the read it depends on, or two edits to the same file).",
+            "   read_file/read_many/glob/grep/list_dir/ask_user/task_output and",
+            "   type=explore agent calls also run CONCURRENTLY when batched, so it's",
+            "   faster too. Only batch calls that don't depend on each other's results",
+            "   (never batch an edit with the read it depends on, or two edits to the",
+            "   same file). For many files, read_many reads them in ONE call and",
+            "   edit_many changes them in ONE atomic call.",
             "",
             "AVAILABLE TOOLS:",
         ]
@@ -1679,16 +1782,19 @@ class ToolRegistry:
 
 
 # ========================================================================
-# Persistent shell session (Windows/PowerShell) — reuses ONE process across
-# bash tool calls instead of spawning a fresh `powershell.exe` per call.
-# Profiled: a one-shot call costs ~0.75-1.0s of pure process-spawn overhead,
+# Persistent shell session (PowerShell on Windows, bash on POSIX) — reuses
+# ONE process across bash tool calls instead of spawning a fresh shell per call.
+# Profiled: a one-shot PowerShell call costs ~0.75-1.0s of pure process-spawn overhead,
 # paid on EVERY bash call — a turn with 5 shell commands burns ~4-5s just on
 # cold starts. OpenHands solves this the same way for its bash tool (a
 # persistent tmux/bash session with a completion sentinel); this is the
 # PowerShell equivalent: one long-lived `-Command -` process reading
 # statements from stdin, each terminated with a unique marker line carrying
 # a synthetic exit code ($? / $LASTEXITCODE combined the same way a real
-# terminal session would report it).
+# terminal session would report it). On POSIX the spawn is cheaper but not
+# free (a /bin/sh fork/exec per call), and the state a real terminal keeps
+# (cd, export, an activated venv) was lost between calls;
+# _PersistentPosixShell does the same over bash.
 # ========================================================================
 def _persistent_shell_enabled() -> bool:
     # Read fresh on every call (not cached at import time) so the toggle is
@@ -1904,6 +2010,197 @@ class _PersistentPowerShell:
             return rc, out_lines, err_lines, False
 
 
+def _sh_quote(text: str) -> str:
+    """Single-quote text for a POSIX shell. Inside '...' nothing is special
+    but the quote itself, so any command — embedded newlines, unbalanced
+    quotes, text that looks like our sentinel — arrives as one inert word."""
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+class _PersistentPosixShell:
+    """A long-lived `bash` process reused across bash tool calls (POSIX).
+
+    The same contract as _PersistentPowerShell — `run()` takes and returns
+    the same things, state (env vars, a bare `cd`, a sourced venv) persists
+    across calls, a `cwd` tool-param override is scoped to its one call, and
+    any anomaly resets the session for the next call.
+
+    Each command goes over stdin as one quoted `eval` word (so no content can
+    leave the shell's parser mid-string and swallow the framing), with stdin
+    for the command itself from /dev/null so it can't eat the protocol. After
+    it, the shell prints a sentinel carrying $? on stdout and a second one on
+    stderr; the call ends when both have arrived, so no stderr is left behind
+    for the next call. One selector drives both pipes, the deadline and the
+    idle notes — no reader or watcher threads per call. The session leads its
+    own process group, so a timeout kills everything the command started.
+    """
+
+    def __init__(self):
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()   # one command in flight at a time
+
+    def _alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self, cwd: str) -> None:
+        bash = shutil.which("bash")
+        argv = [bash, "--noprofile", "--norc"] if bash else ["/bin/sh"]
+        self._proc = subprocess.Popen(
+            argv, cwd=str(cwd),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        for stream in (self._proc.stdout, self._proc.stderr):
+            os.set_blocking(stream.fileno(), False)
+
+    def kill(self) -> None:
+        if self._proc is not None:
+            try:
+                os.killpg(self._proc.pid, signal.SIGKILL)
+            except Exception:
+                pass
+            try:
+                self._proc.wait(timeout=5)
+            except Exception:
+                pass
+            for stream in (self._proc.stdin, self._proc.stdout, self._proc.stderr):
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+        self._proc = None
+
+    def run(self, command: str, cwd_override: Optional[str], base_cwd: str,
+            timeout: int, on_line: Optional[Callable[[str], None]] = None,
+            idle_note_seconds: int = 20
+            ) -> Tuple[Optional[int], List[str], List[str], bool]:
+        """Run one command in the persistent session. Returns (returncode,
+        stdout_lines, stderr_lines, timed_out), as _PersistentPowerShell.run
+        does; `returncode is None and not timed_out` means the session could
+        not take the command and the caller should run it one-shot."""
+        with self._lock:
+            if not self._alive():
+                self.kill()
+                self._start(base_cwd)
+            marker = uuid.uuid4().hex
+            done = f"@@ROBODOG_DONE:{marker}:"
+            script = f"eval {_sh_quote(command)} </dev/null\n__rd_rc=$?\n"
+            if cwd_override:
+                # A failed cd is the command's failure (rc 1, the shell's own
+                # message on stderr) — the command doesn't run elsewhere.
+                script = (f"__rd_prev=$PWD\n"
+                          f"if cd -- {_sh_quote(cwd_override)}; then\n{script}"
+                          f"cd -- \"$__rd_prev\"\nelse __rd_rc=1; fi\n")
+            script += (f"printf '%s%d@@\\n' '{done}' \"$__rd_rc\"\n"
+                       f"printf '%s@@\\n' '{done}' >&2\n")
+            try:
+                self._proc.stdin.write(script.encode("utf-8"))
+                self._proc.stdin.flush()
+            except Exception:
+                self.kill()
+                return None, [], [], False   # caller falls back to one-shot
+
+            out_lines: List[str] = []
+            err_lines: List[str] = []
+            rc: Optional[int] = None
+            streams = {
+                self._proc.stdout.fileno(): [out_lines, b"", False],
+                self._proc.stderr.fileno(): [err_lines, b"", False],
+            }
+
+            def _line(state, raw: bytes) -> None:
+                nonlocal rc
+                text = raw.decode("utf-8", errors="replace").rstrip("\r")
+                at = text.find(done)
+                if at >= 0:
+                    # Output without a final newline shares the sentinel's line.
+                    state[2] = True
+                    tag = text[at + len(done):].rstrip("@")
+                    text = text[:at]
+                    if state[0] is out_lines:
+                        try:
+                            rc = int(tag)
+                        except ValueError:
+                            rc = 1
+                    if not text:
+                        return
+                state[0].append(text)
+                if on_line is not None:
+                    try:
+                        on_line(text)
+                    except Exception:
+                        pass   # a UI error must never kill the reader
+
+            sel = selectors.DefaultSelector()
+            for fd in streams:
+                sel.register(fd, selectors.EVENT_READ)
+            deadline = time.monotonic() + timeout
+            last_activity = time.monotonic()
+            notified_at = 0.0
+            timed_out = False
+            died = False
+            try:
+                while not all(st[2] for st in streams.values()):
+                    now = time.monotonic()
+                    if now >= deadline:
+                        timed_out = True
+                        break
+                    wait = min(deadline - now, 1.0)
+                    if on_line is not None:
+                        wait = min(wait, max(0.05, last_activity + idle_note_seconds - now),
+                                   max(0.05, notified_at + idle_note_seconds - now))
+                    events = sel.select(wait)
+                    if not events:
+                        if died or self._proc.poll() is not None:
+                            # Exited on its own (`exit N`, `set -e`, a crash)
+                            # but something it started still holds the pipes
+                            # open: what's already arrived is all there is.
+                            break
+                        idle_for = time.monotonic() - last_activity
+                        if (on_line is not None and idle_for >= idle_note_seconds
+                                and time.monotonic() - notified_at >= idle_note_seconds):
+                            notified_at = time.monotonic()
+                            on_line(f"⏳ still running — no new output for {int(idle_for)}s "
+                                    f"(normal for installs/builds/servers; not necessarily hung)")
+                        continue
+                    for key, _mask in events:
+                        state = streams[key.fd]
+                        try:
+                            chunk = os.read(key.fd, 65536)
+                        except BlockingIOError:
+                            continue
+                        if not chunk:
+                            # EOF: the shell is gone. Flush the partial line
+                            # and stop watching this pipe.
+                            sel.unregister(key.fd)
+                            if state[1]:
+                                _line(state, state[1])
+                                state[1] = b""
+                            state[2] = died = True
+                            continue
+                        last_activity = time.monotonic()
+                        *complete, state[1] = (state[1] + chunk).split(b"\n")
+                        for raw in complete:
+                            _line(state, raw)
+            finally:
+                sel.close()
+
+            if timed_out:
+                # The shell and everything the command started share one
+                # process group; the next call gets a fresh session.
+                self.kill()
+                return None, out_lines, err_lines, True
+            if rc is None:
+                # Died before its sentinel: report the shell's own exit code,
+                # as the one-shot path would for the same `exit N`.
+                try:
+                    rc = self._proc.wait(timeout=5)
+                except Exception:
+                    rc = 1
+                self.kill()
+            return rc, out_lines, err_lines, False
+
+
 # ========================================================================
 # Default tool implementations
 # ========================================================================
@@ -1911,69 +2208,151 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
     reg = ToolRegistry(cwd=cwd)
 
     # --- helpers for the safety layer -----------------------------------
-    def _diff_and_checkpoint(path: Path, old_text: Optional[str], new_text: str):
-        """Snapshot before mutation and surface a diff preview to the UI."""
+    def _checkpoint(path: Path, old_text: Optional[str]) -> None:
         if reg.checkpointer is not None:
             if old_text is None:
                 reg.checkpointer.record_new(path)
             else:
                 reg.checkpointer.snapshot(path)
-        if reg.on_diff is not None:
-            import difflib
 
-            def _nl_terminated(text):
-                # A file whose last line has no trailing newline yields a diff
-                # line with no '\n'; "".join then GLUES it to the next +/- line
-                # (`examples.+**See**`). difflib emits no `\ No newline` marker,
-                # so terminate the last line ourselves — this is display-only.
-                lines = text.splitlines(keepends=True)
-                if lines and not lines[-1].endswith(("\n", "\r")):
-                    lines[-1] += "\n"
-                return lines
-
-            old_lines = _nl_terminated(old_text or "")
-            new_lines = _nl_terminated(new_text)
-            diff = "".join(difflib.unified_diff(
-                old_lines, new_lines,
-                fromfile=f"a/{path.name}", tofile=f"b/{path.name}", n=2))
+    def _render_diff(path: Path, old_text: Optional[str], new_text: str) -> str:
+        # Only as many hunks as the preview shows (diff_max_lines); see
+        # diffing.py for the trimming / patience / size-cutoff details.
+        return diffing.unified(old_text or "", new_text,
+                               f"a/{path.name}", f"b/{path.name}", n=2,
+                               max_lines=reg.diff_max_lines)
+
+    def _diff_and_checkpoint(path: Path, old_text: Optional[str], new_text: str):
+        """Snapshot before mutation and surface a diff preview to the UI."""
+        _checkpoint(path, old_text)
+        if reg.on_diff is not None:
+            diff = _render_diff(path, old_text, new_text)
             if diff:
                 reg.on_diff(str(path), diff)
 
     # --- read_file -------------------------------------------------------
+    def _past_end(offset: int, total: int) -> str:
+        return (f"(offset {offset} is past the end — the file has {total} line(s); "
+                f"use an offset below {total}, or a negative one to read from the end)")
+
     def _read_file(args):
         path = reg._resolve(args["path"], search=True)
         if not path.exists():
             base = reg._project_root() or reg.cwd
             return f"ERROR: file not found: {path}" + read_not_found_hint(base, path)
         reg._mark_read(path)
-        text = path.read_text(encoding="utf-8", errors="replace")
-        lines = text.splitlines()
         offset = int(args.get("offset", 0) or 0)
         limit = args.get("limit")
-        if limit is not None and str(limit).strip():
-            lines = lines[offset: offset + int(limit)]
-        elif offset:
-            lines = lines[offset:]
-        numbered = "\n".join(f"{i + offset + 1}\t{ln}" for i, ln in enumerate(lines))
-        return numbered or "(empty file)"
+        limit = int(limit) if limit is not None and str(limit).strip() else None
+        full = str(args.get("full", "")).strip().lower() in ("1", "true", "yes")
+
+        def _produce():
+            try:
+                size = path.stat().st_size
+            except OSError:
+                size = 0
+            if size >= line_index.min_bytes():
+                # Large file: seek straight to the window via the cached line
+                # index instead of decoding and splitting the whole thing.
+                first, lines, total = line_index.read_window(path, offset, limit,
+                                                             max_chars=MAX_OUTPUT)
+                if total and first >= total:
+                    return _past_end(offset, total)
+                numbered = "\n".join(f"{first + i + 1}\t{ln}" for i, ln in enumerate(lines))
+                if limit is None and first + len(lines) < total:
+                    numbered += (f"\n… [showing lines {first + 1}-{first + len(lines)} of "
+                                 f"{total}; pass offset/limit for more — a negative offset "
+                                 f"reads from the end]")
+                return numbered or "(empty file)"
+            text = path.read_text(encoding="utf-8", errors="replace")
+            lines = text.splitlines()
+            start = max(0, len(lines) + offset) if offset < 0 else offset
+            if lines and start >= len(lines):
+                return _past_end(offset, len(lines))
+            if limit is not None:
+                lines = lines[start: start + limit]
+            elif start:
+                lines = lines[start:]
+            numbered = "\n".join(f"{i + start + 1}\t{ln}" for i, ln in enumerate(lines))
+            return numbered or "(empty file)"
+
+        if full:
+            return _produce()
+        return reg._read_dedup(path, offset, limit, _produce)
 
     reg.register(Tool(
         name="read_file",
         description="Read a text file. Returns line-numbered content.",
         params=[
             ToolParam("path", "File path (absolute or relative to cwd)."),
-            ToolParam("offset", "0-based start line.", required=False),
+            ToolParam("offset", "0-based start line; negative = from the end "
+                      "(-200 = the last 200 lines).", required=False),
             ToolParam("limit", "Max lines to read.", required=False),
+            ToolParam("full", "true = return the content even if this exact range "
+                      "is unchanged since an earlier read.", required=False),
         ],
         handler=_read_file,
         executes=False,
     ))
 
-    def _finalize_write(path: Path, old_text: Optional[str], new_text: str,
-                        summary: str) -> str:
-        """Checkpoint + diff + write + verify-after-write + mark-read + syntax."""
-        path.parent.mkdir(parents=True, exist_ok=True)
-        _diff_and_checkpoint(path, old_text, new_text)
+    # --- read_many (several files / ranges in one call) -----------------
+    def _read_many(args):
+        # One entry per line (or comma-separated): `path`, `path:START-END`
+        # (1-based, inclusive — the numbers read_file shows), `path:START`
+        # (to the end) or `path:-N` (the last N lines). Each entry goes
+        # through read_file itself, so resolution, not-found hints, the read
+        # tracking edits rely on and the dedup stubs all behave the same.
+        specs = [p.strip() for p in re.split(r"[\n,]", args["paths"]) if p.strip()]
+        if not specs:
+            return "ERROR: no paths given."
+        if len(specs) > _READ_MANY_MAX:
+            return (f"ERROR: {len(specs)} paths — read_many takes at most "
+                    f"{_READ_MANY_MAX} per call; split them up.")
+        calls = []
+        for spec in specs:
+            m = _RANGE_RE.match(spec)
+            if not m or not m.group(1):
+                calls.append({"path": spec})
+                continue
+            first, last = int(m.group(2)), m.group(3)
+            call = {"path": m.group(1)}
+            if first < 0:
+                call["offset"] = str(first)
+            else:
+                call["offset"] = str(max(first - 1, 0))
+                if last is not None:
+                    call["limit"] = str(max(int(last) - max(first, 1) + 1, 0))
+            calls.append(call)
+        with ThreadPoolExecutor(max_workers=min(8, len(calls))) as pool:
+            outs = list(pool.map(lambda c: reg.execute("read_file", c), calls))
+        # Share the output budget so the last files aren't clamped away.
+        budget = max(2_000, MAX_OUTPUT // len(specs) - 100)
+        parts = [f"{len(specs)} file(s):"]
+        for spec, out in zip(specs, outs):
+            if len(out) > budget:
+                out = (out[:budget].rsplit("\n", 1)[0]
+                       + f"\n… [cut to share the output between {len(specs)} files; "
+                         f"read_file {spec} with offset/limit for the rest]")
+            parts.append(f"=== {spec} ===\n{out}")
+        return "\n".join(parts)
+
+    reg.register(Tool(
+        name="read_many",
+        description=("Read several files (or line ranges) in ONE call, concurrently. "
+                     "Same output as read_file, one '=== path ===' section each. "
+                     "Prefer it over several read_file calls when you already know "
+                     "which files you need."),
+        params=[
+            ToolParam("paths", "One per line (or comma-separated): path, "
+                      "path:START-END (1-based lines), path:START or path:-N "
+                      "(last N lines). Example: 'src/a.py\\nsrc/b.py:120-180'."),
+        ],
+        handler=_read_many,
+        executes=False,
+    ))
+
+    def _write_and_check(path: Path, new_text: str) -> str:
+        """Write `new_text`, read it back; returns a warning to append, or ""."""
         # Write byte-faithfully (newline="" = no \n->\r\n translation) so the
         # content lands EXACTLY as the model intended — otherwise CRLF content
         # gets mangled and Windows silently rewrites line endings.
@@ -1986,16 +2365,27 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
             with open(path, "r", encoding="utf-8", newline="") as _fh:
                 on_disk = _fh.read()
             if on_disk != new_text:
-                summary += (f"\n\n⚠ WRITE NOT VERIFIED: the file on disk does not "
-                            f"match what was written ({len(on_disk)} vs "
-                            f"{len(new_text)} chars) — it may have been truncated or "
-                            f"changed by another process. Re-read it before relying "
-                            f"on it.")
+                return (f"\n\n⚠ WRITE NOT VERIFIED: the file on disk does not "
+                        f"match what was written ({len(on_disk)} vs "
+                        f"{len(new_text)} chars) — it may have been truncated or "
+                        f"changed by another process. Re-read it before relying "
+                        f"on it.")
         except OSError as exc:
-            summary += f"\n\n⚠ WROTE but could not read back to verify ({exc})."
+            return f"\n\n⚠ WROTE but could not read back to verify ({exc})."
+        return ""
+
+    def _finalize_write(path: Path, old_text: Optional[str], new_text: str,
+                        summary: str) -> str:
+        """Checkpoint + diff + write + verify-after-write + mark-read + syntax."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # The syntax check parses new_text on the verify pool while the diff,
+        # checkpoint and write happen here; it's joined at the end.
+        pending = verify.submit(path, new_text) if reg.verify_edits else None
+        _diff_and_checkpoint(path, old_text, new_text)
+        summary += _write_and_check(path, new_text)
         reg._mark_read(path)
-        if reg.verify_edits:
-            err = verify_syntax(path)
+        if pending is not None:
+            err = verify.result(pending)
             if err:
                 summary += (f"\n\n⚠ VERIFY FAILED: {err}\n"
                             f"The file was saved but does not parse. Fix it now.")
@@ -2102,20 +2492,10 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
     ))
 
     # --- multi_edit (atomic multi-replace on one file) -------------------
-    def _multi_edit(args):
-        path = reg._resolve(args["path"], search=True)  # see _edit_file's comment
-        if not path.exists():
-            return f"ERROR: file not found: {path}"
-        if str(path) not in reg.read_paths:
-            return (f"ERROR: refusing to edit {path} — read it first with read_file.")
-        if reg._stale_since_read(path):
-            reg._mark_read(path)
-            return (f"ERROR: {path} CHANGED ON DISK since you last read it — "
-                    f"re-read it with read_file before editing (it may contain "
-                    f"changes you never saw).")
-        raw = args["edits"]
-        # edits format: one 'old_string>>>new_string' pair per line, pairs
-        # separated by a line containing only '==='.
+    def _parse_pairs(raw: str):
+        """multi_edit's edits format: one 'old_string>>>new_string' pair per
+        block, blocks separated by a line containing only '==='. Returns the
+        (old, new) pairs or an ERROR string."""
         blocks = [b for b in raw.split("\n===\n") if b.strip()]
         pairs = []
         for b in blocks:
@@ -2126,7 +2506,38 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
             pairs.append((old.strip("\n"), new.strip("\n")))
         if not pairs:
             return "ERROR: no edits provided."
-        original = path.read_text(encoding="utf-8")
+        return pairs
+
+    def _plan_edits(original: str, pairs):
+        """Apply (old, new) pairs to `original` in memory. Returns (updated,
+        applied, None), or (None, 0, (headline, detail)) for the first edit
+        that doesn't match — nothing is written either way."""
+        # One pass: locate every edit in the ORIGINAL text (exact, else the
+        # whitespace-tolerant match over one shared LineTable) and splice
+        # them all in a single join. Edits that don't each match exactly
+        # once, or that overlap, take the sequential path below — which also
+        # handles an edit whose old text only exists after an earlier edit
+        # and produces the per-edit error messages.
+        table = None
+        spans = []
+        for old, new in pairs:
+            s = original.find(old) if old else -1
+            if s >= 0 and original.find(old, s + 1) < 0:
+                spans.append((s, s + len(old), new))
+                continue
+            if s < 0:
+                table = table or edit_match.LineTable(original)
+                span = _fuzzy_find(original, old, table)
+                if span:
+                    spans.append((span[0], span[1], new))
+                    continue
+            spans = None
+            break
+        if spans is not None:
+            try:
+                return edit_match.apply_spans(original, spans), len(spans), None
+            except ValueError:
+                pass
         updated = original
         applied = 0
         for i, (old, new) in enumerate(pairs, 1):
@@ -2144,8 +2555,29 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
                     reason = "not found" if c == 0 else f"not unique ({c} matches)"
                     hint = edit_not_found_hint(updated, old, new) if c == 0 else (
                         " add more surrounding context so it's unique.")
-                    return (f"ERROR: edit #{i} {reason} — NO changes applied "
-                            f"(atomic). old text starts: {old[:50]!r}.{hint}")
+                    return None, 0, (f"edit #{i} {reason}",
+                                     f"old text starts: {old[:50]!r}.{hint}")
+        return updated, applied, None
+
+    def _multi_edit(args):
+        path = reg._resolve(args["path"], search=True)  # see _edit_file's comment
+        if not path.exists():
+            return f"ERROR: file not found: {path}"
+        if str(path) not in reg.read_paths:
+            return (f"ERROR: refusing to edit {path} — read it first with read_file.")
+        if reg._stale_since_read(path):
+            reg._mark_read(path)
+            return (f"ERROR: {path} CHANGED ON DISK since you last read it — "
+                    f"re-read it with read_file before editing (it may contain "
+                    f"changes you never saw).")
+        pairs = _parse_pairs(args["edits"])
+        if isinstance(pairs, str):
+            return pairs
+        original = path.read_text(encoding="utf-8")
+        updated, applied, failure = _plan_edits(original, pairs)
+        if failure:
+            head, detail = failure
+            return f"ERROR: {head} — NO changes applied (atomic). {detail}"
         return _finalize_write(path, original, updated,
                                f"Applied {applied} edits to {path} atomically.")
 
@@ -2176,6 +2608,108 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
         mutating=True,
     ))
 
+    # --- edit_many (atomic edits across several files) -------------------
+    def _edit_many(args):
+        raw = args["edits"]
+        heads = list(_FILE_HEADER_RE.finditer(raw))
+        if not heads or heads[0].start() != 0:
+            return ("ERROR: edit_many needs a 'FILE: <path>' line before each "
+                    "file's edits. Format: FILE: a.py, then multi_edit-style "
+                    "'old>>>new' pairs split by '===' lines, then ===, FILE: b.py, …")
+        plans = []       # (path, original, updated, applied)
+        seen = set()
+        for k, head in enumerate(heads):
+            end = heads[k + 1].start() if k + 1 < len(heads) else len(raw)
+            path = reg._resolve(head.group(1), search=True)  # see _edit_file
+            if str(path) in seen:
+                return (f"ERROR: {path} is listed twice — put all of its edits "
+                        f"under one FILE: line. NO files changed.")
+            seen.add(str(path))
+            if not path.exists():
+                return f"ERROR: file not found: {path} — NO files changed."
+            if str(path) not in reg.read_paths:
+                return (f"ERROR: refusing to edit {path} — read it first with "
+                        f"read_file (or read_many). NO files changed.")
+            if reg._stale_since_read(path):
+                reg._mark_read(path)
+                return (f"ERROR: {path} CHANGED ON DISK since you last read it — "
+                        f"re-read it before editing. NO files changed.")
+            pairs = _parse_pairs(raw[head.end():end].strip("\n"))
+            if isinstance(pairs, str):
+                return f"ERROR: {path}: {pairs[len('ERROR: '):]} NO files changed."
+            original = path.read_text(encoding="utf-8")
+            updated, applied, failure = _plan_edits(original, pairs)
+            if failure:
+                what, detail = failure
+                return f"ERROR: {path}: {what} — NO files changed (atomic). {detail}"
+            plans.append((path, original, updated, applied))
+
+        # Everything matched: one verification pass (on the pool, while the
+        # rest runs), one checkpoint group, one diff, then the writes.
+        pending = [verify.submit(p, new) if reg.verify_edits else None
+                   for p, _old, new, _n in plans]
+        for p, old, _new, _n in plans:
+            _checkpoint(p, old)
+        if reg.on_diff is not None:
+            diff = "".join(_render_diff(p, old, new) for p, old, new, _n in plans)
+            if diff:
+                label = (str(plans[0][0]) if len(plans) == 1 else
+                         os.path.commonpath([str(p.parent) for p, *_ in plans]))
+                reg.on_diff(label, diff)
+        notes = []
+        done = []
+        for p, old, new, _n in plans:
+            try:
+                notes.append(_write_and_check(p, new))
+            except OSError as exc:
+                # Put back what was already written — and `p` itself, which
+                # the failed write may have truncated or half-written.
+                for q, q_old in done + [(p, old)]:
+                    try:
+                        with open(q, "w", encoding="utf-8", newline="") as fh:
+                            fh.write(q_old)
+                    except OSError:
+                        pass
+                return (f"ERROR: writing {p} failed ({exc}); it and the {len(done)} "
+                        f"file(s) written before it were restored. NO files changed.")
+            done.append((p, old))
+        total = sum(n for *_rest, n in plans)
+        lines = [f"Applied {total} edits across {len(plans)} file(s) atomically:"]
+        for (p, _old, _new, n), note, fut in zip(plans, notes, pending):
+            reg._mark_read(p)
+            lines.append(f"  {p} ({n} edit{'s' if n != 1 else ''}){note}")
+            err = verify.result(fut) if fut is not None else None
+            if err:
+                lines.append(f"  ⚠ VERIFY FAILED: {p}: {err} — saved, but it does "
+                             f"not parse. Fix it now.")
+        return "\n".join(lines)
+
+    reg.register(Tool(
+        name="edit_many",
+        description=("Apply find/replace edits across SEVERAL files atomically — "
+                     "every edit in every file matches or nothing is written. "
+                     "Each file starts with a line 'FILE: <path>', followed by "
+                     "that file's edits in multi_edit format ('old>>>new' pairs "
+                     "split by '===' lines); a '===' line also goes before each "
+                     "later FILE: line. Example:\n"
+                     "FILE: src/a.py\n"
+                     "import old_name>>>import new_name\n"
+                     "===\n"
+                     "FILE: src/b.py\n"
+                     "old_name()>>>new_name()\n"
+                     "===\n"
+                     "old_name.x>>>new_name.x\n"
+                     "Every file must have been read first."),
+        params=[
+            ToolParam("edits", "'FILE: <path>' lines, each followed by that "
+                               "file's old>>>new pairs; '===' lines separate "
+                               "pairs and files."),
+        ],
+        handler=_edit_many,
+        executes=False,
+        mutating=True,
+    ))
+
     # --- streaming subprocess machinery (shared by bash and run_script) --
     def _kill_tree(proc: subprocess.Popen) -> None:
         """Kill a process and its entire tree (Windows: taskkill; POSIX: killpg)."""
@@ -2208,12 +2742,15 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
         arrives. Returns (returncode, stdout_lines, stderr_lines, timed_out).
         On timeout the whole process TREE is killed. Output is decoded as UTF-8
         so non-ASCII (em-dashes, accents) isn't mojibake'd (`—` -> `â€"`) by the
-        Windows codepage default."""
+        Windows codepage default. On POSIX the process-wide reactor does the
+        reading, idle notes and timeout (reactor.py) — no threads per call."""
         popen_kwargs = {}
         if os.name != "nt":
             popen_kwargs["start_new_session"] = True
         if env is not None:
             popen_kwargs["env"] = env
+        if reactor.available():
+            return _run_watched(cmd_list, cwd, timeout, popen_kwargs)
         proc = subprocess.Popen(
             cmd_list, cwd=str(cwd),
             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
@@ -2275,10 +2812,37 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
         t_idle.join(timeout=2)
         return proc.returncode, out_lines, err_lines, timed_out
 
+    def _run_watched(cmd_list: List[str], cwd, timeout: int, popen_kwargs
+                     ) -> Tuple[Optional[int], List[str], List[str], bool]:
+        proc = subprocess.Popen(cmd_list, cwd=str(cwd), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, **popen_kwargs)
+        out_lines: List[str] = []
+        err_lines: List[str] = []
+
+        def _sink(lines: List[str]) -> Callable[[str], None]:
+            def _take(line: str) -> None:
+                lines.append(line)
+                cb = reg.on_bash_line
+                if cb is not None:
+                    cb(line)
+            return _take
+
+        def _idle(quiet: float) -> None:
+            cb = reg.on_bash_line
+            if cb is not None:
+                cb(f"⏳ still running — no new output for {int(quiet)}s "
+                   f"(normal for installs/builds/servers; not necessarily hung)")
+
+        watch = reactor.get().watch(
+            proc, [(proc.stdout, _sink(out_lines)), (proc.stderr, _sink(err_lines))],
+            timeout=timeout, idle_seconds=IDLE_NOTE_SECONDS, on_idle=_idle)
+        watch.wait()
+        return watch.returncode, out_lines, err_lines, watch.timed_out
+
     def _format_run_result(shown_cmd: str, returncode: Optional[int],
                            out_lines: List[str], err_lines: List[str],
                            timed_out: bool, timeout: int,
-                           command: str = "") -> str:
+                           command: str = "", show_output: bool = True) -> str:
         out = "\n".join(out_lines)
         err = "\n".join(err_lines)
         if timed_out:
@@ -2291,9 +2855,10 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
             parts = [f"$ {shown_cmd}",
                      f"⚠ COMMAND FAILED (exit {returncode}) — read the error and fix it."]
         # On truncation, prefer keeping the END of output (errors/tracebacks live there).
-        if out.strip():
+        # (run_tests leaves it out when a junit report already says what failed.)
+        if show_output and out.strip():
             parts.append("--- stdout ---\n" + _tail_clamp(out.rstrip()))
-        if err.strip():
+        if show_output and err.strip():
             parts.append("--- stderr ---\n" + _tail_clamp(err.rstrip()))
         # Shell-syntax hint keys on the ERROR TEXT, not the return code —
         # PowerShell often exits 0 even when a cmdlet in a pipe wasn't found.
@@ -2352,7 +2917,8 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
             return ("ERROR: background execution is not available yet — "
                     "run in foreground or split the work.")
         timeout = int(args.get("timeout", 120) or 120)
-        # Use PowerShell on Windows, sh elsewhere, matching the host shell.
+        # Use PowerShell on Windows, bash (or sh) elsewhere, matching the host
+        # shell — in both cases one persistent session per registry.
         if os.name == "nt":
             # Auto-fix the bash-isms models reach for on Windows so they run
             # instead of erroring: `&&`/`||` chains -> if ($?)/if (-not $?),
@@ -2381,14 +2947,25 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
                 shell_cmd = _one_shot_powershell_cmd(run_cmd)
                 rc, out_lines, err_lines, timed_out = _run_streaming(shell_cmd, cwd_path, timeout)
         else:
-            shell_cmd = ["/bin/sh", "-c", command]
-            rc, out_lines, err_lines, timed_out = _run_streaming(shell_cmd, cwd_path, timeout)
+            rc = out_lines = err_lines = timed_out = None
+            if _persistent_shell_enabled():
+                if reg._shell is None:
+                    reg._shell = _PersistentPosixShell()
+                # Resolved here (the session's own cwd may have moved on).
+                rc, out_lines, err_lines, timed_out = reg._shell.run(
+                    command, str(cwd_path) if cwd else None, str(reg.cwd), timeout,
+                    on_line=reg.on_bash_line, idle_note_seconds=IDLE_NOTE_SECONDS)
+            if rc is None and not timed_out:
+                shell_cmd = ["/bin/sh", "-c", command]
+                rc, out_lines, err_lines, timed_out = _run_streaming(shell_cmd, cwd_path, timeout)
         return _format_run_result(command, rc, out_lines, err_lines, timed_out,
                                   timeout, command=command)
 
     reg.register(Tool(
         name="bash",
-        description="Run a shell command (PowerShell on Windows, sh elsewhere). Returns exit code + output.",
+        description="Run a shell command (PowerShell on Windows, bash elsewhere). "
+                    "One session: a bare cd or export carries over to the next call. "
+                    "Returns exit code + output.",
         params=[
             ToolParam("command", "The command line to execute."),
             ToolParam("cwd", "Working directory.", required=False),
@@ -2499,31 +3076,276 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
             counts.append(f"{m.group(1)} failed")
         return f"[{head}] " + (", ".join(counts) if counts else f"exit {rc}")
 
+    def _test_shell(cmd: str) -> List[str]:
+        if os.name == "nt":
+            return ["powershell", "-NoProfile", "-NonInteractive", "-Command", cmd]
+        return ["/bin/sh", "-c", cmd]
+
+    def _pytest_args(cmd: str) -> Optional[List[str]]:
+        """The arguments after pytest when `cmd` runs pytest itself (`pytest
+        …`, `python -m pytest …`), else None — `tox -e pytest` or
+        `make pytest` only name it."""
+        try:
+            words = shlex.split(cmd, posix=os.name != "nt")
+        except ValueError:
+            return None
+        while words and re.match(r"[A-Za-z_]\w*=", words[0]):     # VAR=value prefixes
+            words.pop(0)
+        if not words:
+            return None
+        prog = re.sub(r"\.exe$", "", os.path.basename(words[0]).lower())
+        if prog in ("pytest", "py.test"):
+            return words[1:]
+        if re.fullmatch(r"python[\d.]*|py", prog) and words[1:3] == ["-m", "pytest"]:
+            return words[3:]
+        return None
+
+    def _single_pytest(cmd: str) -> bool:
+        # Only a lone pytest invocation can take extra file / --junitxml
+        # arguments safely — in `pytest && npm test` they'd land on npm.
+        return not re.search(r"[;&|<>`]", cmd) and _pytest_args(cmd) is not None
+
+    def _quote_arg(text: str) -> str:
+        return f'"{text}"' if os.name == "nt" else shlex.quote(text)
+
+    def _impact_plan(cmd: str) -> "impact.Plan":
+        tree, prefix = file_tree.tree_for(reg.cwd, ignore.matcher_for(reg.cwd))
+        files = [os.path.relpath(f, prefix) if prefix else f for f in tree.files(prefix)]
+        changed = reg.checkpointer.changed_paths() if reg.checkpointer is not None else []
+        cache = reg._test_results
+        plan = impact.plan(reg.cwd, files, changed, cache, cmd)
+        if cache.pending:
+            cache.harvest(plan.keys)
+            plan = impact.plan(reg.cwd, files, changed, cache, cmd)
+        return plan
+
+    def _junit_path() -> str:
+        fd, path = tempfile.mkstemp(prefix="robodog_junit_", suffix=".xml")
+        os.close(fd)
+        os.unlink(path)         # pytest writes it; absent = not finished yet
+        return path
+
+    def _pytest_cmd(cmd: str, tests: List[str], report: str, extra: Tuple[str, ...] = ()) -> str:
+        return " ".join([cmd] + list(extra) + [_quote_arg(t) for t in tests]
+                        + [f"--junitxml={_quote_arg(report)}", "-o", "junit_family=xunit1"])
+
+    def _run_pytest_background(cmd: str, tests: List[str]) -> Tuple[str, str]:
+        """Start `cmd` on `tests` via background_spawn; (its message, report path)."""
+        report = _junit_path()
+        return reg.background_spawn(_pytest_cmd(cmd, tests, report), str(reg.cwd)), report
+
+    def _shard_count(cmd: str, tests: List[str], whole_suite: bool) -> int:
+        """Processes to split a pytest run across (1 = one plain run)."""
+        raw = os.environ.get("ROBODOG_TEST_SHARDS", "").strip()
+        try:
+            n = int(raw) if raw else (os.cpu_count() or 1)
+        except ValueError:
+            n = 1
+        if n < 2 or len(tests) < 2:
+            return 1
+        # The command already picks its own parallelism / order / debugger.
+        if re.search(r"(^|\s)(-n|--numprocesses|--dist|--pdb|--lf|--last-failed|--ff)(\s|=|$)",
+                     cmd):
+            return 1
+        with reg._test_results.lock:
+            known = [reg._test_results.seconds.get(t) for t in tests]
+        if None not in known and sum(known) < _SHARD_MIN_SECONDS:
+            return 1            # a fast suite: extra interpreters cost more than they save
+        if whole_suite:
+            # Sharding hands pytest explicit test files: a command or config
+            # that picks its own (paths, -k/-m, ignores, testpaths) or that
+            # collects anything else (doctests, other file patterns) runs whole.
+            for word in _pytest_args(cmd) or []:
+                if not word.startswith("-") or re.match(
+                        r"(-[km]|--ignore|--ignore-glob|--deselect|--pyargs)(=|$)|-[km].", word):
+                    return 1
+            for name in impact.CONFIG_FILES:
+                try:
+                    text = (reg.cwd / name).read_text(encoding="utf-8", errors="replace")
+                except OSError:
+                    continue
+                if re.search(r"python_files|doctest|testpaths|norecursedirs|--ignore|--deselect",
+                             text):
+                    return 1
+        return n
+
+    def _shards(tests: List[str], n: int) -> List[List[str]]:
+        """`tests` in `n` groups of about equal recorded duration (longest
+        first into the lightest group); files never timed count as the median."""
+        with reg._test_results.lock:
+            known = {t: reg._test_results.seconds[t] for t in tests
+                     if t in reg._test_results.seconds}
+        times = sorted(known.values())
+        guess = times[len(times) // 2] if times else 1.0
+        groups: List[Tuple[float, List[str]]] = [(0.0, []) for _ in range(min(n, len(tests)))]
+        for t in sorted(tests, key=lambda t: (-known.get(t, guess), t)):
+            k = min(range(len(groups)), key=lambda i: groups[i][0])
+            groups[k] = (groups[k][0] + known.get(t, guess), groups[k][1] + [t])
+        return [sorted(g) for _, g in groups if g]
+
+    def _run_pytest(cmd: str, tests: List[str], timeout: int, whole_suite: bool = False):
+        """Run `cmd` on `tests` — or, with whole_suite, as given (`tests` is
+        then every test file, used only to shard) — with junit reports.
+        Uses pytest-xdist when the running interpreter has it, else splits
+        the files over several pytest processes.
+        Returns (rc, out, err, timed_out, testreport.Report or None, shards)."""
+        import importlib.util
+        n = _shard_count(cmd, tests, whole_suite)
+        args = [] if whole_suite else tests
+        if n > 1 and sys.executable in cmd and importlib.util.find_spec("xdist") is not None:
+            path = _junit_path()
+            rc, out_lines, err_lines, timed_out = _run_streaming(
+                _test_shell(_pytest_cmd(cmd, args, path, ("-n", str(n)))), reg.cwd, timeout)
+            runs, paths = [(rc, out_lines, err_lines, timed_out)], [path]
+        else:
+            groups = _shards(tests, n) if n > 1 else [args]
+            paths = [_junit_path() for _ in groups]
+            with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                runs = list(pool.map(
+                    lambda gp: _run_streaming(_test_shell(_pytest_cmd(cmd, gp[0], gp[1])),
+                                              reg.cwd, timeout),
+                    zip(groups, paths)))
+            n = len(groups)
+        report = testreport.read(paths, set(tests))
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        # pytest exit codes: 0 ok, 1 failures, 2-4 interrupted/internal/usage,
+        # 5 nothing collected — a shard with nothing to do mustn't hide the rest.
+        codes = [r[0] for r in runs]
+        real = [c for c in codes if c != 5]
+        rc = (max(real, key=lambda c: 99 if c is None else c) if real else 5)
+        out_lines = [ln for r in runs for ln in r[1]]
+        err_lines = [ln for r in runs for ln in r[2]]
+        return rc, out_lines, err_lines, any(r[3] for r in runs), report, n
+
+    def _record_report(report: Optional["testreport.Report"], keys: Dict[str, str]) -> None:
+        if report is not None:
+            outcomes = {t: v for t, v in report.files.items() if t in keys}
+            if outcomes:
+                reg._test_results.record(outcomes, keys)
+
+    def _test_result(shown: str, rc, out_lines: List[str], err_lines: List[str], timeout: int,
+                     report: Optional["testreport.Report"], shards: int,
+                     seconds: float) -> Tuple[str, str]:
+        """(summary line, detail) for a pytest run: counts and compact failure
+        records from the junit report, or the scraped summary and output tail
+        when the report doesn't cover the run (crash, usage error, no tests)."""
+        if report is None or rc not in (0, 1) or (rc == 1 and not report.failures):
+            return (_summarize_tests(rc, out_lines, err_lines),
+                    _format_run_result(shown, rc, out_lines, err_lines, False, timeout))
+        head = f"[{'PASS' if rc == 0 else 'FAIL'}] {testreport.summary(report, seconds)}"
+        if shards > 1:
+            head += f" ({shards} shards)"
+        detail = _format_run_result(shown, rc, out_lines, err_lines, False, timeout,
+                                    show_output=False)
+        records = testreport.failure_records(report)
+        return head, detail + ("\n" + records if records else "")
+
+    def _run_impacted(cmd: str, timeout: int, rest_mode: str) -> str:
+        plan = _impact_plan(cmd)
+        cache = reg._test_results
+        total = len(plan.keys)
+        skipped = plan.cached + plan.rest
+        with cache.lock:
+            known = [cache.seconds[t] for t in skipped if t in cache.seconds]
+        saved = (f"~{sum(known):.1f}s saved" if known else "time saved unknown")
+        if len(known) < len(skipped):
+            saved += f" ({len(skipped) - len(known)} never timed this session)"
+        if plan.changed:
+            names = ", ".join(plan.changed[:5]) + (" …" if len(plan.changed) > 5 else "")
+            why = f"affected by {len(plan.changed)} changed file(s) ({names})"
+        else:
+            why = "not cached as passing (no changes recorded this prompt)"
+        impact_line = (f"Impact: ran {len(plan.affected)} of {total} test file(s) {why}; "
+                       f"skipped {len(skipped)} ({len(plan.cached)} passed earlier with "
+                       f"unchanged inputs, {len(plan.rest)} not affected) — {saved}.")
+
+        tail = ""
+        if plan.rest and rest_mode in ("background", "bg", "true", "1", "yes"):
+            if reg.background_spawn is None:
+                tail = "\nThe unaffected files were not started: background execution isn't available."
+            else:
+                msg, report = _run_pytest_background(cmd, plan.rest)
+                with cache.lock:
+                    cache.pending.append((report, {t: plan.keys[t] for t in plan.rest}))
+                tail = f"\nThe {len(plan.rest)} unaffected file(s) run in the background: {msg}"
+        elif plan.rest:
+            tail = ("\nrest='background' runs the unaffected files in the background; "
+                    "scope='all' runs everything.")
+
+        if not plan.affected:
+            head = "[PASS]" if not plan.rest else "[NOT RUN]"
+            return f"{head} nothing affected to re-run\n{impact_line}{tail}"
+        t0 = time.monotonic()
+        rc, out_lines, err_lines, timed_out, report, shards = _run_pytest(
+            cmd, plan.affected, timeout)
+        shown = " ".join([cmd] + plan.affected[:8]
+                         + ([f"… +{len(plan.affected) - 8} more"] if len(plan.affected) > 8 else []))
+        if timed_out:
+            return f"ERROR: tests timed out after {timeout}s: {shown}"
+        _record_report(report, {t: plan.keys[t] for t in plan.affected})
+        summary, detail = _test_result(shown, rc, out_lines, err_lines, timeout, report, shards,
+                                       time.monotonic() - t0)
+        return f"{summary}\n{impact_line}{tail}\n{detail}"
+
     def _run_tests(args):
         cmd = args.get("command") or _detect_test_command()
         if not cmd:
             return ("ERROR: no test command detected. Pass command= "
                     "(e.g. 'pytest -q') or configure one.")
         timeout = int(args.get("timeout", 600) or 600)
-        if os.name == "nt":
-            shell_cmd = ["powershell", "-NoProfile", "-NonInteractive", "-Command", cmd]
-        else:
-            shell_cmd = ["/bin/sh", "-c", cmd]
-        rc, out_lines, err_lines, timed_out = _run_streaming(shell_cmd, reg.cwd, timeout)
+        scope = str(args.get("scope") or os.environ.get("ROBODOG_TEST_SCOPE")
+                    or "all").strip().lower()
+        note = ""
+        if scope in ("impacted", "changed"):
+            if _single_pytest(cmd):
+                return _run_impacted(cmd, timeout, str(args.get("rest") or "").strip().lower())
+            note = (f"(scope='{scope}' needs a plain pytest command — "
+                    f"ran the whole suite)\n")
+        keys: Optional[Dict[str, str]] = None
+        if _single_pytest(cmd):
+            # A full run fills the impact cache too, so a later impacted run
+            # can skip what passed here; the test files also drive sharding.
+            try:
+                keys = _impact_plan(cmd).keys
+            except Exception:
+                keys = None
+        if keys is None:
+            rc, out_lines, err_lines, timed_out = _run_streaming(_test_shell(cmd), reg.cwd, timeout)
+            if timed_out:
+                return f"ERROR: tests timed out after {timeout}s: {cmd}"
+            summary = _summarize_tests(rc, out_lines, err_lines)
+            detail = _format_run_result(cmd, rc, out_lines, err_lines, False, timeout)
+            return f"{note}{summary}\n{detail}"
+        t0 = time.monotonic()
+        rc, out_lines, err_lines, timed_out, report, shards = _run_pytest(
+            cmd, sorted(keys), timeout, whole_suite=True)
         if timed_out:
             return f"ERROR: tests timed out after {timeout}s: {cmd}"
-        summary = _summarize_tests(rc, out_lines, err_lines)
-        detail = _format_run_result(cmd, rc, out_lines, err_lines, False, timeout)
-        return f"{summary}\n{detail}"
+        _record_report(report, keys)
+        summary, detail = _test_result(cmd, rc, out_lines, err_lines, timeout, report, shards,
+                                       time.monotonic() - t0)
+        return f"{note}{summary}\n{detail}"
 
     reg.register(Tool(
         name="run_tests",
         description=("Run the project's test suite and get a pass/fail summary. "
                      "Auto-detects pytest / npm test, or pass command= explicitly. "
-                     "Use after making changes to verify they work."),
+                     "Use after making changes to verify they work. With pytest, "
+                     "the suite is split across CPU cores and each failure comes "
+                     "back as its test id, assertion line and a short traceback; "
+                     "scope='impacted' runs only the test files your changes this "
+                     "prompt can reach and skips files that already passed with "
+                     "unchanged inputs."),
         params=[
             ToolParam("command", "Test command (auto-detected if omitted).", required=False),
             ToolParam("timeout", "Timeout in seconds (default 600).", required=False),
+            ToolParam("scope", "all (default) | impacted.", required=False),
+            ToolParam("rest", "With scope='impacted': 'background' also runs the "
+                              "unaffected test files in the background.", required=False),
         ],
         handler=_run_tests,
         mutating=True,
@@ -2538,35 +3360,34 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
         def _rel(full: str) -> str:
             return str(Path(full).relative_to(reg.cwd)) if full.startswith(cwd_s) else full
 
-        # os.walk with in-place dir pruning so node_modules/.git/etc. are never
-        # descended into (rglob would walk all of them first, then filter — slow
-        # right after an `npm install`). Collect a small sample of NON-matching
-        # files too, to orient the model when the pattern matches nothing.
+        # Answered from the shared file_tree snapshot (excludes pruned, so
+        # node_modules/.git/etc. never count): a suffix-index lookup for
+        # `*.ext`, an in-memory fnmatch otherwise. Keep a small sample of
+        # NON-matching files too, to orient the model when nothing matches.
         matches: List[str] = []
         present: List[str] = []
-        scanned = 0
+        capped = ""
         try:
-            for dirpath, dirnames, filenames in os.walk(str(root)):
-                dirnames[:] = [d for d in dirnames
-                               if d not in EXCLUDE_DIRS and not d.endswith(".egg-info")]
-                for fn in filenames:
-                    if fnmatch.fnmatch(fn, pattern):
-                        matches.append(_rel(os.path.join(dirpath, fn)))
-                    elif len(present) < 40:
-                        present.append(os.path.relpath(os.path.join(dirpath, fn), str(root)))
-                scanned += len(filenames)
-                if len(matches) >= 2000 or scanned > 60_000:
-                    break
+            tree, prefix = file_tree.tree_for(root, ignore.matcher_for(root))
+            hits = tree.glob(pattern, prefix)
+            if tree.truncated:
+                capped = (f"\n(The file index stopped at {tree.max_files} files, so this "
+                          f"may be incomplete — raise ROBODOG_FILE_TREE_MAX.)")
+            base = str(root)
+            matches = [_rel(os.path.join(base, os.path.relpath(h, prefix) if prefix else h))
+                       for h in hits]
+            if not matches:
+                present = [os.path.relpath(h, prefix) if prefix else h
+                           for h in tree.files(prefix)[:40]]
         except (OSError, RuntimeError):
             pass
-        matches.sort()
         if not matches:
             # Mirror the read_file/list_dir "did you mean" philosophy: a bare "no
             # files" leads models to barrel on and read paths they only assumed
             # exist. Show what IS there so they can fix the pattern or the path.
             if not present:
                 return (f"No files matching '{pattern}' under {root} "
-                        f"(the directory is empty or fully excluded).")
+                        f"(the directory is empty or fully excluded)." + capped)
             exts = sorted({os.path.splitext(p)[1] for p in present
                            if os.path.splitext(p)[1]})
             sample = sorted(present)[:15]
@@ -2576,14 +3397,14 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
                     + (f" (types: {' '.join(exts[:12])})" if exts else "")
                     + ". The pattern matches the file BASENAME (e.g. '*.js', "
                     "'*.test.js'). What's actually there:\n  "
-                    + "\n  ".join(sample) + more)
+                    + "\n  ".join(sample) + more + capped)
         # Lead with the COUNT so the model doesn't have to count lines (small
         # models miscount) — then the list (capped at 500).
         n = len(matches)
         shown = matches[:500]
         head = (f"{n} file(s) matching '{pattern}'"
                 + (f" (showing first 500)" if n > 500 else "") + ":")
-        return head + "\n" + "\n".join(shown)
+        return head + "\n" + "\n".join(shown) + capped
 
     reg.register(Tool(
         name="glob",
@@ -2606,36 +3427,79 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
             rx = _re.compile(pattern)
         except _re.error as exc:
             return f"ERROR: bad regex: {exc}"
-        results = []
-        targets = [root] if root.is_file() else [
-            p for p in root.rglob("*")
-            if p.is_file() and not _is_excluded(p.relative_to(root))
-            and fnmatch.fnmatch(p.name, file_glob)
-        ]
-        for fp in targets:
+        targets = [root] if root.is_file() else None
+        if targets is None and grep_index.enabled():
+            # Trigram index (ROBODOG_GREP_INDEX=1): only the files that can
+            # contain the regex's literals get scanned. None = the index can't
+            # answer (still building, pattern has no literals, root outside
+            # the project or in an excluded dir) — fall through to the walk.
+            project = reg._project_root() or reg.cwd
+            real_root = Path(os.path.realpath(root))
             try:
-                for i, line in enumerate(fp.read_text(encoding="utf-8", errors="ignore").splitlines(), 1):
-                    if rx.search(line):
-                        rel = fp.relative_to(reg.cwd) if str(fp).startswith(str(reg.cwd)) else fp
-                        results.append(f"{rel}:{i}: {line.strip()[:200]}")
-                        if len(results) >= 300:
-                            break
-            except Exception:
-                continue
-            if len(results) >= 300:
-                break
-        if not results:
+                rel_root = real_root.relative_to(project)
+            except ValueError:
+                rel_root = None
+            skip = ignore.matcher_for(project)
+            if rel_root is not None and not skip.excluded_path(real_root):
+                idx = grep_index.index_for(project, skip)
+                targets = idx.candidates(real_root, pattern, file_glob)
+        if targets is None:
+            # Streamed from an os.scandir walk: the first files are being
+            # searched while the rest of the tree is still being listed.
+            targets = grep_engine.iter_files(root, ignore.matcher_for(root), file_glob)
+
+        def _num(key):
+            try:
+                return max(0, int(args.get(key) or 0))
+            except (TypeError, ValueError):
+                return 0
+        around = _num("context")
+        before, after = _num("before") or around, _num("after") or around
+        count_only = str(args.get("count", "")).lower() in ("1", "true", "yes")
+        found = grep_engine.search(targets, rx, max_matches=300, before=before,
+                                   after=after, count_only=count_only)
+        if not found.matches:
             return f"No matches for /{pattern}/."
-        capped = " (showing first 300)" if len(results) >= 300 else ""
-        return f"{len(results)} match(es) for /{pattern}/{capped}:\n" + "\n".join(results)
+
+        def _rel(fp):
+            return fp.relative_to(reg.cwd) if str(fp).startswith(str(reg.cwd)) else fp
+
+        if count_only:
+            rows = [f"{_rel(fh.path)}: {fh.count}" for fh in found.files]
+            return (f"{found.matches} matching line(s) for /{pattern}/ in "
+                    f"{len(found.files)} file(s):\n" + "\n".join(rows))
+        results = []
+        for fh in found.files:
+            rel = _rel(fh.path)
+            last = None
+            for i, line, is_match in fh.lines:
+                if (before or after) and last is not None and i > last + 1:
+                    results.append("--")
+                sep = ":" if is_match else "-"
+                results.append(f"{rel}{sep}{i}{sep} {line.strip()[:200]}")
+                last = i
+            if (before or after) and fh is not found.files[-1]:
+                results.append("--")
+        capped = " (showing first 300)" if found.capped else ""
+        return (f"{found.matches} match(es) for /{pattern}/{capped}:\n"
+                + "\n".join(results))
 
     reg.register(Tool(
         name="grep",
-        description="Search file contents by regex. Returns file:line: match.",
+        description=("Search file contents by regex. Returns file:line: match "
+                     "(context lines as file-line-). Stops at 300 matches."),
         params=[
             ToolParam("pattern", "Regular expression."),
             ToolParam("path", "File or dir to search (default cwd).", required=False),
             ToolParam("glob", "Filename filter, e.g. *.py", required=False),
+            ToolParam("context", "Lines of context around each match (like grep -C).",
+                      required=False),
+            ToolParam("before", "Lines of context before each match (grep -B).",
+                      required=False),
+            ToolParam("after", "Lines of context after each match (grep -A).",
+                      required=False),
+            ToolParam("count", "true = only per-file match counts, no cap.",
+                      required=False),
         ],
         handler=_grep,
         executes=False,
@@ -2662,4 +3526,9 @@ def default_registry(cwd: Optional[str] = None) -> ToolRegistry:
         executes=False,
     ))
 
+    if grep_index.enabled():
+        # Start building (or loading) the project's trigram index now so it's
+        # likely ready by the first grep.
+        project = reg._project_root() or reg.cwd
+        grep_index.index_for(project, ignore.matcher_for(project))
     return reg
@@ -0,0 +1,336 @@
+# file: robodog_terminal/transport.py
+"""
+Shared HTTP transport for the LLM clients.
+
+Each client used to build its own `requests.Session()` with the default
+adapters (10 connections per host). A subagent fan-out fires 8-12 calls at
+one host at once, so the pool overflowed — every extra call paid a fresh TCP
++ TLS handshake, and its connection was thrown away afterwards. This module
+owns ONE process-wide session instead, shared by every client (and so by
+every `_child_registry` subagent and every /model switch):
+
+  - _PooledAdapter : an HTTPAdapter sized by ROBODOG_HTTP_POOL_SIZE (default
+    32 connections per host), with TCP keep-alive probes on the sockets and
+    idle eviction — connections parked longer than ROBODOG_HTTP_IDLE_S
+    (default 50s, under the common 60s server/LB keep-alive cut-off) are
+    closed before the pool would hand out one the server already dropped.
+  - _HTTP2Adapter : ROBODOG_HTTP2=1 multiplexes every call to a host over a
+    single HTTP/2 connection via httpx, when `httpx[http2]` is installed;
+    otherwise it logs once and the HTTP/1.1 pool is used. A request with
+    TLS or proxy settings of its own (verify= / REQUESTS_CA_BUNDLE, cert=,
+    a proxy for its URL) goes through the HTTP/1.1 pool as well, which
+    honours them exactly as before.
+
+Every request records {host, connect_s, tls_s, ttfb_s, reused, status} on the
+calling thread; `take_timings()` hands them to the loop's llm_call trace so
+/trace can show where first-byte latency goes.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_POOL_SIZE = 32
+_DEFAULT_IDLE_S = 50.0
+
+_local = threading.local()
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _env_number(name: str, default, cast=int):
+    raw = os.environ.get(name)
+    if raw:
+        try:
+            return max(0, cast(raw))
+        except ValueError:
+            pass
+    return default
+
+
+def _record(timing: dict) -> None:
+    rec = getattr(_local, "timings", None)
+    if rec is None:
+        rec = _local.timings = []
+    rec.append(timing)
+    if len(rec) > 64:          # a thread nobody takes from must not grow forever
+        del rec[:-64]
+
+
+def take_timings() -> List[dict]:
+    """Timings of the requests made on THIS thread since the last call."""
+    rec = getattr(_local, "timings", None) or []
+    _local.timings = []
+    return rec
+
+
+def _keepalive_socket_options():
+    from urllib3.connection import HTTPConnection
+    opts = list(HTTPConnection.default_socket_options)
+    opts.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # Probe after 30s idle, every 10s — Linux/macOS names; absent elsewhere.
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPALIVE", 30),
+                        ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            opts.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return opts
+
+
+def _timed_pool_classes():
+    """urllib3 pool classes whose connections time their own TCP connect and
+    TLS handshake (stored on the connection until the adapter reads them)."""
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def timed(base):
+        class Timed(base):
+            _rd_timing = None
+
+            def _new_conn(self):
+                t0 = time.monotonic()
+                sock = super()._new_conn()
+                self._rd_tcp = time.monotonic() - t0
+                return sock
+
+            def connect(self):
+                t0 = time.monotonic()
+                super().connect()
+                total = time.monotonic() - t0
+                tcp = getattr(self, "_rd_tcp", total)
+                self._rd_timing = (tcp, max(0.0, total - tcp))
+        Timed.__name__ = "Timed" + base.__name__
+        return Timed
+
+    class TimedHTTPPool(HTTPConnectionPool):
+        ConnectionCls = timed(HTTPConnection)
+
+    class TimedHTTPSPool(HTTPSConnectionPool):
+        ConnectionCls = timed(HTTPSConnection)
+
+    return {"http": TimedHTTPPool, "https": TimedHTTPSPool}
+
+
+def _drain_idle(pool) -> int:
+    """Close the connections parked in a urllib3 pool (in-flight ones are
+    untouched). The pool's queue holds connections and None placeholders;
+    every slot taken is put back as a placeholder."""
+    q = getattr(pool, "pool", None)
+    if q is None:
+        return 0
+    taken = []
+    while True:
+        try:
+            taken.append(q.get(block=False))
+        except queue.Empty:
+            break
+    closed = 0
+    for conn in taken:
+        if conn is not None:
+            conn.close()
+            closed += 1
+        q.put(None)
+    return closed
+
+
+def _build_pooled_adapter(pool_size: int, idle_s: float):
+    from requests.adapters import HTTPAdapter
+
+    class _PooledAdapter(HTTPAdapter):
+        """HTTPAdapter with sized per-host pools, socket keep-alive, idle
+        eviction and per-request connect/TLS/TTFB timing."""
+
+        def __init__(self):
+            self.idle_s = idle_s
+            self._last_used: dict = {}
+            self._idle_lock = threading.Lock()
+            super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs.setdefault("socket_options", _keepalive_socket_options())
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = _timed_pool_classes()
+
+        def _evict_if_idle(self, url: str) -> None:
+            parts = urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            now = time.monotonic()
+            with self._idle_lock:
+                last = self._last_used.get(key)
+                self._last_used[key] = now
+            if last is not None and self.idle_s and now - last > self.idle_s:
+                pools = self.poolmanager.pools
+                n = 0
+                for k in list(pools.keys()):
+                    if (k.key_scheme, k.key_host) == (parts.scheme, parts.hostname):
+                        pool = pools.get(k)
+                        n += _drain_idle(pool) if pool is not None else 0
+                if n:
+                    logger.debug("transport: closed %d idle connection(s) to %s",
+                                 n, parts.hostname)
+
+        def send(self, request, **kwargs):
+            self._evict_if_idle(request.url)
+            t0 = time.monotonic()
+            resp = super().send(request, **kwargs)
+            ttfb = time.monotonic() - t0
+            conn = getattr(resp.raw, "_connection", None)
+            fresh = getattr(conn, "_rd_timing", None)
+            if conn is not None:
+                conn._rd_timing = None      # the next request on it is a reuse
+            _record({"host": urlsplit(request.url).hostname or "",
+                     "connect_s": fresh[0] if fresh else 0.0,
+                     "tls_s": fresh[1] if fresh else 0.0,
+                     "ttfb_s": ttfb, "reused": fresh is None and conn is not None,
+                     "status": resp.status_code, "http": "1.1"})
+            return resp
+
+    return _PooledAdapter()
+
+
+class _HTTPXRaw:
+    """Just enough of urllib3's HTTPResponse for requests' Response to read an
+    httpx streamed body (content, iter_content, iter_lines)."""
+
+    def __init__(self, resp):
+        self._resp = resp
+
+    def stream(self, chunk_size=None, decode_content=True):
+        import httpx
+        import requests
+        try:
+            yield from self._resp.iter_bytes(chunk_size)
+        except httpx.TimeoutException as exc:
+            raise requests.exceptions.ReadTimeout(exc) from exc
+        except httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(exc) from exc
+        finally:
+            self._resp.close()
+
+    def read(self, amt=None, decode_content=True):
+        return b"".join(self.stream())
+
+    def close(self):
+        self._resp.close()
+
+    def release_conn(self):
+        self._resp.close()
+
+
+def _build_http2_adapter(pool_size: int, idle_s: float):
+    """An adapter that sends through httpx with HTTP/2, or None when httpx
+    (with its h2 extra) isn't installed."""
+    try:
+        import h2  # noqa: F401  (httpx's http2=True needs it)
+        import httpx
+    except ImportError:
+        return None
+    import requests
+    from requests.adapters import BaseAdapter
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers, select_proxy
+
+    class _HTTP2Adapter(BaseAdapter):
+        def __init__(self):
+            super().__init__()
+            self._client = httpx.Client(http2=True, limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size,
+                keepalive_expiry=idle_s or None))
+            self._http11 = _build_pooled_adapter(pool_size, idle_s)
+
+        def send(self, request, stream=False, timeout=None, verify=True, cert=None,
+                 proxies=None):
+            if verify is not True or cert or select_proxy(request.url, proxies or {}):
+                # A CA bundle, client cert or proxy: the httpx client is built
+                # once for everyone and can't take them per request.
+                return self._http11.send(request, stream=stream, timeout=timeout,
+                                         verify=verify, cert=cert, proxies=proxies)
+            connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+            req = self._client.build_request(
+                request.method, request.url, headers=dict(request.headers),
+                content=request.body, timeout=httpx.Timeout(read, connect=connect))
+            t0 = time.monotonic()
+            try:
+                r = self._client.send(req, stream=True)
+            except httpx.ConnectTimeout as exc:
+                raise requests.exceptions.ConnectTimeout(exc, request=request) from exc
+            except httpx.TimeoutException as exc:
+                raise requests.exceptions.ReadTimeout(exc, request=request) from exc
+            except httpx.TransportError as exc:
+                raise requests.exceptions.ConnectionError(exc, request=request) from exc
+            _record({"host": urlsplit(request.url).hostname or "", "connect_s": 0.0,
+                     "tls_s": 0.0, "ttfb_s": time.monotonic() - t0, "reused": None,
+                     "status": r.status_code, "http": r.http_version.replace("HTTP/", "")})
+            resp = requests.Response()
+            resp.status_code = r.status_code
+            resp.headers = CaseInsensitiveDict(r.headers)
+            resp.encoding = get_encoding_from_headers(resp.headers)
+            resp.reason = r.reason_phrase
+            resp.url = request.url
+            resp.request = request
+            resp.raw = _HTTPXRaw(r)
+            resp.connection = self
+            return resp
+
+        def close(self):
+            self._client.close()
+            self._http11.close()
+
+    return _HTTP2Adapter()
+
+
+def _build_session():
+    import requests
+    pool_size = _env_number("ROBODOG_HTTP_POOL_SIZE", _DEFAULT_POOL_SIZE) or 1
+    idle_s = _env_number("ROBODOG_HTTP_IDLE_S", _DEFAULT_IDLE_S, float)
+    session = requests.Session()
+    adapter = None
+    if os.environ.get("ROBODOG_HTTP2", "").lower() in ("1", "true", "yes"):
+        adapter = _build_http2_adapter(pool_size, idle_s)
+        if adapter is None:
+            logger.warning("ROBODOG_HTTP2 is set but httpx[http2] isn't installed "
+                           "— using pooled HTTP/1.1")
+    if adapter is None:
+        adapter = _build_pooled_adapter(pool_size, idle_s)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def shared_session():
+    """The process-wide session every LLM client sends through (built on
+    first use, so importing this module costs nothing)."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = _build_session()
+        return _SESSION
+
+
+def reset_shared_session() -> None:
+    """Close the shared session's connections; the next shared_session()
+    builds a fresh one (re-reading the ROBODOG_HTTP_* settings)."""
+    global _SESSION
+    with _SESSION_LOCK:
+        old, _SESSION = _SESSION, None
+    if old is not None:
+        old.close()
+
+
+def summarize_timings(timings: List[dict]) -> Optional[dict]:
+    """Fold per-request timings into the llm_call trace fields, or None."""
+    if not timings:
+        return None
+    last = timings[-1]
+    return {"connect_s": round(sum(t["connect_s"] for t in timings), 4),
+            "tls_s": round(sum(t["tls_s"] for t in timings), 4),
+            "ttfb_s": round(last["ttfb_s"], 4),
+            "new_conns": sum(1 for t in timings if t["connect_s"] or t["tls_s"]),
+            "requests": len(timings), "http": last.get("http", "1.1")}
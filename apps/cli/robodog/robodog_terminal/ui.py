@@ -165,6 +165,8 @@ def _input_key_bindings(on_cycle_permission=None):
 
 
 class UI:
+    DIFF_LINES = 40   # diff preview height; build_core formats no more than this
+
     def __init__(self, model_name: str = "gateway/sonnet", cwd: Optional[str] = None,
                  commands: Optional[List[str]] = None, stderr: bool = False,
                  editor: Optional[str] = None, theme: Optional[str] = None):
@@ -1011,7 +1013,7 @@ class UI:
         else:
             print(f"    -> {summary}")
 
-    def diff(self, path: str, diff_text: str, max_lines: int = 40):
+    def diff(self, path: str, diff_text: str, max_lines: int = DIFF_LINES):
         """Colored unified diff preview of a file change."""
         lines = diff_text.splitlines()
         shown = lines[:max_lines]
@@ -0,0 +1,231 @@
+# file: robodog_terminal/verify.py
+"""
+Post-edit syntax verification, off the agent thread.
+
+verify_syntax used to re-read the file it had just written, parse it inline,
+and for JS spawn a fresh `node --check` (15 s timeout) on every edit. Now:
+
+  - the check runs on the text the edit already has in memory — nothing is
+    read back from disk;
+  - results are cached by (extension, content hash), so re-saving text that
+    was already checked (an undo, a no-op rewrite, the same file after a
+    revert) costs one hash;
+  - JS goes to one long-lived `node` worker that parses with the vm module
+    (CommonJS first, then as an ES module for import/export code, the way
+    `node --check` detects it) over a JSON-lines pipe — one process for the
+    session instead of one per edit;
+  - submit() runs the check on a small pool, so _finalize_write starts it
+    before building the diff/checkpoint and only joins it at the end.
+
+Every failure inside a check — a missing parser, a dead worker, a timeout —
+reads as "nothing to report": verification must never break an edit. Only
+a check that actually ran is cached, so a worker crash or timeout doesn't
+pin "clean" on that text.
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import queue
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
+_MAX_CACHED = 512
+_NODE_TIMEOUT = 15.0
+_JS_SUFFIXES = (".js", ".mjs", ".cjs", ".jsx")
+
+_CACHE: "OrderedDict[Tuple[str, bytes], Optional[str]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+# The worker: one JSON request per line in ({"id", "src", "kind"}), one
+# {"id", "error"} per line out. kind "script" = CommonJS only, "module" =
+# ESM only, "auto" = CommonJS, then ESM if the error is an ESM-only construct.
+_NODE_WORKER = r"""
+const vm = require('vm');
+const ESM_ONLY = /Cannot use import statement|Unexpected token 'export'|import\.meta/;
+const ARGS = ['exports', 'require', 'module', '__filename', '__dirname'];
+function fmt(e) {
+  const m = /check:(\d+)/.exec(String(e && e.stack));
+  return (m ? `line ${m[1]}: ` : '') + String(e && e.message || e);
+}
+function check(src, kind) {
+  if (kind !== 'module') {
+    try { vm.compileFunction(src, ARGS, { filename: 'check' }); return null; }
+    catch (e) { if (kind === 'script' || !ESM_ONLY.test(String(e.message))) return fmt(e); }
+  }
+  if (!vm.SourceTextModule) return null;
+  try { new vm.SourceTextModule(src, { identifier: 'check' }); return null; }
+  catch (e) { return fmt(e); }
+}
+require('readline').createInterface({ input: process.stdin }).on('line', (line) => {
+  let out;
+  try { const q = JSON.parse(line); out = { id: q.id, error: check(q.src, q.kind) }; }
+  catch (e) { out = { id: null, error: null }; }
+  process.stdout.write(JSON.stringify(out) + '\n');
+});
+"""
+
+
+class _Unchecked(Exception):
+    """The check couldn't run (the worker died or timed out) — not a verdict."""
+
+
+class _NodeWorker:
+    """One warm `node` process answering syntax checks, restarted if it dies."""
+
+    def __init__(self, node: str):
+        self.node = node
+        self.proc: Optional[subprocess.Popen] = None
+        self.replies: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.seq = 0
+
+    def _start(self) -> None:
+        self.proc = subprocess.Popen(
+            [self.node, "--experimental-vm-modules", "-e", _NODE_WORKER],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1)
+        self.replies = queue.Queue()
+        threading.Thread(target=self._pump, args=(self.proc, self.replies),
+                         name="robodog-verify-node", daemon=True).start()
+
+    @staticmethod
+    def _pump(proc: subprocess.Popen, replies: "queue.Queue[Optional[dict]]") -> None:
+        for line in proc.stdout:
+            try:
+                replies.put(json.loads(line))
+            except ValueError:
+                continue
+        replies.put(None)
+
+    def stop(self) -> None:
+        proc, self.proc = self.proc, None
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+
+    def check(self, src: str, kind: str) -> Optional[str]:
+        with self.lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+            self.seq += 1
+            try:
+                self.proc.stdin.write(json.dumps({"id": self.seq, "src": src,
+                                                  "kind": kind}) + "\n")
+                self.proc.stdin.flush()
+                while True:
+                    reply = self.replies.get(timeout=_NODE_TIMEOUT)
+                    if reply is None:
+                        raise OSError("node worker exited")
+                    if reply.get("id") == self.seq:
+                        return reply.get("error")
+            except (OSError, ValueError, queue.Empty) as exc:
+                self.stop()      # a wedged or dead worker is replaced next time
+                raise _Unchecked(str(exc)) from exc
+
+
+_WORKER: Optional[_NodeWorker] = None
+_WORKER_LOCK = threading.Lock()
+
+
+def _node_worker() -> Optional[_NodeWorker]:
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is None:
+            node = shutil.which("node")
+            if not node:
+                return None
+            _WORKER = _NodeWorker(node)
+        return _WORKER
+
+
+@atexit.register
+def _stop_worker() -> None:
+    if _WORKER is not None:
+        _WORKER.stop()
+
+
+def _check(suffix: str, text: str, name: str) -> Optional[str]:
+    if suffix == ".py":
+        try:
+            compile(text, name, "exec")
+        except SyntaxError as exc:
+            return f"Python syntax error at line {exc.lineno}: {exc.msg}"
+    elif suffix == ".json":
+        try:
+            json.loads(text)
+        except json.JSONDecodeError as exc:
+            return f"JSON parse error at line {exc.lineno}, col {exc.colno}: {exc.msg}"
+    elif suffix in (".yaml", ".yml"):
+        try:
+            import yaml  # PyYAML is a robodog dependency
+        except ImportError:
+            return None
+        try:
+            yaml.safe_load(text)
+        except yaml.YAMLError as exc:
+            return f"YAML parse error: {str(exc).splitlines()[0]}"
+    elif suffix == ".toml":
+        try:
+            import tomllib  # py3.11+
+        except ImportError:
+            return None
+        try:
+            tomllib.loads(text)
+        except Exception as exc:
+            return f"TOML parse error: {exc}"
+    elif suffix in _JS_SUFFIXES:
+        worker = _node_worker()
+        if worker is None:
+            return None
+        kind = {".mjs": "module", ".cjs": "script"}.get(suffix, "auto")
+        err = worker.check(text, kind)
+        return f"JS syntax error at {err}" if err and err.startswith("line ") else (
+            f"JS syntax error: {err}" if err else None)
+    return None
+
+
+def check_text(path: Path, text: str) -> Optional[str]:
+    """Syntax-check `text` as the contents of `path` (by extension). Returns
+    an error string, or None when clean, not checkable, or the check failed."""
+    suffix = Path(path).suffix.lower()
+    if suffix not in (".py", ".json", ".yaml", ".yml", ".toml") + _JS_SUFFIXES:
+        return None
+    key = (suffix, hashlib.blake2b(text.encode("utf-8", "surrogatepass"),
+                                   digest_size=16).digest())
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+    try:
+        err = _check(suffix, text, str(path))
+    except Exception:            # _Unchecked or a parser bug: no verdict, not cached
+        return None
+    with _CACHE_LOCK:
+        _CACHE[key] = err
+        while len(_CACHE) > _MAX_CACHED:
+            _CACHE.popitem(last=False)
+    return err
+
+
+def submit(path: Path, text: str) -> "Future[Optional[str]]":
+    """check_text on the verify pool; join with result()."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="robodog-verify")
+    return _POOL.submit(check_text, path, text)
+
+
+def result(fut: "Future[Optional[str]]", timeout: float = _NODE_TIMEOUT + 5) -> Optional[str]:
+    try:
+        return fut.result(timeout=timeout)
+    except Exception:
+        return None
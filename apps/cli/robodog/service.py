@@ -29,6 +29,11 @@ try:
 except ImportError:
     from code_map import CodeMapper
 
+try:
+    from .robodog_terminal.ignore import DEFAULT_EXCLUDE_DIRS, matcher_for
+except ImportError:
+    from robodog_terminal.ignore import DEFAULT_EXCLUDE_DIRS, matcher_for
+
 try:
     from .amplenote_service import AmplenoteService
 except ImportError:
@@ -62,7 +67,7 @@ class RobodogService:
         #    If svc.todo is set later by the CLI, include() will pick up svc.todo._roots.
         #    Otherwise we default to cwd.
         self._roots = [os.getcwd()]
-        self._exclude_dirs = exclude_dirs or {"node_modules", "dist", "diffoutput"}
+        self._exclude_dirs = set(exclude_dirs or DEFAULT_EXCLUDE_DIRS)
         self.stashes = {}
         self.backupFolder = backupFolder
         self.file_service = file_service
@@ -486,8 +491,9 @@ class RobodogService:
 
         return knowledge
 
-    # Default exclude directories
-    DEFAULT_EXCLUDE_DIRS = {"node_modules", "dist", "diffoutput"}
+    # Default exclude directories (shared with the terminal tools; .gitignore /
+    # .robodogignore rules apply on top via matcher_for)
+    DEFAULT_EXCLUDE_DIRS = DEFAULT_EXCLUDE_DIRS
 
     def search_files(self, patterns="*", recursive=True, roots=None, exclude_dirs=None):
         if isinstance(patterns, str):
@@ -500,10 +506,13 @@ class RobodogService:
             if not os.path.isdir(root):
                 continue
             if recursive:
+                skip = matcher_for(root, exclude_dirs)
                 for dirpath, dirnames, filenames in os.walk(root):
-                    dirnames[:] = [d for d in dirnames if d not in exclude_dirs]
+                    dirnames[:] = [d for d in dirnames if not skip(os.path.join(dirpath, d), True)]
                     for fn in filenames:
                         full = os.path.join(dirpath, fn)
+                        if skip(full, False):
+                            continue
                         for pat in patterns:
                             if fnmatch.fnmatch(full, pat) or fnmatch.fnmatch(fn, pat):
                                 matches.append(full)
@@ -592,7 +601,9 @@ class RobodogService:
     def _find_files(self) -> List[str]:
         out = []
         for r in self._roots:
-            for dp, _, fns in os.walk(r):
+            skip = matcher_for(r, self._exclude_dirs)
+            for dp, dns, fns in os.walk(r):
+                dns[:] = [d for d in dns if not skip(os.path.join(dp, d), True)]
                 if self.get_todo_filename() in fns:
                     out.append(os.path.join(dp, self.get_todo_filename()))
         return out